@@ -269,9 +269,11 @@ class QuickStart:
     def _check_vllm_connection(self, api_base: str) -> bool:
         """检查LLM连接（vLLM或Ollama）"""
         backup_keys = [
-            "LLM_BACKEND", "VLLM_API_BASE", "VLLM_MODEL", "VLLM_TIMEOUT",
+            "LLM_BACKEND", "VLLM_API_BASE", "VLLM_API_BASES", "VLLM_MODEL", "VLLM_TIMEOUT",
+            "VLLM_EJECT_AFTER_FAILURES", "VLLM_EJECT_SECONDS", "VLLM_STREAM",
             "OLLAMA_API_BASE", "OLLAMA_MODEL", "OLLAMA_TIMEOUT", "OLLAMA_MAX_TOKENS",
-            "VLLM_FALLBACK_TO_OLLAMA"
+            "VLLM_FALLBACK_TO_OLLAMA", "OLLAMA_API", "OLLAMA_KEEP_ALIVE", "OLLAMA_STREAM",
+            "OLLAMA_NUM_PARALLEL"
         ]
         backup = {k: os.environ.get(k) for k in backup_keys}
 
@@ -287,6 +289,14 @@ class QuickStart:
                 os.environ["VLLM_MODEL"] = str(llm_cfg.get("model"))
             if llm_cfg.get("timeout") is not None:
                 os.environ["VLLM_TIMEOUT"] = str(llm_cfg.get("timeout"))
+            if llm_cfg.get("endpoints"):
+                os.environ["VLLM_API_BASES"] = ",".join(str(x) for x in llm_cfg.get("endpoints"))
+            if llm_cfg.get("eject_after_failures") is not None:
+                os.environ["VLLM_EJECT_AFTER_FAILURES"] = str(llm_cfg.get("eject_after_failures"))
+            if llm_cfg.get("eject_seconds") is not None:
+                os.environ["VLLM_EJECT_SECONDS"] = str(llm_cfg.get("eject_seconds"))
+            if llm_cfg.get("stream") is not None:
+                os.environ["VLLM_STREAM"] = str(llm_cfg.get("stream"))
 
             if ollama_cfg.get("api_base"):
                 os.environ["OLLAMA_API_BASE"] = str(ollama_cfg.get("api_base"))
@@ -298,6 +308,14 @@ class QuickStart:
                 os.environ["OLLAMA_MAX_TOKENS"] = str(ollama_cfg.get("max_tokens"))
             if ollama_cfg.get("fallback_from_vllm") is not None:
                 os.environ["VLLM_FALLBACK_TO_OLLAMA"] = str(ollama_cfg.get("fallback_from_vllm"))
+            if ollama_cfg.get("api"):
+                os.environ["OLLAMA_API"] = str(ollama_cfg.get("api"))
+            if ollama_cfg.get("keep_alive") is not None:
+                os.environ["OLLAMA_KEEP_ALIVE"] = str(ollama_cfg.get("keep_alive"))
+            if ollama_cfg.get("stream") is not None:
+                os.environ["OLLAMA_STREAM"] = str(ollama_cfg.get("stream"))
+            if ollama_cfg.get("num_parallel") is not None:
+                os.environ["OLLAMA_NUM_PARALLEL"] = str(ollama_cfg.get("num_parallel"))
 
             sys.path.insert(0, str(self.tools_dir))
             from llm_client import VLLMClient
@@ -827,9 +845,69 @@ Then verify with:
         if effective_experience_store_path:
             cmd.extend(["--experience-store-path", str(effective_experience_store_path)])
 
+        generation_cfg = self.config.get("test_generation", {}).get("generation", {})
+        if isinstance(generation_cfg, dict) and generation_cfg.get("workers") is not None:
+            try:
+                cmd.extend(["--gen-workers", str(max(1, int(generation_cfg.get("workers"))))])
+            except (TypeError, ValueError):
+                pass
+        if isinstance(generation_cfg, dict) and generation_cfg.get("mode") in ("function", "tu_batch"):
+            cmd.extend(["--gen-mode", str(generation_cfg.get("mode"))])
+        if isinstance(generation_cfg, dict) and generation_cfg.get("batch_size") is not None:
+            try:
+                cmd.extend(["--gen-batch-size", str(max(1, int(generation_cfg.get("batch_size"))))])
+            except (TypeError, ValueError):
+                pass
+        if isinstance(generation_cfg, dict) and generation_cfg.get("header_slicing") in ("full", "tu", "function"):
+            cmd.extend(["--header-slicing", str(generation_cfg.get("header_slicing"))])
+        if isinstance(generation_cfg, dict) and generation_cfg.get("mocking_mode") in ("off", "weak"):
+            cmd.extend(["--mocking-mode", str(generation_cfg.get("mocking_mode"))])
+        if compile_fix_cfg.get("repair_output") in ("full", "patch"):
+            cmd.extend(["--repair-output", str(compile_fix_cfg.get("repair_output"))])
+        if compile_fix_cfg.get("patch_max_tokens") is not None:
+            try:
+                cmd.extend(["--patch-max-tokens", str(max(256, int(compile_fix_cfg.get("patch_max_tokens"))))])
+            except (TypeError, ValueError):
+                pass
+        if compile_fix_cfg.get("speculative_candidates") is not None:
+            try:
+                cmd.extend(["--speculative-candidates", str(max(1, int(compile_fix_cfg.get("speculative_candidates"))))])
+            except (TypeError, ValueError):
+                pass
+        if compile_fix_cfg.get("fused_triage_fix") is True:
+            cmd.append("--fused-triage-fix")
+        if compile_fix_cfg.get("clangd_session") is False:
+            cmd.append("--disable-clangd-session")
+        if compile_fix_cfg.get("syntax_preflight") is False:
+            cmd.append("--disable-syntax-preflight")
+        if compile_fix_cfg.get("domain_classify") in ("rules_first", "llm"):
+            cmd.extend(["--domain-classify", str(compile_fix_cfg.get("domain_classify"))])
+        build_generator = self.config.get("build", {}).get("cmake_generator")
+        if build_generator is not None:
+            cmd.extend(["--cmake-generator", str(build_generator).strip()])
+
         execution_cfg = self.config.get("test_generation", {}).get("execution", {})
         compile_exec_cfg = execution_cfg.get("compile", {}) if isinstance(execution_cfg, dict) else {}
         run_exec_cfg = execution_cfg.get("run", {}) if isinstance(execution_cfg, dict) else {}
+        if isinstance(execution_cfg, dict):
+            for key, flag, minimum in (
+                ("test_workers", "--test-workers", 1),
+                ("compile_jobs", "--compile-jobs", 0),
+                ("llm_inflight", "--llm-inflight", 0),
+                ("aggregate_shards", "--aggregate-shards", 0),
+            ):
+                if execution_cfg.get(key) is not None:
+                    try:
+                        cmd.extend([flag, str(max(minimum, int(execution_cfg.get(key))))])
+                    except (TypeError, ValueError):
+                        pass
+            if execution_cfg.get("pipeline_mode") in ("phased", "streaming"):
+                cmd.extend(["--pipeline-mode", str(execution_cfg.get("pipeline_mode"))])
+            if execution_cfg.get("pipeline_queue_size") is not None:
+                try:
+                    cmd.extend(["--pipeline-queue-size", str(max(1, int(execution_cfg.get("pipeline_queue_size"))))])
+                except (TypeError, ValueError):
+                    pass
 
         compile_raw = ""
         run_raw = ""
@@ -865,6 +943,14 @@ Then verify with:
             env["VLLM_MODEL"] = str(llm_cfg.get("model"))
         if llm_cfg.get("timeout") is not None:
             env["VLLM_TIMEOUT"] = str(llm_cfg.get("timeout"))
+        if llm_cfg.get("endpoints"):
+            env["VLLM_API_BASES"] = ",".join(str(x) for x in llm_cfg.get("endpoints"))
+        if llm_cfg.get("eject_after_failures") is not None:
+            env["VLLM_EJECT_AFTER_FAILURES"] = str(llm_cfg.get("eject_after_failures"))
+        if llm_cfg.get("eject_seconds") is not None:
+            env["VLLM_EJECT_SECONDS"] = str(llm_cfg.get("eject_seconds"))
+        if llm_cfg.get("stream") is not None:
+            env["VLLM_STREAM"] = str(llm_cfg.get("stream"))
 
         if ollama_cfg.get("api_base"):
             env["OLLAMA_API_BASE"] = str(ollama_cfg.get("api_base"))
@@ -876,6 +962,38 @@ Then verify with:
             env["OLLAMA_MAX_TOKENS"] = str(ollama_cfg.get("max_tokens"))
         if ollama_cfg.get("fallback_from_vllm") is not None:
             env["VLLM_FALLBACK_TO_OLLAMA"] = str(ollama_cfg.get("fallback_from_vllm"))
+        if ollama_cfg.get("api"):
+            env["OLLAMA_API"] = str(ollama_cfg.get("api"))
+        if ollama_cfg.get("keep_alive") is not None:
+            env["OLLAMA_KEEP_ALIVE"] = str(ollama_cfg.get("keep_alive"))
+        if ollama_cfg.get("stream") is not None:
+            env["OLLAMA_STREAM"] = str(ollama_cfg.get("stream"))
+        if ollama_cfg.get("num_parallel") is not None:
+            env["OLLAMA_NUM_PARALLEL"] = str(ollama_cfg.get("num_parallel"))
+
+        # 透传根因检索配置
+        research_cfg = self.config.get("test_generation", {}).get("research", {})
+        if not isinstance(research_cfg, dict):
+            research_cfg = {}
+        if research_cfg.get("sources"):
+            sources = research_cfg.get("sources")
+            env["RESEARCH_SOURCES"] = ",".join(str(x) for x in sources) if isinstance(sources, list) else str(sources)
+        if research_cfg.get("kb_dir"):
+            kb_dir = Path(str(research_cfg.get("kb_dir")))
+            if not kb_dir.is_absolute():
+                kb_dir = self.config_file.parent / kb_dir
+            env["RESEARCH_KB_DIR"] = str(kb_dir.resolve())
+        if research_cfg.get("cache_path"):
+            cache_path = Path(str(research_cfg.get("cache_path")))
+            if not cache_path.is_absolute():
+                cache_path = self.project_root / cache_path
+            env["RESEARCH_CACHE_PATH"] = str(cache_path.resolve())
+        if research_cfg.get("cache_ttl_hours") is not None:
+            env["RESEARCH_CACHE_TTL_HOURS"] = str(research_cfg.get("cache_ttl_hours"))
+        if research_cfg.get("timeout_seconds") is not None:
+            env["RESEARCH_TIMEOUT"] = str(research_cfg.get("timeout_seconds"))
+        if research_cfg.get("offline") is not None:
+            env["RESEARCH_OFFLINE"] = str(research_cfg.get("offline"))
 
         # 透传编译器配置
         build_cfg = self.config.get("build", {})
@@ -886,6 +1004,16 @@ Then verify with:
             resolved_compiler, _ = self._resolve_compiler()
             if resolved_compiler:
                 env["CXX"] = resolved_compiler
+
+        # 透传构建产物缓存配置
+        artifact_cache_cfg = build_cfg.get("artifact_cache", {})
+        if isinstance(artifact_cache_cfg, dict):
+            if artifact_cache_cfg.get("enabled") is not None:
+                env["UT_BUILD_CACHE"] = str(artifact_cache_cfg.get("enabled"))
+            if artifact_cache_cfg.get("dir"):
+                env["UT_BUILD_CACHE_DIR"] = str(Path(str(artifact_cache_cfg.get("dir"))).expanduser().resolve())
+            if artifact_cache_cfg.get("precompiled_headers") is not None:
+                env["UT_BUILD_PCH"] = str(artifact_cache_cfg.get("precompiled_headers"))
         
         # 运行工作流
         result = subprocess.run(cmd, cwd=str(self.tools_dir), env=env)
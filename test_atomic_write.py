@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+测试生成文件的原子写入（tools/ut_workflow_llm.py）
+验证写入后不残留临时文件、文件权限与open()创建时一致，以及内容不变时不重写
+"""
+
+import glob
+import os
+import stat
+import sys
+import tempfile
+import threading
+
+from testlib import run_tests
+
+from ut_workflow_llm import LLMUTWorkflow
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_mode_follows_umask():
+    with tempfile.TemporaryDirectory() as root:
+        reference = os.path.join(root, "reference.txt")
+        with open(reference, "w", encoding="utf-8") as f:
+            f.write("x")
+        path = os.path.join(root, "add_student_llm_test.cpp")
+        LLMUTWorkflow._write_text_file_atomic(path, "TEST(A, B) {}\n")
+        assert _mode(path) == _mode(reference)
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == "TEST(A, B) {}\n"
+
+
+def test_existing_file_mode_is_preserved():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "function_status_index.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{}")
+        os.chmod(path, 0o640)
+        LLMUTWorkflow._write_text_file_atomic(path, '{"a": 1}')
+        assert _mode(path) == 0o640
+
+
+def test_no_temp_files_left_and_not_discovered_as_tests():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "add_student_llm_test.cpp")
+        threads = [
+            threading.Thread(target=LLMUTWorkflow._write_text_file_atomic, args=(path, f"// v{i}\n"))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert os.listdir(root) == ["add_student_llm_test.cpp"]
+        assert glob.glob(os.path.join(root, "*_llm_test.cpp")) == [path]
+
+
+def test_write_if_changed_keeps_mtime():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "CMakeLists.txt")
+        assert LLMUTWorkflow._write_text_file_if_changed(path, "project(t)\n")
+        os.utime(path, ns=(0, 1))
+        assert not LLMUTWorkflow._write_text_file_if_changed(path, "project(t)\n")
+        assert os.stat(path).st_mtime_ns == 1
+        assert LLMUTWorkflow._write_text_file_if_changed(path, "project(u)\n")
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试按TU分组的批量生成（tools/llm_test_generator.py）
+验证同源文件请求连续发送并共享前缀、source_file缺失时的排序，以及批量响应按标记拆分
+"""
+
+import os
+import re
+import sys
+import threading
+
+from testlib import run_tests
+
+from c_code_analyzer import FunctionDependency
+from llm_test_generator import LLMTestGenerator
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class RecordingLLMClient:
+    """记录提示词并返回最小的可用测试文件"""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        target = re.search(r"target function '(\w+)'", prompt)
+        name = target.group(1) if target else "unknown"
+        return f"#include <gtest/gtest.h>\n\nTEST({name}_test, Runs)\n{{\n    EXPECT_TRUE(true);\n}}\n"
+
+
+def _dep(name, source_file):
+    return FunctionDependency(
+        name=name,
+        return_type="int32_t",
+        parameters=[("int32_t", "id")],
+        external_calls=set(),
+        source_file=source_file,
+        include_files={"validator.h"} if source_file else set()
+    )
+
+
+DEPS = [
+    _dep("validate_score", "src/validator.c"),
+    _dep("db_init", "src/database.c"),
+    _dep("validate_student_id", "src/validator.c"),
+    _dep("inline_helper", None),
+]
+
+
+def test_batch_groups_by_tu_and_tolerates_missing_source():
+    client = RecordingLLMClient()
+    generator = LLMTestGenerator(client)
+    codes = generator.generate_batch_tests(DEPS, project_root=PROJECT_ROOT)
+
+    assert set(codes) == {"validate_score", "db_init", "validate_student_id", "inline_helper"}
+    order = [re.search(r"target function '(\w+)'", p).group(1) for p in client.prompts]
+    # source_file为None的函数排在最前，同一源文件的函数连续发送
+    assert order == ["inline_helper", "db_init", "validate_score", "validate_student_id"]
+    assert "TEST(db_init_test, Runs)" in codes["db_init"]
+
+
+def test_same_tu_prompts_share_shared_context_prefix():
+    client = RecordingLLMClient()
+    generator = LLMTestGenerator(client)
+    generator.generate_batch_tests(DEPS[:3], project_root=PROJECT_ROOT)
+    # 同TU的请求以相同的共享上下文开头，函数相关内容在其后
+    shared_context = generator._build_shared_context(DEPS[0], None, PROJECT_ROOT)
+    assert "=== HEADER FILE:" in shared_context
+    for prompt in client.prompts[1:]:
+        assert prompt.startswith(shared_context)
+    assert "target function 'validate_score'" in client.prompts[1][len(shared_context):]
+    stats = generator.get_prefix_cache_stats()
+    assert stats["prompts"] == 3 and stats["shared_prefix_chars"] > len(shared_context)
+
+
+def test_split_batch_sections():
+    begin = LLMTestGenerator.BATCH_BEGIN_MARKER
+    end = LLMTestGenerator.BATCH_END_MARKER
+    response = "\n".join([
+        "Here are the files:",
+        begin.format(name="validate_score"),
+        "TEST(A, B) {}",
+        end.format(name="validate_score"),
+        begin.format(name="validate_student_id") + " (cont.)",
+        "TEST(C, D) {}",
+        end.format(name="validate_student_id"),
+        begin.format(name="db_init"),
+        "TEST(E, F) {}",
+    ])
+    sections = LLMTestGenerator._split_batch_sections(
+        response, ["validate_score", "validate_student_id", "db_init"]
+    )
+    assert sections == {"validate_score": "TEST(A, B) {}", "validate_student_id": "TEST(C, D) {}"}
+    assert LLMTestGenerator._split_batch_sections("", ["validate_score"]) == {}
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
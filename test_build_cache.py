@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+测试机器级构建产物缓存（tools/build_cache.py）
+验证内容寻址条目的构建/命中/失败记忆与并发发布，gtest/gmock静态库只构建一次，
+生产代码目标文件按源文件与依赖头文件内容复用，gtest/gmock预编译头的生成与复用，
+以及弱符号化目标文件（按objcopy身份缓存、weak模式强制-O0 -fno-inline使同TU被调函数可替换）
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from testlib import run_tests, make_workflow
+
+import build_cache
+from build_cache import ArtifactCache, GTestArtifactCache, ObjectCache, PchCache, WeakObjectCache, parse_depfile
+
+GTEST_SOURCE_ROOT = "/usr/src/googletest"
+
+
+def _writer(content, calls=None, ok=True):
+    def _build(staging):
+        if calls is not None:
+            calls.append(staging)
+        with open(os.path.join(staging, "artifact.txt"), "w", encoding="utf-8") as f:
+            f.write(content)
+        return ok
+    return _build
+
+
+def test_artifact_cache_builds_once_and_hits():
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(root)
+        key = cache.make_key("g++ 12", "-std=c++17")
+        assert key == cache.make_key("g++ 12", "-std=c++17") and key != cache.make_key("g++ 12", "-std=c++14")
+        calls = []
+        first = cache.get_or_build("ns", key, ["artifact.txt"], _writer("v1", calls), manifest={"flags": ["-O0"]})
+        second = cache.get_or_build("ns", key, ["artifact.txt"], _writer("v2", calls))
+        assert first == second == [os.path.join(root, "ns", key, "artifact.txt")]
+        with open(first[0], encoding="utf-8") as f:
+            assert f.read() == "v1"
+        assert os.path.isfile(os.path.join(root, "ns", key, "manifest.json"))
+        assert len(calls) == 1 and cache.stats() == {"hits": 1, "builds": 1, "failures": 0}
+        # 发布后不残留临时目录
+        assert os.listdir(os.path.join(root, "ns")) == [key]
+
+        cache.invalidate("ns", key)
+        assert cache.lookup("ns", key, ["artifact.txt"]) is None
+
+
+def test_artifact_cache_remembers_failures_in_process():
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(root)
+        calls = []
+        assert cache.get_or_build("ns", "k", ["artifact.txt"], _writer("x", calls, ok=False)) is None
+        assert cache.get_or_build("ns", "k", ["artifact.txt"], _writer("x", calls)) is None
+        assert len(calls) == 1 and cache.stats()["failures"] == 1
+        assert os.listdir(os.path.join(root, "ns")) == []
+        # 其他进程（新实例）会重新尝试
+        assert ArtifactCache(root).get_or_build("ns", "k", ["artifact.txt"], _writer("x")) is not None
+
+
+def test_artifact_cache_concurrent_builders_share_one_entry():
+    with tempfile.TemporaryDirectory() as root:
+        caches = [ArtifactCache(root) for _ in range(4)]
+        barrier = threading.Barrier(len(caches))
+        results = []
+
+        def _build(staging):
+            barrier.wait()
+            return _writer(staging)(staging)
+
+        threads = [
+            threading.Thread(target=lambda c=c: results.append(c.get_or_build("ns", "k", ["artifact.txt"], _build)))
+            for c in caches
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({tuple(r) for r in results}) == 1
+        assert os.listdir(os.path.join(root, "ns")) == ["k"]
+
+
+def test_gtest_archives_are_built_once_and_link():
+    if not os.path.isfile(os.path.join(GTEST_SOURCE_ROOT, "googletest", "src", "gtest-all.cc")):
+        print("  (skipped: googletest sources not found)")
+        return
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(root)
+        gtest_cache = GTestArtifactCache(cache)
+        gtest_root = os.path.join(GTEST_SOURCE_ROOT, "googletest")
+        gmock_root = os.path.join(GTEST_SOURCE_ROOT, "googlemock")
+        libs = gtest_cache.get_libraries("g++", gtest_root, gmock_root, ["-std=c++17"])
+        assert [os.path.basename(lib) for lib in libs] == ["libgmock.a", "libgtest_main.a", "libgtest.a"]
+        assert gtest_cache.get_libraries("g++", gtest_root, gmock_root, ["-std=c++17"]) == libs
+        assert cache.stats()["builds"] == 1 and cache.stats()["hits"] == 1
+
+        test_cpp = os.path.join(root, "sample_test.cpp")
+        with open(test_cpp, "w", encoding="utf-8") as f:
+            f.write("#include <gmock/gmock.h>\nTEST(Sample, Works) { EXPECT_THAT(2, ::testing::Eq(2)); }\n")
+        exe = os.path.join(root, "sample_test")
+        build = subprocess.run(
+            ["g++", "-std=c++17", f"-I{gtest_root}/include", f"-I{gmock_root}/include", test_cpp, *libs,
+             "-pthread", "-o", exe],
+            capture_output=True, text=True
+        )
+        assert build.returncode == 0, build.stderr
+        assert subprocess.run([exe], capture_output=True).returncode == 0
+
+
+def test_gtest_missing_sources_returns_none():
+    with tempfile.TemporaryDirectory() as root:
+        assert GTestArtifactCache(ArtifactCache(root)).get_libraries("g++", root, None, []) is None
+        assert os.listdir(root) == []
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    # 同一秒内的多次改写也要让mtime变化（file_digest按mtime/size记忆）
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def _c_project(root):
+    _write(os.path.join(root, "include", "limits.h"), "#define MAX_ITEMS 4\n")
+    _write(os.path.join(root, "src", "items.c"), '#include "limits.h"\nint max_items(void) { return MAX_ITEMS; }\n')
+    _write(os.path.join(root, "src", "other.c"), "int other(void) { return 1; }\n")
+    return [os.path.join(root, "src", "items.c"), os.path.join(root, "src", "other.c")], [f"-I{root}/include"]
+
+
+def test_parse_depfile():
+    text = "items.o: /p/src/items.c /p/include/limits.h \\\n /p/include/with\\ space.h\n"
+    assert parse_depfile(text) == ["/p/src/items.c", "/p/include/limits.h", "/p/include/with space.h"]
+
+
+def test_object_cache_reuses_until_header_changes():
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        objects = ObjectCache(cache)
+        sources, include_flags = _c_project(root)
+        first = objects.get_objects("gcc", sources, ["-std=gnu99"], include_flags)
+        assert [os.path.basename(o) for o in first] == ["items.o", "other.o"]
+        assert objects.get_objects("gcc", sources, ["-std=gnu99"], include_flags) == first
+        assert cache.stats() == {"hits": 2, "builds": 2, "failures": 0}
+
+        # 参数不同是不同条目
+        assert objects.get_object("gcc", sources[1], ["-std=gnu11"], include_flags) != first[1]
+
+        # 头文件内容变化：依赖校验失败，重新编译该TU
+        _write(os.path.join(root, "include", "limits.h"), "#define MAX_ITEMS 8\n")
+        rebuilt = objects.get_object("gcc", sources[0], ["-std=gnu99"], include_flags)
+        assert rebuilt == first[0]
+        assert cache.stats()["builds"] == 4
+        disassembly = subprocess.run(["objdump", "-d", rebuilt], capture_output=True, text=True).stdout
+        assert "$0x8" in disassembly
+
+
+def test_object_cache_compile_failure_returns_none():
+    with tempfile.TemporaryDirectory() as root:
+        objects = ObjectCache(ArtifactCache(os.path.join(root, "cache")))
+        sources, include_flags = _c_project(root)
+        _write(sources[1], "int other(void) { return }\n")
+        assert objects.get_objects("gcc", sources, ["-std=gnu99"], include_flags) is None
+        assert objects.get_object("gcc", os.path.join(root, "src", "missing.c"), [], include_flags) is None
+        assert objects.get_objects("gcc", [], [], []) == []
+
+
+def test_pch_is_built_once_and_used_by_test_tu():
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        pch = PchCache(cache)
+        flags = pch.get_pch_flags("g++", ["-std=c++17"], [])
+        assert flags is not None and flags[0] == "-include"
+        assert os.path.isfile(flags[1] + ".gch")
+        assert pch.get_pch_flags("g++", ["-std=c++17"], []) == flags
+        assert cache.stats() == {"hits": 1, "builds": 1, "failures": 0}
+
+        test_cpp = os.path.join(root, "pch_test.cpp")
+        with open(test_cpp, "w", encoding="utf-8") as f:
+            f.write("#include <gtest/gtest.h>\nTEST(Pch, Used) { EXPECT_TRUE(true); }\n")
+        # -H列出实际读取的头文件：使用PCH时列出的是.gch而不是gtest.h本身
+        result = subprocess.run(
+            ["g++", "-std=c++17", "-Winvalid-pch", "-Werror=invalid-pch", "-H", *flags, "-fsyntax-only", test_cpp],
+            capture_output=True, text=True
+        )
+        assert result.returncode == 0, result.stderr
+        assert ".gch" in result.stderr
+
+        # 参数不同（ABI相关宏/-std）是不同条目
+        assert pch.get_pch_flags("g++", ["-std=c++14"], []) != flags
+
+
+def test_pch_unsupported_compilers_and_failures():
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        pch = PchCache(cache)
+        assert pch.get_pch_flags("cl.exe", ["/std:c++17"], []) is None
+        assert pch.get_pch_flags("", [], []) is None
+        # 生成失败（无效参数）返回None，本进程内不再重试
+        assert pch.get_pch_flags("g++", ["-std=c++99x"], []) is None
+        assert pch.get_pch_flags("g++", ["-std=c++99x"], []) is None
+        assert cache.stats()["failures"] == 1
+
+
+SAME_TU_SOURCE = """int helper(void) { return 1; }
+int target(void) { return helper() + 1; }
+"""
+
+
+def _weak_project(root):
+    source = os.path.join(root, "src", "calc.c")
+    _write(source, SAME_TU_SOURCE)
+    return source
+
+
+def _skip_without_objcopy():
+    if WeakObjectCache().objcopy_path == "":
+        print("  (skipped: objcopy not found)")
+        return True
+    return False
+
+
+def test_weak_object_cache_weakens_defined_symbols_once():
+    if _skip_without_objcopy():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        obj = ObjectCache(cache).get_object("gcc", _weak_project(root), ["-O0", "-fno-inline"], [])
+        weak = WeakObjectCache(cache)
+        weakened = weak.get_object(obj, ["target", "helper"])
+        assert weakened and weakened != obj and os.path.basename(weakened) == "calc.o"
+        symbols = subprocess.run(["nm", "-P", weakened], capture_output=True, text=True).stdout
+        assert "helper W" in symbols and "target W" in symbols
+        assert "helper T" in subprocess.run(["nm", "-P", obj], capture_output=True, text=True).stdout
+        assert weak.get_object(obj, ["helper", "target"]) == weakened
+        assert cache.stats() == {"hits": 1, "builds": 2, "failures": 0}
+
+        assert weak.get_object(obj, []) == obj
+        assert weak.get_object(os.path.join(root, "missing.o"), ["helper"]) is None
+        assert weak.get_objects([(obj, ["helper"]), (os.path.join(root, "missing.o"), ["helper"])]) is None
+
+
+def test_weak_object_cache_key_tracks_objcopy():
+    if _skip_without_objcopy():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        obj = ObjectCache(cache).get_object("gcc", _weak_project(root), ["-O0"], [])
+        first = WeakObjectCache(cache).get_object(obj, ["helper"])
+        # 另一份objcopy（路径不同）不复用已缓存的弱化产物
+        other_objcopy = os.path.join(root, "objcopy")
+        shutil.copy2(WeakObjectCache().objcopy_path, other_objcopy)
+        second = WeakObjectCache(cache, objcopy_path=other_objcopy).get_object(obj, ["helper"])
+        assert second and second != first
+        assert WeakObjectCache(cache, objcopy_path=os.path.join(root, "no-objcopy")).get_object(obj, ["target"]) is None
+
+
+def test_weakened_same_tu_callee_can_be_replaced():
+    if _skip_without_objcopy():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        cache = ArtifactCache(os.path.join(root, "cache"))
+        obj = ObjectCache(cache).get_object("gcc", _weak_project(root), ["-O0", "-fno-inline"], [])
+        weakened = WeakObjectCache(cache).get_object(obj, ["helper", "target"])
+        test_cpp = os.path.join(root, "override_test.cpp")
+        _write(test_cpp, 'extern "C" int helper(void) { return 41; }\n'
+                         'extern "C" int target(void);\nint main() { return target() == 42 ? 0 : 1; }\n')
+        exe = os.path.join(root, "override_test")
+        build = subprocess.run(["g++", test_cpp, weakened, "-o", exe], capture_output=True, text=True)
+        assert build.returncode == 0, build.stderr
+        assert subprocess.run([exe]).returncode == 0
+
+
+def test_weak_mode_builds_unoptimized_production_objects():
+    if _skip_without_objcopy():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, mocking_mode="weak")
+        sources = [os.path.join(root, "src", "validator.c")]
+        include_dirs = [f"-I{root}/include"]
+        object_cache = build_cache.get_default_object_cache()
+        seen_flags = []
+        get_objects = object_cache.get_objects
+
+        def _recording(compiler_path, source_files, flags, include_flags):
+            seen_flags.append(list(flags))
+            return get_objects(compiler_path, source_files, flags, include_flags)
+
+        object_cache.get_objects = _recording
+        try:
+            weakened = workflow._cached_production_objects("gcc", include_dirs, sources)
+            assert seen_flags[-1][-2:] == workflow.WEAK_MOCK_CXX_FLAGS
+            assert weakened and "weak_objects" in weakened[0]
+            # 优化选项会覆盖-O0：不弱化，链接普通目标文件
+            regular = workflow._cached_production_objects("gcc", include_dirs + ["-O2"], sources)
+            assert seen_flags[-1] == workflow.GNU_TEST_CXX_FLAGS
+            assert regular and "weak_objects" not in regular[0]
+        finally:
+            object_cache.get_objects = get_objects
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试长驻clangd LSP会话（tools/clangd_session.py）
+验证诊断格式化、修复轮次间的增量诊断、头文件变化后重新检查、超时后继续等待未完成的版本，
+以及编译命令变化时重新打开文档（找不到clangd时跳过需要clangd的用例）
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from testlib import run_tests
+
+from clangd_session import ClangdSession, format_diagnostics
+
+CLANGD = shutil.which("clangd")
+
+SOURCE = """#include "config.h"
+static_assert(LIMIT == 1, "limit");
+#ifdef STRICT_LIMIT
+static_assert(LIMIT > 1, "strict");
+#endif
+int main() { return 0; }
+"""
+
+
+def _skip_without_clangd():
+    if CLANGD is None:
+        print("  (skipped: clangd not found)")
+        return True
+    return False
+
+
+def _session(root):
+    with open(os.path.join(root, "config.h"), "w", encoding="utf-8") as f:
+        f.write("#define LIMIT 1\n")
+    path = os.path.join(root, "sample_llm_test.cpp")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(SOURCE)
+    session = ClangdSession(CLANGD, root)
+    assert session.start()
+    session.set_compile_command(path, root, ["clang++", "-x", "c++", "-std=c++17", f"-I{root}", "-c", path])
+    return session, path
+
+
+def _set_header(root, limit):
+    # 保证mtime变化，clangd按stat判断前导头文件是否可复用
+    with open(os.path.join(root, "config.h"), "w", encoding="utf-8") as f:
+        f.write(f"#define LIMIT {limit}\n")
+    st = os.stat(os.path.join(root, "config.h"))
+    os.utime(os.path.join(root, "config.h"), ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def test_format_diagnostics():
+    diagnostics = [
+        {"severity": 1, "range": {"start": {"line": 4, "character": 2}}, "message": "unknown type 'Foo'\nnote"},
+        {"severity": 2, "range": {"start": {"line": 0, "character": 0}}, "message": "unused"},
+        {"severity": 1, "range": {"start": {"line": 4, "character": 2}}, "message": "unknown type 'Foo'"},
+    ]
+    path = os.path.abspath("x_llm_test.cpp")
+    assert format_diagnostics("x_llm_test.cpp", diagnostics) == [f"{path}:5:3: error: unknown type 'Foo'"]
+    assert len(format_diagnostics("x_llm_test.cpp", diagnostics, errors_only=False)) == 2
+
+
+def test_incremental_checks_follow_text_changes():
+    if _skip_without_clangd():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        session, path = _session(root)
+        try:
+            assert session.check(path) == []
+            broken = session.check(path, text=SOURCE + "int broken = ;\n")
+            assert len(broken) == 1 and broken[0]["severity"] == 1
+            assert session.check(path, text=SOURCE) == []
+            assert session.stats["opens"] == 1 and session.stats["changes"] == 2
+        finally:
+            session.close()
+        assert not session.alive
+
+
+def test_unchanged_text_is_rechecked_after_header_change():
+    if _skip_without_clangd():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        session, path = _session(root)
+        try:
+            assert session.check(path) == []
+            _set_header(root, 2)
+            diagnostics = session.check(path)
+            assert len(diagnostics) == 1 and "static assertion failed" in diagnostics[0]["message"].lower()
+            _set_header(root, 1)
+            assert session.check(path) == []
+        finally:
+            session.close()
+
+
+def test_timed_out_version_is_awaited_not_resubmitted():
+    if _skip_without_clangd():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        session, path = _session(root)
+        try:
+            # 首次打开需要解析前导头文件，极短超时必然等不到
+            assert session.check(path, timeout=0.001) is None
+            assert session.stats["timeouts"] == 1
+            assert session.check(path) == []
+            assert session.stats["opens"] == 1 and session.stats["changes"] == 0
+        finally:
+            session.close()
+
+
+def test_compile_command_change_reopens_document():
+    if _skip_without_clangd():
+        return
+    with tempfile.TemporaryDirectory() as root:
+        session, path = _session(root)
+        try:
+            assert session.check(path) == []
+            strict = ["clang++", "-x", "c++", "-std=c++17", f"-I{root}", "-DSTRICT_LIMIT", "-c", path]
+            session.set_compile_command(path, root, strict)
+            # 文本未变，但按旧参数发布的诊断不能复用
+            assert len(session.check(path)) == 1
+            assert session.stats["opens"] == 2
+            session.set_compile_command(path, root, strict)
+            assert len(session.check(path)) == 1 and session.stats["opens"] == 2
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试CMake配置跳过（tools/ut_workflow_llm.py）
+验证配置输入摘要覆盖CMake脚本内容与file(GLOB)收集的源文件列表，以及摘要不变时跳过cmake配置
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from testlib import run_tests, make_workflow
+
+GLOB_CMAKELISTS = """cmake_minimum_required(VERSION 3.10)
+project(sample C)
+file(GLOB SOURCES ${CMAKE_CURRENT_SOURCE_DIR}/src/*.c)
+add_library(sample STATIC ${SOURCES})
+target_include_directories(sample PUBLIC include)
+"""
+
+LISTED_CMAKELISTS = """cmake_minimum_required(VERSION 3.10)
+project(sample C)
+add_library(sample STATIC src/validator.c)
+target_include_directories(sample PUBLIC include)
+"""
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _configure(workflow, build_path):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        ok = workflow._configure_test_build_dir(build_path)
+    return ok, out.getvalue()
+
+
+def test_digest_tracks_glob_sources_only_when_globbing():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        args = ["cmake", "-S", root, "-B", os.path.join(root, "build-test")]
+        _write(os.path.join(root, "CMakeLists.txt"), LISTED_CMAKELISTS)
+        listed = workflow._cmake_configure_inputs_digest(args)
+        _write(os.path.join(root, "src", "extra.c"), "int extra(void) { return 0; }\n")
+        assert workflow._cmake_configure_inputs_digest(args) == listed
+
+        _write(os.path.join(root, "CMakeLists.txt"), GLOB_CMAKELISTS)
+        globbed = workflow._cmake_configure_inputs_digest(args)
+        assert globbed != listed
+        os.remove(os.path.join(root, "src", "extra.c"))
+        assert workflow._cmake_configure_inputs_digest(args) != globbed
+        # 源文件内容变化不需要重新配置
+        _write(os.path.join(root, "src", "validator.c"), "int validate_score(float s) { return 0; }\n")
+        without_extra = workflow._cmake_configure_inputs_digest(args)
+        _write(os.path.join(root, "src", "validator.c"), "int validate_score(float s) { return 1; }\n")
+        assert workflow._cmake_configure_inputs_digest(args) == without_extra
+        assert workflow._cmake_configure_inputs_digest(args + ["-DX=1"]) != without_extra
+
+
+def test_configure_is_skipped_until_inputs_change():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        build_path = os.path.join(root, "build-test")
+        os.makedirs(build_path)
+        _write(os.path.join(root, "CMakeLists.txt"), GLOB_CMAKELISTS)
+
+        ok, output = _configure(workflow, build_path)
+        assert ok and "CMake configured successfully" in output
+        stamp = os.path.join(build_path, workflow.CMAKE_CONFIGURE_STAMP)
+        assert os.path.isfile(stamp)
+
+        ok, output = _configure(workflow, build_path)
+        assert ok and "configure skipped" in output
+
+        _write(os.path.join(root, "src", "extra.c"), "int extra(void) { return 0; }\n")
+        ok, output = _configure(workflow, build_path)
+        assert ok and "CMake configured successfully" in output
+
+        # 配置失败删除戳文件，下次重新配置
+        _write(os.path.join(root, "CMakeLists.txt"), GLOB_CMAKELISTS + "not_a_command()\n")
+        ok, output = _configure(workflow, build_path)
+        assert not ok and not os.path.exists(stamp)
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
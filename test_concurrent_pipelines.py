@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+测试并发的逐测试流水线（tools/ut_workflow_llm.py、tools/llm_client.py）
+验证LLM在途请求上限、并发输出按行加测试名前缀、函数状态索引的并发更新，
+以及多个测试流水线并发编译运行的结果
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from testlib import run_tests, make_workflow
+
+from llm_client import VLLMClient
+from ut_workflow_llm import _ThreadTaggedStream
+
+PASSING_TEST = """#include <gtest/gtest.h>
+
+extern "C" {
+#include "validator.h"
+}
+
+TEST(validate_score_test, AcceptsRange)
+{
+    EXPECT_EQ(validate_score(50.0f), 0);
+    EXPECT_EQ(validate_score(101.0f), -1);
+}
+"""
+
+FAILING_TEST = """#include <gtest/gtest.h>
+
+extern "C" {
+#include "validator.h"
+}
+
+TEST(validate_student_id_test, WrongExpectation)
+{
+    EXPECT_EQ(validate_student_id(0), 0);
+}
+"""
+
+
+class _SlowChatHandler(BaseHTTPRequestHandler):
+    """POST 睡眠一段时间后返回；记录同时在途的最大请求数"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply({"data": [{"id": "qwen-coder"}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        time.sleep(0.1)
+        with server.lock:
+            server.in_flight -= 1
+        self._reply({"choices": [{"message": {"role": "assistant", "content": "ok"}}], "usage": {}})
+
+
+def _peak_concurrency(limit, calls=6):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowChatHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.peak = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for name in ("VLLM_API_BASE", "VLLM_API_BASES", "LLM_BACKEND", "LLM_CAPTURE_PATH", "LLM_METRICS_PATH"):
+            os.environ.pop(name, None)
+        client = VLLMClient(api_bases=[f"http://127.0.0.1:{server.server_address[1]}"])
+        client.set_max_inflight(limit)
+        threads = [threading.Thread(target=client.generate, args=(f"prompt {i}",)) for i in range(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return server.peak
+    finally:
+        server.shutdown()
+
+
+def test_max_inflight_caps_concurrent_requests():
+    assert _peak_concurrency(2) == 2
+    assert _peak_concurrency(0) > 2
+
+
+def test_tagged_stream_prefixes_whole_lines_per_thread():
+    sink = io.StringIO()
+    stream = _ThreadTaggedStream(sink)
+    barrier = threading.Barrier(4)
+
+    def _worker(tag):
+        stream.set_tag(tag)
+        barrier.wait()
+        for i in range(50):
+            stream.write(f"step {i} ")
+            stream.write(f"of {tag}\nnext")
+            stream.write("\n")
+        stream.write("unterminated")
+        stream.set_tag(None)
+
+    threads = [threading.Thread(target=_worker, args=(f"t{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stream.write("untagged\n")
+
+    lines = sink.getvalue().splitlines()
+    assert lines[-1] == "untagged"
+    for n in range(4):
+        tag = f"t{n}"
+        own = [line for line in lines if line.startswith(f"[{tag}] ")]
+        assert len(own) == 101
+        assert [line for line in own if line.startswith(f"[{tag}] step")] == [
+            f"[{tag}] step {i} of {tag}" for i in range(50)
+        ]
+        assert own[-1] == f"[{tag}] unterminated"
+
+
+def test_status_index_updates_from_concurrent_pipelines():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        names = [f"func_{i}" for i in range(16)]
+        threads = [
+            threading.Thread(
+                target=workflow._update_function_status_index,
+                args=({name: "PASSED" if i % 2 else "FAILED"}, os.path.join(root, "log"), "20260101_000000")
+            )
+            for i, name in enumerate(names)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        index = workflow._load_function_status_index()
+        assert sorted(index) == sorted(names)
+        assert index["func_1"]["status"] == "PASSED" and index["func_0"]["status"] == "FAILED"
+        assert index["func_3"]["test_file"] == "func_3_llm_test.cpp"
+
+
+def test_pipelines_run_concurrently_and_report_in_order():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, test_workers=2, cmakelists_autogen_enabled=False)
+        test_dir = os.path.join(root, "test")
+        os.makedirs(test_dir, exist_ok=True)
+        files = ["validate_student_id_llm_test.cpp", "validate_score_llm_test.cpp"]
+        for name, code in zip(files, (FAILING_TEST, PASSING_TEST)):
+            with open(os.path.join(test_dir, name), "w", encoding="utf-8") as f:
+                f.write(code)
+
+        run_ctx = workflow._prepare_test_run(
+            test_dir,
+            auto_fix_compile_errors=False,
+            auto_fix_test_failures=False,
+            llm_triage_enabled=False,
+            web_research_enabled=False,
+            experience_learning_enabled=False
+        )
+        assert run_ctx is not None
+        results = workflow._execute_test_pipelines(files, run_ctx)
+        assert results == [("validate_student_id_llm_test", "FAILED"), ("validate_score_llm_test", "PASSED")]
+        assert workflow._compile_semaphore is None
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试失败分流（tools/ut_workflow_llm.py）
+验证高置信度规则直接判定、信号冲突时交给LLM、按错误指纹复用分流结果，以及LLM失败时的回退
+"""
+
+import sys
+import tempfile
+
+from testlib import run_tests, make_workflow
+
+from ut_workflow_llm import LLMUTWorkflow
+
+TEST_COMPILE_ERROR = (
+    "/work/test/add_student_llm_test.cpp:12:5: error: 'Student' was not declared in this scope\n"
+)
+CMAKE_ERROR = "CMake Error at CMakeLists.txt:14 (add_executable):\n  Cannot find source file: src/missing.c\n"
+
+
+class CountingLLMClient:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def test_rule_classifier_strong_and_weak_signals():
+    assert LLMUTWorkflow._rule_classify_issue_domain(TEST_COMPILE_ERROR) == ("test_case", 0.95)
+    assert LLMUTWorkflow._rule_classify_issue_domain(CMAKE_ERROR) == ("cmakelists", 0.95)
+    assert LLMUTWorkflow._rule_classify_issue_domain("sh: 1: ninja: command not found") == ("other", 0.95)
+    assert LLMUTWorkflow._rule_classify_issue_domain("") == ("unknown", 0.0)
+    # 两类强信号冲突：只给低置信度的旧规则结果
+    domain, confidence = LLMUTWorkflow._rule_classify_issue_domain(CMAKE_ERROR + TEST_COMPILE_ERROR)
+    assert domain == "cmakelists" and confidence == 0.5
+    assert LLMUTWorkflow._rule_classify_issue_domain("ld returned 1 exit status") == ("other", 0.5)
+
+
+def test_fingerprint_ignores_test_names_paths_and_numbers():
+    other = TEST_COMPILE_ERROR.replace("add_student", "find_student").replace("/work", "/home/ci").replace("12:5", "40:9")
+    assert LLMUTWorkflow._build_domain_fingerprint(TEST_COMPILE_ERROR, "compile") == \
+        LLMUTWorkflow._build_domain_fingerprint(other, "compile")
+    assert LLMUTWorkflow._build_domain_fingerprint(TEST_COMPILE_ERROR, "compile") != \
+        LLMUTWorkflow._build_domain_fingerprint(TEST_COMPILE_ERROR, "runtime")
+
+
+def test_rule_hits_skip_llm_and_conflicts_are_memoized():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        workflow.cmakelists_autogen_enabled = True
+        client = CountingLLMClient('{"domain": "test_case", "confidence": 0.8, "reason": "test code"}')
+        workflow.llm_client = client
+
+        assert workflow._classify_issue_domain(TEST_COMPILE_ERROR) == "test_case"
+        assert client.calls == 0
+
+        conflicting = CMAKE_ERROR + TEST_COMPILE_ERROR
+        assert workflow._classify_issue_domain(conflicting) == "test_case"
+        assert workflow._classify_issue_domain(conflicting.replace("add_student", "find_student")) == "test_case"
+        assert client.calls == 1
+        stats = workflow._domain_classify_stats
+        assert stats["rule"] == 1 and stats["llm"] == 1 and stats["memo"] == 1
+
+
+def test_llm_failure_falls_back_without_caching():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        workflow.cmakelists_autogen_enabled = True
+        client = CountingLLMClient(RuntimeError("endpoint down"))
+        workflow.llm_client = client
+        conflicting = CMAKE_ERROR + TEST_COMPILE_ERROR
+        assert workflow._classify_issue_domain(conflicting) == "cmakelists"
+        assert workflow._classify_issue_domain(conflicting) == "cmakelists"
+        assert client.calls == 2 and workflow._domain_classify_stats["fallback"] == 2
+
+        # domain_classify=llm 时规则命中也交给LLM
+        workflow.domain_classify = "llm"
+        client.response = '{"domain": "other", "confidence": 0.6}'
+        assert workflow._classify_issue_domain(TEST_COMPILE_ERROR) == "other"
+        assert client.calls == 3
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试融合诊断+修复响应的解析（tools/llm_test_generator.py）
+验证诊断JSON与修复代码按标记拆分、should_fix=false与缺少修复时的结果，
+以及修复代码与分步修复使用相同的参考资料与符号清理
+"""
+
+import json
+import sys
+
+from testlib import run_tests
+
+from llm_test_generator import LLMTestGenerator
+from ut_workflow_llm import LLMUTWorkflow
+
+TEST_CODE = """#include <gtest/gtest.h>
+#include "database.h"
+
+TEST(db_init_test, Initializes)
+{
+    EXPECT_EQ(db_init(), 0);
+}
+"""
+
+FIXED_CODE = """#include <gtest/gtest.h>
+#include "database.h"
+
+int db_count(void)
+{
+    return 0;
+}
+
+int db_init(void)
+{
+    return 0;
+}
+
+TEST(db_init_test, Initializes)
+{
+    EXPECT_EQ(db_init(), 0);
+    EXPECT_EQ(db_count(), 0);
+}
+"""
+
+COMPILE_ERROR = "db_init_llm_test.cpp:4:5: error: conflicting types for 'db_count'\n"
+
+
+class CannedLLMClient:
+    """记录提示词，按顺序返回预置响应"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self.phases = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        self.phases.append(kwargs.get("phase"))
+        return self.responses.pop(0) if self.responses else ""
+
+
+def _triage_json(**overrides):
+    triage = {
+        "error_type": "type_mismatch",
+        "root_cause": "db_count redefined in test",
+        "should_fix": True,
+        "confidence": 0.9,
+        "key_symbols": ["db_count"],
+    }
+    triage.update(overrides)
+    return json.dumps(triage)
+
+
+def test_compile_fix_is_split_and_sanitized_like_direct_fix():
+    response = f"{_triage_json()}\n{LLMTestGenerator.FUSED_FIX_MARKER}\n```cpp\n{FIXED_CODE}```\n"
+    client = CannedLLMClient(response)
+    generator = LLMTestGenerator(client)
+    triage, fixed = generator.triage_and_fix_compile_error(TEST_CODE, COMPILE_ERROR, function_name="db_init")
+
+    assert client.phases == ["compile_triage_fix"]
+    assert triage["error_type"] == "type_mismatch" and triage["confidence"] == 0.9
+    assert triage["fused_fix_available"] is True
+    # 目标函数与"conflicting types"中的符号都被清除，同fix_test_from_compile_error
+    assert "int db_init(void)" not in fixed and "int db_count(void)" not in fixed
+    assert "EXPECT_EQ(db_count(), 0);" in fixed
+
+    direct = LLMTestGenerator(CannedLLMClient(f"```cpp\n{FIXED_CODE}```\n"))
+    assert direct.fix_test_from_compile_error(TEST_CODE, COMPILE_ERROR, function_name="db_init") == fixed
+
+
+def test_fix_references_are_included_in_prompt():
+    references = {
+        "web_research": {"query": "conflicting types", "count": 1, "results": [{"title": "ref"}]},
+        "experience_hints": [{"root_cause": "duplicate definition", "fix": "remove body"}],
+    }
+    client = CannedLLMClient(_triage_json(should_fix=False))
+    generator = LLMTestGenerator(client)
+    triage, fixed = generator.triage_and_fix_compile_error(
+        TEST_CODE, COMPILE_ERROR, function_name="db_init", fix_references=references
+    )
+    assert fixed is None and triage["should_fix"] is False
+    assert triage["fused_fix_available"] is False
+    prompt = client.prompts[0]
+    assert "=== FIX REFERENCES" in prompt and '"remove body"' in prompt
+    assert "Apply relevant historical experience hints" in prompt
+
+
+def test_runtime_without_marker_or_unparseable_json():
+    client = CannedLLMClient(_triage_json(error_type="assertion_mismatch"), "not json at all")
+    generator = LLMTestGenerator(client)
+    triage, fixed = generator.triage_and_fix_test_failure(TEST_CODE, "[  FAILED  ] db_init_test.Initializes")
+    assert client.phases == ["runtime_triage_fix"]
+    assert triage["error_type"] == "assertion_mismatch" and fixed is None
+    assert "FIX REFERENCES" not in client.prompts[0]
+
+    triage, fixed = generator.triage_and_fix_test_failure(TEST_CODE, "[  FAILED  ] db_init_test.Initializes")
+    assert triage["root_cause"] == "triage_unavailable" and fixed is None
+
+
+def test_preliminary_fix_query_uses_first_diagnostic():
+    output = "In file included from x.cpp:1:\n" + "/tmp/p/test/" + COMPILE_ERROR + "note: previous declaration\n"
+    cause, symbols = LLMUTWorkflow._preliminary_fix_query(output)
+    assert cause == "error: conflicting types for 'db_count'"
+    assert symbols == ["db_count"]
+    assert LLMUTWorkflow._preliminary_fix_query("") == ("", [])
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
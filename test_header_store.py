@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试头文件声明切片（tools/header_store.py）
+验证声明名字推断、跨头文件的传递闭包切片以及mtime变化后的缓存失效
+"""
+
+import os
+import sys
+import tempfile
+
+from testlib import run_tests
+
+from c_code_analyzer import FunctionDependency
+from header_store import HeaderStore, clean_header_content, parse_header_declarations
+from llm_test_generator import LLMTestGenerator
+
+TYPES_H = """#ifndef TYPES_H
+#define TYPES_H
+#include <stdint.h>
+
+#define MAX_NAME_LEN 32
+
+typedef struct {
+    int32_t id;
+    char name[MAX_NAME_LEN];
+} Student;
+
+typedef enum { GRADE_A, GRADE_B } Grade;
+
+#endif
+"""
+
+DATABASE_H = """#ifndef DATABASE_H
+#define DATABASE_H
+#include "types.h"
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+/* 添加学生 */
+int32_t db_add_student(const Student* student);
+int32_t db_init(void);
+Grade db_grade_of(int32_t id);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif
+"""
+
+
+def _write_headers(root: str) -> tuple:
+    types_path = os.path.join(root, "types.h")
+    database_path = os.path.join(root, "database.h")
+    with open(types_path, "w", encoding="utf-8") as f:
+        f.write(TYPES_H)
+    with open(database_path, "w", encoding="utf-8") as f:
+        f.write(DATABASE_H)
+    return types_path, database_path
+
+
+def test_parse_declaration_names():
+    decls = parse_header_declarations(clean_header_content(TYPES_H + DATABASE_H))
+    provided = {}
+    for decl in decls:
+        for name in decl.names:
+            provided[name] = decl
+    for name in ("MAX_NAME_LEN", "Student", "Grade", "GRADE_A", "db_add_student", "db_init"):
+        assert name in provided, name
+    assert "Student" in provided["db_add_student"].refs
+    assert "MAX_NAME_LEN" in provided["Student"].refs
+    # extern "C"包装不作为声明出现
+    assert not any('extern "C"' in decl.text for decl in decls)
+
+
+def test_slice_pulls_transitive_dependencies():
+    with tempfile.TemporaryDirectory() as root:
+        types_path, database_path = _write_headers(root)
+        sliced = HeaderStore().slice_headers([types_path, database_path], {"db_add_student"})
+
+        assert "db_add_student" in sliced[database_path]
+        assert "db_init(void)" not in sliced[database_path]
+        assert "omitted (not referenced): db_grade_of, db_init" in sliced[database_path]
+        # 函数参数类型Student及其成员数组长度宏被传递拉入
+        assert "} Student;" in sliced[types_path]
+        assert "#define MAX_NAME_LEN 32" in sliced[types_path]
+        assert "typedef enum" not in sliced[types_path]
+        assert "#include <stdint.h>" in sliced[types_path]
+
+
+def test_slice_skips_unreferenced_headers():
+    with tempfile.TemporaryDirectory() as root:
+        types_path, database_path = _write_headers(root)
+        sliced = HeaderStore().slice_headers([types_path, database_path], {"unrelated_symbol"})
+        assert sliced == {}
+
+
+def test_cache_invalidated_on_change():
+    with tempfile.TemporaryDirectory() as root:
+        types_path, _ = _write_headers(root)
+        store = HeaderStore()
+        assert "Student" in store.get_content(types_path)
+        store.get_content(types_path)
+        assert store.stats()["hits"] == 1
+
+        with open(types_path, "w", encoding="utf-8") as f:
+            f.write("typedef int Renamed;\n")
+        os.utime(types_path, ns=(0, 1))
+        assert store.get_content(types_path) == "typedef int Renamed;"
+        assert store.stats()["misses"] == 2
+
+
+def test_tu_slicing_falls_back_to_full_headers_without_source():
+    with tempfile.TemporaryDirectory() as root:
+        _write_headers(root)
+        generator = LLMTestGenerator(llm_client=None)
+        func_dep = FunctionDependency(
+            name="db_init", return_type="int32_t", parameters=[], external_calls=set(),
+            source_file="missing.c", include_files={"types.h", "database.h"}
+        )
+        # 源文件不可读：不能切掉全部声明，退回整份头文件
+        headers = generator._read_header_files(func_dep, root, "tu")
+        assert set(headers) == {"types.h", "database.h"}
+        assert "db_grade_of" in headers["database.h"]
+        func_dep.source_file = None
+        assert generator._read_header_files(func_dep, root, "tu") == headers
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+测试链接桩的独立翻译单元（tools/ut_workflow_llm.py 中的 _LinkStubUnit）
+验证桩的增删与渲染、桩TU写出后可单独编译，以及通过后折叠回测试文件时的单独编译链接校验与失败还原
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from testlib import run_tests, make_workflow
+
+from ut_workflow_llm import _LinkStubUnit
+
+TEST_SOURCE = 'extern "C" int helper(void);\nextern int counter;\n\nint main() { return helper() + counter; }\n'
+
+
+def _unit(root):
+    unit = _LinkStubUnit(os.path.join(root, "build", "t_link_stubs.cpp"), os.path.join(root, "build", "t_link_stubs.o"))
+    unit.add("helper", "int helper(void) { return 0; }", False, ["helper.h"])
+    unit.add("counter", "int counter = 0;", True, [])
+    return unit
+
+
+def test_add_remove_and_render():
+    with tempfile.TemporaryDirectory() as root:
+        unit = _unit(root)
+        unit.add("helper", "int helper(void) { return 1; }", False, ["helper.h", "other.h"])
+        assert unit.symbols == ["counter", "helper"]
+        assert unit.includes == ["helper.h", "other.h"]
+        assert unit.render_block() == "\n".join([
+            'extern "C" {',
+            '#include "helper.h"',
+            '#include "other.h"',
+            "}",
+            "int counter = 0;",
+            'extern "C" {',
+            "int helper(void) { return 1; }",
+            "}",
+        ])
+        assert unit.remove(["helper", "missing"]) == ["helper"]
+        # 只剩变量时不需要包含头文件
+        assert unit.render_block() == "int counter = 0;"
+        assert unit.link_inputs() == []
+
+
+def test_written_unit_compiles_and_links():
+    compiler = shutil.which("g++")
+    if compiler is None:
+        print("  (skipped: g++ not found)")
+        return
+    with tempfile.TemporaryDirectory() as root:
+        unit = _unit(root)
+        unit.write()
+        with open(os.path.join(root, "helper.h"), "w", encoding="utf-8") as f:
+            f.write("#ifndef HELPER_H\n#define HELPER_H\nint helper(void);\n#endif\n")
+        test_path = os.path.join(root, "t.cpp")
+        with open(test_path, "w", encoding="utf-8") as f:
+            f.write(TEST_SOURCE)
+        build = subprocess.run(
+            [compiler, f"-I{root}", "-c", unit.source_path, "-o", unit.object_path], capture_output=True, text=True
+        )
+        assert build.returncode == 0, build.stderr
+        assert unit.link_inputs() == [unit.object_path]
+        exe = os.path.join(root, "t")
+        link = subprocess.run([compiler, test_path, *unit.link_inputs(), "-o", exe], capture_output=True, text=True)
+        assert link.returncode == 0, link.stderr
+        assert subprocess.run([exe]).returncode == 0
+
+
+def _fold(workflow, test_path, unit, verify):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        folded = workflow._fold_link_stubs_into_test(test_path, unit, verify=verify)
+    return folded, out.getvalue()
+
+
+def test_fold_is_verified_and_reverted_on_failure():
+    compiler = shutil.which("g++")
+    if compiler is None:
+        print("  (skipped: g++ not found)")
+        return
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        unit = _LinkStubUnit(os.path.join(root, "build", "t_link_stubs.cpp"), os.path.join(root, "build", "t_link_stubs.o"))
+        unit.add("helper", "int helper(void) { return 0; }", False, [])
+        unit.add("counter", "int counter = 0;", True, [])
+        test_path = os.path.join(root, "t.cpp")
+        exe = os.path.join(root, "t")
+
+        def _verify():
+            return subprocess.run([compiler, test_path, "-o", exe], capture_output=True, text=True)
+
+        with open(test_path, "w", encoding="utf-8") as f:
+            f.write(TEST_SOURCE)
+        os.chmod(test_path, 0o640)
+        folded, output = _fold(workflow, test_path, unit, _verify)
+        assert folded and "verified" in output
+        with open(test_path, encoding="utf-8") as f:
+            assert f.read().endswith(unit.render_block() + "\n")
+        assert os.stat(test_path).st_mode & 0o777 == 0o640
+        assert subprocess.run([exe]).returncode == 0
+
+        # 测试文件已有同名定义：折叠后单独编译失败，还原原内容
+        conflicting = TEST_SOURCE + 'extern "C" int helper(void) { return 0; }\n'
+        with open(test_path, "w", encoding="utf-8") as f:
+            f.write(conflicting)
+        folded, output = _fold(workflow, test_path, unit, _verify)
+        assert not folded and "reverted" in output
+        with open(test_path, encoding="utf-8") as f:
+            assert f.read() == conflicting
+        assert not [name for name in os.listdir(root) if name.endswith(".tmp")]
+
+        assert _fold(workflow, test_path, _LinkStubUnit(unit.source_path, unit.object_path), _verify)[0] is False
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
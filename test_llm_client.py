@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试vLLM端点池（tools/llm_client.py）
+验证最少在途路由、连续失败摘除与冷却恢复，以及确定性4xx不改变端点健康状态
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from testlib import run_tests
+
+from llm_client import EndpointPool, VLLMClient, VLLMRequestError
+
+
+class _FakeVLLMHandler(BaseHTTPRequestHandler):
+    """GET /v1/models 返回200；POST /v1/chat/completions 按server.chat_status返回"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply(200, {"data": [{"id": "qwen-coder"}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.chat_calls += 1
+        if self.server.chat_status != 200:
+            self._reply(self.server.chat_status, {"error": f"status {self.server.chat_status}"})
+            return
+        self._reply(200, {"choices": [{"message": {"role": "assistant", "content": "ok"}}], "usage": {}})
+
+
+def _start_server(chat_status: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeVLLMHandler)
+    server.chat_status = chat_status
+    server.chat_calls = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _client(servers) -> VLLMClient:
+    for name in ("VLLM_API_BASE", "VLLM_API_BASES", "LLM_BACKEND", "LLM_CAPTURE_PATH", "LLM_METRICS_PATH"):
+        os.environ.pop(name, None)
+    return VLLMClient(api_bases=[f"http://127.0.0.1:{s.server_address[1]}" for s in servers])
+
+
+def test_acquire_prefers_least_outstanding():
+    pool = EndpointPool(["http://a:8000", "http://b:8000/"])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.api_base, second.api_base} == {"http://a:8000", "http://b:8000"}
+    pool.release(first, success=True)
+    assert pool.acquire().api_base == first.api_base
+    assert pool.acquire(exclude=["http://a:8000", "http://b:8000"]) is None
+
+
+def test_eject_after_consecutive_failures_and_recover():
+    pool = EndpointPool(["http://a:8000", "http://b:8000"], eject_after_failures=2, eject_seconds=0.2)
+    bad = pool.endpoints[0]
+    for _ in range(2):
+        pool.acquire(exclude=["http://b:8000"])
+        pool.release(bad, success=False)
+    assert bad.ejections == 1
+    assert pool.healthy_count() == 1
+    # 摘除期间路由到健康端点
+    chosen = pool.acquire()
+    assert chosen.api_base == "http://b:8000"
+    pool.release(chosen, success=True)
+
+    time.sleep(0.25)
+    assert pool.healthy_count() == 2
+    pool.acquire(exclude=["http://b:8000"])
+    pool.release(bad, success=True)
+    assert bad.consecutive_failures == 0 and bad.ejected_until == 0.0
+
+
+def test_neutral_release_keeps_failure_state():
+    pool = EndpointPool(["http://a:8000"], eject_after_failures=1, eject_seconds=30)
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=False)
+    ejected_until = endpoint.ejected_until
+    assert ejected_until > 0
+
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=None, latency=0.1)
+    assert endpoint.in_flight == 0 and endpoint.requests == 2
+    assert endpoint.consecutive_failures == 1 and endpoint.failures == 1
+    assert endpoint.ejected_until == ejected_until
+
+
+def test_4xx_raises_without_failover_or_health_change():
+    rejecting = _start_server(400)
+    healthy = _start_server(200)
+    try:
+        client = _client([rejecting, healthy])
+        endpoint = client.endpoint_pool.endpoints[0]
+        # 让第一个端点带着一次失败记录被选中
+        endpoint.consecutive_failures = 1
+        endpoint.requests = -1
+        try:
+            client._post_vllm_chat({"model": client.model, "messages": [{"role": "user", "content": "x"}]})
+            raise AssertionError("expected VLLMRequestError")
+        except VLLMRequestError:
+            pass
+        assert rejecting.chat_calls == 1 and healthy.chat_calls == 0
+        assert endpoint.in_flight == 0
+        assert endpoint.consecutive_failures == 1 and endpoint.failures == 0
+    finally:
+        rejecting.shutdown()
+        healthy.shutdown()
+
+
+def test_5xx_fails_over_to_next_endpoint():
+    failing = _start_server(503)
+    healthy = _start_server(200)
+    try:
+        client = _client([failing, healthy])
+        # 最少请求数优先：先路由到失败端点
+        client.endpoint_pool.endpoints[0].requests = -1
+        result = client._post_vllm_chat({"model": client.model, "messages": [{"role": "user", "content": "x"}]})
+        assert result["choices"][0]["message"]["content"] == "ok"
+        assert failing.chat_calls == 1 and healthy.chat_calls == 1
+        assert client.endpoint_pool.endpoints[0].consecutive_failures == 1
+    finally:
+        failing.shutdown()
+        healthy.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+测试补丁应用（tools/patch_apply.py）
+验证SEARCH/REPLACE与unified diff的定位、模糊匹配以及无法定位时整体失败
+"""
+
+import sys
+
+from testlib import run_tests
+
+from patch_apply import apply_patch, apply_search_replace, apply_unified_diff, detect_patch_format
+
+CODE = """#include <gtest/gtest.h>
+
+TEST(Score, Valid)
+{
+    EXPECT_EQ(validate_score(50.0f), 1);
+}
+
+TEST(Score, Invalid)
+{
+    EXPECT_EQ(validate_score(-1.0f), 1);
+}
+"""
+
+
+def test_detect_patch_format():
+    assert detect_patch_format("<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE") == "search_replace"
+    assert detect_patch_format("@@ -1,2 +1,2 @@\n-a\n+b") == "unified_diff"
+    assert detect_patch_format("just some code") == "none"
+
+
+def test_search_replace_applies_block():
+    patch = """```
+<<<<<<< SEARCH
+    EXPECT_EQ(validate_score(-1.0f), 1);
+=======
+    EXPECT_EQ(validate_score(-1.0f), 0);
+>>>>>>> REPLACE
+```"""
+    result = apply_search_replace(CODE, patch)
+    assert result.success and result.applied == 1
+    assert "validate_score(-1.0f), 0);" in result.code
+    assert "validate_score(50.0f), 1);" in result.code
+    assert result.code.endswith("\n")
+
+
+def test_search_replace_ignores_whitespace_differences():
+    patch = """<<<<<<< SEARCH
+  EXPECT_EQ(validate_score(-1.0f),   1);
+=======
+    EXPECT_EQ(validate_score(-1.0f), 0);
+>>>>>>> REPLACE"""
+    result = apply_search_replace(CODE, patch)
+    assert result.success
+    assert "validate_score(-1.0f), 0);" in result.code
+
+
+def test_search_replace_empty_search_appends():
+    patch = """<<<<<<< SEARCH
+=======
+TEST(Score, Boundary) {}
+>>>>>>> REPLACE"""
+    result = apply_search_replace(CODE, patch)
+    assert result.success
+    assert result.code.rstrip().endswith("TEST(Score, Boundary) {}")
+
+
+def test_search_replace_mismatch_fails_whole_patch():
+    patch = """<<<<<<< SEARCH
+    EXPECT_EQ(validate_score(-1.0f), 1);
+=======
+    EXPECT_EQ(validate_score(-1.0f), 0);
+>>>>>>> REPLACE
+<<<<<<< SEARCH
+    EXPECT_EQ(not_in_file(), 1);
+=======
+    EXPECT_EQ(not_in_file(), 0);
+>>>>>>> REPLACE"""
+    result = apply_search_replace(CODE, patch)
+    assert not result.success
+    assert result.applied == 1 and result.failed == 1
+    assert any("not found" in error for error in result.errors)
+
+
+def test_unified_diff_applies_with_line_offset():
+    # 行号偏移（旧文件行号写错）时按内容定位
+    patch = """--- a/score_llm_test.cpp
++++ b/score_llm_test.cpp
+@@ -40,3 +40,3 @@
+ TEST(Score, Invalid)
+ {
+-    EXPECT_EQ(validate_score(-1.0f), 1);
++    EXPECT_EQ(validate_score(-1.0f), 0);
+"""
+    result = apply_unified_diff(CODE, patch)
+    assert result.success and result.applied == 1
+    assert "validate_score(-1.0f), 0);" in result.code
+    assert "validate_score(-1.0f), 1);" not in result.code
+
+
+def test_unified_diff_trims_stale_context():
+    # 首尾上下文与文件不一致时裁剪上下文（fuzz）后仍可定位
+    patch = """@@ -9,3 +9,3 @@
+ {  // stale context line
+-    EXPECT_EQ(validate_score(-1.0f), 1);
++    EXPECT_EQ(validate_score(-1.0f), 0);
+ }  // stale context line
+"""
+    result = apply_unified_diff(CODE, patch)
+    assert result.success
+    assert "validate_score(-1.0f), 0);" in result.code
+
+
+def test_unified_diff_mismatch_fails():
+    patch = """@@ -3,3 +3,3 @@
+ TEST(Score, Missing)
+-    EXPECT_EQ(other_function(), 1);
++    EXPECT_EQ(other_function(), 0);
+"""
+    result = apply_unified_diff(CODE, patch)
+    assert not result.success
+    assert result.failed == 1
+    assert result.code == CODE
+
+
+def test_apply_patch_without_patch_keeps_code():
+    result = apply_patch(CODE, "Here is the whole file again")
+    assert not result.success
+    assert result.code == CODE
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
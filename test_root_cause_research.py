@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试根因检索的缓存（tools/root_cause_research.py）
+验证ResearchCache的过期与持久化，以及检索结果何时写入缓存（网络失败、源冷却、离线节点）
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from testlib import run_tests
+
+from root_cause_research import ResearchCache, RootCauseResearcher
+
+
+class FakeSource:
+    """按预置结果返回，或抛出预置异常；记录调用次数"""
+
+    def __init__(self, name, results=None, error=None):
+        self.name = name
+        self.results = results or []
+        self.error = error
+        self.calls = 0
+
+    def search(self, query, max_results, timeout):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return list(self.results)
+
+
+def _ref(url):
+    return {"title": url, "url": url, "snippet": f"snippet for {url}"}
+
+
+def _research(researcher):
+    return researcher.research("undefined reference to db_init", error_type="link_error", key_symbols=["db_init"])
+
+
+def test_cache_expiry_and_persistence():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "research_cache.json")
+        cache = ResearchCache(path, ttl_seconds=60)
+        cache.put("a", {"count": 1})
+        cache.put("b", {"count": 2}, ttl_seconds=0.05)
+        assert cache.get("a") == {"count": 1} and cache.get("b") == {"count": 2}
+        time.sleep(0.1)
+        assert cache.get("b") is None
+
+        reloaded = ResearchCache(path, ttl_seconds=60)
+        assert reloaded.get("a") == {"count": 1}
+        assert reloaded.get("missing") is None
+        assert [name for name in os.listdir(root)] == ["research_cache.json"]
+
+        # 默认ttl已过期的条目读取时视为不存在
+        time.sleep(0.02)
+        assert ResearchCache(path, ttl_seconds=0.01).get("a") is None
+
+
+def test_make_key_ignores_source_order_and_spacing():
+    key = ResearchCache.make_key("undefined  reference", 4, ["stackoverflow", "local_kb"])
+    assert key == ResearchCache.make_key("undefined reference", 4, ["local_kb", "stackoverflow"])
+    assert key != ResearchCache.make_key("undefined reference", 3, ["local_kb", "stackoverflow"])
+
+
+def test_all_sources_ok_is_cached():
+    local = FakeSource("local_kb", [_ref("kb://1")])
+    online = FakeSource("stackoverflow", [_ref("https://so/1"), _ref("kb://1")])
+    researcher = RootCauseResearcher(sources=[local, online], cache=ResearchCache())
+    first = _research(researcher)
+    assert first["cached"] is False and first["count"] == 2
+    assert [ref["url"] for ref in first["references"]] == ["kb://1", "https://so/1"]
+    assert first["sources"] == {"local_kb": "ok", "stackoverflow": "ok"}
+    second = _research(researcher)
+    assert second["cached"] is True and local.calls == 1 and online.calls == 1
+
+
+def test_network_failure_is_not_cached_then_cooldown_is_cached_briefly():
+    local = FakeSource("local_kb", [_ref("kb://1")])
+    online = FakeSource("stackoverflow", error=requests.exceptions.ConnectionError("offline"))
+    cache = ResearchCache()
+    researcher = RootCauseResearcher(sources=[local, online], cache=cache)
+
+    first = _research(researcher)
+    assert first["sources"]["stackoverflow"] == "error:ConnectionError" and first["cached"] is False
+
+    # 在线源进入冷却：只查本地源，结果可缓存，但只保留到冷却结束
+    second = _research(researcher)
+    assert second["sources"] == {"local_kb": "ok", "stackoverflow": "cooldown"} and second["cached"] is False
+    assert online.calls == 1
+    third = _research(researcher)
+    assert third["cached"] is True and local.calls == 2
+    entry = next(iter(cache._entries.values()))
+    assert entry["ttl"] == RootCauseResearcher.ONLINE_COOLDOWN_SECONDS
+
+
+def test_source_error_is_not_cached():
+    broken = FakeSource("local_kb", error=ValueError("bad index"))
+    researcher = RootCauseResearcher(sources=[broken], cache=ResearchCache())
+    assert _research(researcher)["sources"] == {"local_kb": "error:ValueError"}
+    _research(researcher)
+    assert broken.calls == 2
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试推测式修复的候选评估（tools/ut_workflow_llm.py）
+验证选出首个编译运行通过的候选、其产物移到主循环位置供下一轮复用，以及落选候选被及时终止
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from testlib import run_tests, make_workflow
+
+BROKEN = "int main( { return 0; }\n"
+FAILING = "int main() { return 3; }\n"
+PASSING = '#include <cstdio>\nint main() { std::printf("%s", __FILE__); return 0; }\n'
+HANGING = "int main() { for (;;) {} }\n"
+
+
+def _evaluate(workflow, root, candidates, split_build):
+    test_path = os.path.join(root, "test", "add_student_llm_test.cpp")
+    build_path = os.path.join(root, "build-test")
+    os.makedirs(os.path.dirname(test_path), exist_ok=True)
+    os.makedirs(build_path, exist_ok=True)
+    exe_path = os.path.join(build_path, "add_student_llm_test")
+    result = workflow._evaluate_fix_candidates(
+        candidates=candidates,
+        test_name="add_student_llm_test",
+        test_path=test_path,
+        build_path=build_path,
+        compiler_path="g++",
+        include_dirs=[],
+        source_files=[],
+        gtest_link_inputs=[],
+        exe_path=exe_path,
+        split_build=split_build
+    )
+    return result, test_path, build_path, exe_path
+
+
+def test_split_build_winner_is_moved_into_place():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, speculative_candidates=3)
+        (winner, outcomes, winner_build), test_path, build_path, exe_path = _evaluate(
+            workflow, root, [BROKEN, FAILING, PASSING], split_build=True
+        )
+        assert winner == 2 and outcomes[2] == "passed"
+        assert outcomes.get(0) in (None, "compile_failed", "cancelled")
+        assert winner_build is not None and winner_build.returncode == 0
+        assert os.path.isfile(exe_path)
+        assert os.path.isfile(workflow._test_object_path(exe_path))
+        assert not os.path.exists(os.path.join(build_path, "speculative", "add_student_llm_test"))
+        # #line指令使复用产物中的__FILE__指向原测试文件
+        output = subprocess.run([exe_path], capture_output=True, text=True).stdout
+        assert output == os.path.abspath(test_path).replace(os.sep, "/")
+
+
+def test_monolithic_build_and_no_winner():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, speculative_candidates=2)
+        (winner, outcomes, winner_build), _, _, exe_path = _evaluate(
+            workflow, root, [FAILING, PASSING], split_build=False
+        )
+        assert winner == 1 and winner_build is not None and os.path.isfile(exe_path)
+        assert not os.path.exists(workflow._test_object_path(exe_path))
+        os.remove(exe_path)
+
+        (winner, outcomes, winner_build), _, _, exe_path = _evaluate(
+            workflow, root, [BROKEN, FAILING], split_build=False
+        )
+        assert winner is None and winner_build is None
+        assert outcomes == {0: "compile_failed", 1: "run_failed"}
+        assert not os.path.exists(exe_path)
+
+
+def test_hanging_loser_is_killed_after_winner():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, speculative_candidates=2)
+        started = time.monotonic()
+        (winner, outcomes, _), _, _, _ = _evaluate(workflow, root, [HANGING, PASSING], split_build=True)
+        assert winner == 1
+        assert time.monotonic() - started < 60
+        assert outcomes.get(0) is None
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+测试流式流水线（tools/ut_workflow_llm.py）
+验证生成与编译运行重叠执行、有界队列背压、校验未通过只淘汰单个文件，
+以及在离线LLM替身服务上完整跑通生成到运行
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from testlib import run_tests, make_workflow
+
+VALID_TEST = "#include <gtest/gtest.h>\n\nTEST({name}_test, Runs)\n{{\n    EXPECT_TRUE(true);\n}}\n"
+
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+
+    def add(self, *event):
+        with self.lock:
+            self.events.append((time.monotonic(),) + event)
+
+    def time_of(self, *event):
+        return next(t for t, *rest in self.events if tuple(rest) == event)
+
+
+def _fake_stages(workflow, names, recorder, build_seconds=0.0, invalid=()):
+    """生成阶段按names逐个保存测试文件；编译运行阶段只记录调用"""
+    def _generate_tests(target_functions=None, on_test_saved=None):
+        for name in names:
+            path = os.path.join(workflow.test_dir, f"{name}_llm_test.cpp")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("int main() {}\n" if name in invalid else VALID_TEST.format(name=name))
+            recorder.add("saved", name)
+            on_test_saved(name, path)
+            recorder.add("handed_off", name)
+            time.sleep(0.05)
+        recorder.add("generation_done")
+
+    def _run_single_test_pipeline(test_file, run_ctx):
+        name = test_file[:-len("_llm_test.cpp")]
+        recorder.add("build_start", name)
+        time.sleep(build_seconds)
+        return "PASSED"
+
+    workflow.generate_tests = _generate_tests
+    workflow._run_single_test_pipeline = _run_single_test_pipeline
+
+
+def _run(workflow, skip_run=False):
+    workflow._run_streaming_pipeline(
+        target_functions=None,
+        skip_run=skip_run,
+        skip_quality_gates=True,
+        quality_strict=False,
+        run_options={
+            "auto_fix_compile_errors": False,
+            "auto_fix_test_failures": False,
+            "llm_triage_enabled": False,
+            "web_research_enabled": False,
+            "experience_learning_enabled": False,
+        }
+    )
+
+
+def test_builds_start_before_generation_finishes():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, pipeline_mode="streaming", test_workers=2)
+        recorder = _Recorder()
+        names = ["validate_score", "validate_student_id", "db_init", "invalid_one"]
+        _fake_stages(workflow, names, recorder, invalid=("invalid_one",))
+        _run(workflow)
+
+        assert recorder.time_of("build_start", "validate_score") < recorder.time_of("generation_done")
+        built = sorted(rest[1] for _, *rest in recorder.events if rest[0] == "build_start")
+        # 校验未通过的文件被淘汰，其余照常构建
+        assert built == ["db_init", "validate_score", "validate_student_id"]
+        index = workflow._load_function_status_index()
+        assert index["invalid_one"]["status"] == "INVALID"
+        assert index["db_init"]["status"] == "PASSED"
+
+
+def test_bounded_queues_apply_backpressure():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, pipeline_mode="streaming", pipeline_queue_size=1, test_workers=1)
+        recorder = _Recorder()
+        names = [f"func_{i}" for i in range(6)]
+        _fake_stages(workflow, names, recorder, build_seconds=0.3)
+        started = time.monotonic()
+        _run(workflow)
+
+        # 单个构建worker + 两个容量为1的队列：生成最多领先构建几个文件，之后被阻塞等待
+        handed_off_last = recorder.time_of("handed_off", "func_5")
+        assert handed_off_last > recorder.time_of("build_start", "func_1")
+        assert time.monotonic() - started >= 6 * 0.3
+
+
+def test_skip_run_only_verifies():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, pipeline_mode="streaming")
+        recorder = _Recorder()
+        _fake_stages(workflow, ["validate_score", "invalid_one"], recorder, invalid=("invalid_one",))
+        _run(workflow, skip_run=True)
+        assert not [event for event in recorder.events if event[1] == "build_start"]
+        assert not os.path.exists(os.path.join(root, "build-test"))
+
+
+def test_streaming_end_to_end_with_standin_llm():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, pipeline_mode="streaming", test_workers=2)
+        workflow.analyze_codebase()
+        workflow._run_streaming_pipeline(
+            target_functions=["validate_score", "db_init"],
+            skip_run=False,
+            skip_quality_gates=True,
+            quality_strict=False,
+            run_options={
+                "auto_fix_compile_errors": False,
+                "auto_fix_test_failures": False,
+                "llm_triage_enabled": False,
+                "web_research_enabled": False,
+                "experience_learning_enabled": False,
+            }
+        )
+        index = workflow._load_function_status_index()
+        assert {name: entry["status"] for name, entry in index.items()} == {
+            "validate_score": "PASSED", "db_init": "PASSED"
+        }
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
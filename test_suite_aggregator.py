@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+测试合并测试二进制的源码改写与分片（tools/suite_aggregator.py）
+验证套件/类名加前缀（字面量与注释保持原样）、不可合并的测试、C桩定义文本比较、按桩冲突与相同桩去重的分片规划，
+以及分片内各测试单独启动进程（生产代码的静态状态互不影响）
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from testlib import run_tests, make_workflow
+
+from suite_aggregator import AggregateUnit, c_definition_text, plan_shards, rewrite_for_aggregate
+
+TEST_CODE = """#include <gtest/gtest.h>
+#include "MockDatabase.h"
+
+extern "C" {
+#include "student_manager.h"
+}
+
+class MockDatabase {
+public:
+    int calls = 0;
+};
+
+struct ScoreFixture : public ::testing::Test {
+    MockDatabase db;
+};
+
+TEST(AddStudent, RejectsNull)
+{
+    EXPECT_NE(add_student(nullptr), 0);
+}
+
+TEST_F(ScoreFixture, StartsEmpty)
+{
+    EXPECT_EQ(db.calls, 0);
+}
+
+TEST(AddStudent, AcceptsValid) {}
+"""
+
+
+def test_rewrite_prefixes_suites_and_classes():
+    rewritten = rewrite_for_aggregate(TEST_CODE, "add_student")
+    assert rewritten is not None
+    code, suites = rewritten
+    assert suites == ["add_student__AddStudent", "add_student__ScoreFixture"]
+    assert "class add_student__MockDatabase {" in code
+    assert "struct add_student__ScoreFixture : public ::testing::Test {" in code
+    assert "    add_student__MockDatabase db;" in code
+    assert "TEST(add_student__AddStudent, RejectsNull)" in code
+    assert "TEST_F(add_student__ScoreFixture, StartsEmpty)" in code
+    # include行与被测函数调用保持不变（::testing::Test不是测试文件定义的类）
+    assert '#include "MockDatabase.h"' in code
+    assert "EXPECT_NE(add_student(nullptr), 0);" in code
+    assert "::testing::Test" in code
+
+
+LITERAL_CODE = r"""#include <gtest/gtest.h>
+
+// MockDatabase keeps call counts; TEST(Commented, Out) is not a suite
+/* struct Hidden { int x; }; int main() {} */
+class MockDatabase {};
+
+TEST(Output, KeepsLiterals)
+{
+    MockDatabase db;
+    const char* name = "MockDatabase";
+    const char* escaped = "quote \" MockDatabase";
+    const char* raw = R"x(MockDatabase "in raw")x";
+    const wchar_t* wide = L"MockDatabase";
+    char quote = '"';
+    int big = 1'000'000;
+    EXPECT_STREQ(name, "MockDatabase") << "MockDatabase mismatch";
+}
+"""
+
+
+def test_rewrite_skips_literals_and_comments():
+    code, suites = rewrite_for_aggregate(LITERAL_CODE, "db_init")
+    assert suites == ["db_init__Output"]
+    assert "class db_init__MockDatabase {};" in code
+    assert "    db_init__MockDatabase db;" in code
+    assert "// MockDatabase keeps call counts; TEST(Commented, Out) is not a suite" in code
+    assert "/* struct Hidden { int x; }; int main() {} */" in code
+    assert 'const char* name = "MockDatabase";' in code
+    assert r'"quote \" MockDatabase"' in code
+    assert 'R"x(MockDatabase "in raw")x"' in code
+    assert 'L"MockDatabase"' in code
+    assert "char quote = '\"';" in code and "int big = 1'000'000;" in code
+    assert 'EXPECT_STREQ(name, "MockDatabase") << "MockDatabase mismatch";' in code
+    assert "Hidden" not in code.replace("struct Hidden", "")
+
+
+def test_rewrite_rejects_custom_main_and_no_tests():
+    assert rewrite_for_aggregate(TEST_CODE + "\nint main(int argc, char** argv) { return 0; }\n", "f") is None
+    assert rewrite_for_aggregate("int helper(void) { return 0; }\n", "f") is None
+
+
+def test_c_definition_text():
+    code = """extern "C" {
+int32_t validate_score(float score) {
+    if (score < 0) { return 0; }
+    return 1;
+}
+}
+TEST(S, A) { EXPECT_EQ(validate_score(1.0f), 1); }
+"""
+    text = c_definition_text(code, "validate_score")
+    assert text == "int32_t validate_score(float score) { if (score < 0) { return 0; } return 1; }"
+    # 只有调用/声明没有定义时返回None
+    assert c_definition_text("int32_t validate_score(float score);\nint x = validate_score(1);\n", "validate_score") is None
+
+
+def _unit(name, defined=(), required=(), texts=None, include_dirs=("-Iinclude",), sources=()):
+    return AggregateUnit(
+        name=name,
+        object_path=f"{name}.agg.o",
+        include_dirs=list(include_dirs),
+        suites=[f"{name}__Suite"],
+        sources=list(sources),
+        defined=set(defined),
+        required=set(required),
+        definition_texts=dict(texts or {})
+    )
+
+
+def test_plan_separates_stub_from_real_implementation():
+    stubbing = _unit("add_student_llm_test", defined={"validate_score"}, texts={"validate_score": "stub"},
+                     sources=["student_manager.c"])
+    real = _unit("validate_score_llm_test", required={"validate_score"}, sources=["validator.c"])
+    other = _unit("db_init_llm_test", required={"db_init"}, sources=["database.c"])
+
+    shards = plan_shards([stubbing, real, other], 1)
+    assert [[u.name for u in shard.units] for shard in shards] == [
+        ["add_student_llm_test", "db_init_llm_test"],
+        ["validate_score_llm_test"],
+    ]
+    assert shards[0].sources() == ["student_manager.c", "database.c"]
+
+
+def test_plan_deduplicates_identical_stubs():
+    stub = "int32_t db_init(void) { return 0; }"
+    first = _unit("a_llm_test", defined={"db_init"}, texts={"db_init": stub})
+    second = _unit("b_llm_test", defined={"db_init"}, texts={"db_init": stub})
+    different = _unit("c_llm_test", defined={"db_init"}, texts={"db_init": "int32_t db_init(void) { return -1; }"})
+    opaque = _unit("d_llm_test", defined={"_Z6helperv"})
+    opaque_again = _unit("e_llm_test", defined={"_Z6helperv"})
+
+    shards = plan_shards([first, second, different, opaque, opaque_again], 1)
+    # 相同桩文本共存；不同文本与无法比较（None）的重复定义分到不同分片
+    assert [[u.name for u in shard.units] for shard in shards] == [
+        ["a_llm_test", "b_llm_test", "e_llm_test"],
+        ["c_llm_test", "d_llm_test"],
+    ]
+    # 强定义保留在首个加入分片的测试中，其余副本弱化
+    assert shards[0].duplicate_symbols(first) == []
+    assert shards[0].duplicate_symbols(second) == ["db_init"]
+
+
+def test_plan_balances_and_respects_include_dirs():
+    units = [_unit(f"t{i}_llm_test") for i in range(4)]
+    units.append(_unit("other_flags_llm_test", include_dirs=("-Iother",)))
+    shards = plan_shards(units, 2)
+    # 同编译参数的测试均分到前两个分片，包含目录不同的测试新开分片
+    assert [len(shard.units) for shard in shards] == [2, 2, 1]
+    assert [u.name for u in shards[2].units] == ["other_flags_llm_test"]
+    for shard in shards:
+        assert len({tuple(unit.include_dirs) for unit in shard.units}) == 1
+
+
+ISOLATION_TESTS = {
+    "add_student": """#include <gtest/gtest.h>
+
+extern "C" {
+#include "student_manager.h"
+#include "database.h"
+}
+
+TEST(AddStudent, FirstIdIsOne)
+{
+    ASSERT_EQ(db_init(), 0);
+    EXPECT_EQ(add_student("Alice", 90.0f), 1);
+}
+""",
+    "get_total_students": """#include <gtest/gtest.h>
+
+extern "C" {
+#include "student_manager.h"
+#include "database.h"
+}
+
+TEST(TotalStudents, CountsFromFreshState)
+{
+    ASSERT_EQ(db_init(), 0);
+    ASSERT_EQ(add_student("Bob", 80.0f), 1);
+    EXPECT_EQ(get_total_students(), 1);
+}
+""",
+}
+
+
+def test_gtest_filter_covers_parameterized_and_typed_suites():
+    from ut_workflow_llm import LLMUTWorkflow
+    assert LLMUTWorkflow._aggregate_gtest_filter(["f__S"]) == "f__S.*:*/f__S.*:f__S/*"
+    assert LLMUTWorkflow._aggregate_gtest_filter(["f__A", "f__B"]).count(":") == 5
+
+
+def test_shard_runs_each_test_in_its_own_process():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root, aggregate_shards=1)
+        test_dir = os.path.join(root, "test")
+        os.makedirs(test_dir, exist_ok=True)
+        files = []
+        for name, code in ISOLATION_TESTS.items():
+            files.append(f"{name}_llm_test.cpp")
+            with open(os.path.join(test_dir, files[-1]), "w", encoding="utf-8") as f:
+                f.write(code)
+        time.sleep(0.01)
+        workflow._update_function_status_index(
+            {name: "PASSED" for name in ISOLATION_TESTS}, os.path.join(root, "log"), "20260101_000000"
+        )
+        run_ctx = workflow._prepare_test_run(
+            test_dir,
+            auto_fix_compile_errors=False,
+            auto_fix_test_failures=False,
+            llm_triage_enabled=False,
+            web_research_enabled=False,
+            experience_learning_enabled=False
+        )
+        assert run_ctx is not None
+        # 两个测试都依赖静态计数器g_next_id的初始值：同一进程内依次运行时后一个必然失败
+        statuses = workflow._run_aggregate_shards(files, run_ctx)
+        assert statuses == {name: "PASSED" for name in files}
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
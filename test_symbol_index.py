@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试nm符号索引（tools/symbol_index.py）
+验证nm -P输出解析（弱定义/弱引用/未定义）与最小链接闭包选择（避开与测试桩冲突的TU）
+"""
+
+import os
+import sys
+import tempfile
+
+from testlib import run_tests
+
+from symbol_index import SymbolIndex, parse_nm_output
+
+NM_OUTPUT = """student_manager.o:
+add_student T 0000000000000000 0000000000000042
+g_student_count B 0000000000000000 0000000000000004
+kMaxScore R 0000000000000000 0000000000000004
+_ZN7testing4TestD2Ev W 0000000000000000 0000000000000010
+_ZTV5Mock V 0000000000000000 0000000000000020
+validate_score U
+db_add_student U
+__gmon_start__ w
+"""
+
+
+def test_parse_nm_output_types():
+    defined, undefined = parse_nm_output(NM_OUTPUT)
+    assert defined == {"add_student", "g_student_count", "kMaxScore", "_ZN7testing4TestD2Ev", "_ZTV5Mock"}
+    # 弱引用（w/v）可缺省，不计入未定义符号
+    assert undefined == {"validate_score", "db_add_student"}
+
+
+def test_parse_nm_output_strong_only():
+    defined, undefined = parse_nm_output(NM_OUTPUT, strong_only=True)
+    assert defined == {"add_student", "g_student_count", "kMaxScore"}
+    assert undefined == {"validate_score", "db_add_student"}
+
+
+def test_parse_nm_output_defined_wins_over_undefined():
+    defined, undefined = parse_nm_output("foo T 0 1\nfoo U\n")
+    assert defined == {"foo"}
+    assert undefined == set()
+
+
+class _FakeIndex(SymbolIndex):
+    """用固定符号表代替nm（目标文件路径 -> (已定义, 未定义)）"""
+
+    def __init__(self, symbols):
+        super().__init__(index_dir=os.path.join(tempfile.gettempdir(), "ut_symbol_index_test"), nm_path="nm")
+        self.symbols = symbols
+
+    def read_symbols(self, object_path, strong_only=False):
+        entry = self.symbols.get(object_path)
+        return (set(entry[0]), set(entry[1])) if entry else None
+
+    def update(self, object_paths):
+        return {
+            os.path.abspath(path): {"defined": sorted(self.symbols[path][0]), "undefined": sorted(self.symbols[path][1])}
+            for path in object_paths if path in self.symbols
+        }
+
+
+SYMBOLS = {
+    "test.o": ({"validate_score"}, {"add_student", "printf"}),
+    "student_manager.o": ({"add_student", "get_average_score"}, {"validate_score", "db_add_student"}),
+    "validator.o": ({"validate_score", "validate_student_id"}, set()),
+    "database.o": ({"db_add_student", "db_init"}, {"validate_student_id"}),
+    "database_legacy.o": ({"db_add_student", "validate_score"}, set()),
+}
+CANDIDATES = {
+    "student_manager.c": "student_manager.o",
+    "validator.c": "validator.o",
+    "database_legacy.c": "database_legacy.o",
+    "database.c": "database.o",
+}
+
+
+def test_link_closure_avoids_stub_conflicts():
+    index = _FakeIndex(SYMBOLS)
+    selected, unresolved = index.link_closure(["test.o"], CANDIDATES, seed_sources=["student_manager.c"])
+    # 测试自行定义了validate_score（桩）：validator.c与database_legacy.c都会重复定义，不能选
+    assert selected == ["student_manager.c", "database.c"]
+    # database.c需要的validate_student_id只有冲突TU能提供，留给链接桩处理
+    assert unresolved == ["printf", "validate_student_id"]
+
+
+def test_link_closure_allows_overrides_with_weak_objects():
+    index = _FakeIndex(SYMBOLS)
+    selected, unresolved = index.link_closure(
+        ["test.o"], CANDIDATES, seed_sources=["student_manager.c"], allow_test_overrides=True
+    )
+    # 弱化的生产目标文件可被测试定义覆盖：按候选顺序选第一个提供者，不再排除冲突TU
+    assert selected == ["student_manager.c", "database_legacy.c"]
+    assert unresolved == ["printf"]
+
+
+def test_link_closure_unreadable_test_object():
+    index = _FakeIndex(SYMBOLS)
+    assert index.link_closure(["missing.o"], CANDIDATES) is None
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试编译前的语法预检（tools/ut_workflow_llm.py）
+验证预检命令与实际编译测试TU的参数一致，以及测试文件内容未变时复用上次结果而不重新检查
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from testlib import run_tests, make_workflow
+
+BROKEN_TEST = "#include <gtest/gtest.h>\n\nTEST(validate_score_test, Broken)\n{\n    int x = ;\n}\n"
+VALID_TEST = "#include <gtest/gtest.h>\n\nTEST(validate_score_test, Runs)\n{\n    EXPECT_TRUE(true);\n}\n"
+
+
+def _write(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_check_command_matches_test_object_command():
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        include_dirs = [f"-I{root}/include"]
+        test_path = os.path.join(root, "validate_score_llm_test.cpp")
+        check = workflow._build_syntax_check_command("g++", include_dirs, test_path)
+        build = workflow._build_test_object_command("g++", include_dirs, test_path, test_path + ".o")
+        assert check[-2:] == ["-fsyntax-only", test_path]
+        assert check[:-2] == build[:-4]
+        assert all(flag in check for flag in workflow.GNU_TEST_CXX_FLAGS)
+
+        msvc = workflow._build_syntax_check_command("cl.exe", include_dirs, test_path)
+        assert "/Zs" in msvc and f"/I{root}/include" in msvc
+        assert all(flag in msvc for flag in workflow.MSVC_TEST_CXX_FLAGS)
+
+
+def test_unchanged_file_reuses_previous_result():
+    compiler = shutil.which("g++")
+    if compiler is None:
+        print("  (skipped: g++ not found)")
+        return
+    with tempfile.TemporaryDirectory() as root:
+        workflow = make_workflow(root)
+        test_path = os.path.join(root, "validate_score_llm_test.cpp")
+        include_dirs = [f"-I{root}/include"]
+        run_ctx = {}
+        calls = []
+        run_syntax_check = workflow._run_syntax_check
+
+        def _counting(cmd):
+            calls.append(cmd)
+            return run_syntax_check(cmd)
+
+        workflow._run_syntax_check = _counting
+
+        def _preflight():
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                result, _ = workflow._syntax_preflight_for_test(
+                    "validate_score_llm_test.cpp", test_path, compiler, include_dirs, run_ctx
+                )
+            return result
+
+        _write(test_path, BROKEN_TEST)
+        assert _preflight().returncode != 0
+        assert _preflight().returncode != 0
+        assert len(calls) == 1
+
+        _write(test_path, VALID_TEST)
+        assert _preflight().returncode == 0
+        assert _preflight().returncode == 0 and len(calls) == 2
+        # 检查命令变化（include路径不同）同样重新检查
+        workflow._syntax_preflight_for_test(
+            "validate_score_llm_test.cpp", test_path, compiler, include_dirs + [f"-I{root}"], run_ctx
+        )
+        assert len(calls) == 3
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests(globals()))
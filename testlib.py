@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+根目录 test_*.py 的公共运行入口与夹具
+各测试文件以 `python test_xxx.py` 直接运行，按名字顺序执行模块中的 test_* 函数；
+需要完整工作流的测试使用离线LLM替身服务与临时示例工程（src/include的副本）
+"""
+
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+from http.server import ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.join(REPO_ROOT, 'tools')
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+_fixture_lock = threading.Lock()
+_standin_api_base = None
+
+
+def use_private_build_cache() -> str:
+    """本进程的构建产物缓存改用临时目录（不读写机器级缓存），进程退出时删除"""
+    with _fixture_lock:
+        cache_dir = os.environ.get("UT_TESTLIB_BUILD_CACHE_DIR")
+        if not cache_dir:
+            cache_dir = tempfile.mkdtemp(prefix="ut_build_cache_")
+            atexit.register(shutil.rmtree, cache_dir, True)
+            os.environ["UT_TESTLIB_BUILD_CACHE_DIR"] = cache_dir
+        os.environ["UT_BUILD_CACHE_DIR"] = cache_dir
+        return cache_dir
+
+
+def start_standin_server() -> str:
+    """在后台线程启动canned模式的离线LLM替身服务（进程内只启动一次），返回api_base"""
+    global _standin_api_base
+    with _fixture_lock:
+        if _standin_api_base is None:
+            from llm_standin_server import StandInHandler, StandInState
+            StandInHandler.state = StandInState(
+                mode="canned", capture_path=None, latency_ms=0.0, tokens_per_sec=0.0, model="qwen-coder"
+            )
+            server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            _standin_api_base = f"http://127.0.0.1:{server.server_address[1]}"
+        return _standin_api_base
+
+
+def make_sample_project(root: str) -> str:
+    """在root下复制示例工程（src/include）并生成compile_commands.json，返回其路径"""
+    for name in ("src", "include"):
+        shutil.copytree(os.path.join(REPO_ROOT, name), os.path.join(root, name), dirs_exist_ok=True)
+    build_dir = os.path.join(root, "build")
+    os.makedirs(build_dir, exist_ok=True)
+    entries = []
+    for source in sorted(os.listdir(os.path.join(root, "src"))):
+        if source.endswith(".c"):
+            path = os.path.join(root, "src", source)
+            entries.append({
+                "directory": build_dir,
+                "command": f"/usr/bin/cc -I{os.path.join(root, 'include')} -std=gnu99 -o {source}.o -c {path}",
+                "file": path,
+            })
+    compile_commands = os.path.join(build_dir, "compile_commands.json")
+    with open(compile_commands, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    return compile_commands
+
+
+def make_workflow(root: str, **kwargs):
+    """在root下的示例工程上构建LLMUTWorkflow（LLM指向进程内替身服务，构建缓存为临时目录）"""
+    from ut_workflow_llm import LLMUTWorkflow
+    use_private_build_cache()
+    for name in ("VLLM_API_BASE", "VLLM_API_BASES", "VLLM_MODEL", "LLM_CAPTURE_PATH", "LLM_METRICS_PATH"):
+        os.environ.pop(name, None)
+    os.environ["LLM_BACKEND"] = "vllm"
+    compile_commands = make_sample_project(root)
+    kwargs.setdefault("experience_learning_enabled", False)
+    return LLMUTWorkflow(root, compile_commands, llm_api_base=start_standin_server(), **kwargs)
+
+
+def run_tests(namespace: dict) -> int:
+    """执行namespace中的test_*函数，返回进程退出码（有失败时为1）"""
+    tests = [value for name, value in sorted(namespace.items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception:
+            failed += 1
+            print(f"✗ {test.__name__}")
+            traceback.print_exc()
+            continue
+        print(f"✓ {test.__name__}")
+    print(f"\n{len(tests) - failed}/{len(tests)} test(s) passed")
+    return 1 if failed else 0
@@ -0,0 +1,814 @@
+#!/usr/bin/env python3
+"""
+Build Cache
+机器级共享的内容寻址构建产物缓存（默认 ~/.cache/c-unit-test-workflow）：
+- gtest/gmock：由源码（gtest-all.cc / gtest_main.cc / gmock-all.cc）只构建一次静态库，
+  按 编译器 + 编译参数 + gtest版本/源码内容 寻址，所有测试、所有修复轮次、所有项目复用
+- 被测生产代码：每个.c按 编译器 + 编译参数 + include路径 + 源文件内容 编译为目标文件，
+  并用编译器生成的依赖文件（-MMD / /showIncludes）校验头文件内容，修复轮次只需编译测试TU并链接
+- gtest/gmock预编译头（GCC .gch / Clang .pch）：按 编译器 + 编译参数 + include路径 寻址，
+  测试TU通过 -include / -include-pch 复用，省去每次编译（含每个修复轮次）解析gtest/gmock头文件的前端开销
+- 弱符号化的生产代码目标文件（objcopy --weaken-symbols）：按 原目标文件内容 + 弱化符号 寻址，
+  测试中的同名强定义在链接时覆盖生产实现，一组弱化目标文件供所有测试共用
+
+环境变量:
+    UT_BUILD_CACHE       false/0/off 时关闭缓存（回退为每个测试直接编译gtest源码）
+    UT_BUILD_PCH         false/0/off 时关闭gtest/gmock预编译头（默认开启，依赖UT_BUILD_CACHE）
+    UT_BUILD_CACHE_DIR   缓存根目录（默认 ~/.cache/c-unit-test-workflow，Windows为 %LOCALAPPDATA%）
+
+Usage:
+    python build_cache.py info
+    python build_cache.py gtest <googletest_root> [--gmock-root DIR] [--compiler g++]
+    python build_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+CACHE_SCHEMA = "v1"
+
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def cache_enabled() -> bool:
+    """UT_BUILD_CACHE 未显式关闭即启用"""
+    return str(os.getenv("UT_BUILD_CACHE", "true")).strip().lower() not in _FALSE_VALUES
+
+
+def pch_enabled() -> bool:
+    """UT_BUILD_PCH 未显式关闭且产物缓存启用时生成并复用预编译头"""
+    return cache_enabled() and str(os.getenv("UT_BUILD_PCH", "true")).strip().lower() not in _FALSE_VALUES
+
+
+def default_cache_dir() -> str:
+    configured = os.getenv("UT_BUILD_CACHE_DIR", "").strip()
+    if configured:
+        return os.path.abspath(os.path.expanduser(configured))
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "c-unit-test-workflow")
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_msvc(compiler_path: str) -> bool:
+    return os.path.basename(compiler_path).lower() in ("cl", "cl.exe")
+
+
+_identity_lock = threading.Lock()
+_compiler_identities: Dict[Tuple[str, int, int], str] = {}
+_tree_hashes: Dict[Tuple[str, Tuple[str, ...]], Tuple[Tuple, str]] = {}
+_file_digests: Dict[str, Tuple[int, int, str]] = {}
+
+
+def file_digest(path: str) -> Optional[str]:
+    """文件内容哈希（按mtime/size记忆）；文件不存在返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _identity_lock:
+        cached = _file_digests.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+    digest = hash_file(path)
+    with _identity_lock:
+        _file_digests[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def compiler_identity(compiler_path: str) -> str:
+    """编译器真实路径 + 版本输出首行（按二进制mtime/size记忆）"""
+    resolved = shutil.which(compiler_path) or compiler_path
+    resolved = os.path.realpath(resolved)
+    try:
+        st = os.stat(resolved)
+        stamp = (resolved, st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = (resolved, 0, 0)
+
+    with _identity_lock:
+        if stamp in _compiler_identities:
+            return _compiler_identities[stamp]
+
+    version = ""
+    try:
+        args = [compiler_path] if _is_msvc(compiler_path) else [compiler_path, "--version"]
+        result = subprocess.run(args, capture_output=True, text=True, timeout=20)
+        output = (result.stdout or "") + (result.stderr or "")
+        version = next((line.strip() for line in output.splitlines() if line.strip()), "")
+    except Exception:
+        pass
+
+    identity = f"{resolved}|{version}"
+    with _identity_lock:
+        _compiler_identities[stamp] = identity
+    return identity
+
+
+def hash_tree(root: str, suffixes: Sequence[str] = (".h", ".hpp", ".cc", ".cpp", ".inc")) -> str:
+    """目录下指定后缀文件的内容哈希（按文件列表及mtime/size签名记忆）"""
+    files: List[str] = []
+    for walk_root, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in sorted(names):
+            if name.endswith(tuple(suffixes)):
+                files.append(os.path.join(walk_root, name))
+
+    signature = []
+    for path in files:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            continue
+    signature_key = tuple(signature)
+    memo_key = (os.path.abspath(root), tuple(suffixes))
+    with _identity_lock:
+        cached = _tree_hashes.get(memo_key)
+        if cached and cached[0] == signature_key:
+            return cached[1]
+
+    digest = hashlib.sha256()
+    for path, _, _ in signature:
+        digest.update(os.path.relpath(path, root).replace(os.sep, "/").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(hash_file(path).encode("ascii"))
+    value = digest.hexdigest()
+    with _identity_lock:
+        _tree_hashes[memo_key] = (signature_key, value)
+    return value
+
+
+class ArtifactCache:
+    """
+    内容寻址的产物目录：<root>/<namespace>/<key>/
+
+    构建在同级临时目录中完成后整体rename发布，多个进程并发构建同一key时只保留先完成的一份。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or default_cache_dir())
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "failures": 0}
+        # 本进程内构建失败过的key不再重试（避免每个测试重复一次失败的慢构建）
+        self._failed_keys = set()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(CACHE_SCHEMA.encode("ascii"))
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(str(part).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def entry_dir(self, namespace: str, key: str) -> str:
+        return os.path.join(self.root, namespace, key)
+
+    def lookup(self, namespace: str, key: str, names: Sequence[str]) -> Optional[List[str]]:
+        entry = self.entry_dir(namespace, key)
+        paths = [os.path.join(entry, name) for name in names]
+        if all(os.path.isfile(path) for path in paths):
+            return paths
+        return None
+
+    def key_lock(self, namespace: str, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(f"{namespace}/{key}", threading.Lock())
+
+    def get_or_build(self,
+                     namespace: str,
+                     key: str,
+                     names: Sequence[str],
+                     builder: Callable[[str], bool],
+                     manifest: Optional[Dict[str, object]] = None) -> Optional[List[str]]:
+        """
+        命中直接返回产物路径；否则调用builder(临时目录)构建并发布
+
+        Returns:
+            产物路径列表（与names一一对应），构建失败返回None
+        """
+        found = self.lookup(namespace, key, names)
+        if found:
+            with self._locks_guard:
+                self._stats["hits"] += 1
+            return found
+
+        with self.key_lock(namespace, key):
+            if f"{namespace}/{key}" in self._failed_keys:
+                return None
+            found = self.lookup(namespace, key, names)
+            if found:
+                with self._locks_guard:
+                    self._stats["hits"] += 1
+                return found
+
+            namespace_dir = os.path.join(self.root, namespace)
+            os.makedirs(namespace_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=f".{key}.tmp-", dir=namespace_dir)
+            try:
+                ok = builder(staging) and all(os.path.isfile(os.path.join(staging, name)) for name in names)
+                if not ok:
+                    with self._locks_guard:
+                        self._stats["failures"] += 1
+                        self._failed_keys.add(f"{namespace}/{key}")
+                    return None
+                if manifest is not None:
+                    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+                        json.dump(manifest, f, ensure_ascii=False, indent=2)
+                try:
+                    os.rename(staging, self.entry_dir(namespace, key))
+                except OSError:
+                    # 其他进程已发布同一key，使用已发布的版本
+                    pass
+                with self._locks_guard:
+                    self._stats["builds"] += 1
+            finally:
+                if os.path.isdir(staging):
+                    shutil.rmtree(staging, ignore_errors=True)
+
+        return self.lookup(namespace, key, names)
+
+    def invalidate(self, namespace: str, key: str) -> None:
+        """删除已发布的条目（内容校验失败时由调用方在key_lock内调用）"""
+        shutil.rmtree(self.entry_dir(namespace, key), ignore_errors=True)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        target = os.path.join(self.root, namespace) if namespace else self.root
+        shutil.rmtree(target, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._locks_guard:
+            return dict(self._stats)
+
+
+def read_gtest_version(gtest_root: str) -> str:
+    """从googletest发行包的CMakeLists.txt读取GOOGLETEST_VERSION（找不到返回空串）"""
+    for candidate in (os.path.join(gtest_root, "..", "CMakeLists.txt"), os.path.join(gtest_root, "CMakeLists.txt")):
+        try:
+            with open(candidate, "r", encoding="utf-8", errors="ignore") as f:
+                match = re.search(r'GOOGLETEST_VERSION\s+([0-9][\w.]*)', f.read())
+            if match:
+                return match.group(1)
+        except OSError:
+            continue
+    return ""
+
+
+class GTestArtifactCache:
+    """gtest/gmock静态库缓存：每种 编译器+参数+gtest源码 组合只构建一次"""
+
+    NAMESPACE = "gtest"
+
+    def __init__(self, cache: Optional[ArtifactCache] = None):
+        self.cache = cache or ArtifactCache()
+
+    @staticmethod
+    def _library_names(msvc: bool, with_gmock: bool) -> List[str]:
+        components = (["gmock"] if with_gmock else []) + ["gtest_main", "gtest"]
+        if msvc:
+            return [f"{name}.lib" for name in components]
+        return [f"lib{name}.a" for name in components]
+
+    @staticmethod
+    def _find_archiver(compiler_path: str) -> Optional[List[str]]:
+        if _is_msvc(compiler_path):
+            sibling = os.path.join(os.path.dirname(shutil.which(compiler_path) or compiler_path), "lib.exe")
+            tool = sibling if os.path.isfile(sibling) else shutil.which("lib")
+            return [tool, "/nologo"] if tool else None
+        compiler_dir = os.path.dirname(shutil.which(compiler_path) or compiler_path)
+        for name in ("llvm-ar" if "clang" in os.path.basename(compiler_path).lower() else "gcc-ar", "ar"):
+            sibling = os.path.join(compiler_dir, name)
+            tool = sibling if os.path.isfile(sibling) else shutil.which(name)
+            if tool:
+                return [tool]
+        return None
+
+    def get_libraries(self,
+                      compiler_path: str,
+                      gtest_root: str,
+                      gmock_root: Optional[str],
+                      compile_flags: Sequence[str]) -> Optional[List[str]]:
+        """
+        返回可直接链接的静态库路径（顺序：gmock, gtest_main, gtest），无法构建时返回None
+
+        Args:
+            compiler_path: 测试使用的C++编译器
+            gtest_root: googletest目录（含include/与src/gtest-all.cc）
+            gmock_root: googlemock目录（可为None）
+            compile_flags: 与测试编译一致的ABI相关参数（-std、宏定义等）
+        """
+        gtest_all = os.path.join(gtest_root, "src", "gtest-all.cc")
+        gtest_main = os.path.join(gtest_root, "src", "gtest_main.cc")
+        if not (os.path.isfile(gtest_all) and os.path.isfile(gtest_main)):
+            return None
+        gmock_all = os.path.join(gmock_root, "src", "gmock-all.cc") if gmock_root else ""
+        with_gmock = bool(gmock_all) and os.path.isfile(gmock_all)
+
+        msvc = _is_msvc(compiler_path)
+        archiver = self._find_archiver(compiler_path)
+        if not archiver:
+            return None
+
+        try:
+            source_hash = hash_tree(gtest_root) + (hash_tree(gmock_root) if with_gmock else "")
+        except OSError:
+            return None
+        version = read_gtest_version(gtest_root)
+        identity = compiler_identity(compiler_path)
+        key = self.cache.make_key(identity, " ".join(compile_flags), version, source_hash, str(with_gmock))
+        names = self._library_names(msvc, with_gmock)
+
+        include_roots = [gtest_root, os.path.join(gtest_root, "include")]
+        if with_gmock:
+            include_roots += [gmock_root, os.path.join(gmock_root, "include")]
+        units = [("gtest", gtest_all), ("gtest_main", gtest_main)]
+        if with_gmock:
+            units.insert(0, ("gmock", gmock_all))
+
+        def _compile(staging: str, component: str, source: str) -> Tuple[bool, str]:
+            obj = os.path.join(staging, component + (".obj" if msvc else ".o"))
+            if msvc:
+                cmd = [compiler_path, "/nologo", "/c", *compile_flags]
+                cmd += [f"/I{root}" for root in include_roots]
+                cmd += [source, f"/Fo{obj}"]
+            else:
+                cmd = [compiler_path, *compile_flags]
+                cmd += [f"-I{root}" for root in include_roots]
+                cmd += ["-c", source, "-o", obj]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+            if result.returncode != 0:
+                print(f"[BuildCache] ✗ {os.path.basename(source)}: {(result.stderr or result.stdout or '').strip()[:400]}")
+                return False, ""
+            return True, obj
+
+        def _build(staging: str) -> bool:
+            print(f"[BuildCache] Building gtest/gmock archives once (gtest {version or 'unknown'}) -> "
+                  f"{self.cache.entry_dir(self.NAMESPACE, key)}")
+            with ThreadPoolExecutor(max_workers=len(units)) as executor:
+                futures = {
+                    component: executor.submit(_compile, staging, component, source)
+                    for component, source in units
+                }
+                objects = {component: future.result() for component, future in futures.items()}
+            if not all(ok for ok, _ in objects.values()):
+                return False
+            for component, _ in units:
+                lib_path = os.path.join(staging, f"{component}.lib" if msvc else f"lib{component}.a")
+                obj = objects[component][1]
+                cmd = archiver + ([f"/OUT:{lib_path}", obj] if msvc else ["rcs", lib_path, obj])
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+                if result.returncode != 0:
+                    print(f"[BuildCache] ✗ archive {os.path.basename(lib_path)}: {(result.stderr or '').strip()[:300]}")
+                    return False
+                os.remove(obj)
+            return True
+
+        return self.cache.get_or_build(
+            self.NAMESPACE,
+            key,
+            names,
+            _build,
+            manifest={
+                "compiler": identity,
+                "flags": list(compile_flags),
+                "gtest_version": version,
+                "gtest_root": os.path.abspath(gtest_root),
+                "gmock_root": os.path.abspath(gmock_root) if with_gmock else "",
+            }
+        )
+
+
+_MSVC_INCLUDE_NOTE_RE = re.compile(r'^(?:Note: including file:|注意: 包含文件:)\s*(.+?)\s*$')
+
+
+def parse_depfile(text: str) -> List[str]:
+    """解析make格式依赖文件（-MMD输出），返回依赖路径列表（不含目标本身）"""
+    joined = text.replace("\\\n", " ").replace("\\\r\n", " ")
+    match = re.search(r'^.+?\.o(?:bj)?\s*:(?:\s|$)', joined, flags=re.MULTILINE)
+    body = joined[match.end():] if match else joined
+    deps: List[str] = []
+    for token in re.split(r'(?<!\\)\s+', body.strip()):
+        token = token.replace("\\ ", " ").strip()
+        if token and not token.endswith(":"):
+            deps.append(token)
+    return deps
+
+
+class ObjectCache:
+    """
+    被测生产代码目标文件缓存
+
+    key = 编译器 + 编译参数 + include路径 + 源文件路径与内容；条目内的deps.json记录每个依赖头文件的内容哈希，
+    命中时逐一校验，头文件变化即重新编译该TU。
+    """
+
+    NAMESPACE = "objects"
+    DEPS_FILE = "deps.json"
+
+    def __init__(self, cache: Optional[ArtifactCache] = None):
+        self.cache = cache or ArtifactCache()
+
+    @staticmethod
+    def _deps_valid(deps_path: str) -> bool:
+        try:
+            with open(deps_path, "r", encoding="utf-8") as f:
+                recorded = json.load(f).get("deps", {})
+        except (OSError, ValueError):
+            return False
+        return all(file_digest(path) == digest for path, digest in recorded.items())
+
+    def get_object(self,
+                   compiler_path: str,
+                   source: str,
+                   compile_flags: Sequence[str],
+                   include_flags: Sequence[str]) -> Optional[str]:
+        """返回源文件对应的缓存目标文件路径，编译失败返回None"""
+        source = os.path.abspath(source)
+        source_hash = file_digest(source)
+        if source_hash is None:
+            return None
+
+        msvc = _is_msvc(compiler_path)
+        key = self.cache.make_key(
+            compiler_identity(compiler_path),
+            " ".join(compile_flags),
+            " ".join(include_flags),
+            source,
+            source_hash
+        )
+        obj_name = os.path.splitext(os.path.basename(source))[0] + (".obj" if msvc else ".o")
+        names = [obj_name, self.DEPS_FILE]
+
+        with self.cache.key_lock(self.NAMESPACE, key):
+            published = self.cache.lookup(self.NAMESPACE, key, names)
+            if published and not self._deps_valid(published[1]):
+                self.cache.invalidate(self.NAMESPACE, key)
+
+        def _build(staging: str) -> bool:
+            obj = os.path.join(staging, obj_name)
+            if msvc:
+                cmd = [compiler_path, "/nologo", "/c", "/showIncludes", *compile_flags]
+                cmd += [f"/I{flag[2:]}" if flag.startswith("-I") else flag for flag in include_flags]
+                cmd += ["/TC", source, f"/Fo{obj}"]
+            else:
+                depfile = os.path.join(staging, "deps.d")
+                cmd = [compiler_path, *compile_flags, *include_flags, "-MMD", "-MF", depfile, "-c", source, "-o", obj]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            if result.returncode != 0:
+                return False
+
+            if msvc:
+                deps = [
+                    match.group(1)
+                    for match in (_MSVC_INCLUDE_NOTE_RE.match(line.strip()) for line in (result.stdout or "").splitlines())
+                    if match
+                ]
+            else:
+                with open(depfile, "r", encoding="utf-8", errors="ignore") as f:
+                    deps = parse_depfile(f.read())
+                os.remove(depfile)
+
+            recorded: Dict[str, str] = {}
+            for dep in deps:
+                dep_path = os.path.abspath(dep if os.path.isabs(dep) else os.path.join(os.path.dirname(source), dep))
+                digest = file_digest(dep_path)
+                if digest is not None:
+                    recorded[dep_path] = digest
+            with open(os.path.join(staging, self.DEPS_FILE), "w", encoding="utf-8") as f:
+                json.dump({"source": source, "deps": recorded}, f, ensure_ascii=False, indent=2)
+            return True
+
+        found = self.cache.get_or_build(self.NAMESPACE, key, names, _build)
+        return found[0] if found else None
+
+    def get_objects(self,
+                    compiler_path: str,
+                    sources: Sequence[str],
+                    compile_flags: Sequence[str],
+                    include_flags: Sequence[str]) -> Optional[List[str]]:
+        """并行获取多个源文件的目标文件；任一失败返回None（调用方回退为直接编译源码）"""
+        if not sources:
+            return []
+        workers = max(1, min(len(sources), os.cpu_count() or 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            objects = list(executor.map(
+                lambda src: self.get_object(compiler_path, src, compile_flags, include_flags),
+                sources
+            ))
+        if not all(objects):
+            return None
+        return objects
+
+
+class PchCache:
+    """
+    gtest/gmock预编译头缓存（GCC/Clang；MSVC的/Yc需要配套目标文件，不在此处理）
+
+    key = 编译器 + 编译参数 + include路径；条目内的deps.json记录PCH依赖的全部头文件（含系统头）哈希，
+    命中时逐一校验。生成后先用探测TU验证PCH确实可被使用，验证失败的组合本进程内不再尝试，
+    调用方回退为普通编译。
+    """
+
+    NAMESPACE = "pch"
+    DEPS_FILE = "deps.json"
+    HEADER_NAME = "ut_gtest_pch.h"
+    # 优先同时预编译gtest与gmock；找不到gmock头文件时只预编译gtest
+    HEADER_VARIANTS = (
+        ("gtest/gtest.h", "gmock/gmock.h"),
+        ("gtest/gtest.h",),
+    )
+    PROBE_SOURCE = "#include <gtest/gtest.h>\nTEST(UtPchProbe, Compiles) { EXPECT_TRUE(true); }\n"
+
+    def __init__(self, cache: Optional[ArtifactCache] = None):
+        self.cache = cache or ArtifactCache()
+
+    @staticmethod
+    def _is_clang(compiler_path: str) -> bool:
+        return "clang" in os.path.basename(compiler_path).lower()
+
+    def _pch_name(self, clang: bool) -> str:
+        return self.HEADER_NAME + (".pch" if clang else ".gch")
+
+    def _shared_header(self, content: str) -> str:
+        """Clang的PCH记录头文件绝对路径，头文件需放在不随条目发布而移动的位置（按内容寻址）"""
+        header_dir = os.path.join(self.cache.root, self.NAMESPACE, "headers",
+                                  hashlib.sha256(content.encode("utf-8")).hexdigest()[:16])
+        header = os.path.join(header_dir, self.HEADER_NAME)
+        if not os.path.isfile(header):
+            os.makedirs(header_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".hdr-", dir=header_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, header)
+        return header
+
+    def _use_flags(self, entry: str, clang: bool) -> List[str]:
+        if clang:
+            return ["-include-pch", os.path.join(entry, self._pch_name(True))]
+        # GCC在-include的头文件同目录查找同名.gch
+        return ["-include", os.path.join(entry, self.HEADER_NAME)]
+
+    def get_pch_flags(self,
+                      compiler_path: str,
+                      compile_flags: Sequence[str],
+                      include_flags: Sequence[str]) -> Optional[List[str]]:
+        """返回测试TU使用预编译头所需的编译参数；不支持或生成失败返回None"""
+        if not compiler_path or _is_msvc(compiler_path):
+            return None
+        clang = self._is_clang(compiler_path)
+        key = self.cache.make_key(
+            compiler_identity(compiler_path),
+            " ".join(compile_flags),
+            " ".join(include_flags),
+            "clang" if clang else "gcc"
+        )
+        names = [self._pch_name(clang), self.DEPS_FILE] + ([] if clang else [self.HEADER_NAME])
+
+        with self.cache.key_lock(self.NAMESPACE, key):
+            published = self.cache.lookup(self.NAMESPACE, key, names)
+            if published and not ObjectCache._deps_valid(published[1]):
+                self.cache.invalidate(self.NAMESPACE, key)
+
+        def _build(staging: str) -> bool:
+            for headers in self.HEADER_VARIANTS:
+                content = "#pragma once\n" + "".join(f"#include <{name}>\n" for name in headers)
+                if clang:
+                    header = self._shared_header(content)
+                else:
+                    header = os.path.join(staging, self.HEADER_NAME)
+                    with open(header, "w", encoding="utf-8") as f:
+                        f.write(content)
+                depfile = os.path.join(staging, "deps.d")
+                cmd = [compiler_path, *compile_flags, *include_flags, "-x", "c++-header", header,
+                       "-MD", "-MF", depfile, "-o", os.path.join(staging, self._pch_name(clang))]
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+                if result.returncode == 0 and self._probe(compiler_path, compile_flags, include_flags, staging, clang):
+                    with open(depfile, "r", encoding="utf-8", errors="ignore") as f:
+                        deps = parse_depfile(f.read())
+                    os.remove(depfile)
+                    recorded: Dict[str, str] = {}
+                    for dep in deps:
+                        dep_path = os.path.abspath(dep)
+                        # 条目内的头文件副本发布后路径会变化，不参与校验
+                        if dep_path.startswith(os.path.abspath(staging) + os.sep):
+                            continue
+                        digest = file_digest(dep_path)
+                        if digest is not None:
+                            recorded[dep_path] = digest
+                    with open(os.path.join(staging, self.DEPS_FILE), "w", encoding="utf-8") as f:
+                        json.dump({"headers": list(headers), "deps": recorded}, f, ensure_ascii=False, indent=2)
+                    return True
+                for leftover in (depfile, os.path.join(staging, self._pch_name(clang))):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            return False
+
+        found = self.cache.get_or_build(
+            self.NAMESPACE, key, names, _build,
+            manifest={"compiler": compiler_identity(compiler_path), "flags": list(compile_flags)}
+        )
+        if not found:
+            return None
+        return self._use_flags(os.path.dirname(found[0]), clang)
+
+    def _probe(self,
+               compiler_path: str,
+               compile_flags: Sequence[str],
+               include_flags: Sequence[str],
+               staging: str,
+               clang: bool) -> bool:
+        """用最小gtest用例验证PCH会被实际采用（GCC对不可用的.gch默认静默回退，这里提升为错误）"""
+        probe = os.path.join(staging, "probe.cpp")
+        with open(probe, "w", encoding="utf-8") as f:
+            f.write(self.PROBE_SOURCE)
+        cmd = [compiler_path, *compile_flags, *include_flags, *self._use_flags(staging, clang), "-fsyntax-only", probe]
+        if not clang:
+            cmd[1:1] = ["-Winvalid-pch", "-Werror=invalid-pch"]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            return result.returncode == 0
+        finally:
+            os.remove(probe)
+
+
+class WeakObjectCache:
+    """
+    弱符号化的生产代码目标文件（GCC/Clang工具链的objcopy / llvm-objcopy）
+
+    只弱化目标文件中已定义的全局符号（未定义引用保持强引用，缺失依赖仍报链接错误）。
+    调用方须以-O0 -fno-inline编译这些目标文件：此时同TU内的调用也经过符号重定位，测试可以替换任意被调函数，
+    生产代码无需修改；开启优化后同TU内的调用可能被内联或直接绑定，测试中的替换会静默失效。
+    缓存键包含objcopy的路径与版本，工具链升级后不会复用旧产物。
+    """
+
+    NAMESPACE = "weak_objects"
+    SYMBOLS_FILE = "weak_symbols.txt"
+
+    def __init__(self, cache: Optional[ArtifactCache] = None, objcopy_path: Optional[str] = None):
+        self.cache = cache or ArtifactCache()
+        self.objcopy_path = objcopy_path or shutil.which("objcopy") or shutil.which("llvm-objcopy") or ""
+
+    @property
+    def available(self) -> bool:
+        return bool(self.objcopy_path)
+
+    def get_object(self, object_path: str, symbols: Sequence[str]) -> Optional[str]:
+        """返回弱化后的目标文件路径；没有需要弱化的符号时返回原文件，objcopy失败返回None"""
+        if not symbols:
+            return object_path
+        object_hash = file_digest(object_path)
+        if object_hash is None or not self.available:
+            return None
+        key = self.cache.make_key(compiler_identity(self.objcopy_path), object_hash, *sorted(symbols))
+        obj_name = os.path.basename(object_path)
+
+        def _build(staging: str) -> bool:
+            symbols_file = os.path.join(staging, self.SYMBOLS_FILE)
+            with open(symbols_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(sorted(symbols)) + "\n")
+            try:
+                result = subprocess.run(
+                    [self.objcopy_path, f"--weaken-symbols={symbols_file}", object_path, os.path.join(staging, obj_name)],
+                    capture_output=True,
+                    text=True,
+                    timeout=120
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                return False
+            return result.returncode == 0
+
+        found = self.cache.get_or_build(self.NAMESPACE, key, [obj_name, self.SYMBOLS_FILE], _build)
+        return found[0] if found else None
+
+    def get_objects(self, objects_with_symbols: Sequence[Tuple[str, Sequence[str]]]) -> Optional[List[str]]:
+        """并行弱化多个目标文件；任一失败返回None（调用方回退为原目标文件）"""
+        if not objects_with_symbols:
+            return []
+        workers = max(1, min(len(objects_with_symbols), os.cpu_count() or 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            weakened = list(executor.map(lambda item: self.get_object(item[0], item[1]), objects_with_symbols))
+        if not all(weakened):
+            return None
+        return weakened
+
+
+_default_cache: Optional[ArtifactCache] = None
+_default_gtest_cache: Optional[GTestArtifactCache] = None
+_default_object_cache: Optional[ObjectCache] = None
+_default_pch_cache: Optional[PchCache] = None
+_default_weak_object_cache: Optional[WeakObjectCache] = None
+_default_lock = threading.Lock()
+
+
+def _ensure_default_cache() -> ArtifactCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ArtifactCache()
+    return _default_cache
+
+
+def get_default_gtest_cache() -> Optional[GTestArtifactCache]:
+    """进程级共享的gtest产物缓存；UT_BUILD_CACHE关闭时返回None"""
+    global _default_gtest_cache
+    if not cache_enabled():
+        return None
+    with _default_lock:
+        if _default_gtest_cache is None:
+            _default_gtest_cache = GTestArtifactCache(_ensure_default_cache())
+        return _default_gtest_cache
+
+
+def get_default_object_cache() -> Optional[ObjectCache]:
+    """进程级共享的生产代码目标文件缓存；UT_BUILD_CACHE关闭时返回None"""
+    global _default_object_cache
+    if not cache_enabled():
+        return None
+    with _default_lock:
+        if _default_object_cache is None:
+            _default_object_cache = ObjectCache(_ensure_default_cache())
+        return _default_object_cache
+
+
+def get_default_pch_cache() -> Optional[PchCache]:
+    """进程级共享的gtest/gmock预编译头缓存；UT_BUILD_CACHE或UT_BUILD_PCH关闭时返回None"""
+    global _default_pch_cache
+    if not pch_enabled():
+        return None
+    with _default_lock:
+        if _default_pch_cache is None:
+            _default_pch_cache = PchCache(_ensure_default_cache())
+        return _default_pch_cache
+
+
+def get_default_weak_object_cache() -> Optional[WeakObjectCache]:
+    """进程级共享的弱符号化目标文件缓存；UT_BUILD_CACHE关闭或找不到objcopy时返回None"""
+    global _default_weak_object_cache
+    if not cache_enabled():
+        return None
+    with _default_lock:
+        if _default_weak_object_cache is None:
+            _default_weak_object_cache = WeakObjectCache(_ensure_default_cache())
+        return _default_weak_object_cache if _default_weak_object_cache.available else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Machine-wide build artifact cache for the UT workflow")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="Show cache location and contents")
+    gtest_parser = sub.add_parser("gtest", help="Build (or look up) cached gtest/gmock archives")
+    gtest_parser.add_argument("gtest_root", help="googletest directory containing src/gtest-all.cc")
+    gtest_parser.add_argument("--gmock-root", default=None, help="googlemock directory containing src/gmock-all.cc")
+    gtest_parser.add_argument("--compiler", default=os.getenv("CXX", "g++"), help="C++ compiler (default: $CXX or g++)")
+    gtest_parser.add_argument("--flag", action="append", default=[], help="Extra compile flag (repeatable)")
+    sub.add_parser("clear", help="Remove all cached artifacts")
+    args = parser.parse_args()
+
+    cache = ArtifactCache()
+    if args.command == "info":
+        print(f"Cache dir: {cache.root} (enabled={cache_enabled()})")
+        if os.path.isdir(cache.root):
+            for namespace in sorted(os.listdir(cache.root)):
+                namespace_dir = os.path.join(cache.root, namespace)
+                if os.path.isdir(namespace_dir):
+                    entries = [e for e in os.listdir(namespace_dir) if not e.startswith(".")]
+                    print(f"  {namespace}: {len(entries)} entr{'y' if len(entries) == 1 else 'ies'}")
+        return 0
+    if args.command == "clear":
+        cache.clear()
+        print(f"Cleared {cache.root}")
+        return 0
+
+    flags = args.flag or ["-std=c++14"]
+    libs = GTestArtifactCache(cache).get_libraries(args.compiler, args.gtest_root, args.gmock_root, flags)
+    if not libs:
+        print("[BuildCache] failed to build gtest archives", file=sys.stderr)
+        return 1
+    for lib in libs:
+        print(lib)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
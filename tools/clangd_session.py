@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Clangd Session
+长驻clangd LSP客户端（stdio / JSON-RPC）：
+- 一个clangd进程服务整轮工作流，测试文件首次didOpen，修复后didChange（全量文本），
+  等待对应版本的publishDiagnostics，避免每次 clangd --check 冷启动、重新解析gtest等头文件
+- 未提供compile_commands目录时，通过clangd扩展 compilationDatabaseChanges 直接下发单文件编译命令，
+  不再每次写临时compile_commands.json
+- 启动/请求失败返回None，由调用方回退到 clangd --check
+
+Usage:
+    python clangd_session.py <test.cpp> [--compile-commands-dir DIR] [-- <compile args...>]
+"""
+
+import argparse
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# LSP DiagnosticSeverity
+SEVERITY_NAMES = {1: "error", 2: "warning", 3: "note", 4: "note"}
+
+
+def path_to_uri(path: str) -> str:
+    return Path(os.path.abspath(path)).as_uri()
+
+
+def format_diagnostics(path: str, diagnostics: List[Dict[str, Any]], errors_only: bool = True) -> List[str]:
+    """LSP诊断转为编译器风格文本 file:line:col: error: message（行列从1开始）"""
+    file_abs = os.path.abspath(path)
+    lines: List[str] = []
+    seen = set()
+    for diag in diagnostics or []:
+        severity = int(diag.get("severity", 1) or 1)
+        if errors_only and severity != 1:
+            continue
+        start = (diag.get("range") or {}).get("start") or {}
+        message = str(diag.get("message", "")).strip().splitlines()[0] if diag.get("message") else ""
+        text = (
+            f"{file_abs}:{int(start.get('line', 0)) + 1}:{int(start.get('character', 0)) + 1}: "
+            f"{SEVERITY_NAMES.get(severity, 'error')}: {message}"
+        )
+        if text not in seen:
+            seen.add(text)
+            lines.append(text)
+    return lines
+
+
+class ClangdSession:
+    """单个clangd进程的LSP会话（线程安全：多个测试流水线可并发check不同文件）"""
+
+    def __init__(self,
+                 clangd_path: str,
+                 root_dir: str,
+                 compile_commands_dir: Optional[str] = None,
+                 request_timeout: float = 30.0):
+        self.clangd_path = clangd_path
+        self.root_dir = os.path.abspath(root_dir)
+        self.compile_commands_dir = os.path.abspath(compile_commands_dir) if compile_commands_dir else ""
+        self.request_timeout = float(request_timeout)
+
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._next_id = 0
+        self._responses: Dict[int, Dict[str, Any]] = {}
+        # uri -> (version, diagnostics)
+        self._diagnostics: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        # uri -> 最近一次提交给clangd的文本
+        self._texts: Dict[str, str] = {}
+        # uri -> (超时未等到诊断的版本, 调用方文本)：下次check同一文本时继续等待该版本，不重新提交
+        self._pending: Dict[str, Any] = {}
+        self._commands: Dict[str, List[str]] = {}
+        self._closed = False
+        self.stats = {"opens": 0, "changes": 0, "timeouts": 0}
+
+    # ---- 进程与消息 ----
+
+    def start(self) -> bool:
+        args = [self.clangd_path, "--log=error", "--background-index=false", "--pch-storage=memory"]
+        if self.compile_commands_dir:
+            args.append(f"--compile-commands-dir={self.compile_commands_dir}")
+        try:
+            self._proc = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.root_dir
+            )
+        except OSError:
+            return False
+
+        self._reader = threading.Thread(target=self._read_loop, name="clangd-lsp-reader", daemon=True)
+        self._reader.start()
+        result = self._request("initialize", {
+            "processId": os.getpid(),
+            "rootUri": path_to_uri(self.root_dir),
+            "capabilities": {
+                "textDocument": {
+                    "publishDiagnostics": {"versionSupport": True},
+                    "synchronization": {"didSave": False},
+                }
+            },
+        })
+        if result is None:
+            self.close()
+            return False
+        self._notify("initialized", {})
+        _live_sessions.add(self)
+        return True
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed and self._proc is not None and self._proc.poll() is None
+
+    def _send(self, payload: Dict[str, Any]) -> bool:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        header = f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+        with self._write_lock:
+            if self._proc is None or self._proc.stdin is None:
+                return False
+            try:
+                self._proc.stdin.write(header + body)
+                self._proc.stdin.flush()
+                return True
+            except (OSError, ValueError):
+                return False
+
+    def _notify(self, method: str, params: Dict[str, Any]) -> bool:
+        return self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _request(self, method: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Any]:
+        with self._cond:
+            self._next_id += 1
+            request_id = self._next_id
+        if not self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}):
+            return None
+        deadline = time.monotonic() + (timeout if timeout is not None else self.request_timeout)
+        with self._cond:
+            while request_id not in self._responses:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.alive:
+                    return None
+                self._cond.wait(remaining)
+            response = self._responses.pop(request_id)
+        if "error" in response:
+            return None
+        return response.get("result", {})
+
+    def _read_message(self, stream) -> Optional[Dict[str, Any]]:
+        length = None
+        while True:
+            line = stream.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("ascii", errors="ignore").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        if length is None:
+            return {}
+        body = stream.read(length)
+        if len(body) < length:
+            return None
+        try:
+            return json.loads(body.decode("utf-8", errors="replace"))
+        except ValueError:
+            return {}
+
+    def _read_loop(self) -> None:
+        stream = self._proc.stdout
+        while True:
+            message = self._read_message(stream)
+            if message is None:
+                break
+            if not message:
+                continue
+            if "id" in message and "method" in message:
+                # 服务端请求（如workspace/configuration、window/workDoneProgress/create）统一回空结果
+                self._send({"jsonrpc": "2.0", "id": message["id"], "result": None})
+                continue
+            with self._cond:
+                if "id" in message:
+                    self._responses[message["id"]] = message
+                elif message.get("method") == "textDocument/publishDiagnostics":
+                    params = message.get("params") or {}
+                    uri = params.get("uri", "")
+                    version = params.get("version")
+                    # didClose后clangd发布不带版本的空诊断（清除），不能当作之后重新打开的文档的结果
+                    if version is not None:
+                        self._diagnostics[uri] = (version, params.get("diagnostics") or [])
+                self._cond.notify_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # ---- 文档诊断 ----
+
+    def set_compile_command(self, path: str, directory: str, arguments: List[str]) -> None:
+        """下发单文件编译命令（clangd扩展：workspace/didChangeConfiguration.compilationDatabaseChanges）"""
+        file_abs = os.path.abspath(path)
+        if self._commands.get(file_abs) == list(arguments):
+            return
+        changed = file_abs in self._commands
+        self._commands[file_abs] = list(arguments)
+        if changed:
+            # 编译参数变化（如修复轮次间include目录变化）：关闭已打开的文档，下次check重新didOpen，
+            # 不再复用按旧参数发布的诊断（内容未变时didChange不保证重新发布）
+            self.close_document(file_abs)
+        self._notify("workspace/didChangeConfiguration", {
+            "settings": {
+                "compilationDatabaseChanges": {
+                    file_abs: {"workingDirectory": directory, "compilationCommand": list(arguments)}
+                }
+            }
+        })
+
+    def check(self, path: str, text: Optional[str] = None, timeout: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        打开或更新文档并等待该版本的诊断
+
+        文本与上次提交的相同时也会以新版本重新提交（末尾追加一个换行，clangd对内容相同的didChange
+        不会重新解析），因为两次check之间被包含的头文件可能已变化；上次check超时且文本未变时不重新提交，
+        继续等待仍在解析的那个版本。
+
+        Returns:
+            LSP诊断列表；会话不可用或超时返回None（调用方回退到 clangd --check）
+        """
+        if not self.alive:
+            return None
+        file_abs = os.path.abspath(path)
+        if text is None:
+            try:
+                with open(file_abs, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                return None
+        uri = path_to_uri(file_abs)
+
+        with self._cond:
+            pending = self._pending.pop(uri, None)
+            if pending is not None and pending[1] == text:
+                version = pending[0]
+                send_text = None
+            else:
+                send_text = text + "\n" if self._texts.get(uri) == text else text
+                self._texts[uri] = send_text
+                version = self._versions.get(uri, 0) + 1
+                self._versions[uri] = version
+                # 丢弃旧版本诊断，只接受本次版本的结果
+                self._diagnostics.pop(uri, None)
+        if send_text is not None:
+            if version == 1:
+                sent = self._notify("textDocument/didOpen", {
+                    "textDocument": {"uri": uri, "languageId": "cpp", "version": version, "text": send_text}
+                })
+                self.stats["opens"] += 1
+            else:
+                sent = self._notify("textDocument/didChange", {
+                    "textDocument": {"uri": uri, "version": version},
+                    "contentChanges": [{"text": send_text}],
+                })
+                self.stats["changes"] += 1
+            if not sent:
+                return None
+
+        deadline = time.monotonic() + (timeout if timeout is not None else self.request_timeout)
+        with self._cond:
+            while True:
+                published = self._diagnostics.get(uri)
+                if published is not None and published[0] >= version:
+                    return list(published[1])
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.alive:
+                    self.stats["timeouts"] += 1
+                    if self._versions.get(uri) == version:
+                        self._pending[uri] = (version, text)
+                    return None
+                self._cond.wait(remaining)
+
+    def close_document(self, path: str) -> None:
+        uri = path_to_uri(path)
+        with self._cond:
+            if self._versions.pop(uri, None) is None:
+                return
+            self._diagnostics.pop(uri, None)
+            self._texts.pop(uri, None)
+            self._pending.pop(uri, None)
+        self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+
+    def close(self) -> None:
+        proc = self._proc
+        if proc is None:
+            return
+        if proc.poll() is None:
+            self._request("shutdown", {}, timeout=3)
+            self._notify("exit", {})
+            try:
+                proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._proc = None
+        self._closed = True
+        _live_sessions.discard(self)
+
+
+_live_sessions = set()
+
+
+@atexit.register
+def _close_live_sessions() -> None:
+    for session in list(_live_sessions):
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run clangd diagnostics for one file through a persistent LSP session")
+    parser.add_argument("file", help="C/C++ file to check")
+    parser.add_argument("--clangd", default="clangd", help="clangd executable (default: clangd)")
+    parser.add_argument("--compile-commands-dir", default=None, help="Directory containing compile_commands.json")
+    parser.add_argument("--repeat", type=int, default=1, help="Re-check the same file N times (shows incremental latency)")
+    argv = sys.argv[1:]
+    # "--" 之后为该文件的编译命令（未提供compile_commands目录时使用）
+    compile_args: List[str] = []
+    if "--" in argv:
+        split_at = argv.index("--")
+        argv, compile_args = argv[:split_at], argv[split_at + 1:]
+    args = parser.parse_args(argv)
+
+    session = ClangdSession(args.clangd, root_dir=os.path.dirname(os.path.abspath(args.file)),
+                            compile_commands_dir=args.compile_commands_dir)
+    if not session.start():
+        print("[Clangd] failed to start LSP session", file=sys.stderr)
+        return 1
+    if compile_args:
+        session.set_compile_command(args.file, os.getcwd(), compile_args)
+    for index in range(max(1, args.repeat)):
+        started = time.monotonic()
+        diagnostics = session.check(args.file)
+        elapsed = time.monotonic() - started
+        if diagnostics is None:
+            print(f"[Clangd] check #{index + 1} timed out", file=sys.stderr)
+            session.close()
+            return 1
+        print(f"[Clangd] check #{index + 1}: {len(diagnostics)} diagnostic(s) in {elapsed:.2f}s")
+        for line in format_diagnostics(args.file, diagnostics, errors_only=False):
+            print(f"  {line}")
+    session.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ Persist fix experiences and retrieve similar past cases.
 import json
 import os
 import re
+import threading
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
@@ -16,6 +17,7 @@ class ExperienceStore:
 
     def __init__(self, db_path: str):
         self.db_path = os.path.abspath(db_path)
+        self._write_lock = threading.Lock()
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         if not os.path.exists(self.db_path):
             with open(self.db_path, "w", encoding="utf-8"):
@@ -33,8 +35,10 @@ class ExperienceStore:
     def add_experience(self, entry: Dict[str, Any]) -> None:
         row = dict(entry)
         row.setdefault("timestamp", datetime.now().isoformat(timespec="seconds"))
-        with open(self.db_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._write_lock:
+            with open(self.db_path, "a", encoding="utf-8") as f:
+                f.write(line)
 
     def _load_all(self) -> List[Dict[str, Any]]:
         rows: List[Dict[str, Any]] = []
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Header Store
+头文件内容缓存与声明切片：
+- 按(路径, mtime, size)缓存预清理后的头文件内容与解析出的顶层声明
+- 按被测代码实际引用的标识符切出所需的声明/typedef/结构体/宏（含传递依赖）
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+IDENTIFIER_RE = re.compile(r'\b[A-Za-z_]\w*\b')
+
+HEADER_SLICING_MODES = ("full", "tu", "function")
+
+_EXTERN_C_OPEN_RE = re.compile(r'#\s*ifdef\s+__cplusplus\s*\n\s*extern\s+"C"\s*\{\s*\n\s*#\s*endif[^\n]*\n?')
+_EXTERN_C_CLOSE_RE = re.compile(r'#\s*ifdef\s+__cplusplus\s*\n\s*\}\s*\n\s*#\s*endif[^\n]*\n?')
+_TAG_RE = re.compile(r'\b(?:struct|union|enum)\s+([A-Za-z_]\w*)\s*\{')
+_FUNC_PTR_RE = re.compile(r'\(\s*\*\s*([A-Za-z_]\w*)\s*\)')
+
+
+def clean_header_content(content: str) -> str:
+    """清理头文件内容，保留关键部分（移除注释与多余空行）"""
+    # 移除多行注释
+    content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
+    # 移除单行注释
+    content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
+    # 移除多余的空行
+    content = re.sub(r'\n\s*\n\s*\n+', '\n\n', content)
+    return content.strip()
+
+
+def extract_identifiers(text: str) -> Set[str]:
+    """提取文本中出现的全部C标识符"""
+    return set(IDENTIFIER_RE.findall(text or ""))
+
+
+@dataclass
+class HeaderDecl:
+    """头文件中的一个顶层声明"""
+    kind: str  # include / macro / directive / decl
+    text: str
+    names: Set[str] = field(default_factory=set)  # 该声明提供的标识符
+    refs: Set[str] = field(default_factory=set)  # 该声明引用的其他标识符
+
+
+@dataclass
+class _CachedHeader:
+    mtime_ns: int
+    size: int
+    content: str
+    decls: List[HeaderDecl]
+
+
+def _strip_for_names(text: str) -> str:
+    """去掉字符串/字符字面量，避免误识别标识符"""
+    text = re.sub(r'"(?:\\.|[^"\\])*"', '""', text)
+    return re.sub(r"'(?:\\.|[^'\\])*'", "''", text)
+
+
+def _decl_names(text: str) -> Set[str]:
+    """推断一个C声明对外提供的名字（typedef名、结构体标签、枚举常量、函数名、变量名）"""
+    body = _strip_for_names(text).strip()
+    names: Set[str] = set(_TAG_RE.findall(body))
+
+    # 枚举常量
+    for enum_body in re.findall(r'\benum\b[^{;]*\{([^}]*)\}', body):
+        for item in enum_body.split(','):
+            match = re.match(r'\s*([A-Za-z_]\w*)', item)
+            if match:
+                names.add(match.group(1))
+
+    # 去掉花括号内的成员，剩余部分决定声明的名字
+    outer = body
+    while True:
+        reduced = re.sub(r'\{[^{}]*\}', ' ', outer)
+        if reduced == outer:
+            break
+        outer = reduced
+    outer = outer.rstrip(';').strip()
+
+    if re.match(r'typedef\b', outer):
+        func_ptr = _FUNC_PTR_RE.search(outer)
+        if func_ptr:
+            names.add(func_ptr.group(1))
+            return names
+        outer = re.sub(r'\([^()]*\)\s*$', '', outer)
+        outer = re.sub(r'\[[^\]]*\]', '', outer)
+        for part in outer.split(','):
+            idents = IDENTIFIER_RE.findall(part)
+            if idents:
+                names.add(idents[-1])
+        return names
+
+    paren = outer.find('(')
+    if paren > 0:
+        func_ptr = _FUNC_PTR_RE.match(outer[paren:])
+        if func_ptr:
+            names.add(func_ptr.group(1))
+            return names
+        idents = IDENTIFIER_RE.findall(outer[:paren])
+        if idents:
+            names.add(idents[-1])
+        return names
+
+    outer = re.sub(r'=.*$', '', outer, flags=re.DOTALL)
+    outer = re.sub(r'\[[^\]]*\]', '', outer)
+    idents = IDENTIFIER_RE.findall(outer)
+    if len(idents) >= 2:
+        names.add(idents[-1])
+    return names
+
+
+def parse_header_declarations(content: str) -> List[HeaderDecl]:
+    """将预清理后的头文件拆为顶层声明列表（按出现顺序）"""
+    content = _EXTERN_C_OPEN_RE.sub('', content)
+    content = _EXTERN_C_CLOSE_RE.sub('', content)
+
+    decls: List[HeaderDecl] = []
+    lines = content.splitlines()
+    buffer: List[str] = []
+    depth = 0
+    last_ifndef = ""
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not buffer and stripped.startswith('#'):
+            directive = [line]
+            while directive[-1].rstrip().endswith('\\') and i + 1 < len(lines):
+                i += 1
+                directive.append(lines[i])
+            i += 1
+            text = "\n".join(directive)
+            match = re.match(r'#\s*(\w+)\s*(.*)', text.strip(), flags=re.DOTALL)
+            keyword = match.group(1) if match else ""
+            rest = match.group(2) if match else ""
+
+            if keyword == 'include':
+                decls.append(HeaderDecl(kind='include', text=text))
+            elif keyword == 'define':
+                macro = re.match(r'([A-Za-z_]\w*)(\([^)]*\))?\s*(.*)', rest, flags=re.DOTALL)
+                if not macro:
+                    continue
+                name = macro.group(1)
+                # include guard：紧跟#ifndef的同名空宏
+                if name == last_ifndef and not macro.group(3).strip():
+                    last_ifndef = ""
+                    continue
+                params = extract_identifiers(macro.group(2) or "")
+                refs = extract_identifiers(_strip_for_names(macro.group(3))) - params - {name}
+                decls.append(HeaderDecl(kind='macro', text=text, names={name}, refs=refs))
+            else:
+                last_ifndef = rest.strip() if keyword == 'ifndef' else ""
+                decls.append(HeaderDecl(kind='directive', text=text))
+            continue
+
+        i += 1
+        if not stripped and not buffer:
+            continue
+        buffer.append(line)
+        code = _strip_for_names(line)
+        depth += code.count('{') + code.count('(') - code.count('}') - code.count(')')
+        if depth > 0:
+            continue
+
+        joined = "\n".join(buffer).strip()
+        # 以';'结束的声明，或函数形式的内联定义（形如 ") {...}"）
+        is_inline_def = joined.endswith('}') and re.search(r'\)\s*\{', joined)
+        if joined.endswith(';') or is_inline_def:
+            names = _decl_names(joined)
+            refs = extract_identifiers(_strip_for_names(joined)) - names
+            decls.append(HeaderDecl(kind='decl', text=joined, names=names, refs=refs))
+            buffer = []
+            depth = 0
+
+    if buffer:
+        joined = "\n".join(buffer).strip()
+        names = _decl_names(joined)
+        decls.append(HeaderDecl(kind='decl', text=joined, names=names,
+                                refs=extract_identifiers(joined) - names))
+    return decls
+
+
+class HeaderStore:
+    """线程安全的头文件缓存：路径解析、预清理内容与声明解析只做一次，mtime变化时自动失效"""
+
+    SEARCH_SUBDIRS = ('include', '', 'src')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, _CachedHeader] = {}
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = {}
+        self._stats = {"hits": 0, "misses": 0}
+
+    def resolve(self, header_name: str, project_root: str) -> Optional[str]:
+        """按include/、项目根、src/的顺序解析头文件路径（结果缓存）"""
+        key = (os.path.abspath(project_root), header_name)
+        with self._lock:
+            if key in self._resolved and (self._resolved[key] is None or os.path.exists(self._resolved[key])):
+                return self._resolved[key]
+
+        found: Optional[str] = None
+        for subdir in self.SEARCH_SUBDIRS:
+            candidate = os.path.join(project_root, subdir, header_name) if subdir else os.path.join(project_root, header_name)
+            if os.path.exists(candidate):
+                found = candidate
+                break
+
+        with self._lock:
+            self._resolved[key] = found
+        return found
+
+    def _load(self, path: str) -> Optional[_CachedHeader]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                self._stats["hits"] += 1
+                return cached
+
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = clean_header_content(f.read())
+        entry = _CachedHeader(
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            content=content,
+            decls=parse_header_declarations(content)
+        )
+        with self._lock:
+            self._files[path] = entry
+            self._stats["misses"] += 1
+        return entry
+
+    def get_content(self, path: str) -> Optional[str]:
+        """返回预清理后的文件内容"""
+        entry = self._load(path)
+        return entry.content if entry else None
+
+    def identifiers(self, path: str) -> Set[str]:
+        """返回文件（去注释后）中出现的全部标识符"""
+        entry = self._load(path)
+        return extract_identifiers(_strip_for_names(entry.content)) if entry else set()
+
+    def slice_headers(self, paths: Iterable[str], identifiers: Set[str]) -> Dict[str, str]:
+        """
+        在多个头文件间做传递闭包切片：被引用的声明会继续拉入它所引用的类型/宏
+
+        Returns:
+            {路径: 切片后的内容}；没有任何被引用声明的头文件不出现在结果中
+        """
+        entries = [(path, self._load(path)) for path in paths]
+        entries = [(path, entry) for path, entry in entries if entry]
+
+        needed = set(identifiers)
+        selected: Set[Tuple[int, int]] = set()
+        changed = True
+        while changed:
+            changed = False
+            for file_idx, (_, entry) in enumerate(entries):
+                for decl_idx, decl in enumerate(entry.decls):
+                    if decl.kind not in ('decl', 'macro') or (file_idx, decl_idx) in selected:
+                        continue
+                    if decl.names & needed:
+                        selected.add((file_idx, decl_idx))
+                        needed |= decl.refs
+                        changed = True
+
+        result: Dict[str, str] = {}
+        for file_idx, (path, entry) in enumerate(entries):
+            picked = [decl.text for decl_idx, decl in enumerate(entry.decls)
+                      if (file_idx, decl_idx) in selected]
+            if not picked:
+                continue
+            includes = [decl.text for decl in entry.decls if decl.kind == 'include']
+            omitted = sorted({
+                name
+                for decl_idx, decl in enumerate(entry.decls)
+                if decl.kind in ('decl', 'macro') and (file_idx, decl_idx) not in selected
+                for name in decl.names
+            })
+            parts = includes + ([""] if includes else []) + picked
+            # 仅列出未引用声明的名字，便于模型知道其存在（如初始化/清理函数）
+            if omitted:
+                parts.append(f"/* omitted (not referenced): {', '.join(omitted)} */")
+            result[path] = "\n".join(parts).strip()
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, files=len(self._files))
@@ -7,19 +7,175 @@ LLM Client (vLLM + Ollama fallback)
 import requests
 import json
 import os
-from typing import Optional, Dict, List
+import contextlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any
 import logging
+from llm_metrics import LLMMetricsRecorder
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class VLLMRequestError(RuntimeError):
+    """确定性的请求错误（4xx，408/429除外）：换端点同样失败，不重试、不计入端点失败"""
+
+
+@dataclass
+class PooledEndpoint:
+    """端点池中的单个vLLM端点及其运行统计"""
+    api_base: str
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    ejections: int = 0
+    total_latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_prompt_tokens: int = 0
+
+
+class EndpointPool:
+    """
+    vLLM多端点池
+
+    - 路由: 最少在途请求（least outstanding requests），相同时按累计请求数打散
+    - 被动健康检查: 连续失败达到阈值后摘除一段时间，冷却后自动恢复
+    - 统计: 每端点请求数/失败数/平均延迟/token吞吐
+    """
+
+    def __init__(self, api_bases: List[str],
+                 eject_after_failures: int = 2,
+                 eject_seconds: float = 30.0):
+        bases: List[str] = []
+        for base in api_bases:
+            normalized = str(base or "").strip().rstrip('/')
+            if normalized and normalized not in bases:
+                bases.append(normalized)
+        if not bases:
+            raise ValueError("EndpointPool requires at least one api_base")
+
+        self.endpoints = [PooledEndpoint(api_base=base) for base in bases]
+        self.eject_after_failures = max(1, int(eject_after_failures or 1))
+        self.eject_seconds = max(0.0, float(eject_seconds or 0.0))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Optional[List[str]] = None) -> Optional[PooledEndpoint]:
+        """选择一个端点并占用在途名额；全部被摘除时选最早恢复的端点。"""
+        excluded = set(exclude or [])
+        now = time.monotonic()
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep.api_base not in excluded]
+            if not candidates:
+                return None
+
+            healthy = [ep for ep in candidates if ep.ejected_until <= now]
+            if healthy:
+                chosen = min(healthy, key=lambda ep: (ep.in_flight, ep.requests))
+            else:
+                chosen = min(candidates, key=lambda ep: ep.ejected_until)
+
+            chosen.in_flight += 1
+            return chosen
+
+    def release(self, endpoint: PooledEndpoint,
+                success: Optional[bool],
+                latency: float = 0.0,
+                prompt_tokens: int = 0,
+                completion_tokens: int = 0,
+                cached_prompt_tokens: int = 0) -> None:
+        """
+        释放在途名额并记录结果；连续失败达到阈值时摘除端点。
+        success=None表示结果与端点健康无关（如确定性的4xx），不改变失败计数与摘除状态。
+        """
+        with self._lock:
+            endpoint.in_flight = max(0, endpoint.in_flight - 1)
+            endpoint.requests += 1
+            endpoint.total_latency += max(0.0, float(latency or 0.0))
+            endpoint.prompt_tokens += int(prompt_tokens or 0)
+            endpoint.completion_tokens += int(completion_tokens or 0)
+            endpoint.cached_prompt_tokens += int(cached_prompt_tokens or 0)
+
+            if success is None:
+                return
+            if success:
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = 0.0
+                return
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after_failures:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.ejections += 1
+                logger.warning(
+                    f"Endpoint {endpoint.api_base} ejected for {self.eject_seconds:.0f}s "
+                    f"after {endpoint.consecutive_failures} consecutive failure(s)"
+                )
+
+    def mark_unhealthy(self, api_base: str) -> None:
+        """连接检查失败时直接摘除端点。"""
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.api_base == api_base:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    endpoint.ejections += 1
+
+    def healthy_count(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for ep in self.endpoints if ep.ejected_until <= now)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """返回每个端点的统计快照。"""
+        now = time.monotonic()
+        rows: List[Dict[str, Any]] = []
+        with self._lock:
+            for ep in self.endpoints:
+                avg_latency = ep.total_latency / ep.requests if ep.requests else 0.0
+                tokens_per_sec = ep.completion_tokens / ep.total_latency if ep.total_latency > 0 else 0.0
+                rows.append({
+                    "api_base": ep.api_base,
+                    "healthy": ep.ejected_until <= now,
+                    "in_flight": ep.in_flight,
+                    "requests": ep.requests,
+                    "failures": ep.failures,
+                    "ejections": ep.ejections,
+                    "avg_latency_s": round(avg_latency, 3),
+                    "prompt_tokens": ep.prompt_tokens,
+                    "completion_tokens": ep.completion_tokens,
+                    "cached_prompt_tokens": ep.cached_prompt_tokens,
+                    "completion_tokens_per_s": round(tokens_per_sec, 1),
+                })
+        return rows
+
+    def format_stats(self) -> str:
+        lines = ["[LLM Endpoints] per-endpoint statistics:"]
+        for row in self.snapshot():
+            lines.append(
+                f"  {'✓' if row['healthy'] else '✗'} {row['api_base']}: "
+                f"requests={row['requests']}, failures={row['failures']}, ejections={row['ejections']}, "
+                f"avg_latency={row['avg_latency_s']:.2f}s, "
+                f"tokens(in/cached/out)={row['prompt_tokens']}/{row['cached_prompt_tokens']}/{row['completion_tokens']}, "
+                f"throughput={row['completion_tokens_per_s']:.1f} tok/s"
+            )
+        return "\n".join(lines)
+
+
 class VLLMClient:
     """统一LLM客户端：vLLM优先，支持自动回退Ollama"""
     
     def __init__(self, api_base: Optional[str] = None, 
                  model: str = "qwen-coder", 
-                 api_key: str = "dummy"):
+                 api_key: str = "dummy",
+                 api_bases: Optional[List[str]] = None):
         """
         初始化vLLM客户端
         
@@ -35,6 +191,8 @@ class VLLMClient:
             api_key: API密钥
                 环境变量: VLLM_API_KEY
                 默认: dummy
+            api_bases: vLLM多副本端点列表（非空时替代api_base组成端点池）
+                环境变量: VLLM_API_BASES（逗号分隔）
         
         示例:
             # 使用环境变量
@@ -51,12 +209,39 @@ class VLLMClient:
         self.model = os.getenv('VLLM_MODEL') or model
         self.api_key = os.getenv('VLLM_API_KEY') or api_key
         self.timeout = int(os.getenv('VLLM_TIMEOUT', '120'))
+        # 流式输出可测得TTFT（首token延迟）
+        self.stream = os.getenv('VLLM_STREAM', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+        # vLLM端点池（多副本负载均衡）
+        env_bases = [b for b in (os.getenv('VLLM_API_BASES') or "").split(',') if b.strip()]
+        pool_bases = env_bases or [b for b in (api_bases or []) if str(b or "").strip()]
+        if pool_bases:
+            self.api_base = str(pool_bases[0]).strip().rstrip('/')
+        self.endpoint_pool = EndpointPool(
+            pool_bases or [self.api_base],
+            eject_after_failures=int(os.getenv('VLLM_EJECT_AFTER_FAILURES', '2')),
+            eject_seconds=float(os.getenv('VLLM_EJECT_SECONDS', '30'))
+        )
 
         # Ollama配置
         self.ollama_api_base = (os.getenv('OLLAMA_API_BASE') or "http://localhost:11434").rstrip('/')
         self.ollama_model = os.getenv('OLLAMA_MODEL') or "deepseek-r1:7b"
         self.ollama_timeout = int(os.getenv('OLLAMA_TIMEOUT', '900'))
         self.ollama_max_tokens = int(os.getenv('OLLAMA_MAX_TOKENS', '2048'))
+        # chat: /api/chat（默认，保留消息角色）；generate: 旧的/api/generate
+        self.ollama_api = (os.getenv('OLLAMA_API') or "chat").strip().lower()
+        # keep_alive避免空闲后模型被卸载导致下一次请求重新加载（Ollama默认5m）
+        keep_alive = (os.getenv('OLLAMA_KEEP_ALIVE') or "30m").strip()
+        # 纯数字按秒传数值（-1表示常驻），带单位的按时长字符串传递
+        self.ollama_keep_alive = int(keep_alive) if keep_alive.lstrip('-').isdigit() else keep_alive
+        self.ollama_stream = os.getenv('OLLAMA_STREAM', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+        # 并发上限与Ollama服务端OLLAMA_NUM_PARALLEL对齐，超出的请求在客户端排队而不是在服务端排队超时
+        self.ollama_num_parallel = max(1, int(os.getenv('OLLAMA_NUM_PARALLEL', '1') or 1))
+        self._ollama_semaphore = threading.BoundedSemaphore(self.ollama_num_parallel)
+        self._ollama_preloaded = False
+        # 全局在途请求上限（由工作流按llm_inflight设置；None为不限制）
+        self._inflight_limit = 0
+        self._inflight_semaphore: Optional[threading.BoundedSemaphore] = None
 
         # 后端策略: auto / vllm / ollama
         self.backend_preference = (os.getenv('LLM_BACKEND') or "auto").strip().lower()
@@ -66,6 +251,13 @@ class VLLMClient:
         self.active_backend = None
         self.active_api_base = None
         self.active_model = None
+
+        # 每次LLM调用的结构化指标（路径由LLM_METRICS_PATH或工作流设置）
+        self.metrics = LLMMetricsRecorder()
+
+        # 请求/响应捕获（供 llm_standin_server.py --mode replay 离线回放）
+        self.capture_path = os.getenv('LLM_CAPTURE_PATH') or None
+        self._capture_lock = threading.Lock()
         
         # 检查连接
         self._check_connection()
@@ -79,6 +271,7 @@ class VLLMClient:
                 self.active_api_base = self.ollama_api_base
                 self.active_model = self.ollama_model
                 logger.info(f"✓ Connected to Ollama at {self.active_api_base} (model={self.active_model})")
+                self._preload_ollama_model()
                 return True
             logger.warning(f"✗ Cannot connect to Ollama: {self.ollama_api_base}")
             return False
@@ -89,9 +282,9 @@ class VLLMClient:
                 self.active_backend = 'vllm'
                 self.active_api_base = self.api_base
                 self.active_model = self.model
-                logger.info(f"✓ Connected to vLLM service at {self.active_api_base} (model={self.active_model})")
+                logger.info(f"✓ Connected to vLLM service at {self._describe_vllm_endpoints()} (model={self.active_model})")
                 return True
-            logger.warning(f"✗ Cannot connect to vLLM: {self.api_base}")
+            logger.warning(f"✗ Cannot connect to vLLM: {self._describe_vllm_endpoints()}")
             return False
 
         # auto: 优先vLLM，再回退Ollama
@@ -99,7 +292,7 @@ class VLLMClient:
             self.active_backend = 'vllm'
             self.active_api_base = self.api_base
             self.active_model = self.model
-            logger.info(f"✓ Connected to vLLM service at {self.active_api_base} (model={self.active_model})")
+            logger.info(f"✓ Connected to vLLM service at {self._describe_vllm_endpoints()} (model={self.active_model})")
             return True
 
         if self.allow_ollama_fallback and self._check_ollama_connection():
@@ -107,23 +300,48 @@ class VLLMClient:
             self.active_api_base = self.ollama_api_base
             self.active_model = self.ollama_model
             logger.info(f"✓ vLLM unavailable, fallback to Ollama at {self.active_api_base} (model={self.active_model})")
+            self._preload_ollama_model()
             return True
 
         logger.warning("✗ No available LLM backend (vLLM/Ollama)")
         return False
 
+    def _describe_vllm_endpoints(self) -> str:
+        if len(self.endpoint_pool) <= 1:
+            return self.api_base
+        return (
+            f"{len(self.endpoint_pool)} endpoints "
+            f"({self.endpoint_pool.healthy_count()} healthy: "
+            + ", ".join(ep.api_base for ep in self.endpoint_pool.endpoints)
+            + ")"
+        )
+
     def _check_vllm_connection(self) -> bool:
-        """检查vLLM连接"""
-        try:
-            response = requests.get(
-                f"{self.api_base}/v1/models",
-                timeout=5,
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            )
-            return response.status_code == 200
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"vLLM connection check failed: {e}")
-            return False
+        """检查vLLM连接（端点池中任一端点可用即视为可用，不可用端点先摘除）"""
+        any_ok = False
+        for endpoint in self.endpoint_pool.endpoints:
+            try:
+                response = requests.get(
+                    f"{endpoint.api_base}/v1/models",
+                    timeout=5,
+                    headers={"Authorization": f"Bearer {self.api_key}"}
+                )
+                if response.status_code == 200:
+                    any_ok = True
+                    continue
+                logger.warning(f"vLLM connection check failed: {endpoint.api_base} -> HTTP {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"vLLM connection check failed: {e}")
+            if len(self.endpoint_pool) > 1:
+                self.endpoint_pool.mark_unhealthy(endpoint.api_base)
+        return any_ok
+
+    def get_endpoint_stats(self) -> List[Dict[str, Any]]:
+        """返回vLLM端点池统计。"""
+        return self.endpoint_pool.snapshot()
+
+    def format_endpoint_stats(self) -> str:
+        return self.endpoint_pool.format_stats()
 
     def _check_ollama_connection(self) -> bool:
         """检查Ollama连接"""
@@ -137,11 +355,114 @@ class VLLMClient:
             logger.warning(f"Ollama connection check failed: {e}")
             return False
 
-    def _generate_vllm(self, prompt: str, temperature: float, max_tokens: int, top_p: float) -> str:
-        """调用vLLM chat/completions"""
-        url = f"{self.api_base}/v1/chat/completions"
+    def _post_vllm_chat(self, payload: Dict[str, Any],
+                        call_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        经端点池发送chat/completions请求。
+        连接错误/5xx记为端点失败（连续失败会被摘除），并换下一个端点重试，直到池内端点都试过；
+        确定性的4xx（如提示词超过max_model_len）直接抛出VLLMRequestError。
+        call_info（可选）回填本次调用的端点/token用量/TTFT。
+        """
+        if call_info is None:
+            call_info = {}
+        streaming = bool(payload.get("stream"))
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
 
-        messages = [{"role": "user", "content": prompt}]
+        tried: List[str] = []
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.endpoint_pool):
+            endpoint = self.endpoint_pool.acquire(exclude=tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint.api_base)
+
+            started = time.monotonic()
+            try:
+                response = requests.post(
+                    f"{endpoint.api_base}/v1/chat/completions",
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout,
+                    stream=streaming
+                )
+                if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                    raise VLLMRequestError(f"vLLM API error: {response.status_code} - {response.text}")
+                if response.status_code != 200:
+                    raise RuntimeError(f"vLLM API error: {response.status_code} - {response.text}")
+                if streaming:
+                    result = self._read_vllm_stream(response, started, call_info)
+                else:
+                    result = response.json()
+            except VLLMRequestError:
+                # 与端点健康无关：只释放在途名额，不清除已有的失败计数/摘除状态
+                self.endpoint_pool.release(endpoint, success=None, latency=time.monotonic() - started)
+                raise
+            except Exception as e:
+                self.endpoint_pool.release(endpoint, success=False, latency=time.monotonic() - started)
+                last_error = e
+                if len(self.endpoint_pool) > 1:
+                    logger.warning(f"vLLM endpoint {endpoint.api_base} failed: {e}")
+                continue
+
+            usage = result.get("usage") or {}
+            # vLLM开启 --enable-prompt-tokens-details 时会返回前缀缓存命中的token数
+            prompt_details = usage.get("prompt_tokens_details") or {}
+            call_info["endpoint"] = endpoint.api_base
+            call_info["prompt_tokens"] = int(usage.get("prompt_tokens", 0) or 0)
+            call_info["completion_tokens"] = int(usage.get("completion_tokens", 0) or 0)
+            call_info["cached_prompt_tokens"] = int(prompt_details.get("cached_tokens", 0) or 0)
+            self.endpoint_pool.release(
+                endpoint,
+                success=True,
+                latency=time.monotonic() - started,
+                prompt_tokens=call_info["prompt_tokens"],
+                completion_tokens=call_info["completion_tokens"],
+                cached_prompt_tokens=call_info["cached_prompt_tokens"]
+            )
+            self.active_api_base = endpoint.api_base
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("No vLLM endpoint available")
+
+    @staticmethod
+    def _read_vllm_stream(response, started: float, call_info: Dict[str, Any]) -> Dict[str, Any]:
+        """读取SSE流式响应，拼接为非流式结构，并记录TTFT"""
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        for raw_line in response.iter_lines(decode_unicode=True):
+            if not raw_line or not raw_line.startswith("data:"):
+                continue
+            data = raw_line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content") or ""
+                if delta:
+                    if "ttft_s" not in call_info:
+                        call_info["ttft_s"] = time.monotonic() - started
+                    parts.append(delta)
+
+        return {
+            "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}],
+            "usage": usage,
+        }
+
+    def _generate_vllm(self, prompt: str, temperature: float, max_tokens: int, top_p: float,
+                       system_prompt: str = "",
+                       call_info: Optional[Dict[str, Any]] = None) -> str:
+        """调用vLLM chat/completions"""
+        messages = self._as_messages(prompt, system_prompt)
         payload = {
             "model": self.model,
             "messages": messages,
@@ -149,57 +470,160 @@ class VLLMClient:
             "max_tokens": max_tokens,
             "top_p": top_p,
         }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-
-        response = requests.post(
-            url,
-            json=payload,
-            headers=headers,
-            timeout=self.timeout
-        )
-
-        if response.status_code != 200:
-            raise RuntimeError(f"vLLM API error: {response.status_code} - {response.text}")
+        if self.stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
 
-        result = response.json()
+        result = self._post_vllm_chat(payload, call_info)
         if result.get("choices") and len(result["choices"]) > 0:
             return result["choices"][0]["message"].get("content", "")
         return ""
 
-    def _generate_ollama(self, prompt: str, temperature: float, max_tokens: int, top_p: float) -> str:
-        """调用Ollama generate接口"""
+    def _preload_ollama_model(self) -> None:
+        """后台预加载Ollama模型并设置keep_alive，避免首个请求承担冷启动加载耗时"""
+        if self._ollama_preloaded:
+            return
+        self._ollama_preloaded = True
+
+        def _preload() -> None:
+            try:
+                requests.post(
+                    f"{self.ollama_api_base}/api/generate",
+                    json={"model": self.ollama_model, "keep_alive": self.ollama_keep_alive},
+                    timeout=self.ollama_timeout
+                )
+                logger.info(f"✓ Ollama model preloaded: {self.ollama_model} (keep_alive={self.ollama_keep_alive})")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Ollama model preload failed: {e}")
+
+        threading.Thread(target=_preload, name="ollama-preload", daemon=True).start()
+
+    def _generate_ollama(self, prompt: str, temperature: float, max_tokens: int, top_p: float,
+                         system_prompt: str = "",
+                         call_info: Optional[Dict[str, Any]] = None) -> str:
+        """调用Ollama（默认走/api/chat，OLLAMA_API=generate时走旧的/api/generate）"""
+        if self.ollama_api != 'generate':
+            return self._chat_ollama(self._as_messages(prompt, system_prompt), temperature, max_tokens, top_p, call_info)
+
         effective_max_tokens = min(max_tokens, self.ollama_max_tokens)
         url = f"{self.ollama_api_base}/api/generate"
         payload = {
             "model": self.ollama_model,
             "prompt": prompt,
             "stream": False,
+            "keep_alive": self.ollama_keep_alive,
             "options": {
                 "temperature": temperature,
                 "top_p": top_p,
                 "num_predict": effective_max_tokens,
             }
         }
+        if system_prompt:
+            payload["system"] = system_prompt
 
-        response = requests.post(
-            url,
-            json=payload,
-            timeout=self.ollama_timeout
-        )
+        with self._ollama_semaphore:
+            response = requests.post(
+                url,
+                json=payload,
+                timeout=self.ollama_timeout
+            )
 
         if response.status_code != 200:
             raise RuntimeError(f"Ollama API error: {response.status_code} - {response.text}")
 
         result = response.json()
+        self._fill_ollama_call_info(result, call_info)
         return result.get("response", "")
+
+    def _chat_ollama(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                     top_p: float, call_info: Optional[Dict[str, Any]] = None) -> str:
+        """调用Ollama /api/chat（支持流式与keep_alive）"""
+        if call_info is None:
+            call_info = {}
+        effective_max_tokens = min(max_tokens, self.ollama_max_tokens)
+        payload = {
+            "model": self.ollama_model,
+            "messages": messages,
+            "stream": self.ollama_stream,
+            "keep_alive": self.ollama_keep_alive,
+            "options": {
+                "temperature": temperature,
+                "top_p": top_p,
+                "num_predict": effective_max_tokens,
+            }
+        }
+
+        with self._ollama_semaphore:
+            started = time.monotonic()
+            response = requests.post(
+                f"{self.ollama_api_base}/api/chat",
+                json=payload,
+                timeout=self.ollama_timeout,
+                stream=self.ollama_stream
+            )
+
+            if response.status_code != 200:
+                raise RuntimeError(f"Ollama API error: {response.status_code} - {response.text}")
+
+            if not self.ollama_stream:
+                result = response.json()
+                self._fill_ollama_call_info(result, call_info)
+                return (result.get("message") or {}).get("content", "")
+
+            # 流式：每行一个JSON对象，最后一行done=true携带计数/耗时
+            parts: List[str] = []
+            final: Dict[str, Any] = {}
+            for raw_line in response.iter_lines(decode_unicode=True):
+                if not raw_line:
+                    continue
+                try:
+                    chunk = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama stream error: {chunk.get('error')}")
+                content = (chunk.get("message") or {}).get("content") or ""
+                if content:
+                    if "ttft_s" not in call_info:
+                        call_info["ttft_s"] = time.monotonic() - started
+                    parts.append(content)
+                if chunk.get("done"):
+                    final = chunk
+                    break
+
+        self._fill_ollama_call_info(final, call_info)
+        return "".join(parts)
+
+    def _fill_ollama_call_info(self, result: Dict[str, Any], call_info: Optional[Dict[str, Any]]) -> None:
+        """从Ollama响应的计数/耗时字段（纳秒）回填token用量与近似TTFT"""
+        if call_info is None:
+            return
+        call_info["endpoint"] = self.ollama_api_base
+        call_info["prompt_tokens"] = int(result.get("prompt_eval_count", 0) or 0)
+        call_info["completion_tokens"] = int(result.get("eval_count", 0) or 0)
+        if "ttft_s" not in call_info and result.get("prompt_eval_duration") is not None:
+            call_info["ttft_s"] = (
+                int(result.get("load_duration", 0) or 0) + int(result.get("prompt_eval_duration", 0) or 0)
+            ) / 1e9
     
+    def set_max_inflight(self, limit: int) -> None:
+        """限制同时在途的LLM请求数（<=0表示不限制）；超出的调用在客户端排队"""
+        limit = max(0, int(limit or 0))
+        if limit == self._inflight_limit:
+            return
+        self._inflight_limit = limit
+        self._inflight_semaphore = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    def _inflight_slot(self):
+        semaphore = self._inflight_semaphore
+        return semaphore if semaphore is not None else contextlib.nullcontext()
+
     def generate(self, prompt: str, 
                 temperature: float = 0.7, 
                 max_tokens: int = 4096,
-                top_p: float = 0.95) -> str:
+                top_p: float = 0.95,
+                system_prompt: str = "",
+                phase: str = "unknown") -> str:
         """
         调用vLLM生成文本（使用Chat API生成独立的代码片段）
         
@@ -211,52 +635,126 @@ class VLLMClient:
             temperature: 温度参数 (0-2, 默认0.7)
             max_tokens: 最大生成token数 (默认4096)
             top_p: nucleus采样参数 (默认0.95)
+            system_prompt: 可选系统提示（作为system消息置于最前，便于前缀缓存复用）
+            phase: 调用所属阶段（generate/compile_fix等），用于指标统计
             
         Returns:
             生成的文本
         """
-        try:
-            # 初次未选中后端时尝试选择
-            if not self.active_backend:
-                self._check_connection()
-
-            # 优先走当前后端
-            if self.active_backend == 'ollama':
-                logger.info(f"Calling Ollama generate... (model={self.ollama_model}, max_tokens={max_tokens})")
-                generated_text = self._generate_ollama(prompt, temperature, max_tokens, top_p)
+        with self._inflight_slot():
+            started = time.monotonic()
+            call_info: Dict[str, Any] = {}
+            error_text = ""
+            try:
+                # 初次未选中后端时尝试选择
+                if not self.active_backend:
+                    self._check_connection()
+
+                # 优先走当前后端
+                if self.active_backend == 'ollama':
+                    logger.info(f"Calling Ollama {self.ollama_api}... (model={self.ollama_model}, max_tokens={max_tokens})")
+                    generated_text = self._generate_ollama(prompt, temperature, max_tokens, top_p, system_prompt, call_info)
+                    logger.info(f"✓ Generated {len(generated_text)} chars")
+                    self._record_call_metrics(phase, 'ollama', self.ollama_model, prompt, system_prompt,
+                                              generated_text, started, call_info)
+                    self._capture_exchange(phase, self._as_messages(prompt, system_prompt), generated_text)
+                    return generated_text
+
+                logger.info(f"Calling vLLM chat/completions... (model={self.model}, max_tokens={max_tokens})")
+                generated_text = self._generate_vllm(prompt, temperature, max_tokens, top_p, system_prompt, call_info)
                 logger.info(f"✓ Generated {len(generated_text)} chars")
+                self._record_call_metrics(phase, 'vllm', self.model, prompt, system_prompt,
+                                          generated_text, started, call_info)
+                self._capture_exchange(phase, self._as_messages(prompt, system_prompt), generated_text)
                 return generated_text
 
-            logger.info(f"Calling vLLM chat/completions... (model={self.model}, max_tokens={max_tokens})")
-            generated_text = self._generate_vllm(prompt, temperature, max_tokens, top_p)
-            logger.info(f"✓ Generated {len(generated_text)} chars")
-            return generated_text
-
-        except requests.exceptions.Timeout:
-            logger.error(f"Request timeout after {self.timeout}s")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-        except Exception as e:
-            logger.error(f"Generation failed: {e}")
-
-        # vLLM失败且允许回退时，尝试Ollama
-        if self.allow_ollama_fallback and self.active_backend != 'ollama' and self._check_ollama_connection():
+            except requests.exceptions.Timeout:
+                error_text = f"timeout after {self.timeout}s"
+                logger.error(f"Request timeout after {self.timeout}s")
+            except requests.exceptions.RequestException as e:
+                error_text = str(e)
+                logger.error(f"Request failed: {e}")
+            except Exception as e:
+                error_text = str(e)
+                logger.error(f"Generation failed: {e}")
+
+            # vLLM失败且允许回退时，尝试Ollama
+            if self.allow_ollama_fallback and self.active_backend != 'ollama' and self._check_ollama_connection():
+                try:
+                    logger.warning("vLLM generation failed, fallback to Ollama...")
+                    self.active_backend = 'ollama'
+                    self.active_api_base = self.ollama_api_base
+                    self.active_model = self.ollama_model
+                    call_info = {}
+                    generated_text = self._generate_ollama(prompt, temperature, max_tokens, top_p, system_prompt, call_info)
+                    logger.info(f"✓ Generated {len(generated_text)} chars via Ollama fallback")
+                    self._record_call_metrics(phase, 'ollama', self.ollama_model, prompt, system_prompt,
+                                              generated_text, started, call_info, outcome="fallback_ok")
+                    self._capture_exchange(phase, self._as_messages(prompt, system_prompt), generated_text)
+                    return generated_text
+                except Exception as e:
+                    error_text = str(e)
+                    logger.error(f"Ollama fallback failed: {e}")
+
+            self._record_call_metrics(phase, self.active_backend or 'none', self.active_model or self.model,
+                                      prompt, system_prompt, "", started, call_info,
+                                      outcome="error", error=error_text)
+            return ""
+
+    def _capture_exchange(self, phase: str, messages: List[Dict[str, str]], response: str) -> None:
+        """追加一条请求/响应记录到捕获文件"""
+        if not self.capture_path or not response:
+            return
+        row = {
+            "phase": phase,
+            "messages": [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages],
+            "response": response,
+        }
+        with self._capture_lock:
             try:
-                logger.warning("vLLM generation failed, fallback to Ollama...")
-                self.active_backend = 'ollama'
-                self.active_api_base = self.ollama_api_base
-                self.active_model = self.ollama_model
-                generated_text = self._generate_ollama(prompt, temperature, max_tokens, top_p)
-                logger.info(f"✓ Generated {len(generated_text)} chars via Ollama fallback")
-                return generated_text
+                os.makedirs(os.path.dirname(os.path.abspath(self.capture_path)), exist_ok=True)
+                with open(self.capture_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
             except Exception as e:
-                logger.error(f"Ollama fallback failed: {e}")
+                logger.warning(f"LLM capture failed: {e}")
 
-        return ""
+    @staticmethod
+    def _as_messages(prompt: str, system_prompt: str = "") -> List[Dict[str, str]]:
+        messages = [{"role": "user", "content": prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return messages
+
+    def _record_call_metrics(self, phase: str, backend: str, model: str,
+                             prompt: str, system_prompt: str, completion: str,
+                             started: float, call_info: Dict[str, Any],
+                             outcome: str = "ok", error: str = "") -> None:
+        """记录一次LLM调用的结构化指标"""
+        latency = time.monotonic() - started
+        completion_tokens = int(call_info.get("completion_tokens", 0) or 0)
+        if outcome == "ok" and not completion:
+            outcome = "empty"
+        self.metrics.record({
+            "phase": phase,
+            "backend": backend,
+            "model": model,
+            "endpoint": call_info.get("endpoint", ""),
+            "prompt_chars": len(prompt or "") + len(system_prompt or ""),
+            "completion_chars": len(completion or ""),
+            "prompt_tokens": int(call_info.get("prompt_tokens", 0) or 0),
+            "completion_tokens": completion_tokens,
+            "cached_prompt_tokens": int(call_info.get("cached_prompt_tokens", 0) or 0),
+            "latency_s": round(latency, 4),
+            "ttft_s": round(call_info["ttft_s"], 4) if call_info.get("ttft_s") is not None else None,
+            "completion_tokens_per_s": round(completion_tokens / latency, 2) if latency > 0 else 0.0,
+            "outcome": outcome,
+            "error": error[:300] if error else "",
+        })
     
     def chat_complete(self, messages: List[Dict[str, str]], 
                      temperature: float = 0.7,
-                     max_tokens: int = 4096) -> str:
+                     max_tokens: int = 4096,
+                     phase: str = "unknown") -> str:
         """
         调用Chat API - 已被generate()方法使用
         
@@ -264,55 +762,61 @@ class VLLMClient:
             messages: 消息列表 [{'role': 'user', 'content': '...'}, ...]
             temperature: 温度参数
             max_tokens: 最大生成token数
+            phase: 调用所属阶段，用于指标统计
             
         Returns:
             生成的响应
         """
-        # 注意: generate()方法现在也使用此Chat API
-        url = f"{self.api_base}/v1/chat/completions"
-        
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        with self._inflight_slot():
+            # 注意: generate()方法现在也使用此Chat API
+            payload = {
+                "model": self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            }
         
-        try:
-            if self.active_backend == 'ollama':
-                prompt = "\n".join([f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages])
-                return self._generate_ollama(prompt, temperature, max_tokens, top_p=0.95)
+            started = time.monotonic()
+            call_info: Dict[str, Any] = {}
+            prompt_text = "\n".join([f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages])
+            try:
+                if self.active_backend == 'ollama':
+                    if self.ollama_api == 'generate':
+                        content = self._generate_ollama(prompt_text, temperature, max_tokens, 0.95, "", call_info)
+                    else:
+                        content = self._chat_ollama(messages, temperature, max_tokens, 0.95, call_info)
+                    self._record_call_metrics(phase, 'ollama', self.ollama_model, prompt_text, "",
+                                              content, started, call_info)
+                    self._capture_exchange(phase, messages, content)
+                    return content
 
-            logger.info("Calling vLLM chat API...")
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
-            )
+                if self.stream:
+                    payload["stream"] = True
+                    payload["stream_options"] = {"include_usage": True}
 
-            if response.status_code == 200:
-                result = response.json()
+                logger.info("Calling vLLM chat API...")
+                result = self._post_vllm_chat(payload, call_info)
+                content = ""
                 if result.get("choices") and len(result["choices"]) > 0:
                     content = result["choices"][0]["message"].get("content", "")
                     logger.info(f"✓ Generated response ({len(content)} chars)")
-                    return content
-            else:
-                logger.error(f"API error: {response.status_code}")
+                self._record_call_metrics(phase, 'vllm', self.model, prompt_text, "",
+                                          content, started, call_info)
+                self._capture_exchange(phase, messages, content)
+                return content
 
-        except Exception as e:
-            logger.error(f"Chat request failed: {e}")
+            except Exception as e:
+                logger.error(f"Chat request failed: {e}")
+                self._record_call_metrics(phase, self.active_backend or 'none', self.active_model or self.model,
+                                          prompt_text, "", "", started, call_info,
+                                          outcome="error", error=str(e))
         
-        return ""
+            return ""
 
 
 def create_client(api_base: Optional[str] = None,
-                 model: Optional[str] = None) -> VLLMClient:
+                 model: Optional[str] = None,
+                 api_bases: Optional[List[str]] = None) -> VLLMClient:
     """
     工厂函数：创建vLLM客户端
     
@@ -321,11 +825,12 @@ def create_client(api_base: Optional[str] = None,
     Args:
         api_base: vLLM服务地址（可通过环境变量VLLM_API_BASE覆盖）
         model: 模型名称（可通过环境变量VLLM_MODEL覆盖）
+        api_bases: vLLM多副本端点列表（可通过环境变量VLLM_API_BASES覆盖）
         
     Returns:
         VLLMClient实例
     """
-    return VLLMClient(api_base=api_base, model=model)
+    return VLLMClient(api_base=api_base, model=model, api_bases=api_bases)
 
 
 if __name__ == "__main__":
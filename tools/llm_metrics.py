@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+LLM call telemetry.
+Record one structured event per LLM call (phase/backend/tokens/latency/TTFT/outcome)
+to a JSONL file, and summarize where the token and time budget of a run went.
+
+Usage:
+    python llm_metrics.py summary [log/llm_metrics.jsonl] [--run-id RUN] [--all-runs]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+KNOWN_PHASES = [
+    "generate",
+    "compile_triage",
+    "compile_fix",
+    "compile_triage_fix",
+    "runtime_triage",
+    "runtime_fix",
+    "runtime_triage_fix",
+    "domain_classify",
+    "cmake_repair",
+    "clangd_normalize",
+]
+
+
+class LLMMetricsRecorder:
+    """线程安全的JSONL指标记录器；未设置路径时仅保留内存事件。"""
+
+    def __init__(self, metrics_path: Optional[str] = None, run_id: Optional[str] = None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}"
+        self.metrics_path: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.set_path(os.getenv("LLM_METRICS_PATH") or metrics_path)
+
+    def set_path(self, metrics_path: Optional[str]) -> None:
+        if not metrics_path:
+            self.metrics_path = None
+            return
+        self.metrics_path = os.path.abspath(metrics_path)
+        os.makedirs(os.path.dirname(self.metrics_path), exist_ok=True)
+
+    def record(self, event: Dict[str, Any]) -> None:
+        row = dict(event)
+        row.setdefault("timestamp", datetime.now().isoformat(timespec="milliseconds"))
+        row.setdefault("run_id", self.run_id)
+        with self._lock:
+            self.events.append(row)
+            if not self.metrics_path:
+                return
+            try:
+                with open(self.metrics_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            except Exception:
+                pass
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            events = list(self.events)
+        return summarize_events(events)
+
+
+def load_events(metrics_path: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    if not os.path.exists(metrics_path):
+        return rows
+    with open(metrics_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+                if isinstance(obj, dict):
+                    rows.append(obj)
+            except Exception:
+                continue
+    return rows
+
+
+def summarize_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按phase聚合调用次数、token、耗时、TTFT与失败数。"""
+    phases: Dict[str, Dict[str, Any]] = {}
+    total_latency = 0.0
+    total_prompt_tokens = 0
+    total_completion_tokens = 0
+
+    for event in events:
+        phase = str(event.get("phase") or "unknown")
+        bucket = phases.setdefault(phase, {
+            "calls": 0,
+            "failures": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latency_s": 0.0,
+            "ttft_sum_s": 0.0,
+            "ttft_count": 0,
+            "backends": {},
+        })
+        latency = float(event.get("latency_s") or 0.0)
+        prompt_tokens = int(event.get("prompt_tokens") or 0)
+        completion_tokens = int(event.get("completion_tokens") or 0)
+
+        bucket["calls"] += 1
+        if event.get("outcome") not in ("ok", "fallback_ok"):
+            bucket["failures"] += 1
+        bucket["prompt_tokens"] += prompt_tokens
+        bucket["completion_tokens"] += completion_tokens
+        bucket["latency_s"] += latency
+        if event.get("ttft_s") is not None:
+            bucket["ttft_sum_s"] += float(event.get("ttft_s") or 0.0)
+            bucket["ttft_count"] += 1
+        backend = str(event.get("backend") or "unknown")
+        bucket["backends"][backend] = bucket["backends"].get(backend, 0) + 1
+
+        total_latency += latency
+        total_prompt_tokens += prompt_tokens
+        total_completion_tokens += completion_tokens
+
+    for bucket in phases.values():
+        calls = bucket["calls"] or 1
+        bucket["avg_latency_s"] = bucket["latency_s"] / calls
+        bucket["avg_ttft_s"] = (bucket["ttft_sum_s"] / bucket["ttft_count"]) if bucket["ttft_count"] else None
+        bucket["completion_tokens_per_s"] = (
+            bucket["completion_tokens"] / bucket["latency_s"] if bucket["latency_s"] > 0 else 0.0
+        )
+        bucket["time_share"] = (bucket["latency_s"] / total_latency) if total_latency > 0 else 0.0
+        total_tokens = total_prompt_tokens + total_completion_tokens
+        bucket["token_share"] = (
+            (bucket["prompt_tokens"] + bucket["completion_tokens"]) / total_tokens if total_tokens > 0 else 0.0
+        )
+
+    return {
+        "calls": len(events),
+        "latency_s": total_latency,
+        "prompt_tokens": total_prompt_tokens,
+        "completion_tokens": total_completion_tokens,
+        "phases": phases,
+    }
+
+
+def format_summary(summary: Dict[str, Any],
+                   prompt_price_per_1k: float = 0.0,
+                   completion_price_per_1k: float = 0.0) -> str:
+    lines = [
+        f"LLM calls: {summary['calls']}, total latency: {summary['latency_s']:.1f}s, "
+        f"tokens(in/out): {summary['prompt_tokens']}/{summary['completion_tokens']}"
+    ]
+    show_cost = prompt_price_per_1k > 0 or completion_price_per_1k > 0
+    header = f"{'phase':<18}{'calls':>6}{'fail':>6}{'tok_in':>10}{'tok_out':>10}{'time_s':>9}{'time%':>7}{'tok%':>7}{'avg_s':>8}{'ttft_s':>8}{'tok/s':>8}"
+    if show_cost:
+        header += f"{'cost':>10}"
+    lines.append(header)
+    lines.append("-" * len(header))
+
+    ordered = [p for p in KNOWN_PHASES if p in summary["phases"]]
+    ordered += sorted(p for p in summary["phases"] if p not in KNOWN_PHASES)
+    total_cost = 0.0
+    for phase in ordered:
+        bucket = summary["phases"][phase]
+        ttft = bucket["avg_ttft_s"]
+        row = (
+            f"{phase:<18}{bucket['calls']:>6}{bucket['failures']:>6}"
+            f"{bucket['prompt_tokens']:>10}{bucket['completion_tokens']:>10}"
+            f"{bucket['latency_s']:>9.1f}{bucket['time_share'] * 100:>6.1f}%{bucket['token_share'] * 100:>6.1f}%"
+            f"{bucket['avg_latency_s']:>8.2f}{(f'{ttft:.2f}' if ttft is not None else '-'):>8}"
+            f"{bucket['completion_tokens_per_s']:>8.1f}"
+        )
+        if show_cost:
+            cost = (
+                bucket["prompt_tokens"] / 1000.0 * prompt_price_per_1k
+                + bucket["completion_tokens"] / 1000.0 * completion_price_per_1k
+            )
+            total_cost += cost
+            row += f"{cost:>10.4f}"
+        lines.append(row)
+
+    if show_cost:
+        lines.append(f"Estimated total cost: {total_cost:.4f}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LLM call telemetry tools")
+    sub = parser.add_subparsers(dest="command")
+
+    summary_parser = sub.add_parser("summary", help="Summarize token/time budget per phase")
+    summary_parser.add_argument("metrics_file", nargs="?", default=os.path.join("log", "llm_metrics.jsonl"))
+    summary_parser.add_argument("--run-id", default=None, help="Only summarize this run (default: latest run)")
+    summary_parser.add_argument("--all-runs", action="store_true", help="Summarize all runs in the file")
+    summary_parser.add_argument("--prompt-price", type=float, default=0.0, help="Price per 1K prompt tokens")
+    summary_parser.add_argument("--completion-price", type=float, default=0.0, help="Price per 1K completion tokens")
+
+    args = parser.parse_args()
+    if args.command != "summary":
+        parser.print_help()
+        return 1
+
+    events = load_events(args.metrics_file)
+    if not events:
+        print(f"No metrics events found in {args.metrics_file}")
+        return 1
+
+    if not args.all_runs:
+        run_id = args.run_id or str(events[-1].get("run_id", ""))
+        events = [e for e in events if str(e.get("run_id", "")) == run_id]
+        print(f"Run: {run_id}")
+
+    print(format_summary(
+        summarize_events(events),
+        prompt_price_per_1k=args.prompt_price,
+        completion_price_per_1k=args.completion_price
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,15 @@ import json
 import logging
 import os
 import re
-import requests
-from urllib.parse import quote_plus
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, List, Set, Any
 from dataclasses import dataclass
 from llm_client import VLLMClient
 from c_code_analyzer import FunctionDependency
+from header_store import HeaderStore, HEADER_SLICING_MODES, clean_header_content, extract_identifiers
+from patch_apply import apply_patch, detect_patch_format
+from root_cause_research import get_default_researcher
 from compile_commands_analyzer import CompileInfo, CompileCommandsAnalyzer
 
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +26,29 @@ logger = logging.getLogger(__name__)
 
 class LLMTestGenerator:
     """基于LLM的测试代码生成器"""
+
+    # 批量生成时每个函数测试文件的分隔标记
+    BATCH_BEGIN_MARKER = "// ===== BEGIN TEST FILE: {name} ====="
+    BATCH_END_MARKER = "// ===== END TEST FILE: {name} ====="
+
+    # 修复提示词的输出要求：full返回整文件；patch返回SEARCH/REPLACE编辑块
+    REPAIR_FULL_REQUIREMENT = "Return ONLY the complete updated C++ test file."
+    REPAIR_PATCH_REQUIREMENT = "Return ONLY SEARCH/REPLACE edit blocks (format below), not the whole file."
+    # 融合triage+fix：JSON之后以该行分隔修复内容
+    FUSED_FIX_MARKER = "=== FIX ==="
+    REPAIR_PATCH_FORMAT = """
+
+=== OUTPUT FORMAT (edit blocks) ===
+Return one or more blocks exactly like this and nothing else:
+<<<<<<< SEARCH
+<lines copied verbatim from CURRENT TEST CODE, enough to be unique>
+=======
+<replacement lines>
+>>>>>>> REPLACE
+- SEARCH text must match the current file exactly (including indentation).
+- Use an empty SEARCH section to append new code at the end of the file.
+- Keep blocks small; do not repeat unchanged code outside the blocks.
+"""
     
     def __init__(self, llm_client: VLLMClient, compile_analyzer: Optional[CompileCommandsAnalyzer] = None):
         """
@@ -35,101 +61,31 @@ class LLMTestGenerator:
         self.llm = llm_client
         self.compile_analyzer = compile_analyzer
         self.system_prompt = self._build_system_prompt()
+        self._prefix_stats_lock = threading.Lock()
+        self._last_generation_prompt = ""
+        self._prefix_stats = {"prompts": 0, "prompt_chars": 0, "shared_prefix_chars": 0}
+        # 同一源文件的include提取结果缓存；锁同时保证libclang解析串行执行
+        self._includes_cache: Dict[str, Set[str]] = {}
+        self._includes_lock = threading.Lock()
+        # 头文件缓存与切片模式：full=整份头文件，tu=按源文件引用切片（保持TU内前缀一致），function=按被测函数引用切片
+        self.header_store = HeaderStore()
+        self.header_slicing = "tu"
+        # 修复输出模式：full=整文件重写；patch=编辑块，应用失败时回退整文件重写
+        self.repair_output = "full"
+        self.patch_max_tokens = 8192
 
     @staticmethod
     def research_root_cause_online(root_cause: str,
                                    error_type: str = "unknown",
                                    key_symbols: Optional[List[str]] = None,
                                    max_results: int = 4) -> Dict[str, Any]:
-        """基于triage根因做一次在线检索，返回可供修复参考的结果（失败自动降级）。"""
-        key_symbols = key_symbols or []
-        max_results = max(1, int(max_results or 4))
-
-        query_parts = [root_cause or "", error_type or "", "c++ gtest"] + key_symbols[:3]
-        query = " ".join([p for p in query_parts if p]).strip()
-        if not query:
-            query = "c++ gtest compile error"
-
-        references: List[Dict[str, str]] = []
-
-        try:
-            so_url = (
-                "https://api.stackexchange.com/2.3/search/advanced"
-                f"?order=desc&sort=relevance&site=stackoverflow&accepted=True&pagesize={max_results}"
-                f"&q={quote_plus(query)}"
-            )
-            so_resp = requests.get(so_url, timeout=8)
-            if so_resp.ok:
-                so_data = so_resp.json()
-                for item in (so_data.get("items") or [])[:max_results]:
-                    references.append({
-                        "source": "stackoverflow",
-                        "title": str(item.get("title", "")).strip(),
-                        "url": str(item.get("link", "")).strip(),
-                        "snippet": "Accepted/relevant StackOverflow thread"
-                    })
-        except Exception:
-            pass
-
-        try:
-            ddg_url = (
-                "https://api.duckduckgo.com/"
-                f"?q={quote_plus(query)}&format=json&no_redirect=1&no_html=1"
-            )
-            ddg_resp = requests.get(ddg_url, timeout=8)
-            if ddg_resp.ok:
-                ddg = ddg_resp.json()
-                abstract = str(ddg.get("AbstractText", "")).strip()
-                abstract_url = str(ddg.get("AbstractURL", "")).strip()
-                heading = str(ddg.get("Heading", "")).strip() or "DuckDuckGo abstract"
-                if abstract:
-                    references.append({
-                        "source": "duckduckgo",
-                        "title": heading,
-                        "url": abstract_url,
-                        "snippet": abstract[:280]
-                    })
-
-                related = ddg.get("RelatedTopics") or []
-                for topic in related:
-                    if len(references) >= max_results * 2:
-                        break
-                    if isinstance(topic, dict):
-                        text = str(topic.get("Text", "")).strip()
-                        url = str(topic.get("FirstURL", "")).strip()
-                        if text and url:
-                            references.append({
-                                "source": "duckduckgo",
-                                "title": "Related topic",
-                                "url": url,
-                                "snippet": text[:280]
-                            })
-        except Exception:
-            pass
-
-        dedup = []
-        seen_urls = set()
-        for ref in references:
-            url = ref.get("url", "")
-            if not url or url in seen_urls:
-                continue
-            seen_urls.add(url)
-            dedup.append(ref)
-            if len(dedup) >= max_results:
-                break
-
-        hints = []
-        for ref in dedup:
-            snippet = ref.get("snippet", "")
-            if snippet:
-                hints.append(snippet)
-
-        return {
-            "query": query,
-            "count": len(dedup),
-            "references": dedup,
-            "hints": hints[:max_results]
-        }
+        """基于triage根因检索参考资料（本地知识库+在线源并发、带缓存，失败自动降级）。"""
+        return get_default_researcher().research(
+            root_cause=root_cause,
+            error_type=error_type,
+            key_symbols=key_symbols,
+            max_results=max_results
+        )
     
     def _build_system_prompt(self) -> str:
         """构建系统提示"""
@@ -170,15 +126,18 @@ Return ONLY the C++ test code, no explanations."""
             生成的测试代码
         """
         prompt = self._build_prompt(func_dep, compile_info, extra_context, project_root)
+        self._record_prompt_prefix(prompt)
         
         logger.info(f"Generating tests for {func_dep.name}...")
         
-        # 调用LLM
+        # 调用LLM（系统提示固定在最前，作为所有生成请求的公共前缀）
         response = self.llm.generate(
             prompt,
             temperature=0.7,
             max_tokens=64000,
-            top_p=0.95
+            top_p=0.95,
+            system_prompt=self.system_prompt,
+            phase="generate"
         )
         
         if not response:
@@ -202,45 +161,33 @@ Return ONLY the C++ test code, no explanations."""
                      compile_info: Optional[CompileInfo] = None,
                      extra_context: str = "",
                      project_root: str = ".") -> str:
-        """构建提示词"""
-        
-        # 读取被测函数的源代码
-        function_source = self._read_function_source(func_dep, project_root)
-        
-        # 读取依赖的头文件内容
-        header_contents = self._read_header_files(func_dep, project_root)
+        """
+        构建提示词
+
+        布局面向vLLM前缀缓存：同一源文件(TU)共享的上下文（头文件/include/编译信息/生成要求）
+        按固定顺序放在前面，函数相关内容放在最后，使同TU的连续请求共享尽量长的前缀。
+        """
+        shared_context = self._build_shared_context(func_dep, compile_info, project_root)
+        function_context = self._build_function_context(func_dep, extra_context, project_root)
+        return shared_context + function_context
+
+    def _build_shared_context(self, func_dep: FunctionDependency,
+                              compile_info: Optional[CompileInfo] = None,
+                              project_root: str = ".",
+                              header_slicing: Optional[str] = None) -> str:
+        """构建同一源文件(TU)内所有函数共享的提示词前缀（规范排序，保证逐字节一致）"""
+        # 读取依赖的头文件内容；function模式下头文件切片随函数变化，放到函数上下文中
+        mode = self._effective_header_slicing(header_slicing)
+        header_contents = {} if mode == "function" else self._read_header_files(func_dep, project_root, mode)
         
         # 使用libclang提取所有include（包括间接依赖）
         all_includes = self._extract_all_includes(func_dep, compile_info, project_root)
-        
-        # 基本信息
-        prompt = f"""Generate comprehensive unit tests for this C function:
 
-Function Name: {func_dep.name}
-Return Type: {func_dep.return_type}
-Source File: {func_dep.source_file}
+        prompt = f"""Generate comprehensive unit tests for C functions of this translation unit:
 
-Parameters:
+Source File: {func_dep.source_file}
 """
         
-        if func_dep.parameters:
-            for ptype, pname in func_dep.parameters:
-                prompt += f"  - {ptype} {pname}\n"
-        else:
-            prompt += "  - void (no parameters)\n"
-        
-        # 添加函数实际源代码
-        if function_source:
-            prompt += f"\n=== FUNCTION SOURCE CODE ===\n```c\n{function_source}\n```\n"
-        
-        # 外部调用/依赖
-        if func_dep.external_calls:
-            prompt += f"\nExternal Function Calls (requires mocking):\n"
-            for call in sorted(func_dep.external_calls):
-                prompt += f"  - {call}()\n"
-        else:
-            prompt += f"\nExternal Function Calls: None\n"
-        
         # 包含的头文件（直接依赖）
         if func_dep.include_files:
             prompt += f"\nDirect Include Files:\n"
@@ -249,8 +196,8 @@ Parameters:
         
         # 添加头文件内容
         if header_contents:
-            for header_name, content in header_contents.items():
-                prompt += f"\n=== HEADER FILE: {header_name} ===\n```c\n{content}\n```\n"
+            for header_name in sorted(header_contents.keys()):
+                prompt += f"\n=== HEADER FILE: {header_name} ===\n```c\n{header_contents[header_name]}\n```\n"
         
         # 所有include文件（包括间接依赖和系统库）
         if all_includes:
@@ -267,11 +214,7 @@ Parameters:
             prompt += f"  C++ Standard: {compile_info.cxx_standard or 'c++14'}\n"
             
             if compile_info.defines:
-                prompt += f"  Macros: {', '.join(compile_info.defines.keys())}\n"
-        
-        # 额外上下文
-        if extra_context:
-            prompt += f"\nAdditional Context:\n{extra_context}\n"
+                prompt += f"  Macros: {', '.join(sorted(compile_info.defines.keys()))}\n"
         
         # 生成要求
         prompt += """
@@ -294,10 +237,190 @@ Critical constraints (must follow):
 - If you need C linkage, use extern "C" only for includes/declarations, never for function bodies.
 - Preserve exact function signatures from headers (including const qualifiers); never change them in mocks/wrappers.
 - Do NOT reference internal/static production globals (for example g_next_id). Validate behavior via return values and mocked call arguments instead.
+"""
+        return prompt
+
+    def _build_function_context(self, func_dep: FunctionDependency,
+                                extra_context: str = "",
+                                project_root: str = ".",
+                                include_instruction: bool = True,
+                                include_headers: bool = True) -> str:
+        """构建被测函数相关的提示词后缀"""
+        # 读取被测函数的源代码
+        function_source = self._read_function_source(func_dep, project_root)
+        header_contents: Dict[str, str] = {}
+        if include_headers and self._effective_header_slicing() == "function":
+            header_contents = self._read_header_files(
+                func_dep, project_root, "function", function_source=function_source
+            )
+
+        prompt = f"""
+=== TARGET FUNCTION ===
+Function Name: {func_dep.name}
+Return Type: {func_dep.return_type}
+
+Parameters:
+"""
+        
+        if func_dep.parameters:
+            for ptype, pname in func_dep.parameters:
+                prompt += f"  - {ptype} {pname}\n"
+        else:
+            prompt += "  - void (no parameters)\n"
+        
+        for header_name in sorted(header_contents.keys()):
+            prompt += f"\n=== HEADER FILE: {header_name} (declarations used by {func_dep.name}) ===\n```c\n{header_contents[header_name]}\n```\n"
+
+        # 添加函数实际源代码
+        if function_source:
+            prompt += f"\n=== FUNCTION SOURCE CODE ===\n```c\n{function_source}\n```\n"
+        
+        # 外部调用/依赖
+        if func_dep.external_calls:
+            prompt += f"\nExternal Function Calls (requires mocking):\n"
+            for call in sorted(func_dep.external_calls):
+                prompt += f"  - {call}()\n"
+        else:
+            prompt += f"\nExternal Function Calls: None\n"
+        
+        # 额外上下文
+        if extra_context:
+            prompt += f"\nAdditional Context:\n{extra_context}\n"
 
-Return ONLY the C++ code, no markdown wrappers."""
+        if include_instruction:
+            prompt += f"\nGenerate the test file for target function '{func_dep.name}'. Return ONLY the C++ code, no markdown wrappers."
         
         return prompt
+
+    def _build_batch_prompt(self, func_deps: List[FunctionDependency],
+                            compile_info: Optional[CompileInfo] = None,
+                            extra_contexts: Optional[Dict[str, str]] = None,
+                            project_root: str = ".") -> str:
+        """构建同一源文件多个函数的批量提示词（共享上下文只出现一次）"""
+        extra_contexts = extra_contexts or {}
+        # 批量请求中头文件只出现一次：function模式退化为按TU切片
+        shared_slicing = "tu" if self._effective_header_slicing() == "function" else None
+        prompt = self._build_shared_context(func_deps[0], compile_info, project_root, shared_slicing)
+        for func_dep in func_deps:
+            prompt += self._build_function_context(
+                func_dep,
+                extra_contexts.get(func_dep.name, ""),
+                project_root,
+                include_instruction=False,
+                include_headers=False
+            )
+
+        names = [func_dep.name for func_dep in func_deps]
+        prompt += f"""
+Generate ONE complete, standalone test file for EACH of the {len(names)} target functions above: {', '.join(names)}.
+Each test file must compile on its own (its own includes, mocks and fixture) and must test only its target function.
+Wrap every file exactly with these marker lines and output nothing else:
+{self.BATCH_BEGIN_MARKER.format(name=names[0])}
+<complete C++ test file for {names[0]}>
+{self.BATCH_END_MARKER.format(name=names[0])}
+Repeat for every target function, in the same order. No markdown wrappers."""
+        return prompt
+
+    @classmethod
+    def _split_batch_sections(cls, response: str, names: List[str]) -> Dict[str, str]:
+        """按BEGIN/END标记拆分批量响应；缺少END标记的分段视为解析失败"""
+        sections: Dict[str, str] = {}
+        for name in names:
+            begin = cls.BATCH_BEGIN_MARKER.format(name=name)
+            end = cls.BATCH_END_MARKER.format(name=name)
+            match = re.search(re.escape(begin) + r"[^\n]*\n([\s\S]*?)" + re.escape(end), response or "")
+            if match:
+                sections[name] = match.group(1).strip()
+        return sections
+
+    def generate_tu_batch_tests(self, func_deps: List[FunctionDependency],
+                                compile_info: Optional[CompileInfo] = None,
+                                extra_contexts: Optional[Dict[str, str]] = None,
+                                project_root: str = ".") -> Dict[str, str]:
+        """
+        一次请求为同一源文件的多个函数生成测试
+
+        响应按标记拆分为每个函数的测试文件；分段缺失或不是有效测试代码的函数单独重试。
+
+        Returns:
+            {函数名: 测试代码}
+        """
+        extra_contexts = extra_contexts or {}
+        if len(func_deps) == 1:
+            func_dep = func_deps[0]
+            return {
+                func_dep.name: self.generate_test_file(
+                    func_dep, compile_info, extra_contexts.get(func_dep.name, ""), project_root
+                )
+            }
+
+        prompt = self._build_batch_prompt(func_deps, compile_info, extra_contexts, project_root)
+        self._record_prompt_prefix(prompt)
+        names = [func_dep.name for func_dep in func_deps]
+        logger.info(f"Generating batched tests for {len(names)} functions: {', '.join(names)}")
+
+        response = self.llm.generate(
+            prompt,
+            temperature=0.7,
+            max_tokens=64000,
+            top_p=0.95,
+            system_prompt=self.system_prompt,
+            phase="generate"
+        )
+        sections = self._split_batch_sections(response, names)
+
+        results: Dict[str, str] = {}
+        retry: List[FunctionDependency] = []
+        for func_dep in func_deps:
+            section = sections.get(func_dep.name, "")
+            code = self._finalize_model_test_code(
+                raw_response=section,
+                fallback_code="",
+                context=f"batch:{func_dep.name}"
+            ) if section else ""
+            if not code:
+                retry.append(func_dep)
+                continue
+            results[func_dep.name] = self._sanitize_generated_test_code(
+                code,
+                forbidden_symbols=[func_dep.name] + sorted(list(func_dep.external_calls))
+            )
+
+        if retry:
+            logger.warning(
+                f"Batched response missing/invalid for {len(retry)} function(s), retrying individually: "
+                + ", ".join(func_dep.name for func_dep in retry)
+            )
+        for func_dep in retry:
+            results[func_dep.name] = self.generate_test_file(
+                func_dep, compile_info, extra_contexts.get(func_dep.name, ""), project_root
+            )
+
+        return results
+
+    def _record_prompt_prefix(self, prompt: str) -> None:
+        """统计与上一条生成请求共享的前缀长度（估算vLLM前缀缓存可节省的prefill）"""
+        full_prompt = self.system_prompt + "\n" + prompt
+        with self._prefix_stats_lock:
+            shared = len(os.path.commonprefix([self._last_generation_prompt, full_prompt]))
+            self._last_generation_prompt = full_prompt
+            self._prefix_stats["prompts"] += 1
+            self._prefix_stats["prompt_chars"] += len(full_prompt)
+            self._prefix_stats["shared_prefix_chars"] += shared
+
+    def reset_prefix_cache_stats(self) -> None:
+        with self._prefix_stats_lock:
+            self._last_generation_prompt = ""
+            self._prefix_stats = {"prompts": 0, "prompt_chars": 0, "shared_prefix_chars": 0}
+
+    def get_prefix_cache_stats(self) -> Dict[str, Any]:
+        """返回生成阶段的前缀共享统计（字符数，token按约4字符/token估算）"""
+        with self._prefix_stats_lock:
+            stats = dict(self._prefix_stats)
+        total = stats["prompt_chars"]
+        stats["shared_ratio"] = (stats["shared_prefix_chars"] / total) if total else 0.0
+        stats["estimated_saved_prefill_tokens"] = stats["shared_prefix_chars"] // 4
+        return stats
     
     def _clean_response(self, response: str) -> str:
         """清理LLM响应"""
@@ -614,12 +737,82 @@ Return ONLY the C++ code, no markdown wrappers."""
 
         return sanitized
 
+    def _code_from_repair_response(self,
+                                   response: str,
+                                   current_test_code: str,
+                                   context: str) -> Optional[str]:
+        """
+        将修复响应转换为完整代码：编辑块/unified diff应用到当前代码，整文件响应直接清理
+
+        Returns:
+            完整代码；补丁无法应用或结果不是有效测试代码时返回None
+        """
+        if detect_patch_format(response) == "none":
+            # 模型忽略格式要求直接返回整文件时，按整文件结果处理
+            cleaned = self._trim_to_code_region(self._clean_response(response))
+            return cleaned if self._looks_like_cpp_test_code(cleaned) else None
+
+        result = apply_patch(current_test_code, response)
+        if result.success and self._looks_like_cpp_test_code(result.code):
+            logger.info(f"Applied {result.applied} {result.patch_format} block(s) for {context}")
+            return result.code
+        logger.warning(f"Patch for {context} rejected: {'; '.join(result.errors[:3]) or 'invalid result'}")
+        return None
+
+    def _request_test_repair(self,
+                             prompt: str,
+                             current_test_code: str,
+                             function_name: str,
+                             phase: str,
+                             temperature: float = 0.2) -> Optional[str]:
+        """
+        发送修复请求并得到完整的修复后代码
+
+        patch模式先请求编辑块并用模糊补丁器应用；补丁无法应用或结果不是有效测试代码时，
+        回退到整文件重写请求。
+
+        Returns:
+            修复后的完整代码；模型无响应时返回None
+        """
+        if str(self.repair_output or "full").strip().lower() == "patch":
+            patch_prompt = prompt.replace(self.REPAIR_FULL_REQUIREMENT, self.REPAIR_PATCH_REQUIREMENT, 1)
+            patch_prompt += self.REPAIR_PATCH_FORMAT
+            response = self.llm.generate(
+                patch_prompt,
+                temperature=temperature,
+                max_tokens=self.patch_max_tokens,
+                top_p=0.9,
+                phase=phase
+            )
+            if response:
+                fixed_code = self._code_from_repair_response(response, current_test_code, f"{phase}:{function_name}")
+                if fixed_code is not None:
+                    return fixed_code
+                logger.warning(f"Patch for {phase}:{function_name} did not apply, falling back to full rewrite")
+
+        response = self.llm.generate(
+            prompt,
+            temperature=temperature,
+            max_tokens=64000,
+            top_p=0.9,
+            phase=phase
+        )
+        if not response:
+            return None
+
+        return self._finalize_model_test_code(
+            raw_response=response,
+            fallback_code=current_test_code,
+            context=f"{phase}:{function_name}"
+        )
+
     def fix_test_from_compile_error(self,
                                     current_test_code: str,
                                     compile_error: str,
                                     function_name: str = "unknown",
                                     compile_analysis: Optional[Dict[str, Any]] = None,
-                                    aggressive: bool = False) -> str:
+                                    aggressive: bool = False,
+                                    temperature: float = 0.2) -> str:
         """
         根据编译错误修复测试代码
 
@@ -627,6 +820,7 @@ Return ONLY the C++ code, no markdown wrappers."""
             current_test_code: 当前测试代码
             compile_error: 编译器错误输出
             function_name: 目标函数名（用于日志）
+            temperature: 采样温度（推测式多候选修复时用于产生差异化候选）
 
         Returns:
             修复后的测试代码；若修复失败则返回原代码
@@ -641,7 +835,7 @@ Requirements:
 4. NEVER define/re-implement production C functions in test file.
 5. Preserve exact production signatures from headers (const/ptr qualifiers).
 6. Do NOT reference internal/static globals such as g_next_id.
-7. Return ONLY the complete updated C++ test file.
+7. {self.REPAIR_FULL_REQUIREMENT}
 
 Repair Mode: {"aggressive_rewrite" if aggressive else "targeted_minimal"}
 
@@ -687,33 +881,30 @@ Prefer proven fixes from similar past cases before trying novel changes.
 """
 
         logger.info(f"Fixing test code from compile error for {function_name}...")
-        response = self.llm.generate(
-            prompt,
-            temperature=0.2,
-            max_tokens=64000,
-            top_p=0.9
+        fixed_code = self._request_test_repair(
+            prompt, current_test_code, function_name, phase="compile_fix", temperature=temperature
         )
-
-        if not response:
+        if fixed_code is None:
             logger.warning(f"Failed to fix test for {function_name}, keep original code")
             return current_test_code
 
-        fixed_code = self._finalize_model_test_code(
-            raw_response=response,
-            fallback_code=current_test_code,
-            context=f"compile_fix:{function_name}"
-        )
         if not fixed_code.strip():
             logger.warning(f"Empty fixed code for {function_name}, keep original code")
             return current_test_code
 
-        extra_forbidden = re.findall(r"conflicting types for '([A-Za-z_][A-Za-z0-9_]*)'", compile_error)
-        unresolved_forbidden = re.findall(r"无法解析的外部符号\s+([A-Za-z_][A-Za-z0-9_]*)", compile_error)
-        forbidden_symbols = [function_name] + extra_forbidden + unresolved_forbidden
-        fixed_code = self._sanitize_generated_test_code(fixed_code, forbidden_symbols=forbidden_symbols)
+        fixed_code = self._sanitize_generated_test_code(
+            fixed_code, forbidden_symbols=self._compile_fix_forbidden_symbols(function_name, compile_error)
+        )
 
         return fixed_code
 
+    @staticmethod
+    def _compile_fix_forbidden_symbols(function_name: str, compile_error: str) -> List[str]:
+        """编译修复后需从测试中清除定义的符号：目标函数 + 冲突类型声明的符号 + 无法解析的外部符号"""
+        extra_forbidden = re.findall(r"conflicting types for '([A-Za-z_][A-Za-z0-9_]*)'", compile_error or "")
+        unresolved_forbidden = re.findall(r"无法解析的外部符号\s+([A-Za-z_][A-Za-z0-9_]*)", compile_error or "")
+        return [function_name] + extra_forbidden + unresolved_forbidden
+
     @staticmethod
     def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
         """从模型响应中提取首个JSON对象。"""
@@ -748,12 +939,12 @@ Prefer proven fixes from similar past cases before trying novel changes.
 
         return None
 
-    def analyze_compile_error(self,
-                              current_test_code: str,
-                              compile_error: str,
-                                                            function_name: str = "unknown",
-                                                            navigation_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """先诊断编译错误，返回结构化分析结果。"""
+    def _build_compile_triage_prompt(self,
+                                     current_test_code: str,
+                                     compile_error: str,
+                                     function_name: str = "unknown",
+                                     navigation_context: Optional[Dict[str, Any]] = None) -> str:
+        """构建编译错误诊断提示词"""
         prompt = f"""You are a senior C/C++ build and test debugging assistant.
 Analyze the compile/link errors and return a STRICT JSON object only.
 
@@ -814,15 +1005,12 @@ Target Function: {function_name}
 Use this context to produce deterministic code_locations and ordered change_direction.
 Do not introduce file locations outside this scope.
 """
+        return prompt
 
-        logger.info(f"Triaging compile error for {function_name}...")
-        response = self.llm.generate(
-            prompt,
-            temperature=0.1,
-            max_tokens=5000,
-            top_p=0.9
-        )
-
+    def _parse_compile_triage_response(self,
+                                       response: str,
+                                       navigation_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """解析编译诊断响应；无响应或无法解析时返回triage_unavailable默认结果"""
         default_result: Dict[str, Any] = {
             "error_type": "unknown",
             "root_cause": "triage_unavailable",
@@ -865,13 +1053,32 @@ Do not introduce file locations outside this scope.
             result["change_direction"] = [str(result.get("change_direction", "apply minimal compile fix"))]
         return self._normalize_triage_result(result, navigation_context, phase="compile")
 
-    def analyze_test_failure(self,
-                             current_test_code: str,
-                             test_output: str,
-                                                         function_name: str = "unknown",
-                     navigation_context: Optional[Dict[str, Any]] = None,
-                     runtime_evidence: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """先诊断测试运行失败，返回结构化分析结果。"""
+    def analyze_compile_error(self,
+                              current_test_code: str,
+                              compile_error: str,
+                                                            function_name: str = "unknown",
+                                                            navigation_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """先诊断编译错误，返回结构化分析结果。"""
+        prompt = self._build_compile_triage_prompt(current_test_code, compile_error, function_name, navigation_context)
+
+        logger.info(f"Triaging compile error for {function_name}...")
+        response = self.llm.generate(
+            prompt,
+            temperature=0.1,
+            max_tokens=5000,
+            top_p=0.9,
+            phase="compile_triage"
+        )
+
+        return self._parse_compile_triage_response(response, navigation_context)
+
+    def _build_runtime_triage_prompt(self,
+                                     current_test_code: str,
+                                     test_output: str,
+                                     function_name: str = "unknown",
+                                     navigation_context: Optional[Dict[str, Any]] = None,
+                                     runtime_evidence: Optional[Dict[str, Any]] = None) -> str:
+        """构建测试运行失败诊断提示词"""
         prompt = f"""You are a senior C/C++ unit test debugging assistant.
 Analyze the test execution failure output and return a STRICT JSON object only.
 
@@ -946,15 +1153,12 @@ Do not introduce file locations outside this scope.
 
 Use this as high-priority evidence. Prefer first_violation for root cause when present.
 """
+        return prompt
 
-        logger.info(f"Triaging runtime test failure for {function_name}...")
-        response = self.llm.generate(
-            prompt,
-            temperature=0.1,
-            max_tokens=5000,
-            top_p=0.9
-        )
-
+    def _parse_runtime_triage_response(self,
+                                       response: str,
+                                       navigation_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """解析运行失败诊断响应；无响应或无法解析时返回triage_unavailable默认结果"""
         default_result: Dict[str, Any] = {
             "error_type": "unknown",
             "root_cause": "triage_unavailable",
@@ -997,12 +1201,155 @@ Use this as high-priority evidence. Prefer first_violation for root cause when p
             result["change_direction"] = [str(result.get("change_direction", "apply minimal runtime fix"))]
         return self._normalize_triage_result(result, navigation_context, phase="runtime")
 
+    def analyze_test_failure(self,
+                             current_test_code: str,
+                             test_output: str,
+                                                         function_name: str = "unknown",
+                     navigation_context: Optional[Dict[str, Any]] = None,
+                     runtime_evidence: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """先诊断测试运行失败，返回结构化分析结果。"""
+        prompt = self._build_runtime_triage_prompt(current_test_code, test_output, function_name, navigation_context, runtime_evidence)
+
+        logger.info(f"Triaging runtime test failure for {function_name}...")
+        response = self.llm.generate(
+            prompt,
+            temperature=0.1,
+            max_tokens=5000,
+            top_p=0.9,
+            phase="runtime_triage"
+        )
+
+        return self._parse_runtime_triage_response(response, navigation_context)
+
+    def _fused_triage_fix_instructions(self, phase: str) -> str:
+        """融合模式的输出要求：先诊断JSON，再输出修复（整文件或编辑块，取决于repair_output）"""
+        patch_mode = str(self.repair_output or "full").strip().lower() == "patch"
+        fix_output = self.REPAIR_PATCH_REQUIREMENT if patch_mode else self.REPAIR_FULL_REQUIREMENT
+        scope_rule = (
+            "- Assume production code is correct; only modify tests.\n" if phase == "runtime" else ""
+        )
+        instructions = f"""
+
+=== FUSED OUTPUT (triage + fix in one response) ===
+This request also performs the fix. Output, in this order:
+1. The JSON object described above (raw JSON, no markdown).
+2. A line containing exactly: {self.FUSED_FIX_MARKER}
+3. If should_fix is true: the fix. {fix_output} If should_fix is false: nothing after the marker.
+Fix rules:
+- Apply the minimal change described by your own triage; keep test intent and target function.
+{scope_rule}- NEVER define/re-implement production C functions in the test file.
+- Preserve exact production signatures from headers (const/ptr qualifiers).
+- Do NOT reference internal/static globals such as g_next_id.
+"""
+        if patch_mode:
+            instructions += self.REPAIR_PATCH_FORMAT
+        return instructions
+
+    def _run_fused_triage_fix(self,
+                              prompt: str,
+                              current_test_code: str,
+                              function_name: str,
+                              phase: str,
+                              navigation_context: Optional[Dict[str, Any]],
+                              failure_output: str = "",
+                              fix_references: Optional[Dict[str, Any]] = None) -> tuple[Dict[str, Any], Optional[str]]:
+        prompt = prompt.replace(
+            "return a STRICT JSON object only.",
+            "return a STRICT JSON object followed by the fix (see FUSED OUTPUT)."
+        ).replace(
+            "- Do NOT include markdown, comments, or extra text",
+            "- Do NOT include markdown or comments inside the JSON"
+        )
+        prompt += self._fused_triage_fix_instructions(phase)
+        if fix_references:
+            # 与分步修复相同的参考资料（检索结果/历史经验），分步修复经DIAGNOSTIC ANALYSIS传入
+            prompt += f"""
+
+=== FIX REFERENCES (root-cause research and historical experience) ===
+```json
+{json.dumps(fix_references, ensure_ascii=False, indent=2)}
+```
+"""
+            if fix_references.get("experience_hints"):
+                prompt += """
+
+Apply relevant historical experience hints when they match the current failure pattern.
+Prefer proven fixes from similar past cases before trying novel changes.
+"""
+
+        patch_mode = str(self.repair_output or "full").strip().lower() == "patch"
+        logger.info(f"Fused {phase} triage+fix for {function_name}...")
+        response = self.llm.generate(
+            prompt,
+            temperature=0.1,
+            max_tokens=(5000 + self.patch_max_tokens) if patch_mode else 64000,
+            top_p=0.9,
+            phase=f"{phase}_triage_fix"
+        )
+
+        triage_text, _, fix_text = (response or "").partition(self.FUSED_FIX_MARKER)
+        parse = self._parse_runtime_triage_response if phase == "runtime" else self._parse_compile_triage_response
+        triage_result = parse(triage_text, navigation_context)
+
+        fixed_code: Optional[str] = None
+        if fix_text.strip() and triage_result.get("should_fix", True):
+            fixed_code = self._code_from_repair_response(
+                fix_text, current_test_code, f"{phase}_triage_fix:{function_name}"
+            )
+            if fixed_code:
+                # 与分步修复的后处理一致：编译阶段按编译输出补充需清除的符号
+                forbidden_symbols = (
+                    self._compile_fix_forbidden_symbols(function_name, failure_output)
+                    if phase == "compile" else [function_name]
+                )
+                fixed_code = self._sanitize_generated_test_code(fixed_code, forbidden_symbols=forbidden_symbols)
+        triage_result["fused_fix_available"] = fixed_code is not None
+        return triage_result, fixed_code
+
+    def triage_and_fix_compile_error(self,
+                                     current_test_code: str,
+                                     compile_error: str,
+                                     function_name: str = "unknown",
+                                     navigation_context: Optional[Dict[str, Any]] = None,
+                                     fix_references: Optional[Dict[str, Any]] = None) -> tuple[Dict[str, Any], Optional[str]]:
+        """
+        一次请求同时完成编译错误诊断与修复（省去triage与fix之间的一次往返）
+
+        Args:
+            fix_references: 修复参考资料（web_research/experience_hints），与分步修复提示中的内容相同
+
+        Returns:
+            (与analyze_compile_error相同结构的诊断结果, 修复后的完整代码；无可用修复时为None)
+        """
+        prompt = self._build_compile_triage_prompt(current_test_code, compile_error, function_name, navigation_context)
+        return self._run_fused_triage_fix(
+            prompt, current_test_code, function_name, "compile", navigation_context,
+            failure_output=compile_error, fix_references=fix_references
+        )
+
+    def triage_and_fix_test_failure(self,
+                                    current_test_code: str,
+                                    test_output: str,
+                                    function_name: str = "unknown",
+                                    navigation_context: Optional[Dict[str, Any]] = None,
+                                    runtime_evidence: Optional[Dict[str, Any]] = None,
+                                    fix_references: Optional[Dict[str, Any]] = None) -> tuple[Dict[str, Any], Optional[str]]:
+        """一次请求同时完成测试运行失败诊断与修复，参数与返回值同triage_and_fix_compile_error"""
+        prompt = self._build_runtime_triage_prompt(
+            current_test_code, test_output, function_name, navigation_context, runtime_evidence
+        )
+        return self._run_fused_triage_fix(
+            prompt, current_test_code, function_name, "runtime", navigation_context,
+            failure_output=test_output, fix_references=fix_references
+        )
+
     def fix_test_from_test_failure(self,
                                    current_test_code: str,
                                    test_output: str,
                                    function_name: str = "unknown",
                                    failure_analysis: Optional[Dict[str, Any]] = None,
-                                   aggressive: bool = False) -> str:
+                                   aggressive: bool = False,
+                                   temperature: float = 0.2) -> str:
         """根据测试运行失败输出修复测试代码（假设被测代码正确）。"""
         prompt = f"""You are an expert C/C++ unit test engineer.
 Fix the following Google Test file based on TEST EXECUTION failures.
@@ -1014,7 +1361,7 @@ Requirements:
 4. Keep using Google Test / Google Mock.
 5. NEVER define/re-implement production C functions in test file.
 6. Preserve exact production signatures from headers.
-7. Return ONLY the complete updated C++ test file.
+7. {self.REPAIR_FULL_REQUIREMENT}
 
 Repair Mode: {"aggressive_rewrite" if aggressive else "targeted_minimal"}
 
@@ -1060,22 +1407,13 @@ Prefer proven fixes from similar past cases before trying novel changes.
 """
 
         logger.info(f"Fixing runtime test failure for {function_name}...")
-        response = self.llm.generate(
-            prompt,
-            temperature=0.2,
-            max_tokens=64000,
-            top_p=0.9
+        fixed_code = self._request_test_repair(
+            prompt, current_test_code, function_name, phase="runtime_fix", temperature=temperature
         )
-
-        if not response:
+        if fixed_code is None:
             logger.warning(f"Failed to fix runtime test for {function_name}, keep original code")
             return current_test_code
 
-        fixed_code = self._finalize_model_test_code(
-            raw_response=response,
-            fallback_code=current_test_code,
-            context=f"runtime_fix:{function_name}"
-        )
         if not fixed_code.strip():
             logger.warning(f"Empty runtime fixed code for {function_name}, keep original code")
             return current_test_code
@@ -1129,7 +1467,12 @@ TEST_F({func_dep.name.capitalize()}Test, BasicTest) {{
                 logger.warning(f"Source file not found: {source_file}")
                 return set()
             
-            includes = self.compile_analyzer.extract_all_includes(source_file, compile_info)
+            with self._includes_lock:
+                cached = self._includes_cache.get(source_file)
+                if cached is None:
+                    cached = set(self.compile_analyzer.extract_all_includes(source_file, compile_info))
+                    self._includes_cache[source_file] = cached
+            includes = set(cached)
             logger.info(f"Extracted {len(includes)} includes for {func_dep.name}")
             return includes
         except Exception as e:
@@ -1190,45 +1533,73 @@ TEST_F({func_dep.name.capitalize()}Test, BasicTest) {{
             logger.error(f"Error reading function source: {e}")
             return ""
     
-    def _read_header_files(self, func_dep: FunctionDependency, project_root: str) -> Dict[str, str]:
-        """读取依赖的头文件内容"""
-        headers = {}
-        
+    def _effective_header_slicing(self, override: Optional[str] = None) -> str:
+        mode = str(override or self.header_slicing or "full").strip().lower()
+        return mode if mode in HEADER_SLICING_MODES else "full"
+
+    def _read_header_files(self, func_dep: FunctionDependency, project_root: str,
+                           slicing: str = "full",
+                           function_source: Optional[str] = None) -> Dict[str, str]:
+        """
+        读取依赖的头文件内容（经HeaderStore缓存，已预清理）
+
+        Args:
+            slicing: full返回整份头文件；tu/function只保留源文件/被测函数引用到的声明（含传递依赖）
+            function_source: function模式下被测函数源码（未提供时重新读取）
+        """
+        paths: Dict[str, str] = {}
         for header_name in func_dep.include_files:
-            # 尝试多个可能的路径
-            possible_paths = [
-                os.path.join(project_root, 'include', header_name),
-                os.path.join(project_root, header_name),
-                os.path.join(project_root, 'src', header_name),
-            ]
-            
-            for header_path in possible_paths:
-                if os.path.exists(header_path):
-                    try:
-                        with open(header_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                        # 清理内容（移除注释等，保留主要定义）
-                        content = self._clean_header_content(content)
+            header_path = self.header_store.resolve(header_name, project_root)
+            if header_path:
+                paths[header_name] = header_path
+
+        if slicing not in ("tu", "function"):
+            headers = {}
+            for header_name, header_path in paths.items():
+                try:
+                    content = self.header_store.get_content(header_path)
+                    if content is not None:
                         headers[header_name] = content
-                        break
-                    except Exception as e:
-                        logger.error(f"Error reading header {header_path}: {e}")
-        
-        return headers
+                except Exception as e:
+                    logger.error(f"Error reading header {header_path}: {e}")
+            return headers
+
+        if slicing == "tu":
+            identifiers = set()
+            if func_dep.source_file:
+                identifiers = self.header_store.identifiers(os.path.join(project_root, func_dep.source_file))
+            if not identifiers:
+                # 源文件不可读时切片会丢掉全部声明，退回整份头文件
+                logger.warning(
+                    f"Cannot read source file {func_dep.source_file} for header slicing of {func_dep.name}; "
+                    f"using full headers"
+                )
+                return self._read_header_files(func_dep, project_root, "full")
+        else:
+            if function_source is None:
+                function_source = self._read_function_source(func_dep, project_root)
+            identifiers = extract_identifiers(function_source)
+            identifiers |= extract_identifiers(func_dep.return_type)
+            for ptype, _ in func_dep.parameters:
+                identifiers |= extract_identifiers(ptype)
+            identifiers |= set(func_dep.external_calls)
+            identifiers.add(func_dep.name)
+
+        try:
+            sliced = self.header_store.slice_headers(sorted(set(paths.values())), identifiers)
+        except Exception as e:
+            logger.error(f"Error slicing headers for {func_dep.name}: {e}")
+            return self._read_header_files(func_dep, project_root, "full")
+        return {name: sliced[path] for name, path in paths.items() if path in sliced}
     
     def _clean_header_content(self, content: str) -> str:
         """清理头文件内容，保留关键部分"""
-        # 移除多行注释
-        content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-        # 移除单行注释
-        content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-        # 移除多余的空行
-        content = re.sub(r'\n\s*\n\s*\n+', '\n\n', content)
-        return content.strip()
+        return clean_header_content(content)
     
     def generate_batch_tests(self, func_deps: List[FunctionDependency],
                             compile_info_map: Optional[Dict[str, CompileInfo]] = None,
-                            project_root: str = ".") -> Dict[str, str]:
+                            project_root: str = ".",
+                            max_workers: int = 1) -> Dict[str, str]:
         """
         批量生成多个函数的测试
         
@@ -1236,21 +1607,26 @@ TEST_F({func_dep.name.capitalize()}Test, BasicTest) {{
             func_deps: 函数依赖列表
             compile_info_map: 编译信息映射
             project_root: 项目根目录
+            max_workers: 并发请求数（1为串行）
             
         Returns:
             {函数名: 测试代码}
         """
-        results = {}
-        
-        for func_dep in func_deps:
+        # 同一源文件的函数连续发送，以复用vLLM前缀缓存
+        ordered = sorted(func_deps, key=lambda dep: dep.source_file or "")
+
+        def _generate(func_dep: FunctionDependency) -> str:
             compile_info = None
             if compile_info_map and func_dep.source_file in compile_info_map:
                 compile_info = compile_info_map[func_dep.source_file]
-            
-            test_code = self.generate_test_file(func_dep, compile_info, project_root=project_root)
-            results[func_dep.name] = test_code
-        
-        return results
+            return self.generate_test_file(func_dep, compile_info, project_root=project_root)
+
+        if max_workers <= 1:
+            return {func_dep.name: _generate(func_dep) for func_dep in ordered}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            codes = list(executor.map(_generate, ordered))
+        return {func_dep.name: code for func_dep, code in zip(ordered, codes)}
 
 
 class PromptBuilder:
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Patch Apply
+将模型返回的编辑补丁应用到测试代码上，支持两种格式：
+- SEARCH/REPLACE块（<<<<<<< SEARCH / ======= / >>>>>>> REPLACE）
+- unified diff（@@ -a,b +c,d @@ 块）
+
+定位采用逐级放宽的模糊匹配：精确匹配 -> 忽略行首尾空白 -> 裁剪hunk首尾上下文行。
+任一块无法定位即视为整体失败，由调用方回退到整文件重写。
+
+Usage:
+    python patch_apply.py <file> <patch_file> [-o output]
+"""
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+SEARCH_MARKER = "<<<<<<< SEARCH"
+DIVIDER_MARKER = "======="
+REPLACE_MARKER = ">>>>>>> REPLACE"
+
+_HUNK_HEADER_RE = re.compile(r'^@@\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@')
+_SEARCH_BLOCK_RE = re.compile(
+    r'^<{5,9}\s*SEARCH[^\n]*\n(.*?)^={5,9}\s*\n(.*?)^>{5,9}\s*REPLACE[^\n]*$',
+    re.MULTILINE | re.DOTALL
+)
+
+# hunk首尾最多裁剪的上下文行数（类似patch的fuzz因子）
+MAX_CONTEXT_FUZZ = 2
+
+
+@dataclass
+class PatchResult:
+    """补丁应用结果"""
+    success: bool
+    code: str
+    patch_format: str = "none"  # search_replace / unified_diff / none
+    applied: int = 0
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def detect_patch_format(text: str) -> str:
+    """识别响应中的补丁格式"""
+    if not text:
+        return "none"
+    if SEARCH_MARKER in text and REPLACE_MARKER in text:
+        return "search_replace"
+    if re.search(r'(?m)^@@\s*-\d+', text):
+        return "unified_diff"
+    return "none"
+
+
+def _strip_fences(text: str) -> str:
+    """去掉markdown代码围栏行（补丁内部内容保留）"""
+    return "\n".join(line for line in text.splitlines() if not line.strip().startswith("```"))
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _find_block(lines: List[str], block: List[str], hint: int = 0) -> Tuple[int, str]:
+    """
+    在lines中定位block，返回(起始行, 匹配方式)；找不到返回(-1, "")
+
+    多处匹配时取距离hint最近的位置。
+    """
+    if not block:
+        return -1, ""
+    span = len(block)
+    for mode, key in (("exact", lambda s: s.rstrip()), ("whitespace", _normalize)):
+        target = [key(line) for line in block]
+        matches = [
+            i for i in range(0, len(lines) - span + 1)
+            if [key(line) for line in lines[i:i + span]] == target
+        ]
+        if matches:
+            return min(matches, key=lambda i: abs(i - hint)), mode
+    return -1, ""
+
+
+def apply_search_replace(code: str, patch_text: str) -> PatchResult:
+    """应用SEARCH/REPLACE块；SEARCH为空时将REPLACE内容追加到文件末尾"""
+    blocks = _SEARCH_BLOCK_RE.findall(_strip_fences(patch_text) + "\n")
+    result = PatchResult(success=False, code=code, patch_format="search_replace")
+    if not blocks:
+        result.errors.append("no SEARCH/REPLACE blocks found")
+        return result
+
+    lines = code.splitlines()
+    for index, (search, replace) in enumerate(blocks, start=1):
+        search_lines = search.rstrip("\n").splitlines() if search.strip() else []
+        replace_lines = replace.rstrip("\n").splitlines() if replace.strip() else []
+
+        if not search_lines:
+            lines.extend(replace_lines)
+            result.applied += 1
+            continue
+
+        start, _ = _find_block(lines, search_lines)
+        if start < 0:
+            result.failed += 1
+            result.errors.append(f"block {index}: SEARCH text not found: {search_lines[0].strip()[:80]}")
+            continue
+
+        lines[start:start + len(search_lines)] = replace_lines
+        result.applied += 1
+
+    result.code = "\n".join(lines) + ("\n" if code.endswith("\n") else "")
+    result.success = result.failed == 0 and result.applied > 0
+    return result
+
+
+def _parse_unified_hunks(patch_text: str) -> List[Tuple[int, List[str]]]:
+    """解析unified diff，返回[(旧文件起始行号, hunk行列表)]"""
+    hunks: List[Tuple[int, List[str]]] = []
+    current: Optional[List[str]] = None
+    for line in _strip_fences(patch_text).splitlines():
+        header = _HUNK_HEADER_RE.match(line)
+        if header:
+            current = []
+            hunks.append((int(header.group(1)), current))
+            continue
+        if current is None:
+            continue
+        if line.startswith(("--- ", "+++ ", "diff ", "index ")):
+            current = None
+            continue
+        if line.startswith("\\"):
+            continue
+        if line.startswith((" ", "-", "+")):
+            current.append(line)
+        elif line == "":
+            current.append(" ")
+        else:
+            current = None
+    return [(start, body) for start, body in hunks if body]
+
+
+def apply_unified_diff(code: str, patch_text: str) -> PatchResult:
+    """按顺序应用unified diff的各个hunk（忽略行号偏移，按内容模糊定位）"""
+    hunks = _parse_unified_hunks(patch_text)
+    result = PatchResult(success=False, code=code, patch_format="unified_diff")
+    if not hunks:
+        result.errors.append("no unified diff hunks found")
+        return result
+
+    lines = code.splitlines()
+    offset = 0
+    for index, (old_start, body) in enumerate(hunks, start=1):
+        old_block = [line[1:] for line in body if line[0] in (" ", "-")]
+        new_block = [line[1:] for line in body if line[0] in (" ", "+")]
+        hint = max(0, old_start - 1 + offset)
+
+        if not old_block:
+            insert_at = min(len(lines), hint)
+            lines[insert_at:insert_at] = new_block
+            offset += len(new_block)
+            result.applied += 1
+            continue
+
+        placed = False
+        for fuzz in range(0, MAX_CONTEXT_FUZZ + 1):
+            lead = _leading_context(body, fuzz)
+            trail = _trailing_context(body, fuzz)
+            trimmed_old = old_block[lead:len(old_block) - trail]
+            trimmed_new = new_block[lead:len(new_block) - trail]
+            if not trimmed_old:
+                break
+            start, _ = _find_block(lines, trimmed_old, hint + lead)
+            if start < 0:
+                continue
+            lines[start:start + len(trimmed_old)] = trimmed_new
+            offset += len(trimmed_new) - len(trimmed_old)
+            placed = True
+            break
+
+        if placed:
+            result.applied += 1
+        else:
+            result.failed += 1
+            result.errors.append(f"hunk {index}: context not found near line {old_start}")
+
+    result.code = "\n".join(lines) + ("\n" if code.endswith("\n") else "")
+    result.success = result.failed == 0 and result.applied > 0
+    return result
+
+
+def _leading_context(body: List[str], fuzz: int) -> int:
+    count = 0
+    for line in body:
+        if line[0] != " " or count >= fuzz:
+            break
+        count += 1
+    return count
+
+
+def _trailing_context(body: List[str], fuzz: int) -> int:
+    count = 0
+    for line in reversed(body):
+        if line[0] != " " or count >= fuzz:
+            break
+        count += 1
+    return count
+
+
+def apply_patch(code: str, patch_text: str) -> PatchResult:
+    """自动识别格式并应用补丁"""
+    patch_format = detect_patch_format(patch_text)
+    if patch_format == "search_replace":
+        return apply_search_replace(code, patch_text)
+    if patch_format == "unified_diff":
+        return apply_unified_diff(code, patch_text)
+    return PatchResult(success=False, code=code, errors=["no recognizable patch in response"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Apply SEARCH/REPLACE or unified diff patches with fuzzy matching")
+    parser.add_argument("file", help="File to patch")
+    parser.add_argument("patch", help="Patch file (SEARCH/REPLACE blocks or unified diff)")
+    parser.add_argument("-o", "--output", default=None, help="Output path (default: print to stdout)")
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8", errors="ignore") as f:
+        code = f.read()
+    with open(args.patch, "r", encoding="utf-8", errors="ignore") as f:
+        patch_text = f.read()
+
+    result = apply_patch(code, patch_text)
+    for error in result.errors:
+        print(f"[Patch] {error}", file=sys.stderr)
+    if not result.success:
+        print(f"[Patch] failed ({result.patch_format}): applied={result.applied}, failed={result.failed}", file=sys.stderr)
+        return 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(result.code)
+    else:
+        sys.stdout.write(result.code)
+    print(f"[Patch] applied {result.applied} {result.patch_format} block(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
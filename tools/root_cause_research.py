@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Root Cause Research
+triage根因检索层：
+- 多个检索源（本地知识库 / StackOverflow / DuckDuckGo）并发查询，整体超时后丢弃慢源
+- 按规范化查询缓存结果（JSON文件，TTL过期）
+- 本地知识库：目录下的 .md/.txt/.json 经验文档建立倒排索引，离线节点毫秒级返回
+- 在线源连续网络失败后进入冷却期，避免离线环境每次triage都等待超时
+
+环境变量（均可选）:
+    RESEARCH_SOURCES          逗号分隔的检索源，默认 local_kb,stackoverflow,duckduckgo
+    RESEARCH_KB_DIR           本地知识库目录
+    RESEARCH_CACHE_PATH       缓存文件路径（未设置则仅进程内缓存）
+    RESEARCH_CACHE_TTL_HOURS  缓存有效期（小时），默认72
+    RESEARCH_TIMEOUT          单次检索整体超时（秒），默认8
+    RESEARCH_OFFLINE          true时只使用本地知识库
+
+Usage:
+    python root_cause_research.py search "undefined reference to gtest main" [--kb-dir kb] [--offline]
+    python root_cause_research.py index <kb_dir>
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus
+
+import requests
+
+
+DEFAULT_SOURCES = ["local_kb", "stackoverflow", "duckduckgo"]
+KB_EXTENSIONS = (".md", ".txt", ".json")
+
+_TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "not", "are", "was", "but",
+    "into", "when", "then", "than", "have", "has", "use", "used", "using", "c++", "cpp",
+}
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：小写、去除地址/数字噪声、词项去重排序，使同义的triage根因命中同一缓存项"""
+    text = re.sub(r"0x[0-9a-fA-F]+", " ", (query or "").lower())
+    text = re.sub(r"\b\d+\b", " ", text)
+    return " ".join(sorted(set(_tokenize(text))))
+
+
+def build_research_query(root_cause: str,
+                         error_type: str = "unknown",
+                         key_symbols: Optional[List[str]] = None) -> str:
+    query_parts = [root_cause or "", error_type or "", "c++ gtest"] + list(key_symbols or [])[:3]
+    query = " ".join([p for p in query_parts if p]).strip()
+    return query or "c++ gtest compile error"
+
+
+class LocalKnowledgeBase:
+    """本地经验文档检索：按文件mtime签名惰性重建倒排索引，BM25打分"""
+
+    name = "local_kb"
+
+    def __init__(self, kb_dir: str):
+        self.kb_dir = os.path.abspath(kb_dir)
+        self._lock = threading.Lock()
+        self._signature: Optional[tuple] = None
+        self._docs: List[Dict[str, Any]] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._avg_len = 0.0
+
+    def _scan(self) -> List[str]:
+        paths: List[str] = []
+        for root, _, files in os.walk(self.kb_dir):
+            for file in files:
+                if file.lower().endswith(KB_EXTENSIONS):
+                    paths.append(os.path.join(root, file))
+        return sorted(paths)
+
+    @staticmethod
+    def _load_documents(path: str) -> List[Dict[str, str]]:
+        """一个文件可包含一篇文档（md/txt）或多条记录（json数组/对象）"""
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+
+        if path.lower().endswith(".json"):
+            try:
+                data = json.loads(content)
+            except Exception:
+                return []
+            items = data if isinstance(data, list) else [data]
+            docs = []
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                title = str(item.get("title", "") or os.path.basename(path))
+                body = str(item.get("body", "") or item.get("fix", "") or item.get("content", ""))
+                docs.append({"title": title, "body": body, "url": str(item.get("url", "") or "")})
+            return docs
+
+        lines = content.strip().splitlines()
+        title = os.path.splitext(os.path.basename(path))[0]
+        for line in lines:
+            if line.strip():
+                title = line.strip().lstrip("#").strip() or title
+                break
+        return [{"title": title, "body": content, "url": ""}]
+
+    def build_index(self, force: bool = False) -> int:
+        """（重新）建立索引，返回文档数；目录内容未变化时复用现有索引"""
+        if not os.path.isdir(self.kb_dir):
+            return 0
+        paths = self._scan()
+        signature = tuple((p, os.path.getmtime(p), os.path.getsize(p)) for p in paths)
+        with self._lock:
+            if not force and signature == self._signature:
+                return len(self._docs)
+
+            docs: List[Dict[str, Any]] = []
+            postings: Dict[str, Dict[int, int]] = {}
+            total_len = 0
+            for path in paths:
+                try:
+                    loaded = self._load_documents(path)
+                except Exception:
+                    continue
+                for doc in loaded:
+                    tokens = _tokenize(doc["title"] + " " + doc["title"] + " " + doc["body"])
+                    if not tokens:
+                        continue
+                    doc_id = len(docs)
+                    docs.append({
+                        "title": doc["title"],
+                        "body": doc["body"],
+                        "url": doc["url"] or f"file://{path}",
+                        "length": len(tokens),
+                    })
+                    total_len += len(tokens)
+                    for token in tokens:
+                        bucket = postings.setdefault(token, {})
+                        bucket[doc_id] = bucket.get(doc_id, 0) + 1
+
+            self._docs = docs
+            self._postings = postings
+            self._avg_len = (total_len / len(docs)) if docs else 0.0
+            self._signature = signature
+            return len(docs)
+
+    @staticmethod
+    def _snippet(body: str, terms: List[str], limit: int = 280) -> str:
+        lowered = body.lower()
+        positions = [lowered.find(t) for t in terms if lowered.find(t) >= 0]
+        start = max(0, min(positions) - 60) if positions else 0
+        return " ".join(body[start:start + limit * 2].split())[:limit]
+
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, str]]:
+        self.build_index()
+        terms = list(dict.fromkeys(_tokenize(query)))
+        with self._lock:
+            docs = self._docs
+            postings = self._postings
+            avg_len = self._avg_len or 1.0
+        if not docs or not terms:
+            return []
+
+        k1, b = 1.2, 0.75
+        scores: Dict[int, float] = {}
+        for term in terms:
+            bucket = postings.get(term)
+            if not bucket:
+                continue
+            idf = math.log(1 + (len(docs) - len(bucket) + 0.5) / (len(bucket) + 0.5))
+            for doc_id, tf in bucket.items():
+                norm = tf * (k1 + 1) / (tf + k1 * (1 - b + b * docs[doc_id]["length"] / avg_len))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_results]
+        return [
+            {
+                "source": self.name,
+                "title": docs[doc_id]["title"],
+                "url": docs[doc_id]["url"],
+                "snippet": self._snippet(docs[doc_id]["body"], terms),
+            }
+            for doc_id, _ in ranked
+        ]
+
+
+class StackOverflowSource:
+    name = "stackoverflow"
+    online = True
+
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, str]]:
+        so_url = (
+            "https://api.stackexchange.com/2.3/search/advanced"
+            f"?order=desc&sort=relevance&site=stackoverflow&accepted=True&pagesize={max_results}"
+            f"&q={quote_plus(query)}"
+        )
+        so_resp = requests.get(so_url, timeout=timeout)
+        references: List[Dict[str, str]] = []
+        if so_resp.ok:
+            for item in (so_resp.json().get("items") or [])[:max_results]:
+                references.append({
+                    "source": self.name,
+                    "title": str(item.get("title", "")).strip(),
+                    "url": str(item.get("link", "")).strip(),
+                    "snippet": "Accepted/relevant StackOverflow thread"
+                })
+        return references
+
+
+class DuckDuckGoSource:
+    name = "duckduckgo"
+    online = True
+
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, str]]:
+        ddg_url = (
+            "https://api.duckduckgo.com/"
+            f"?q={quote_plus(query)}&format=json&no_redirect=1&no_html=1"
+        )
+        ddg_resp = requests.get(ddg_url, timeout=timeout)
+        references: List[Dict[str, str]] = []
+        if not ddg_resp.ok:
+            return references
+
+        ddg = ddg_resp.json()
+        abstract = str(ddg.get("AbstractText", "")).strip()
+        abstract_url = str(ddg.get("AbstractURL", "")).strip()
+        heading = str(ddg.get("Heading", "")).strip() or "DuckDuckGo abstract"
+        if abstract:
+            references.append({
+                "source": self.name,
+                "title": heading,
+                "url": abstract_url,
+                "snippet": abstract[:280]
+            })
+
+        for topic in ddg.get("RelatedTopics") or []:
+            if len(references) >= max_results * 2:
+                break
+            if isinstance(topic, dict):
+                text = str(topic.get("Text", "")).strip()
+                url = str(topic.get("FirstURL", "")).strip()
+                if text and url:
+                    references.append({
+                        "source": self.name,
+                        "title": "Related topic",
+                        "url": url,
+                        "snippet": text[:280]
+                    })
+        return references
+
+
+class ResearchCache:
+    """按规范化查询缓存检索结果；提供路径时持久化为JSON文件（原子写入）"""
+
+    def __init__(self, cache_path: Optional[str] = None, ttl_seconds: float = 72 * 3600):
+        self.cache_path = os.path.abspath(cache_path) if cache_path else None
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._entries = data
+            except Exception:
+                self._entries = {}
+
+    @staticmethod
+    def make_key(query: str, max_results: int, sources: List[str]) -> str:
+        raw = f"{normalize_query(query)}|{max_results}|{','.join(sorted(sources))}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        """条目自带ttl时按条目ttl判断，否则按缓存默认ttl（0表示不过期）"""
+        ttl = float(entry.get("ttl", self.ttl_seconds) or 0)
+        return bool(ttl) and now - float(entry.get("created", 0)) > ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry or self._expired(entry, time.time()):
+            return None
+        return entry.get("result")
+
+    def put(self, key: str, result: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """写入检索结果；ttl_seconds非空时该条目使用更短的有效期（如缺少部分在线源的结果）"""
+        with self._lock:
+            now = time.time()
+            entry: Dict[str, Any] = {"created": now, "result": result}
+            if ttl_seconds is not None:
+                entry["ttl"] = max(0.0, float(ttl_seconds))
+            self._entries[key] = entry
+            self._entries = {k: v for k, v in self._entries.items() if not self._expired(v, now)}
+            if not self.cache_path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path), suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_path)
+            except Exception:
+                pass
+
+
+class RootCauseResearcher:
+    """并发查询各检索源并合并结果；本地知识库结果优先排列"""
+
+    # 在线源连续网络失败后的冷却时间（秒）
+    ONLINE_COOLDOWN_SECONDS = 600
+
+    def __init__(self,
+                 sources: Optional[List[Any]] = None,
+                 cache: Optional[ResearchCache] = None,
+                 timeout: float = 8.0):
+        self.sources = list(sources or [])
+        self.cache = cache or ResearchCache()
+        self.timeout = max(0.5, float(timeout))
+        self._lock = threading.Lock()
+        self._disabled_until: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "RootCauseResearcher":
+        offline = str(os.getenv("RESEARCH_OFFLINE", "")).strip().lower() in ("1", "true", "yes", "on")
+        names = [
+            n.strip() for n in (os.getenv("RESEARCH_SOURCES") or ",".join(DEFAULT_SOURCES)).split(",") if n.strip()
+        ]
+        kb_dir = os.getenv("RESEARCH_KB_DIR", "").strip()
+
+        sources: List[Any] = []
+        for name in names:
+            if name == "local_kb":
+                if kb_dir:
+                    sources.append(LocalKnowledgeBase(kb_dir))
+            elif offline:
+                continue
+            elif name == "stackoverflow":
+                sources.append(StackOverflowSource())
+            elif name == "duckduckgo":
+                sources.append(DuckDuckGoSource())
+
+        try:
+            ttl_hours = float(os.getenv("RESEARCH_CACHE_TTL_HOURS", "72"))
+        except ValueError:
+            ttl_hours = 72.0
+        try:
+            timeout = float(os.getenv("RESEARCH_TIMEOUT", "8"))
+        except ValueError:
+            timeout = 8.0
+        cache = ResearchCache(os.getenv("RESEARCH_CACHE_PATH", "").strip() or None, ttl_seconds=ttl_hours * 3600)
+        return cls(sources=sources, cache=cache, timeout=timeout)
+
+    def _active_sources(self) -> List[Any]:
+        now = time.time()
+        with self._lock:
+            return [s for s in self.sources if self._disabled_until.get(s.name, 0) <= now]
+
+    def research(self,
+                 root_cause: str,
+                 error_type: str = "unknown",
+                 key_symbols: Optional[List[str]] = None,
+                 max_results: int = 4) -> Dict[str, Any]:
+        """基于triage根因检索参考资料，返回结构与旧版在线检索一致（额外包含sources/cached）"""
+        max_results = max(1, int(max_results or 4))
+        query = build_research_query(root_cause, error_type, key_symbols)
+        source_names = [s.name for s in self.sources]
+        key = ResearchCache.make_key(query, max_results, source_names)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        active = self._active_sources()
+        statuses: Dict[str, str] = {s.name: "cooldown" for s in self.sources if s not in active}
+        results: Dict[str, List[Dict[str, str]]] = {}
+        network_failures = 0
+
+        if active:
+            pool = ThreadPoolExecutor(max_workers=len(active))
+            futures = {pool.submit(s.search, query, max_results, self.timeout): s for s in active}
+            done, not_done = wait(futures, timeout=self.timeout + 0.5)
+            pool.shutdown(wait=False, cancel_futures=True)
+            for future in not_done:
+                # 整体超时（如离线节点DNS挂起）同样进入冷却，后续triage不再等待该源
+                statuses[futures[future].name] = "timeout"
+                network_failures += 1
+                with self._lock:
+                    self._disabled_until[futures[future].name] = time.time() + self.ONLINE_COOLDOWN_SECONDS
+            for future in done:
+                source = futures[future]
+                try:
+                    results[source.name] = future.result() or []
+                    statuses[source.name] = "ok"
+                except requests.exceptions.RequestException as e:
+                    statuses[source.name] = f"error:{type(e).__name__}"
+                    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                        network_failures += 1
+                        with self._lock:
+                            self._disabled_until[source.name] = time.time() + self.ONLINE_COOLDOWN_SECONDS
+                except Exception as e:
+                    statuses[source.name] = f"error:{type(e).__name__}"
+
+        references: List[Dict[str, str]] = []
+        for name in source_names:
+            references.extend(results.get(name, []))
+
+        dedup: List[Dict[str, str]] = []
+        seen_urls = set()
+        for ref in references:
+            url = ref.get("url", "")
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+            dedup.append(ref)
+            if len(dedup) >= max_results:
+                break
+
+        hints = [ref.get("snippet", "") for ref in dedup if ref.get("snippet")]
+        result = {
+            "query": query,
+            "count": len(dedup),
+            "references": dedup,
+            "hints": hints[:max_results],
+            "sources": statuses,
+        }
+        # 本次有网络失败或实际查询的源出错时不缓存；处于冷却的源未被查询，不阻止缓存（离线节点上
+        # 在线源长期冷却），但此类条目只保留到冷却结束，网络恢复后重新检索以补上在线结果
+        attempted = [status for status in statuses.values() if status != "cooldown"]
+        if not network_failures and all(status == "ok" for status in attempted):
+            partial = len(attempted) < len(statuses)
+            self.cache.put(key, result, ttl_seconds=self.ONLINE_COOLDOWN_SECONDS if partial else None)
+        return dict(result, cached=False)
+
+
+_default_researcher: Optional[RootCauseResearcher] = None
+_default_lock = threading.Lock()
+
+
+def get_default_researcher() -> RootCauseResearcher:
+    """进程级共享的检索器（按环境变量配置，首次使用时创建）"""
+    global _default_researcher
+    with _default_lock:
+        if _default_researcher is None:
+            _default_researcher = RootCauseResearcher.from_env()
+        return _default_researcher
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Root-cause research (local knowledge base + online sources)")
+    sub = parser.add_subparsers(dest="command")
+
+    search_parser = sub.add_parser("search", help="Search for references to a root cause")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--kb-dir", default=None, help="Local knowledge base directory")
+    search_parser.add_argument("--offline", action="store_true", help="Only query the local knowledge base")
+    search_parser.add_argument("--max-results", type=int, default=4)
+
+    index_parser = sub.add_parser("index", help="Index a knowledge base directory and report document count")
+    index_parser.add_argument("kb_dir")
+
+    args = parser.parse_args()
+    if args.command == "index":
+        count = LocalKnowledgeBase(args.kb_dir).build_index(force=True)
+        print(f"Indexed {count} document(s) in {os.path.abspath(args.kb_dir)}")
+        return 0 if count else 1
+    if args.command != "search":
+        parser.print_help()
+        return 1
+
+    if args.kb_dir:
+        os.environ["RESEARCH_KB_DIR"] = args.kb_dir
+    if args.offline:
+        os.environ["RESEARCH_OFFLINE"] = "true"
+    started = time.time()
+    result = get_default_researcher().research(args.query, max_results=args.max_results)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"({(time.time() - started) * 1000:.0f} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Suite Aggregator
+回归运行的合并测试二进制（分片）：
+- 已通过的 *_llm_test.cpp 各自重写为独立TU：测试文件中定义的类/结构体（fixture、mock类）与TEST套件名
+  加 <函数名>__ 前缀，多个测试TU链接进同一个可执行文件时不会出现同名套件或同名类（ODR）冲突
+- 按测试目标文件的强定义符号分片：测试中的桩/mock定义不能与同分片其他测试需要的真实实现共存；
+  多个测试中文本相同的C桩只保留一份强定义（其余由objcopy弱化），不同则分到不同分片
+- 每个分片只链接一次gtest/gmock；各测试以--gtest_filter单独启动进程（生产代码的全局/静态状态互不影响），
+  XML结果按套件名映射回各测试
+
+Usage:
+    python suite_aggregator.py rewrite <test.cpp> --prefix <function_name>
+"""
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+SUITE_SEPARATOR = "__"
+
+_MAIN_RE = re.compile(r'\bint\s+main\s*\(')
+_CLASS_DEF_RE = re.compile(r'\b(?:class|struct)\s+([A-Za-z_]\w*)\s*(?:final\s*)?(?=\{|:(?!:))')
+_SUITE_RE = re.compile(r'\b(TEST|TEST_F|TEST_P)\s*\(\s*([A-Za-z_]\w*)\s*,')
+# 改写时保持原样的片段：注释、字符串/字符字面量（含前缀与原始字符串）、#include行
+_PROTECTED_RE = re.compile(
+    r'//[^\n]*'
+    r'|/\*.*?\*/'
+    r'|(?<!\w)(?:u8|[uUL])?R"(?P<delim>[^()\\\s"]{0,16})\(.*?\)(?P=delim)"'
+    r'|(?:(?<!\w)(?:u8|[uUL]))?"(?:\\.|[^"\\\n])*"'
+    r"|(?:(?<!\w)(?:u8|[uUL])|(?<!\w))'(?:\\.|[^'\\\n])+'"
+    r'|^[ \t]*#[ \t]*include\b[^\n]*',
+    re.DOTALL | re.MULTILINE
+)
+
+
+def _code_sub(pattern: "re.Pattern", repl: Callable[["re.Match"], str], code: str) -> str:
+    """只在代码部分做替换，注释、字面量与#include行保持原样"""
+    parts: List[str] = []
+    pos = 0
+    for match in _PROTECTED_RE.finditer(code):
+        parts.append(pattern.sub(repl, code[pos:match.start()]))
+        parts.append(match.group(0))
+        pos = match.end()
+    parts.append(pattern.sub(repl, code[pos:]))
+    return "".join(parts)
+
+
+def _code_only(code: str) -> str:
+    """注释、字面量与#include行替换为空白后的源码（用于查找定义）"""
+    return _PROTECTED_RE.sub(lambda match: " " * len(match.group(0)), code)
+
+
+def rewrite_for_aggregate(code: str, prefix: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    重写测试源码以便与其他测试TU合并链接
+
+    Args:
+        code: 测试文件内容
+        prefix: 套件/类名前缀（通常为被测函数名）
+
+    Returns:
+        (重写后的源码, 套件名列表)；自带main或没有TEST/TEST_F/TEST_P时返回None（该测试不参与合并）
+    """
+    code_only = _code_only(code)
+    if _MAIN_RE.search(code_only):
+        return None
+    tag = f"{prefix}{SUITE_SEPARATOR}"
+    classes = sorted(set(_CLASS_DEF_RE.findall(code_only)))
+    rewritten = code
+    if classes:
+        class_re = re.compile(r'\b(' + '|'.join(re.escape(name) for name in classes) + r')\b')
+        # 字符串（断言消息、期望输出）、注释与#include行（头文件名可能与类名相同）保持原样
+        rewritten = _code_sub(class_re, lambda m: tag + m.group(1), code)
+
+    suites: List[str] = []
+
+    def _rename_suite(match: "re.Match") -> str:
+        name = match.group(2)
+        if not name.startswith(tag):
+            name = tag + name
+        if name not in suites:
+            suites.append(name)
+        return f"{match.group(1)}({name},"
+
+    rewritten = _code_sub(_SUITE_RE, _rename_suite, rewritten)
+    if not suites:
+        return None
+    return rewritten, suites
+
+
+def c_definition_text(code: str, symbol: str) -> Optional[str]:
+    """提取C函数定义（签名+函数体，空白归一化），用于判断多个测试中的同名桩是否相同；找不到返回None"""
+    for match in re.finditer(rf'(?m)^[^\n;{{}}#]*\b{re.escape(symbol)}\s*\(', code):
+        depth = 0
+        pos = match.end() - 1
+        while pos < len(code):
+            if code[pos] == '(':
+                depth += 1
+            elif code[pos] == ')':
+                depth -= 1
+                if depth == 0:
+                    break
+            pos += 1
+        rest = code[pos + 1:]
+        body = rest.lstrip()
+        if not body.startswith('{'):
+            continue
+        start = pos + 1 + len(rest) - len(body)
+        depth = 0
+        for end in range(start, len(code)):
+            if code[end] == '{':
+                depth += 1
+            elif code[end] == '}':
+                depth -= 1
+                if depth == 0:
+                    return " ".join(code[match.start():end + 1].split())
+        return None
+    return None
+
+
+@dataclass
+class AggregateUnit:
+    """参与合并的单个测试"""
+    name: str
+    object_path: str
+    include_dirs: List[str]
+    suites: List[str]
+    sources: List[str]
+    # 测试目标文件的强定义符号
+    defined: Set[str] = field(default_factory=set)
+    # 所链接生产TU定义、且测试未自行替换的符号（需要真实实现）
+    required: Set[str] = field(default_factory=set)
+    # C符号定义文本（None表示无法比较，只能独占）
+    definition_texts: Dict[str, Optional[str]] = field(default_factory=dict)
+
+
+@dataclass
+class AggregateShard:
+    """一个合并测试二进制"""
+    units: List[AggregateUnit] = field(default_factory=list)
+    # 符号 -> (持有强定义的测试, 定义文本)
+    definitions: Dict[str, Tuple[str, Optional[str]]] = field(default_factory=dict)
+
+    def accepts(self, unit: AggregateUnit) -> bool:
+        if self.units and self.units[0].include_dirs != unit.include_dirs:
+            return False
+        for other in self.units:
+            if unit.defined & other.required or other.defined & unit.required:
+                return False
+        for symbol in unit.defined.intersection(self.definitions):
+            text = unit.definition_texts.get(symbol)
+            if text is None or text != self.definitions[symbol][1]:
+                return False
+        return True
+
+    def add(self, unit: AggregateUnit) -> None:
+        self.units.append(unit)
+        for symbol in unit.defined:
+            self.definitions.setdefault(symbol, (unit.name, unit.definition_texts.get(symbol)))
+
+    def sources(self) -> List[str]:
+        ordered: List[str] = []
+        for unit in self.units:
+            ordered.extend(source for source in unit.sources if source not in ordered)
+        return ordered
+
+    def duplicate_symbols(self, unit: AggregateUnit) -> List[str]:
+        """该测试中需要弱化的重复定义（强定义保留在首个加入分片的测试中）"""
+        return sorted(symbol for symbol in unit.defined if self.definitions[symbol][0] != unit.name)
+
+
+def plan_shards(units: List[AggregateUnit], shard_count: int) -> List[AggregateShard]:
+    """
+    贪心分片：每个测试放入可兼容且测试数最少的分片；前shard_count个分片都冲突时新开分片
+
+    Returns:
+        非空分片列表（数量可能超过shard_count）
+    """
+    shards = [AggregateShard() for _ in range(max(1, shard_count))]
+    for unit in units:
+        compatible = [shard for shard in shards if shard.accepts(unit)]
+        if not compatible:
+            shards.append(AggregateShard())
+            compatible = [shards[-1]]
+        min(compatible, key=lambda shard: len(shard.units)).add(unit)
+    return [shard for shard in shards if shard.units]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rewrite generated gtest files for combined shard binaries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rewrite_parser = sub.add_parser("rewrite", help="Print the aggregate-ready rewrite of a test file")
+    rewrite_parser.add_argument("test_file", help="*_llm_test.cpp file")
+    rewrite_parser.add_argument("--prefix", required=True, help="Suite/class prefix (usually the function name)")
+    args = parser.parse_args()
+
+    with open(args.test_file, "r", encoding="utf-8") as f:
+        rewritten = rewrite_for_aggregate(f.read(), args.prefix)
+    if rewritten is None:
+        print("[Aggregate] not eligible (custom main or no TEST/TEST_F/TEST_P)", file=sys.stderr)
+        return 1
+    code, suites = rewritten
+    print(code)
+    print(f"[Aggregate] suites: {' '.join(suites)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
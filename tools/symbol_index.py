@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Symbol Index
+生产代码目标文件的外部符号索引（nm）：
+- 每个目标文件记录 已定义 / 未定义 的外部符号，持久化到构建缓存目录（symbols/index.json）
+- 目标文件由build_cache.ObjectCache按内容寻址生成，索引按 路径 + 大小 + mtime 校验，
+  只对新增或变化的目标文件重新运行nm（增量更新），文件已不存在的条目在保存时清理
+- link_closure：从测试目标文件的未定义符号出发，求满足引用所需的最小生产TU传递闭包，
+  替代“只链接目标函数所在文件 / 链接全部源码”二选一
+
+环境变量:
+    UT_BUILD_CACHE       关闭时不建立索引（生产代码不再编译为缓存目标文件）
+    UT_BUILD_CACHE_DIR   缓存根目录（索引位于其下 symbols/）
+
+Usage:
+    python symbol_index.py show <obj.o>
+    python symbol_index.py closure <test.o> <prod.o> [<prod.o> ...] [--seed <prod.o>]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from build_cache import cache_enabled, default_cache_dir
+
+
+INDEX_SCHEMA = "v1"
+
+# nm -P 类型码：U=未定义；w/v=弱引用（可缺省，不参与闭包）；其余大写与W/V为已定义
+_UNDEFINED_TYPES = {"U"}
+_WEAK_UNDEFINED_TYPES = {"w", "v"}
+_WEAK_DEFINED_TYPES = {"W", "V"}
+
+
+def parse_nm_output(text: str, strong_only: bool = False) -> Tuple[Set[str], Set[str]]:
+    """解析 nm -P -g 输出，返回 (已定义符号, 未定义符号)；strong_only时已定义符号不含弱定义（内联函数、模板实例等）"""
+    defined: Set[str] = set()
+    undefined: Set[str] = set()
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.endswith(":"):
+            continue
+        name, symbol_type = parts[0], parts[1]
+        if symbol_type in _UNDEFINED_TYPES:
+            undefined.add(name)
+        elif symbol_type in _WEAK_UNDEFINED_TYPES:
+            continue
+        elif strong_only and symbol_type in _WEAK_DEFINED_TYPES:
+            continue
+        elif symbol_type.isupper():
+            defined.add(name)
+    return defined, undefined - defined
+
+
+class SymbolIndex:
+    """目标文件符号索引（线程安全；进程间以原子替换写入，最后写入者生效）"""
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, index_dir: Optional[str] = None, nm_path: Optional[str] = None):
+        self.index_dir = os.path.abspath(index_dir or os.path.join(default_cache_dir(), "symbols"))
+        self.index_path = os.path.join(self.index_dir, self.INDEX_FILE)
+        self.nm_path = nm_path or shutil.which("nm") or ""
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._dirty = False
+        self.stats = {"hits": 0, "scanned": 0}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.nm_path)
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            entries: Dict[str, Dict] = {}
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and data.get("schema") == INDEX_SCHEMA:
+                    entries = data.get("objects", {}) or {}
+            except (OSError, ValueError):
+                entries = {}
+            self._entries = entries
+        return self._entries
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[List[int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def read_symbols(self, object_path: str, strong_only: bool = False) -> Optional[Tuple[Set[str], Set[str]]]:
+        """直接运行nm读取目标文件符号（不经过索引，测试目标文件等临时产物使用）"""
+        if not self.available:
+            return None
+        try:
+            result = subprocess.run(
+                [self.nm_path, "-P", "-g", object_path],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return parse_nm_output(result.stdout, strong_only=strong_only)
+
+    def update(self, object_paths: Sequence[str]) -> Dict[str, Dict]:
+        """
+        确保各目标文件都在索引中且未过期，必要时并行运行nm
+
+        Returns:
+            {目标文件绝对路径: {"defined": [...], "undefined": [...]}}；nm失败的目标文件不在结果中
+        """
+        paths = [os.path.abspath(path) for path in object_paths]
+        stamps = {path: self._stamp(path) for path in paths}
+        with self._lock:
+            entries = self._load()
+            stale = [
+                path for path in paths
+                if stamps[path] is not None and (entries.get(path) or {}).get("stamp") != stamps[path]
+            ]
+            self.stats["hits"] += len(paths) - len(stale)
+
+        if stale:
+            workers = max(1, min(len(stale), os.cpu_count() or 4))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                scanned = list(executor.map(self.read_symbols, stale))
+            with self._lock:
+                for path, symbols in zip(stale, scanned):
+                    if symbols is None:
+                        continue
+                    self._entries[path] = {
+                        "stamp": stamps[path],
+                        "defined": sorted(symbols[0]),
+                        "undefined": sorted(symbols[1]),
+                    }
+                    self.stats["scanned"] += 1
+                    self._dirty = True
+            self.save()
+
+        with self._lock:
+            return {path: self._entries[path] for path in paths if path in self._entries}
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            live = {path: entry for path, entry in self._entries.items() if os.path.isfile(path)}
+            self._entries = live
+            payload = {"schema": INDEX_SCHEMA, "objects": live}
+            try:
+                os.makedirs(self.index_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix=".index-", dir=self.index_dir)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False)
+                os.replace(tmp_path, self.index_path)
+                self._dirty = False
+            except OSError:
+                pass
+
+    def link_closure(self,
+                     test_objects: Sequence[str],
+                     candidates: Dict[str, str],
+                     seed_sources: Sequence[str] = (),
+                     allow_test_overrides: bool = False) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        求测试所需的最小生产TU集合
+
+        Args:
+            test_objects: 测试侧目标文件（测试TU、桩TU），其已定义符号视为已满足
+            candidates: {生产源文件: 对应目标文件}
+            seed_sources: 必须链接的源文件（如目标函数所在TU）
+            allow_test_overrides: 生产目标文件已弱符号化时为True，测试中的同名定义覆盖生产实现，不视为冲突
+
+        Returns:
+            (按加入顺序的源文件列表, 任何候选TU都无法提供的未定义符号)；nm不可用或测试目标文件无法读取时返回None
+        """
+        test_defined: Set[str] = set()
+        pending: deque = deque()
+        for test_object in test_objects:
+            symbols = self.read_symbols(test_object)
+            if symbols is None:
+                return None
+            test_defined |= symbols[0]
+            pending.extend(sorted(symbols[1]))
+
+        by_object = self.update(list(candidates.values()))
+        symbols_by_source: Dict[str, Dict] = {}
+        providers: Dict[str, List[str]] = {}
+        for source, object_path in candidates.items():
+            entry = by_object.get(os.path.abspath(object_path))
+            if entry is None:
+                continue
+            symbols_by_source[source] = entry
+            for symbol in entry["defined"]:
+                providers.setdefault(symbol, []).append(source)
+
+        selected: List[str] = []
+        provided: Set[str] = set(test_defined)
+
+        def _select(source: str) -> None:
+            selected.append(source)
+            entry = symbols_by_source.get(source) or {}
+            provided.update(entry.get("defined", []))
+            pending.extend(entry.get("undefined", []))
+
+        for source in seed_sources:
+            if source in candidates and source not in selected:
+                _select(source)
+
+        unresolved: Set[str] = set()
+        while pending:
+            symbol = pending.popleft()
+            if symbol in provided or symbol in unresolved:
+                continue
+            owners = [source for source in providers.get(symbol, []) if source not in selected]
+            # 与测试自身定义（mock/桩）冲突的TU会造成重复定义，优先选无冲突的提供者；全部冲突时留给链接桩处理
+            if not allow_test_overrides:
+                owners = [
+                    source for source in owners
+                    if not test_defined.intersection(symbols_by_source[source]["defined"])
+                ]
+            if not owners:
+                unresolved.add(symbol)
+                continue
+            _select(owners[0])
+
+        return selected, sorted(unresolved)
+
+
+_default_index: Optional[SymbolIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_default_symbol_index() -> Optional[SymbolIndex]:
+    """进程级共享的符号索引；UT_BUILD_CACHE关闭或找不到nm时返回None"""
+    global _default_index
+    if not cache_enabled():
+        return None
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SymbolIndex()
+        return _default_index if _default_index.available else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="nm-based symbol index for minimal test link sets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show_parser = sub.add_parser("show", help="Show defined/undefined external symbols of an object")
+    show_parser.add_argument("object", help="Object file")
+    closure_parser = sub.add_parser("closure", help="Compute the minimal set of production objects for a test object")
+    closure_parser.add_argument("test_object", help="Compiled test object")
+    closure_parser.add_argument("objects", nargs="+", help="Candidate production objects")
+    closure_parser.add_argument("--seed", action="append", default=[], help="Object that must be linked (repeatable)")
+    args = parser.parse_args()
+
+    index = SymbolIndex()
+    if not index.available:
+        print("[SymbolIndex] nm not found", file=sys.stderr)
+        return 1
+
+    if args.command == "show":
+        entry = index.update([args.object]).get(os.path.abspath(args.object))
+        if entry is None:
+            print(f"[SymbolIndex] cannot read symbols: {args.object}", file=sys.stderr)
+            return 1
+        print(f"defined ({len(entry['defined'])}): {' '.join(entry['defined'])}")
+        print(f"undefined ({len(entry['undefined'])}): {' '.join(entry['undefined'])}")
+        return 0
+
+    closure = index.link_closure([args.test_object], {obj: obj for obj in args.objects}, seed_sources=args.seed)
+    if closure is None:
+        print(f"[SymbolIndex] cannot read symbols: {args.test_object}", file=sys.stderr)
+        return 1
+    selected, unresolved = closure
+    print(f"Link set ({len(selected)}/{len(args.objects)}):")
+    for obj in selected:
+        print(f"  {obj}")
+    print(f"Unresolved by candidates ({len(unresolved)}): {' '.join(unresolved)}")
+    print(f"[SymbolIndex] hits={index.stats['hits']} scanned={index.stats['scanned']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,20 @@ import subprocess
 import shutil
 import re
 import difflib
+import hashlib
 import shlex
+import signal
+import stat
 import xml.etree.ElementTree as ET
 import tempfile
+import threading
+import queue
+import contextlib
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, Callable, Set
 
 # 添加tools目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
@@ -28,6 +35,121 @@ from compile_commands_analyzer import CompileCommandsAnalyzer
 from llm_client import VLLMClient, create_client
 from llm_test_generator import LLMTestGenerator
 from experience_store import ExperienceStore
+from build_cache import (
+    get_default_gtest_cache,
+    get_default_object_cache,
+    get_default_pch_cache,
+    get_default_weak_object_cache,
+)
+from clangd_session import ClangdSession, format_diagnostics as format_clangd_diagnostics
+from symbol_index import get_default_symbol_index
+from suite_aggregator import AggregateShard, AggregateUnit, c_definition_text, plan_shards, rewrite_for_aggregate
+from llm_metrics import format_summary as format_llm_metrics_summary
+
+
+def _current_umask() -> int:
+    """读取进程umask（os.umask只能先设置再恢复，因此只在导入时调用一次）"""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _current_umask()
+
+
+class _ThreadTaggedStream:
+    """并发测试流水线的stdout包装：按线程缓冲到整行，加上测试名前缀后整行写出，避免输出交错"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def set_tag(self, tag: Optional[str]) -> None:
+        pending = getattr(self._local, "buffer", "")
+        if pending:
+            self._emit([pending])
+        self._local.tag = tag
+        self._local.buffer = ""
+
+    def _emit(self, lines: List[str]) -> None:
+        tag = getattr(self._local, "tag", None)
+        with self._lock:
+            self._stream.write("".join(f"[{tag}] {line}\n" if tag and line else f"{line}\n" for line in lines))
+
+    def write(self, text: str) -> int:
+        if not getattr(self._local, "tag", None):
+            with self._lock:
+                return self._stream.write(text)
+        parts = (getattr(self._local, "buffer", "") + text).split("\n")
+        self._local.buffer = parts.pop()
+        if parts:
+            self._emit(parts)
+        return len(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _LinkStubUnit:
+    """
+    链接桩的独立翻译单元（内置分步编译路径）：未解析符号的桩写入build目录下的单独.cpp，
+    新增/删除桩只需重编这个小TU并重新链接，测试TU目标文件保持不变
+    """
+
+    def __init__(self, source_path: str, object_path: str):
+        self.source_path = source_path
+        self.object_path = object_path
+        self.includes: List[str] = []
+        self.variables: Dict[str, str] = {}
+        self.functions: Dict[str, str] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.variables) + list(self.functions)
+
+    def add(self, symbol: str, definition: str, is_variable: bool, includes: List[str]) -> None:
+        target = self.variables if is_variable else self.functions
+        target[symbol] = definition
+        for header in includes:
+            if header not in self.includes:
+                self.includes.append(header)
+
+    def remove(self, symbols: List[str]) -> List[str]:
+        removed = []
+        for symbol in symbols:
+            if self.variables.pop(symbol, None) is not None or self.functions.pop(symbol, None) is not None:
+                removed.append(symbol)
+        return removed
+
+    def render_block(self) -> str:
+        """桩定义文本（含所需头文件，头文件有include guard，可直接追加到测试文件）"""
+        lines: List[str] = []
+        if self.includes and self.functions:
+            lines.append('extern "C" {')
+            lines.extend(f'#include "{header}"' for header in self.includes)
+            lines.append("}")
+        lines.extend(self.variables.values())
+        if self.functions:
+            lines.append('extern "C" {')
+            lines.extend(self.functions.values())
+            lines.append("}")
+        return "\n".join(lines)
+
+    def link_inputs(self) -> List[str]:
+        """桩TU已编译时返回其目标文件（供推测式修复候选等一步构建命令链接）"""
+        return [self.object_path] if self.symbols and os.path.isfile(self.object_path) else []
+
+    def write(self) -> None:
+        os.makedirs(os.path.dirname(self.source_path), exist_ok=True)
+        with open(self.source_path, 'w', encoding='utf-8') as f:
+            f.write("// Auto-generated link stubs (folded into the test file once its pipeline passes)\n")
+            f.write("#include <stdint.h>\n\n")
+            f.write(self.render_block() + "\n")
 
 
 class LLMUTWorkflow:
@@ -46,7 +168,26 @@ class LLMUTWorkflow:
                  compile_command_template: Optional[str] = None,
                  compile_command_cwd: Optional[str] = None,
                  run_command_template: Optional[str] = None,
-                 run_command_cwd: Optional[str] = None):
+                 run_command_cwd: Optional[str] = None,
+                 generation_workers: int = 1,
+                 generation_mode: str = "function",
+                 generation_batch_size: int = 6,
+                 header_slicing: str = "tu",
+                 repair_output: str = "full",
+                 patch_max_tokens: int = 8192,
+                 speculative_candidates: int = 1,
+                 fused_triage_fix: bool = False,
+                 domain_classify: str = "rules_first",
+                 test_workers: int = 1,
+                 compile_jobs: int = 0,
+                 llm_inflight: int = 0,
+                 pipeline_mode: str = "phased",
+                 pipeline_queue_size: int = 2,
+                 cmake_generator: str = "auto",
+                 clangd_session_enabled: bool = True,
+                 syntax_preflight_enabled: bool = True,
+                 mocking_mode: str = "off",
+                 aggregate_shards: int = 0):
         """
         初始化工作流
         
@@ -60,6 +201,25 @@ class LLMUTWorkflow:
             src_dir: 源文件目录（相对于project_dir，默认'src'）
             llm_api_base: vLLM API地址（可通过环境变量 VLLM_API_BASE 覆盖）
             llm_model: 模型名称（可通过环境变量 VLLM_MODEL 覆盖）
+            generation_workers: 测试生成并发worker数（1为串行）
+            generation_mode: 生成模式 function / tu_batch
+            generation_batch_size: tu_batch模式下每个提示词最多包含的函数数
+            header_slicing: 提示词中头文件的切片模式 full / tu / function
+            repair_output: 修复输出模式 full（整文件重写）/ patch（编辑块，失败回退整文件）
+            patch_max_tokens: patch模式下修复请求的max_tokens
+            speculative_candidates: 每轮修复并发生成并并行验证的候选数（1为关闭推测式修复）
+            fused_triage_fix: 是否在一次LLM请求中同时返回诊断JSON与修复
+            domain_classify: 失败分流策略 rules_first（高置信度规则直接判定，其余交给LLM）/ llm（总是先问LLM）
+            test_workers: 并发执行的测试流水线数（编译/修复/运行，1为串行）
+            compile_jobs: 并发编译进程上限（0表示与test_workers相同）
+            llm_inflight: 同时在途的LLM请求上限（0表示不限制）
+            pipeline_mode: phased（生成/校验/质量闸门/编译运行逐阶段执行）/ streaming（各测试文件生成后立即流入后续阶段）
+            pipeline_queue_size: streaming模式下相邻阶段之间的有界队列容量
+            cmake_generator: 测试构建目录首次配置使用的CMake生成器（auto=可用时用Ninja；空串=CMake默认）
+            clangd_session_enabled: 预修复诊断复用长驻clangd LSP会话（失败时回退 clangd --check）
+            syntax_preflight_enabled: 完整编译链接前先对测试TU做 -fsyntax-only 检查，前端错误直接进入修复循环
+            mocking_mode: off（同TU被调函数不可mock）/ weak（链接弱符号化的生产目标文件，测试可替换任意被调函数）
+            aggregate_shards: 回归运行时把上次已通过的测试合并链接为约N个分片二进制运行（0为关闭，逐测试编译运行）
         """
         self.project_dir = os.path.abspath(project_dir)
         
@@ -85,6 +245,8 @@ class LLMUTWorkflow:
         # 初始化LLM客户端（VLLMClient内部也会检查环境变量）
         print(f"[Init] Connecting to vLLM at {final_api_base}...")
         self.llm_client = VLLMClient(api_base=final_api_base, model=final_model)
+        if not os.getenv('LLM_METRICS_PATH'):
+            self.llm_client.metrics.set_path(os.path.join(self.project_dir, "log", "llm_metrics.jsonl"))
         
         # 初始化LLM测试生成器（传入compile_analyzer用于提取完整的include）
         self.test_generator = LLMTestGenerator(self.llm_client, compile_analyzer=self.compile_analyzer)
@@ -92,6 +254,36 @@ class LLMUTWorkflow:
         self.experience_learning_enabled = bool(experience_learning_enabled)
         self.experience_top_k = max(1, int(experience_top_k or 3))
         self.cmakelists_autogen_enabled = bool(cmakelists_autogen_enabled)
+        self.generation_workers = max(1, int(generation_workers or 1))
+        self.generation_mode = str(generation_mode or "function").strip().lower()
+        self.generation_batch_size = max(1, int(generation_batch_size or 1))
+        self.test_generator.header_slicing = str(header_slicing or "tu").strip().lower()
+        self.test_generator.repair_output = str(repair_output or "full").strip().lower()
+        self.test_generator.patch_max_tokens = max(256, int(patch_max_tokens or 8192))
+        self.speculative_candidates = max(1, int(speculative_candidates or 1))
+        self.fused_triage_fix = bool(fused_triage_fix)
+        self.domain_classify = str(domain_classify or "rules_first").strip().lower()
+        # 失败分流结果按错误指纹缓存：同一CMake/测试错误在多个测试间只分类一次
+        self._issue_domain_cache: Dict[str, str] = {}
+        self._issue_domain_lock = threading.Lock()
+        self._domain_classify_stats = {"rule": 0, "memo": 0, "llm": 0, "fallback": 0}
+        self.test_workers = max(1, int(test_workers or 1))
+        self.compile_jobs = max(0, int(compile_jobs or 0))
+        self.llm_inflight = max(0, int(llm_inflight or 0))
+        self.pipeline_mode = str(pipeline_mode or "phased").strip().lower()
+        self.pipeline_queue_size = max(1, int(pipeline_queue_size or 2))
+        self.cmake_generator = str(cmake_generator if cmake_generator is not None else "auto").strip()
+        # 并发测试流水线共享资源：编译槽位、CMakeLists同步、函数状态索引
+        self._compile_semaphore: Optional[threading.BoundedSemaphore] = None
+        self._cmake_lock = threading.RLock()
+        self._status_index_lock = threading.Lock()
+        # 长驻clangd会话：按compile_commands目录复用（""表示通过LSP下发单文件编译命令）
+        self.clangd_session_enabled = bool(clangd_session_enabled)
+        self.syntax_preflight_enabled = bool(syntax_preflight_enabled)
+        self.mocking_mode = str(mocking_mode or "off").strip().lower()
+        self.aggregate_shards = max(0, int(aggregate_shards or 0))
+        self._clangd_sessions: Dict[str, Optional[ClangdSession]] = {}
+        self._clangd_sessions_lock = threading.Lock()
         self.experience_store = None
         self.function_status_index_path = os.path.join(
             self.project_dir,
@@ -223,11 +415,12 @@ class LLMUTWorkflow:
                     bg_code="45"
                 )
                 try:
-                    self.ensure_cmakelists_for_tests(
-                        test_dir=self.test_dir,
-                        compile_cwd=cwd,
-                        target_functions=self._current_target_functions_for_cmake_sync
-                    )
+                    with self._cmake_lock:
+                        self.ensure_cmakelists_for_tests(
+                            test_dir=self.test_dir,
+                            compile_cwd=cwd,
+                            target_functions=self._current_target_functions_for_cmake_sync
+                        )
                     retry_result = subprocess.run(
                         step_cmd,
                         shell=True,
@@ -248,11 +441,12 @@ class LLMUTWorkflow:
                         continue
 
                     retry_evidence = ((retry_result.stdout or "") + "\n" + (retry_result.stderr or "")).strip()
-                    llm_fixed = self._llm_repair_cmakelists(
-                        evidence=retry_evidence,
-                        compile_cwd=cwd,
-                        test_dir=self.test_dir
-                    )
+                    with self._cmake_lock:
+                        llm_fixed = self._llm_repair_cmakelists(
+                            evidence=retry_evidence,
+                            compile_cwd=cwd,
+                            test_dir=self.test_dir
+                        )
                     if llm_fixed:
                         retry2_result = subprocess.run(
                             step_cmd,
@@ -343,6 +537,71 @@ class LLMUTWorkflow:
 
         return "other"
 
+    # 高置信度规则：命中即直接判定，不再请求LLM
+    DOMAIN_RULE_MIN_CONFIDENCE = 0.9
+    _STRONG_CMAKE_PATTERNS = [
+        re.compile(r'cmake error at [^\n]*cmakelists\.txt'),
+        re.compile(r'does not appear to contain cmakelists\.txt'),
+        re.compile(r'unknown cmake command'),
+        re.compile(r'no sources given to target'),
+        re.compile(r'cannot find source file'),
+        re.compile(r'cannot specify link libraries for target'),
+        re.compile(r'no rule to make target [^\n]*cmakelists\.txt'),
+    ]
+    _STRONG_TEST_CASE_PATTERNS = [
+        re.compile(r'_llm_test\.cpp:\d+(?::\d+)?: (?:fatal )?error'),
+        re.compile(r'_llm_test\.cpp:\d+: failure'),
+        re.compile(r'^\[  failed  \] ', re.MULTILINE),
+        re.compile(r'actual function call count doesn\'t match'),
+        re.compile(r'expected equality of these values'),
+    ]
+    _STRONG_OTHER_PATTERNS = [
+        re.compile(r'(?:^|: )(?:[\w.+-]+: )?command not found'),
+        re.compile(r'no space left on device'),
+        re.compile(r'permission denied'),
+        re.compile(r'fatal error: [\w./+-]+\.h(?:pp)?: no such file or directory'),
+    ]
+
+    @classmethod
+    def _rule_classify_issue_domain(cls, output_text: str) -> Tuple[str, float]:
+        """规则快速分流：只有一类强信号时给出高置信度结论；信号冲突或只有弱信号时交给LLM"""
+        text = str(output_text or "").lower()
+        if not text:
+            return "unknown", 0.0
+
+        hits = {
+            "cmakelists": any(p.search(text) for p in cls._STRONG_CMAKE_PATTERNS),
+            "test_case": any(p.search(text) for p in cls._STRONG_TEST_CASE_PATTERNS),
+            "other": any(p.search(text) for p in cls._STRONG_OTHER_PATTERNS),
+        }
+        matched = [domain for domain, hit in hits.items() if hit]
+        if len(matched) == 1:
+            return matched[0], 0.95
+
+        # 弱信号只给低置信度，保留原有规则结果供LLM失败时回退
+        return cls._classify_command_issue_domain(text), 0.5
+
+    @classmethod
+    def _build_domain_fingerprint(cls, output_text: str, phase_hint: str) -> str:
+        """去掉测试文件名、路径、行号与数字后的错误指纹，使不同测试中的同类错误命中同一缓存项"""
+        signal_lines = []
+        for line in str(output_text or "").splitlines():
+            lowered = line.strip().lower()
+            if not lowered or not re.search(r'error|fail|undefined|not found|no such|cannot|denied', lowered):
+                continue
+            lowered = re.sub(r'[\w./\\-]*_llm_test\.(?:cpp|cc|cxx)', '<test>', lowered)
+            lowered = re.sub(r'(?:[a-z]:)?(?:[\\/][\w.+-]+)+[\\/]([\w.+-]+)', r'\1', lowered)
+            lowered = re.sub(r'0x[0-9a-f]+|\d+', 'n', lowered)
+            signal_lines.append(lowered)
+            if len(signal_lines) >= 6:
+                break
+        if not signal_lines:
+            signal_lines = [str(output_text or "").strip().lower()[:240]]
+        return cls._build_issue_fingerprint(
+            error_type=f"domain:{phase_hint}",
+            root_cause=" | ".join(signal_lines)
+        )
+
     @staticmethod
     def _extract_json_object_from_text(raw_text: str) -> Optional[Dict[str, Any]]:
         text = str(raw_text or "").strip()
@@ -369,7 +628,7 @@ class LLMUTWorkflow:
         return None
 
     def _classify_issue_domain(self, output_text: str, phase_hint: str = "compile") -> str:
-        """先交给LLM分流，失败时回退到规则分流。"""
+        """按错误指纹缓存分流结果；高置信度规则直接判定，其余交给LLM，LLM失败时回退到规则分流。"""
         text = str(output_text or "").strip()
         if not text:
             return "unknown"
@@ -381,6 +640,34 @@ class LLMUTWorkflow:
             )
             return "test_case"
 
+        fingerprint = self._build_domain_fingerprint(text, phase_hint)
+        with self._issue_domain_lock:
+            cached = self._issue_domain_cache.get(fingerprint)
+            if cached:
+                self._domain_classify_stats["memo"] += 1
+        if cached:
+            self._print_key_event(f"[DomainMemo] domain={cached} (same failure fingerprint seen before)", bg_code="46")
+            return cached
+
+        domain, cacheable = self._classify_issue_domain_uncached(text, phase_hint)
+        if cacheable:
+            with self._issue_domain_lock:
+                self._issue_domain_cache[fingerprint] = domain
+        return domain
+
+    def _classify_issue_domain_uncached(self, text: str, phase_hint: str) -> Tuple[str, bool]:
+        """返回(分流结果, 是否可缓存)；LLM失败后的规则回退不缓存，下次同类错误仍会重试LLM"""
+        if self.domain_classify != "llm":
+            rule_domain, rule_confidence = self._rule_classify_issue_domain(text)
+            if rule_confidence >= self.DOMAIN_RULE_MIN_CONFIDENCE:
+                with self._issue_domain_lock:
+                    self._domain_classify_stats["rule"] += 1
+                self._print_key_event(
+                    f"[DomainRule] domain={rule_domain}, confidence={rule_confidence:.2f} (LLM skipped)",
+                    bg_code="46"
+                )
+                return rule_domain, True
+
         prompt = f"""You are classifying build/test failure domain for a C/C++ unit-test workflow.
 Return STRICT JSON only:
 {{"domain":"cmakelists|test_case|other","confidence":0.0,"reason":"short"}}
@@ -404,7 +691,8 @@ Evidence:
                 prompt,
                 temperature=0.0,
                 max_tokens=120,
-                top_p=0.9
+                top_p=0.9,
+                phase="domain_classify"
             )
             parsed = self._extract_json_object_from_text(response)
             if isinstance(parsed, dict):
@@ -416,16 +704,20 @@ Evidence:
                         f"[DomainLLM] domain={domain}, confidence={confidence}, reason={reason[:80]}",
                         bg_code="46"
                     )
-                    return domain
+                    with self._issue_domain_lock:
+                        self._domain_classify_stats["llm"] += 1
+                    return domain, True
         except Exception as llm_domain_error:
             print(f"  ⚠ LLM domain classify failed, fallback to rules: {llm_domain_error}")
 
         fallback = self._classify_command_issue_domain(text)
+        with self._issue_domain_lock:
+            self._domain_classify_stats["fallback"] += 1
         self._print_key_event(
             f"[DomainFallback] domain={fallback}",
             bg_code="45"
         )
-        return fallback
+        return fallback, False
 
     @staticmethod
     def _normalize_command_template(value) -> str:
@@ -467,8 +759,7 @@ Evidence:
             "updated_at": datetime.now().isoformat(),
             "functions": functions,
         }
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        self._write_text_file_atomic(path, json.dumps(payload, ensure_ascii=False, indent=2))
 
     def _update_function_status_index(self,
                                       updates: Dict[str, str],
@@ -477,20 +768,21 @@ Evidence:
         if not updates:
             return
 
-        existing = self._load_function_status_index()
-        updated_at = datetime.now().isoformat()
-        for function_name, status in updates.items():
-            if not function_name:
-                continue
-            existing[function_name] = {
-                "status": str(status),
-                "updated_at": updated_at,
-                "test_file": f"{function_name}_llm_test.cpp",
-                "last_timestamp": str(timestamp),
-                "log_dir": str(log_dir).replace('\\', '/')
-            }
-
-        self._save_function_status_index(existing)
+        with self._status_index_lock:
+            existing = self._load_function_status_index()
+            updated_at = datetime.now().isoformat()
+            for function_name, status in updates.items():
+                if not function_name:
+                    continue
+                existing[function_name] = {
+                    "status": str(status),
+                    "updated_at": updated_at,
+                    "test_file": f"{function_name}_llm_test.cpp",
+                    "last_timestamp": str(timestamp),
+                    "log_dir": str(log_dir).replace('\\', '/')
+                }
+
+            self._save_function_status_index(existing)
     
     @classmethod
     def from_config(cls, config_file: str, 
@@ -572,6 +864,33 @@ Evidence:
         llm_model = llm_config.get('model', 'qwen-coder')
         compile_fix_cfg = config.get('test_generation', {}).get('compile_fix', {})
         exec_cfg = config.get('test_generation', {}).get('execution', {})
+        generation_cfg = config.get('test_generation', {}).get('generation', {})
+        if not isinstance(generation_cfg, dict):
+            generation_cfg = {}
+        try:
+            generation_workers = max(1, int(generation_cfg.get('workers', 1) or 1))
+        except (TypeError, ValueError):
+            generation_workers = 1
+        generation_mode = str(generation_cfg.get('mode', 'function') or 'function').strip().lower()
+        try:
+            generation_batch_size = max(1, int(generation_cfg.get('batch_size', 6) or 6))
+        except (TypeError, ValueError):
+            generation_batch_size = 6
+        header_slicing = str(generation_cfg.get('header_slicing', 'tu') or 'tu').strip().lower()
+        mocking_mode = str(generation_cfg.get('mocking_mode', 'off') or 'off').strip().lower()
+        repair_output = str(compile_fix_cfg.get('repair_output', 'full') or 'full').strip().lower()
+        try:
+            patch_max_tokens = max(256, int(compile_fix_cfg.get('patch_max_tokens', 8192) or 8192))
+        except (TypeError, ValueError):
+            patch_max_tokens = 8192
+        try:
+            speculative_candidates = max(1, int(compile_fix_cfg.get('speculative_candidates', 1) or 1))
+        except (TypeError, ValueError):
+            speculative_candidates = 1
+        fused_triage_fix = bool(compile_fix_cfg.get('fused_triage_fix', False))
+        clangd_session_enabled = bool(compile_fix_cfg.get('clangd_session', True))
+        syntax_preflight_enabled = bool(compile_fix_cfg.get('syntax_preflight', True))
+        domain_classify = str(compile_fix_cfg.get('domain_classify', 'rules_first') or 'rules_first').strip().lower()
         experience_learning_enabled = bool(compile_fix_cfg.get('experience_learning_enabled', True))
         experience_top_k = int(compile_fix_cfg.get('experience_top_k', 3) or 3)
         cmakelists_autogen_enabled = bool(compile_fix_cfg.get('cmakelists_autogen_enabled', False))
@@ -592,6 +911,14 @@ Evidence:
 
         if llm_config.get('timeout') is not None and 'VLLM_TIMEOUT' not in os.environ:
             os.environ['VLLM_TIMEOUT'] = str(llm_config.get('timeout'))
+        if llm_config.get('endpoints') and 'VLLM_API_BASES' not in os.environ:
+            os.environ['VLLM_API_BASES'] = ",".join(str(x) for x in llm_config.get('endpoints'))
+        if llm_config.get('eject_after_failures') is not None and 'VLLM_EJECT_AFTER_FAILURES' not in os.environ:
+            os.environ['VLLM_EJECT_AFTER_FAILURES'] = str(llm_config.get('eject_after_failures'))
+        if llm_config.get('eject_seconds') is not None and 'VLLM_EJECT_SECONDS' not in os.environ:
+            os.environ['VLLM_EJECT_SECONDS'] = str(llm_config.get('eject_seconds'))
+        if llm_config.get('stream') is not None and 'VLLM_STREAM' not in os.environ:
+            os.environ['VLLM_STREAM'] = str(llm_config.get('stream'))
 
         ollama_config = llm_config.get('ollama', {})
         if ollama_config.get('api_base') and 'OLLAMA_API_BASE' not in os.environ:
@@ -604,6 +931,48 @@ Evidence:
             os.environ['OLLAMA_MAX_TOKENS'] = str(ollama_config.get('max_tokens'))
         if ollama_config.get('fallback_from_vllm') is not None and 'VLLM_FALLBACK_TO_OLLAMA' not in os.environ:
             os.environ['VLLM_FALLBACK_TO_OLLAMA'] = str(ollama_config.get('fallback_from_vllm'))
+        if ollama_config.get('api') and 'OLLAMA_API' not in os.environ:
+            os.environ['OLLAMA_API'] = str(ollama_config.get('api'))
+        if ollama_config.get('keep_alive') is not None and 'OLLAMA_KEEP_ALIVE' not in os.environ:
+            os.environ['OLLAMA_KEEP_ALIVE'] = str(ollama_config.get('keep_alive'))
+        if ollama_config.get('stream') is not None and 'OLLAMA_STREAM' not in os.environ:
+            os.environ['OLLAMA_STREAM'] = str(ollama_config.get('stream'))
+        if ollama_config.get('num_parallel') is not None and 'OLLAMA_NUM_PARALLEL' not in os.environ:
+            os.environ['OLLAMA_NUM_PARALLEL'] = str(ollama_config.get('num_parallel'))
+
+        # 透传构建产物缓存配置
+        artifact_cache_cfg = config.get('build', {}).get('artifact_cache', {})
+        if isinstance(artifact_cache_cfg, dict):
+            if artifact_cache_cfg.get('enabled') is not None and 'UT_BUILD_CACHE' not in os.environ:
+                os.environ['UT_BUILD_CACHE'] = str(artifact_cache_cfg.get('enabled'))
+            if artifact_cache_cfg.get('dir') and 'UT_BUILD_CACHE_DIR' not in os.environ:
+                os.environ['UT_BUILD_CACHE_DIR'] = os.path.abspath(os.path.expanduser(str(artifact_cache_cfg.get('dir'))))
+            if artifact_cache_cfg.get('precompiled_headers') is not None and 'UT_BUILD_PCH' not in os.environ:
+                os.environ['UT_BUILD_PCH'] = str(artifact_cache_cfg.get('precompiled_headers'))
+
+        # 透传根因检索配置（知识库目录相对配置文件，缓存路径相对项目根目录）
+        research_cfg = config.get('test_generation', {}).get('research', {})
+        if not isinstance(research_cfg, dict):
+            research_cfg = {}
+        if research_cfg.get('sources') and 'RESEARCH_SOURCES' not in os.environ:
+            sources = research_cfg.get('sources')
+            os.environ['RESEARCH_SOURCES'] = ",".join(str(x) for x in sources) if isinstance(sources, list) else str(sources)
+        if research_cfg.get('kb_dir') and 'RESEARCH_KB_DIR' not in os.environ:
+            kb_dir = str(research_cfg.get('kb_dir'))
+            if not os.path.isabs(kb_dir):
+                kb_dir = os.path.join(config_dir, kb_dir)
+            os.environ['RESEARCH_KB_DIR'] = os.path.abspath(kb_dir)
+        if research_cfg.get('cache_path') and 'RESEARCH_CACHE_PATH' not in os.environ:
+            cache_path = str(research_cfg.get('cache_path'))
+            if not os.path.isabs(cache_path):
+                cache_path = os.path.join(project_root, cache_path)
+            os.environ['RESEARCH_CACHE_PATH'] = os.path.abspath(cache_path)
+        if research_cfg.get('cache_ttl_hours') is not None and 'RESEARCH_CACHE_TTL_HOURS' not in os.environ:
+            os.environ['RESEARCH_CACHE_TTL_HOURS'] = str(research_cfg.get('cache_ttl_hours'))
+        if research_cfg.get('timeout_seconds') is not None and 'RESEARCH_TIMEOUT' not in os.environ:
+            os.environ['RESEARCH_TIMEOUT'] = str(research_cfg.get('timeout_seconds'))
+        if research_cfg.get('offline') is not None and 'RESEARCH_OFFLINE' not in os.environ:
+            os.environ['RESEARCH_OFFLINE'] = str(research_cfg.get('offline'))
         
         print(f"[Config] Loading from: {config_path}")
         print(f"[Config] Project root: {project_root}")
@@ -625,6 +994,29 @@ Evidence:
         compile_cwd = str(compile_exec_cfg.get('cwd', '')).strip() if isinstance(compile_exec_cfg, dict) else ''
         run_template = cls._normalize_command_template(run_raw)
         run_cwd = str(run_exec_cfg.get('cwd', '')).strip() if isinstance(run_exec_cfg, dict) else ''
+        exec_knobs = exec_cfg if isinstance(exec_cfg, dict) else {}
+        try:
+            test_workers = max(1, int(exec_knobs.get('test_workers', 1) or 1))
+        except (TypeError, ValueError):
+            test_workers = 1
+        try:
+            compile_jobs = max(0, int(exec_knobs.get('compile_jobs', 0) or 0))
+        except (TypeError, ValueError):
+            compile_jobs = 0
+        try:
+            llm_inflight = max(0, int(exec_knobs.get('llm_inflight', 0) or 0))
+        except (TypeError, ValueError):
+            llm_inflight = 0
+        pipeline_mode = str(exec_knobs.get('pipeline_mode', 'phased') or 'phased').strip().lower()
+        cmake_generator = str(config.get('build', {}).get('cmake_generator', 'auto') or '').strip()
+        try:
+            pipeline_queue_size = max(1, int(exec_knobs.get('pipeline_queue_size', 2) or 2))
+        except (TypeError, ValueError):
+            pipeline_queue_size = 2
+        try:
+            aggregate_shards = max(0, int(exec_knobs.get('aggregate_shards', 0) or 0))
+        except (TypeError, ValueError):
+            aggregate_shards = 0
 
         return cls(
             project_dir=project_root,
@@ -641,7 +1033,26 @@ Evidence:
             compile_command_template=compile_template,
             compile_command_cwd=compile_cwd,
             run_command_template=run_template,
-            run_command_cwd=run_cwd
+            run_command_cwd=run_cwd,
+            generation_workers=generation_workers,
+            generation_mode=generation_mode,
+            generation_batch_size=generation_batch_size,
+            header_slicing=header_slicing,
+            repair_output=repair_output,
+            patch_max_tokens=patch_max_tokens,
+            speculative_candidates=speculative_candidates,
+            fused_triage_fix=fused_triage_fix,
+            domain_classify=domain_classify,
+            test_workers=test_workers,
+            compile_jobs=compile_jobs,
+            llm_inflight=llm_inflight,
+            pipeline_mode=pipeline_mode,
+            pipeline_queue_size=pipeline_queue_size,
+            cmake_generator=cmake_generator,
+            clangd_session_enabled=clangd_session_enabled,
+            syntax_preflight_enabled=syntax_preflight_enabled,
+            mocking_mode=mocking_mode,
+            aggregate_shards=aggregate_shards
         )
 
     @staticmethod
@@ -814,7 +1225,8 @@ Evidence:
             "failure_locations": [],
             "tests": 0,
             "failures": 0,
-            "errors": 0
+            "errors": 0,
+            "suites": {}
         }
         if not xml_path or (not os.path.exists(xml_path)):
             return result
@@ -825,6 +1237,8 @@ Evidence:
             suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
             failed_tests: List[str] = []
             failure_locations: List[Dict[str, object]] = []
+            # 套件名 -> [用例数, 失败用例数]
+            suite_counts: Dict[str, List[int]] = {}
 
             tests = int(root.attrib.get("tests", 0) or 0)
             failures = int(root.attrib.get("failures", 0) or 0)
@@ -838,8 +1252,11 @@ Evidence:
                     full_name = f"{class_name}.{case_name}" if class_name else case_name
 
                     failure_nodes = list(case.findall("failure")) + list(case.findall("error"))
+                    counts = suite_counts.setdefault(suite_name, [0, 0])
+                    counts[0] += 1
                     if failure_nodes:
                         failed_tests.append(full_name)
+                        counts[1] += 1
 
                     for node in failure_nodes:
                         message = (node.attrib.get("message", "") or (node.text or "")).strip()
@@ -858,6 +1275,7 @@ Evidence:
             result["tests"] = tests
             result["failures"] = failures
             result["errors"] = errors
+            result["suites"] = suite_counts
             return result
         except Exception as xml_error:
             result["parse_error"] = str(xml_error)
@@ -1028,13 +1446,21 @@ Evidence:
         self.compile_analyzer.print_summary()
     
     def generate_tests(self, target_functions: Optional[List[str]] = None,
-                      output_dir: Optional[str] = None) -> Dict[str, str]:
+                      output_dir: Optional[str] = None,
+                      workers: Optional[int] = None,
+                      mode: Optional[str] = None,
+                      batch_size: Optional[int] = None,
+                      on_test_saved: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
         """
         生成单元测试
         
         Args:
             target_functions: 目标函数名列表（None表示全部）
             output_dir: 输出目录
+            workers: 并发生成的worker数（None表示使用self.generation_workers；1为串行）
+            mode: function=每个函数一个提示词；tu_batch=同一源文件的函数合并为一个提示词
+            batch_size: tu_batch模式下每个提示词最多包含的函数数
+            on_test_saved: 每个测试文件保存成功后的回调 (函数名, 测试文件路径)，流式流水线据此把文件送入后续阶段；并发生成时在生成线程中调用，回调需线程安全
             
         Returns:
             {函数名: 测试代码}
@@ -1046,6 +1472,7 @@ Evidence:
             output_dir = self.test_dir
         
         os.makedirs(output_dir, exist_ok=True)
+        self._apply_llm_inflight_limit()
         
         functions = self.code_analyzer.get_all_functions()
         
@@ -1068,55 +1495,156 @@ Evidence:
             compile_info_map[src_file] = compile_info
         
         results = {}
+
+        # 按源文件(TU)分组调度：同TU函数连续发送，共享的头文件/include前缀可命中vLLM前缀缓存
+        scheduled = sorted(targets.items(), key=lambda item: (item[1].source_file or "", item[0]))
+        self.test_generator.reset_prefix_cache_stats()
+
+        effective_mode = str(mode or self.generation_mode or "function").strip().lower()
+        effective_batch_size = max(1, int(batch_size if batch_size is not None else self.generation_batch_size))
+
+        # 生成任务单元：function模式每个函数一个任务；tu_batch模式同一源文件最多batch_size个函数一个任务
+        jobs: List[List[Tuple[str, Any]]] = []
+        if effective_mode == "tu_batch":
+            for fname, fdep in scheduled:
+                if (
+                    jobs
+                    and jobs[-1][0][1].source_file == fdep.source_file
+                    and len(jobs[-1]) < effective_batch_size
+                ):
+                    jobs[-1].append((fname, fdep))
+                else:
+                    jobs.append([(fname, fdep)])
+        else:
+            jobs = [[(fname, fdep)] for fname, fdep in scheduled]
+
+        effective_workers = max(1, int(workers if workers is not None else self.generation_workers))
+        effective_workers = min(effective_workers, max(1, len(jobs)))
         
         print(f"Generating tests for {len(targets)} functions...")
-        for i, (fname, fdep) in enumerate(targets.items(), 1):
-            print(f"\n[{i}/{len(targets)}] {fname}() from {fdep.source_file}")
-            
-            # 获取编译信息
-            compile_info = compile_info_map.get(fdep.source_file)
-
-            same_tu_symbols = sorted([
-                other_name
-                for other_name, other_dep in functions.items()
-                if other_name != fname and other_dep.source_file == fdep.source_file
-            ])
-            same_tu_external_calls = sorted([
-                symbol for symbol in fdep.external_calls
-                if symbol in same_tu_symbols
-            ])
-
-            extra_context = ""
-            if same_tu_external_calls:
-                extra_context = (
-                    "Linkage constraint: The following called symbols are implemented in the same "
-                    f"source file as target function '{fname}': "
-                    + ", ".join(same_tu_external_calls)
-                    + ". Do NOT redefine/mock-wrap these symbols in test file; "
-                      "let production object provide them to avoid duplicate-definition linker errors."
-                )
-            
-            # 生成测试（传递项目根目录）
-            test_code = self.test_generator.generate_test_file(
-                fdep,
-                compile_info=compile_info,
-                extra_context=extra_context,
-                project_root=self.project_dir
-            )
-            
-            results[fname] = test_code
-            
-            # 保存到文件
+        if effective_mode == "tu_batch":
+            print(f"[Generate] TU batch mode: {len(jobs)} prompt(s), up to {effective_batch_size} function(s) per prompt")
+        if effective_workers > 1:
+            print(f"[Generate] Concurrent mode: {effective_workers} worker(s)")
+
+        def _save(fname: str, test_code: str) -> Tuple[str, str, Optional[str]]:
             test_filename = os.path.join(output_dir, f"{fname}_llm_test.cpp")
             try:
-                with open(test_filename, 'w', encoding='utf-8') as f:
-                    f.write(test_code)
-                print(f"  ✓ Saved to {test_filename}")
+                self._write_text_file_atomic(test_filename, test_code)
             except Exception as e:
-                print(f"  ✗ Failed to save: {e}")
+                return test_code, test_filename, str(e)
+            # 在生成worker内立即回调：流式流水线不必等待调度顺序更靠前的慢任务（只有进度日志按顺序输出）
+            if on_test_saved is not None:
+                on_test_saved(fname, test_filename)
+            return test_code, test_filename, None
+
+        def _generate_job(job: List[Tuple[str, Any]]) -> Dict[str, Tuple[str, str, Optional[str]]]:
+            first_dep = job[0][1]
+            compile_info = compile_info_map.get(first_dep.source_file)
+            if len(job) == 1:
+                fname, fdep = job[0]
+                codes = {
+                    fname: self.test_generator.generate_test_file(
+                        fdep,
+                        compile_info=compile_info,
+                        extra_context=self._build_same_tu_linkage_context(fname, fdep, functions),
+                        project_root=self.project_dir
+                    )
+                }
+            else:
+                codes = self.test_generator.generate_tu_batch_tests(
+                    [fdep for _, fdep in job],
+                    compile_info=compile_info,
+                    extra_contexts={
+                        fname: self._build_same_tu_linkage_context(fname, fdep, functions)
+                        for fname, fdep in job
+                    },
+                    project_root=self.project_dir
+                )
+            return {fname: _save(fname, codes.get(fname, "")) for fname, _ in job}
+
+        def _report(fname: str, outcome: Tuple[str, str, Optional[str]]) -> None:
+            test_code, test_filename, save_error = outcome
+            results[fname] = test_code
+            if save_error:
+                print(f"  ✗ Failed to save: {save_error}")
+            else:
+                print(f"  ✓ Saved to {test_filename}")
+
+        index = 0
+
+        def _report_job(job: List[Tuple[str, Any]], outcomes: Optional[Dict[str, Tuple[str, str, Optional[str]]]],
+                        error: Optional[Exception] = None) -> None:
+            nonlocal index
+            for fname, fdep in job:
+                index += 1
+                print(f"\n[{index}/{len(targets)}] {fname}() from {fdep.source_file}")
+                if error is not None or outcomes is None:
+                    print(f"  ✗ Generation failed: {error}")
+                else:
+                    _report(fname, outcomes[fname])
+
+        if effective_workers <= 1:
+            for job in jobs:
+                if len(job) == 1:
+                    fname, fdep = job[0]
+                    index += 1
+                    print(f"\n[{index}/{len(targets)}] {fname}() from {fdep.source_file}")
+                    _report(fname, _generate_job(job)[fname])
+                else:
+                    _report_job(job, _generate_job(job))
+        else:
+            # 并发提交，按调度顺序依次等待并输出进度，保证日志有序
+            with ThreadPoolExecutor(max_workers=effective_workers) as executor:
+                futures = [executor.submit(_generate_job, job) for job in jobs]
+                for job, future in zip(jobs, futures):
+                    try:
+                        _report_job(job, future.result())
+                    except Exception as e:
+                        _report_job(job, None, e)
+
+        prefix_stats = self.test_generator.get_prefix_cache_stats()
+        if prefix_stats.get("prompts", 0) > 1:
+            print(
+                f"\n[PrefixCache] {prefix_stats['prompts']} prompt(s), "
+                f"shared prefix {prefix_stats['shared_prefix_chars']}/{prefix_stats['prompt_chars']} chars "
+                f"({prefix_stats['shared_ratio'] * 100:.1f}%), "
+                f"~{prefix_stats['estimated_saved_prefill_tokens']} prefill tokens reusable"
+            )
         
         return results
 
+    def _build_same_tu_linkage_context(self, fname: str, fdep, functions: Dict[str, Any]) -> str:
+        """同一源文件内被调用的符号由生产目标文件提供，提示模型不要在测试中重定义（weak模式下则允许替换）。"""
+        same_tu_symbols = sorted([
+            other_name
+            for other_name, other_dep in functions.items()
+            if other_name != fname and other_dep.source_file == fdep.source_file
+        ])
+        same_tu_external_calls = sorted([
+            symbol for symbol in fdep.external_calls
+            if symbol in same_tu_symbols
+        ])
+
+        if not same_tu_external_calls:
+            return ""
+        if self._weak_mocking_active():
+            return (
+                "Linkage note: production objects are linked with weak symbols. The following callees are "
+                f"implemented in the same source file as target function '{fname}': "
+                + ", ".join(same_tu_external_calls)
+                + ". You MAY replace any of them (and any other callee) with a fake/mock by defining a function "
+                  "with the exact same signature inside extern \"C\" in the test file; the test definition "
+                  "overrides the production one at link time. Do not redefine the target function itself."
+            )
+        return (
+            "Linkage constraint: The following called symbols are implemented in the same "
+            f"source file as target function '{fname}': "
+            + ", ".join(same_tu_external_calls)
+            + ". Do NOT redefine/mock-wrap these symbols in test file; "
+              "let production object provide them to avoid duplicate-definition linker errors."
+        )
+
     @staticmethod
     def _resolve_target_test_files(test_dir: str,
                                    target_functions: Optional[List[str]] = None) -> List[str]:
@@ -1140,6 +1668,40 @@ Evidence:
         with open(path, 'w', encoding='utf-8') as f:
             f.write(content)
 
+    @staticmethod
+    def _write_text_file_atomic(path: str, content: str) -> None:
+        """先写同目录临时文件再os.replace，避免并发/中断时留下半截文件。"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 临时文件以.tmp结尾，避免被按 *_llm_test.cpp 扫描测试目录的逻辑当作测试文件
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            # mkstemp创建的文件是0600：沿用原文件权限，新文件按umask（与open()创建时一致）
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def _write_text_file_if_changed(cls, path: str, content: str) -> bool:
+        """内容相同则不写（保持mtime，避免触发CMake重新配置/重新构建），返回是否写入。"""
+        if os.path.isfile(path):
+            try:
+                if cls._read_text_file(path) == content:
+                    return False
+            except (OSError, UnicodeDecodeError):
+                pass
+        cls._write_text_file_atomic(path, content)
+        return True
+
     @staticmethod
     def _normalize_cmake_path(path_text: str) -> str:
         return str(path_text or "").replace('\\', '/')
@@ -1153,10 +1715,10 @@ Evidence:
         block = f"{begin_marker}\n{block_body.rstrip()}\n{end_marker}"
         if begin_marker in content and end_marker in content:
             pattern = re.compile(
-                rf"{re.escape(begin_marker)}[\\s\\S]*?{re.escape(end_marker)}",
+                rf"{re.escape(begin_marker)}[\s\S]*?{re.escape(end_marker)}",
                 re.MULTILINE
             )
-            return pattern.sub(block, content, count=1)
+            return pattern.sub(lambda _: block, content, count=1)
 
         if content and not content.endswith('\n'):
             content += '\n'
@@ -1179,6 +1741,25 @@ Evidence:
         end_targets = "# <<< LLM AUTO TEST TARGETS END <<<"
         block_targets = (
             "if(LLM_GENERATED_TEST_SOURCES)\n"
+            "  # gtest/gmock预编译头只在独立目标中生成一次，各测试目标REUSE_FROM复用（-DLLM_TEST_DISABLE_PCH=ON关闭）\n"
+            "  if(NOT LLM_TEST_DISABLE_PCH AND NOT TARGET llm_test_pch)\n"
+            "    set(llm_test_pch_src \"${CMAKE_CURRENT_BINARY_DIR}/llm_test_pch.cpp\")\n"
+            "    if(NOT EXISTS \"${llm_test_pch_src}\")\n"
+            "      file(WRITE \"${llm_test_pch_src}\" \"// precompiled gtest/gmock header owner\\n\")\n"
+            "    endif()\n"
+            "    add_library(llm_test_pch STATIC \"${llm_test_pch_src}\")\n"
+            "    if(TARGET GTest::gtest)\n"
+            "      target_link_libraries(llm_test_pch PRIVATE GTest::gtest)\n"
+            "    elseif(TARGET gtest)\n"
+            "      target_link_libraries(llm_test_pch PRIVATE gtest)\n"
+            "    endif()\n"
+            "    target_precompile_headers(llm_test_pch PRIVATE <gtest/gtest.h>)\n"
+            "    if(TARGET GTest::gmock OR TARGET gmock)\n"
+            "      target_link_libraries(llm_test_pch PRIVATE $<IF:$<TARGET_EXISTS:GTest::gmock>,GTest::gmock,gmock>)\n"
+            "      target_precompile_headers(llm_test_pch PRIVATE <gmock/gmock.h>)\n"
+            "    endif()\n"
+            "  endif()\n"
+            "\n"
             "  foreach(llm_test_src IN LISTS LLM_GENERATED_TEST_SOURCES)\n"
             "    get_filename_component(llm_test_name \"${llm_test_src}\" NAME_WE)\n"
             "    if(TARGET ${llm_test_name})\n"
@@ -1198,6 +1779,14 @@ Evidence:
             "    elseif(TARGET gtest)\n"
             "      target_link_libraries(${llm_test_name} PRIVATE gtest)\n"
             "    endif()\n"
+            "    if(TARGET GTest::gmock)\n"
+            "      target_link_libraries(${llm_test_name} PRIVATE GTest::gmock)\n"
+            "    elseif(TARGET gmock)\n"
+            "      target_link_libraries(${llm_test_name} PRIVATE gmock)\n"
+            "    endif()\n"
+            "    if(TARGET llm_test_pch)\n"
+            "      target_precompile_headers(${llm_test_name} REUSE_FROM llm_test_pch)\n"
+            "    endif()\n"
             "\n"
             "    add_test(NAME ${llm_test_name} COMMAND ${llm_test_name})\n"
             "  endforeach()\n"
@@ -1220,7 +1809,8 @@ Evidence:
                 f"{begin_targets}\n{block_targets}\n{end_targets}\n"
             )
 
-        self._write_text_file(cmake_path, updated)
+        if not self._write_text_file_if_changed(cmake_path, updated):
+            print(f"[CMakeSync] unchanged: {cmake_path}")
         return cmake_path
 
     def _llm_repair_cmakelists(self,
@@ -1270,7 +1860,8 @@ test/CMakeLists.txt current:
                 prompt,
                 temperature=0.0,
                 max_tokens=2500,
-                top_p=0.9
+                top_p=0.9,
+                phase="cmake_repair"
             )
             parsed = self._extract_json_object_from_text(response)
             if not isinstance(parsed, dict):
@@ -1336,7 +1927,8 @@ test/CMakeLists.txt current:
                 f"{begin}\n{block_body}\n{end}\n"
             )
 
-        self._write_text_file(cmake_path, updated)
+        if not self._write_text_file_if_changed(cmake_path, updated):
+            print(f"[CMakeSync] unchanged: {cmake_path}")
         return cmake_path
 
     def ensure_cmakelists_for_tests(self,
@@ -1384,27 +1976,33 @@ test/CMakeLists.txt current:
         # 基本的验证
         all_valid = True
         for test_file in test_files:
-            filepath = os.path.join(test_dir, test_file)
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 检查必要的包含
-            has_gtest = (
-                '#include <gtest/gtest.h>' in content
-                or '#include "gtest/gtest.h"' in content
-            )
-            has_tests = 'TEST(' in content or 'TEST_F(' in content
-            has_assertions = 'EXPECT_' in content or 'ASSERT_' in content
-            
-            if has_gtest and has_tests and has_assertions:
-                print(f"  ✓ {test_file} - Valid")
-            else:
-                print(f"  ✗ {test_file} - Invalid (missing gtest={has_gtest}, tests={has_tests}, assertions={has_assertions})")
+            if not self._verify_test_file(test_dir, test_file):
                 all_valid = False
         
         return all_valid
 
+    @staticmethod
+    def _verify_test_file(test_dir: str, test_file: str) -> bool:
+        """单个测试文件的基本检查：gtest头文件、测试用例、断言"""
+        filepath = os.path.join(test_dir, test_file)
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        # 检查必要的包含
+        has_gtest = (
+            '#include <gtest/gtest.h>' in content
+            or '#include "gtest/gtest.h"' in content
+        )
+        has_tests = 'TEST(' in content or 'TEST_F(' in content
+        has_assertions = 'EXPECT_' in content or 'ASSERT_' in content
+        
+        if has_gtest and has_tests and has_assertions:
+            print(f"  ✓ {test_file} - Valid")
+            return True
+        print(f"  ✗ {test_file} - Invalid (missing gtest={has_gtest}, tests={has_tests}, assertions={has_assertions})")
+        return False
+
     def run_quality_gates(self,
                           test_dir: Optional[str] = None,
                           strict: bool = False,
@@ -1561,11 +2159,13 @@ test/CMakeLists.txt current:
     def _resolve_gtest_link_inputs(self,
                                    include_dirs: List[str],
                                    build_path: str,
-                                   prefer_sources: bool = False) -> List[str]:
+                                   prefer_sources: bool = False,
+                                   compiler_path: Optional[str] = None) -> List[str]:
         """
         解析gtest链接输入，优先级：
         1) 本地已构建的静态库（libgtest_main/libgtest）
-        2) gtest源码（gtest-all.cc + gtest_main.cc）
+        2) gtest源码（gtest-all.cc + gtest_main.cc）：提供compiler_path时先由源码构建一次静态库并放入
+           机器级产物缓存（build_cache），构建失败才把源码直接加入每个测试的编译
         3) 系统库回退（-lgtest -lgtest_main）
         """
         candidate_roots = [
@@ -1629,6 +2229,15 @@ test/CMakeLists.txt current:
                                 include_dirs.append(gmock_include_inc)
                             source_inputs.insert(0, gmock_all)
 
+                    cached_libs = self._cached_gtest_libraries(
+                        compiler_path,
+                        gtest_root,
+                        gmock_root if len(source_inputs) > 2 else None
+                    )
+                    if cached_libs:
+                        print(f"[Link] Using cached gtest/gmock libs: {', '.join(cached_libs)}")
+                        return cached_libs
+
                     print(f"[Link] Using gtest/gmock sources: {', '.join(source_inputs)}")
                     return source_inputs
             return None
@@ -1677,6 +2286,23 @@ test/CMakeLists.txt current:
         print("[Link] Fallback to system gtest libs: -lgtest -lgtest_main")
         return ["-lgtest", "-lgtest_main"]
 
+    def _cached_gtest_libraries(self,
+                                compiler_path: Optional[str],
+                                gtest_root: str,
+                                gmock_root: Optional[str]) -> Optional[List[str]]:
+        """从机器级产物缓存获取（必要时构建一次）与测试编译参数一致的gtest/gmock静态库"""
+        if not compiler_path:
+            return None
+        gtest_cache = get_default_gtest_cache()
+        if gtest_cache is None:
+            return None
+        flags = self.MSVC_TEST_CXX_FLAGS if self._is_msvc_compiler(compiler_path) else self.GNU_TEST_CXX_FLAGS
+        try:
+            return gtest_cache.get_libraries(compiler_path, gtest_root, gmock_root, flags)
+        except Exception as cache_error:
+            print(f"[BuildCache] gtest cache unavailable, compiling sources per test: {cache_error}")
+            return None
+
     @staticmethod
     def _is_toolchain_link_error(stderr_text: str) -> bool:
         """判断是否为工具链/库缺失类错误（不适合LLM改代码修复）"""
@@ -2005,7 +2631,8 @@ clangd raw output:
                 prompt,
                 temperature=0.0,
                 max_tokens=500,
-                top_p=0.9
+                top_p=0.9,
+                phase="clangd_normalize"
             )
             parsed = self._extract_json_object_from_text(response)
             if not isinstance(parsed, dict):
@@ -2097,6 +2724,23 @@ clangd raw output:
                 elif os.path.isdir(candidate):
                     selected_cc_dir = os.path.abspath(candidate)
 
+        if self.clangd_session_enabled:
+            session = self._get_clangd_session(clangd_path, selected_cc_dir)
+            if session is not None:
+                if not selected_cc_dir:
+                    session.set_compile_command(test_abs, cc_entry["directory"], cc_entry_args)
+                lsp_diagnostics = session.check(test_abs)
+                if lsp_diagnostics is not None:
+                    diagnostics = format_clangd_diagnostics(test_abs, lsp_diagnostics)
+                    if diagnostics:
+                        source_label = f"clangd-lsp db={selected_cc_dir}" if selected_cc_dir else "clangd-lsp"
+                        self._print_key_event(
+                            f"[PreCompileCheck] diagnostics source={source_label} ({len(diagnostics)} errors)",
+                            bg_code="46"
+                        )
+                    return diagnostics
+                print("[PreCompileCheck] clangd LSP session timed out -> fallback clangd --check")
+
         try:
             if selected_cc_dir:
                 run_cmd = list(cmd)
@@ -2203,6 +2847,44 @@ clangd raw output:
 
         return diagnostics
 
+    def _get_clangd_session(self, clangd_path: str, compile_commands_dir: str) -> Optional[ClangdSession]:
+        """获取（必要时启动）长驻clangd会话；启动失败的key记为None，本轮不再重试"""
+        with self._clangd_sessions_lock:
+            if compile_commands_dir in self._clangd_sessions:
+                session = self._clangd_sessions[compile_commands_dir]
+                if session is None or session.alive:
+                    return session
+            session = ClangdSession(
+                clangd_path,
+                root_dir=self.project_dir,
+                compile_commands_dir=compile_commands_dir or None
+            )
+            if session.start():
+                print(f"[PreCompileCheck] clangd LSP session started (db={compile_commands_dir or 'inline'})")
+            else:
+                print("[PreCompileCheck] clangd LSP session unavailable -> fallback clangd --check")
+                session = None
+            self._clangd_sessions[compile_commands_dir] = session
+            return session
+
+    def _release_clangd_document(self, test_path: str) -> None:
+        with self._clangd_sessions_lock:
+            sessions = [session for session in self._clangd_sessions.values() if session is not None]
+        for session in sessions:
+            session.close_document(test_path)
+
+    def _close_clangd_sessions(self) -> None:
+        with self._clangd_sessions_lock:
+            sessions = [session for session in self._clangd_sessions.values() if session is not None]
+            self._clangd_sessions.clear()
+        for session in sessions:
+            stats = session.stats
+            print(
+                f"[PreCompileCheck] clangd LSP session closed "
+                f"(opens={stats['opens']}, changes={stats['changes']}, timeouts={stats['timeouts']})"
+            )
+            session.close()
+
     @staticmethod
     def _print_clang_diagnostics_table(test_path: str,
                                        diagnostics: List[str],
@@ -2542,18 +3224,15 @@ clangd raw output:
                 dedup.append(item)
         return updated, dedup
 
-    def _inject_linker_stubs(self, test_path: str, symbols: List[str]) -> List[str]:
-        """向测试文件注入最小C链接桩函数，解决与目标测试无关的未解析符号。"""
-        if not symbols:
-            return []
-
-        with open(test_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+    def _render_linker_stub_definitions(self, content: str, symbols: List[str]) -> List[Tuple[str, str, bool]]:
+        """
+        为未解析符号生成最小C链接桩定义（测试代码中已出现的符号跳过）
 
+        Returns:
+            [(符号, 定义文本, 是否为变量)]
+        """
         function_map = self.code_analyzer.get_all_functions()
-        stubs: List[str] = []
-        vars_to_define: List[str] = []
-        injected_symbols: List[str] = []
+        definitions: List[Tuple[str, str, bool]] = []
 
         for symbol in symbols:
             if symbol == "g_next_id":
@@ -2562,8 +3241,7 @@ clangd raw output:
                     content
                 ) is not None
                 if not has_definition:
-                    vars_to_define.append("int32_t g_next_id = 0;")
-                    injected_symbols.append(symbol)
+                    definitions.append((symbol, "int32_t g_next_id = 0;", True))
                 continue
 
             if re.search(rf"\b{re.escape(symbol)}\s*\(", content):
@@ -2598,15 +3276,24 @@ clangd raw output:
             else:
                 body = f"return ({return_type})0;"
 
-            stubs.append(f"{return_type} {symbol}({param_sig}) {{ {body} }}")
-            injected_symbols.append(symbol)
+            definitions.append((symbol, f"{return_type} {symbol}({param_sig}) {{ {body} }}", False))
+
+        return definitions
+
+    def _inject_linker_stubs(self, test_path: str, symbols: List[str]) -> List[str]:
+        """向测试文件注入最小C链接桩函数，解决与目标测试无关的未解析符号。"""
+        if not symbols:
+            return []
 
-        if not stubs and not vars_to_define:
+        with open(test_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        definitions = self._render_linker_stub_definitions(content, symbols)
+        if not definitions:
             return []
 
-        block_lines = []
-        if vars_to_define:
-            block_lines.extend(vars_to_define)
+        block_lines = [definition for _, definition, is_variable in definitions if is_variable]
+        stubs = [definition for _, definition, is_variable in definitions if not is_variable]
         if stubs:
             block_lines.append('extern "C" {')
             block_lines.extend(stubs)
@@ -2616,7 +3303,64 @@ clangd raw output:
         with open(test_path, 'w', encoding='utf-8') as f:
             f.write(content.rstrip() + block + "\n")
 
-        return injected_symbols
+        return [symbol for symbol, _, _ in definitions]
+
+    def _add_linker_stubs_to_unit(self,
+                                  stub_unit: _LinkStubUnit,
+                                  test_path: str,
+                                  symbols: List[str],
+                                  weak: bool = False) -> List[str]:
+        """把未解析符号的桩写入独立桩TU（测试文件不变），返回新增的符号；weak=True时桩为弱定义，之后测试自行mock不会重复定义"""
+        if not symbols:
+            return []
+        with open(test_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        pending = [symbol for symbol in symbols if symbol not in stub_unit.symbols]
+        definitions = self._render_linker_stub_definitions(content, pending)
+        if not definitions:
+            return []
+
+        function_map = self.code_analyzer.get_all_functions()
+        for symbol, definition, is_variable in definitions:
+            if weak:
+                definition = "__attribute__((weak)) " + definition
+            func_dep = function_map.get(symbol)
+            includes = sorted(func_dep.include_files) if func_dep and func_dep.include_files else []
+            stub_unit.add(symbol, definition, is_variable, includes)
+        stub_unit.write()
+        return [symbol for symbol, _, _ in definitions]
+
+    def _fold_link_stubs_into_test(self,
+                                   test_path: str,
+                                   stub_unit: _LinkStubUnit,
+                                   verify: Callable[[], subprocess.CompletedProcess]) -> bool:
+        """
+        流水线以PASSED结束时把桩TU内容追加回测试文件，使测试文件单独即可编译链接（与CMake等外部构建一致）
+
+        折叠后调用verify对测试文件单独编译链接；失败（如桩与测试内已有定义冲突）则还原测试文件，
+        桩保留在build目录的桩TU中。返回是否已折叠。
+        """
+        if not stub_unit.symbols:
+            return False
+        original = self._read_text_file(test_path)
+        self._write_text_file_atomic(test_path, original.rstrip() + "\n\n" + stub_unit.render_block() + "\n")
+        try:
+            result = verify()
+        except (OSError, subprocess.TimeoutExpired) as verify_error:
+            print(f"  [LinkStub] standalone build of folded test failed to run: {verify_error}")
+            result = None
+        if result is not None and result.returncode == 0:
+            print(
+                f"  [LinkStub] Folded {len(stub_unit.symbols)} stub(s) into {os.path.basename(test_path)} "
+                "(verified by standalone compile/link)"
+            )
+            return True
+        self._write_text_file_atomic(test_path, original)
+        print(
+            f"  [LinkStub] Folded test does not build standalone -> reverted, "
+            f"stubs kept in {stub_unit.source_path}"
+        )
+        return False
 
     @staticmethod
     def _c_symbol_to_mock_method_name(symbol: str) -> str:
@@ -2758,6 +3502,20 @@ clangd raw output:
                 return path
         return None
 
+    # 测试编译的ABI相关参数（gtest产物缓存按同一组参数构建，保证可混合链接）
+    GNU_TEST_CXX_FLAGS = [
+        "-std=c++14",
+        "-D_CRT_SECURE_NO_WARNINGS",
+        "-ffunction-sections",
+        "-fdata-sections",
+        "-Wno-deprecated",
+        "-Wno-deprecated-declarations",
+    ]
+    MSVC_TEST_CXX_FLAGS = ["/EHsc", "/std:c++14"]
+    # weak模式下生产代码目标文件的附加参数：弱符号替换依赖同TU内的调用经过符号重定位，
+    # 优化会把同TU内的被调函数内联或直接绑定，测试中的替换定义随之静默失效
+    WEAK_MOCK_CXX_FLAGS = ["-O0", "-fno-inline"]
+
     @staticmethod
     def _is_msvc_compiler(compiler_path: str) -> bool:
         name = os.path.basename(compiler_path).lower()
@@ -2770,15 +3528,19 @@ clangd raw output:
                                test_path: str,
                                exe_path: str,
                                gtest_link_inputs: List[str]) -> List[str]:
-        """按编译器类型构建编译命令。"""
+        """按编译器类型构建编译命令（生产代码优先使用缓存的目标文件，每次只编译测试TU并链接）。"""
+        production_objects = self._cached_production_objects(compiler_path, include_dirs, source_files)
+
         if self._is_msvc_compiler(compiler_path):
-            cmd = [compiler_path, "/nologo", "/EHsc", "/std:c++14", f"/Fe:{exe_path}"]
+            cmd = [compiler_path, "/nologo", *self.MSVC_TEST_CXX_FLAGS, f"/Fe:{exe_path}"]
 
             for inc in include_dirs:
                 if inc.startswith("-I"):
                     cmd.append(f"/I{inc[2:]}")
 
-            if source_files:
+            if production_objects:
+                cmd.extend(production_objects)
+            elif source_files:
                 cmd.append("/TC")
                 cmd.extend(source_files)
             cmd.append("/TP")
@@ -2794,21 +3556,12 @@ clangd raw output:
             return cmd
 
         # GCC/Clang 风格
-        cmd = [
-            compiler_path,
-            "-std=c++14",
-            "-D_CRT_SECURE_NO_WARNINGS",
-            "-ffunction-sections",
-            "-fdata-sections",
-            "-Wno-deprecated",
-            "-Wno-deprecated-declarations",
-            "-o",
-            exe_path
-        ]
-        cmd.extend(include_dirs)
-        cmd.append("-I/usr/include/gtest")
+        cmd = [compiler_path, *self.GNU_TEST_CXX_FLAGS, "-o", exe_path]
+        include_flags = list(include_dirs) + ["-I/usr/include/gtest"]
+        cmd.extend(include_flags)
+        cmd.extend(self._cached_gtest_pch_flags(compiler_path, include_flags))
         # 对clang++/g++直接传入.c与.cpp，避免-std与-x c冲突
-        cmd.extend(source_files)
+        cmd.extend(production_objects or source_files)
         cmd.append(test_path)
         cmd.extend(gtest_link_inputs)
 
@@ -2821,6 +3574,264 @@ clangd raw output:
 
         return cmd
 
+    def _build_test_object_command(self,
+                                   compiler_path: str,
+                                   include_dirs: List[str],
+                                   source_path: str,
+                                   object_path: str) -> List[str]:
+        """分步构建：只编译测试TU（或桩TU）为目标文件（GCC/Clang）"""
+        return [*self._test_tu_compile_prefix(compiler_path, include_dirs), "-c", source_path, "-o", object_path]
+
+    def _test_tu_compile_prefix(self, compiler_path: str, include_dirs: List[str]) -> List[str]:
+        """测试TU的编译器与参数（GCC/Clang），目标文件编译与语法预检共用"""
+        include_flags = list(include_dirs) + ["-I/usr/include/gtest"]
+        cmd = [compiler_path, *self.GNU_TEST_CXX_FLAGS, *include_flags]
+        cmd.extend(self._cached_gtest_pch_flags(compiler_path, include_flags))
+        return cmd
+
+    def _build_link_command(self,
+                            compiler_path: str,
+                            include_dirs: List[str],
+                            source_files: List[str],
+                            object_files: List[str],
+                            exe_path: str,
+                            gtest_link_inputs: List[str]) -> List[str]:
+        """分步构建：链接测试目标文件、缓存的生产代码目标文件与gtest（GCC/Clang）"""
+        production_objects = self._cached_production_objects(compiler_path, include_dirs, source_files)
+        cmd = [compiler_path, *self.GNU_TEST_CXX_FLAGS, "-o", exe_path]
+        if production_objects is None and source_files:
+            # 生产代码缓存不可用时直接编译源码，需要include路径
+            cmd.extend(include_dirs)
+        cmd.extend(production_objects if production_objects is not None else source_files)
+        cmd.extend(object_files)
+        cmd.extend(gtest_link_inputs)
+        if os.name == 'nt':
+            cmd.append("-Wl,/OPT:REF")
+        else:
+            cmd.append("-lpthread")
+        return cmd
+
+    @staticmethod
+    def _object_digest(cmd: List[str], content: bytes) -> str:
+        """分步编译目标文件的复用键：编译命令 + 源文件内容"""
+        return hashlib.sha256(" ".join(cmd).encode("utf-8") + b"\0" + content).hexdigest()
+
+    @staticmethod
+    def _test_object_path(exe_path: str) -> str:
+        return os.path.splitext(exe_path)[0] + ".test.o"
+
+    def _minimal_link_sources(self,
+                              compiler_path: str,
+                              include_dirs: List[str],
+                              source_files: List[str],
+                              test_objects: List[str],
+                              seed_sources: List[str],
+                              allow_test_overrides: bool = False) -> Optional[List[str]]:
+        """
+        基于符号索引求满足测试引用的最小生产TU集合（传递闭包）
+
+        Returns:
+            源文件列表；符号索引不可用、生产代码目标文件不可用或测试目标文件缺失时返回None（调用方回退为全部源码）
+        """
+        symbol_index = get_default_symbol_index()
+        if symbol_index is None or not all(os.path.isfile(obj) for obj in test_objects):
+            return None
+        objects = self._cached_production_objects(compiler_path, include_dirs, source_files)
+        if not objects:
+            return None
+        closure = symbol_index.link_closure(
+            test_objects,
+            dict(zip(source_files, objects)),
+            seed_sources=seed_sources,
+            allow_test_overrides=allow_test_overrides
+        )
+        if closure is None:
+            return None
+        selected, _ = closure
+        print(
+            f"[SymbolIndex] Minimal link set: {len(selected)}/{len(source_files)} TU(s) "
+            f"(index hits={symbol_index.stats['hits']}, scanned={symbol_index.stats['scanned']})"
+        )
+        return selected
+
+    def _compile_and_link_test(self,
+                               compiler_path: str,
+                               include_dirs: List[str],
+                               source_files: List[str],
+                               test_path: str,
+                               exe_path: str,
+                               gtest_link_inputs: List[str],
+                               stub_unit: _LinkStubUnit,
+                               object_digests: Dict[str, str]) -> Tuple[subprocess.CompletedProcess, str]:
+        """
+        分步编译链接：测试TU与桩TU分别编译为目标文件（内容与命令未变化时复用），再单独链接。
+        链接期修复（桩、重复符号、全源码链接）因此只需重编变化的小TU并重新链接。
+
+        Args:
+            object_digests: 目标文件路径 -> 上次成功编译时的 命令+源文件内容 摘要（由调用方在整个流水线内保存）
+
+        Returns:
+            (失败步骤或链接步骤的结果, 本轮实际执行的命令文本)
+        """
+        units = [(test_path, self._test_object_path(exe_path))]
+        if stub_unit.symbols:
+            units.append((stub_unit.source_path, stub_unit.object_path))
+
+        executed: List[str] = []
+        for source_path, object_path in units:
+            cmd = self._build_test_object_command(compiler_path, include_dirs, source_path, object_path)
+            with open(source_path, 'rb') as f:
+                digest = self._object_digest(cmd, f.read())
+            if object_digests.get(object_path) == digest and os.path.isfile(object_path):
+                print(f"  [Link] {os.path.basename(source_path)} unchanged -> reuse {os.path.basename(object_path)}")
+                continue
+            object_digests.pop(object_path, None)
+            executed.append(' '.join(cmd))
+            print(f"  [CompileCmd] {executed[-1]}")
+            with self._compile_slot():
+                result = subprocess.run(cmd, capture_output=True, timeout=120, text=True, cwd=self.project_dir)
+            if result.returncode != 0:
+                return result, "\n".join(executed)
+            object_digests[object_path] = digest
+
+        link_cmd = self._build_link_command(
+            compiler_path=compiler_path,
+            include_dirs=include_dirs,
+            source_files=source_files,
+            object_files=[object_path for _, object_path in units],
+            exe_path=exe_path,
+            gtest_link_inputs=gtest_link_inputs
+        )
+        executed.append(' '.join(link_cmd))
+        print(f"  [LinkCmd] {executed[-1]}")
+        with self._compile_slot():
+            result = subprocess.run(link_cmd, capture_output=True, timeout=120, text=True, cwd=self.project_dir)
+        return result, "\n".join(executed)
+
+    def _build_syntax_check_command(self,
+                                    compiler_path: str,
+                                    include_dirs: List[str],
+                                    test_path: str) -> List[str]:
+        """
+        构建测试TU的仅语法检查命令（不生成目标文件、不链接）
+
+        参数与实际构建完全一致（GNU_TEST_CXX_FLAGS/MSVC_TEST_CXX_FLAGS + include + PCH），
+        预检通过即代表实际编译的前端不会报错，反之亦然
+        """
+        if self._is_msvc_compiler(compiler_path):
+            cmd = [compiler_path, "/nologo", "/Zs", *self.MSVC_TEST_CXX_FLAGS]
+            cmd.extend(f"/I{inc[2:]}" for inc in include_dirs if inc.startswith("-I"))
+            cmd.extend(["/TP", test_path])
+            return cmd
+        return [*self._test_tu_compile_prefix(compiler_path, include_dirs), "-fsyntax-only", test_path]
+
+    def _run_syntax_check(self, cmd: List[str]) -> Tuple[Optional[subprocess.CompletedProcess], str]:
+        """
+        执行仅语法检查
+
+        Returns:
+            (检查结果, 命令文本)；编译器无法启动或超时返回 (None, 命令文本)，调用方直接走完整编译
+        """
+        cmd_display = ' '.join(cmd)
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                timeout=60,
+                text=True,
+                cwd=self.project_dir
+            )
+        except (OSError, subprocess.TimeoutExpired) as syntax_error:
+            print(f"  [SyntaxPreflight] skipped: {syntax_error}")
+            return None, cmd_display
+        return result, cmd_display
+
+    def _cached_production_objects(self,
+                                   compiler_path: str,
+                                   include_dirs: List[str],
+                                   source_files: List[str]) -> Optional[List[str]]:
+        """
+        将生产源码编译为缓存目标文件（按源文件内容+编译参数寻址，依赖头文件变化自动失效）
+
+        Returns:
+            目标文件列表；缓存关闭或任一TU编译失败时返回None（调用方直接编译源码，保留原始错误输出）
+        """
+        if not source_files or not compiler_path:
+            return None
+        object_cache = get_default_object_cache()
+        if object_cache is None:
+            return None
+        msvc = self._is_msvc_compiler(compiler_path)
+        flags = self.MSVC_TEST_CXX_FLAGS if msvc else self.GNU_TEST_CXX_FLAGS
+        include_flags = [inc for inc in include_dirs if inc.startswith("-I")] if msvc else list(include_dirs)
+        weak = not msvc and self._weak_mocking_active()
+        if weak and self._has_optimization_flag(include_flags):
+            # include参数位于编译参数之后，其中的优化选项会覆盖-O0，弱符号替换不可靠
+            print("[WeakMock] optimization flag in compile flags -> link regular production objects")
+            weak = False
+        if weak:
+            flags = [*flags, *self.WEAK_MOCK_CXX_FLAGS]
+        try:
+            objects = object_cache.get_objects(compiler_path, source_files, flags, include_flags)
+        except Exception as cache_error:
+            print(f"[ObjCache] object cache unavailable, compiling sources directly: {cache_error}")
+            return None
+        if objects and weak:
+            weakened = self._weakened_production_objects(objects)
+            if weakened is not None:
+                print(f"[WeakMock] Linking {len(weakened)} weakened production object(s)")
+                return weakened
+            print("[WeakMock] objcopy weakening failed -> link regular production objects")
+        if objects:
+            print(f"[ObjCache] Linking {len(objects)} cached production object(s)")
+        return objects
+
+    @staticmethod
+    def _has_optimization_flag(flags: List[str]) -> bool:
+        """是否含-O0以外的优化级别（-O/-O1/-O2/-O3/-Os/-Og/-Ofast等）"""
+        return any(flag.startswith("-O") and flag != "-O0" for flag in flags)
+
+    def _weak_mocking_active(self, compile_template: Optional[str] = None) -> bool:
+        """weak模式生效条件：内置编译命令 + 产物缓存 + nm/objcopy可用（自定义编译命令不经过缓存目标文件）"""
+        if self.mocking_mode != "weak":
+            return False
+        template = compile_template if compile_template is not None else (self.compile_command_template or "")
+        if template:
+            return False
+        return get_default_weak_object_cache() is not None and get_default_symbol_index() is not None
+
+    def _weakened_production_objects(self, objects: List[str]) -> Optional[List[str]]:
+        """按符号索引弱化各目标文件已定义的全局符号（结果按内容缓存，所有测试共用）"""
+        weak_cache = get_default_weak_object_cache()
+        symbol_index = get_default_symbol_index()
+        if weak_cache is None or symbol_index is None:
+            return None
+        entries = symbol_index.update(objects)
+        if len(entries) != len(objects):
+            return None
+        return weak_cache.get_objects([
+            (obj, entries[os.path.abspath(obj)]["defined"]) for obj in objects
+        ])
+
+    def _cached_gtest_pch_flags(self, compiler_path: str, include_flags: List[str]) -> List[str]:
+        """
+        gtest/gmock预编译头参数（按编译器+编译参数+include路径缓存）
+
+        Returns:
+            -include/-include-pch 参数；缓存关闭、MSVC或PCH生成/验证失败时为空列表（测试TU照常解析头文件）
+        """
+        pch_cache = get_default_pch_cache()
+        if pch_cache is None or not compiler_path or self._is_msvc_compiler(compiler_path):
+            return []
+        try:
+            flags = pch_cache.get_pch_flags(compiler_path, self.GNU_TEST_CXX_FLAGS, include_flags)
+        except Exception as pch_error:
+            print(f"[PCH] precompiled gtest/gmock header unavailable: {pch_error}")
+            return []
+        if flags:
+            print(f"[PCH] Using precompiled gtest/gmock header: {flags[-1]}")
+        return flags or []
+
     def _resolve_source_files_for_test(self, test_name: str, all_sources: List[str]) -> List[str]:
         """按测试名解析最小源文件集合，避免不必要的重复符号链接。"""
         function_name = test_name.replace("_llm_test", "")
@@ -2838,281 +3849,599 @@ clangd raw output:
 
         return all_sources
     
-    def run_tests(self, test_dir: Optional[str] = None,
-                  build_dir: str = "build-test",
-                  target_functions: Optional[List[str]] = None,
-                  auto_fix_compile_errors: bool = True,
-                  max_fix_attempts: int = 2,
-                  auto_fix_test_failures: bool = True,
-                  max_test_fix_attempts: int = 2,
-                  llm_triage_enabled: bool = True,
-                  triage_min_confidence: float = 0.55,
-                  web_research_enabled: bool = True,
-                  web_research_max_results: int = 4,
-                  experience_learning_enabled: bool = True,
-                  experience_top_k: int = 3,
-                  preclean_compile_commands: Optional[str] = None,
-                  compile_command_template: Optional[str] = None,
-                  compile_command_cwd: Optional[str] = None,
-                  run_command_template: Optional[str] = None,
-                  run_command_cwd: Optional[str] = None) -> bool:
+    @staticmethod
+    def _preliminary_fix_query(output_text: str) -> Tuple[str, List[str]]:
         """
-        编译并执行生成的测试用例
-        
-        Args:
-            test_dir: 测试文件所在目录
-            build_dir: 测试编译目录
-            target_functions: 本轮限定处理的函数列表（仅处理对应测试文件）
-            auto_fix_compile_errors: 编译失败后是否自动进入LLM修复阶段
-            max_fix_attempts: 最大自动修复重试次数
-            auto_fix_test_failures: 测试运行失败后是否自动进入LLM修复阶段
-            max_test_fix_attempts: 测试运行失败最大自动修复重试次数
-            llm_triage_enabled: 是否启用“先分析再修复”诊断阶段
-            triage_min_confidence: 触发修复的最低诊断置信度
-            web_research_enabled: triage后是否进行在线检索增强
-            web_research_max_results: 在线检索最多返回条数
-            experience_learning_enabled: 是否启用经验积累与检索
-            experience_top_k: 经验检索返回条数
-            preclean_compile_commands: clangd预修复阶段使用的compile_commands.json路径（可为文件或目录）
-            
+        融合修复前（尚无triage根因）的参考资料检索条件
+
         Returns:
-            是否执行成功
+            (首条错误/失败行（去掉路径与行号前缀）作为根因描述, 该行中引号内的标识符)
         """
-        self._print_key_node("[Step 5/5] Compiling and running tests", bg_code="45")
-        print("=" * 60)
-        
-        if test_dir is None:
-            test_dir = self.test_dir
+        for line in str(output_text or "").splitlines():
+            stripped = line.strip()
+            if not re.search(r'error|failure|undefined|not found', stripped, re.IGNORECASE):
+                continue
+            summary = re.sub(r'^(?:[A-Za-z]:)?[^\s:]*:\d+(?::\d+)?:\s*', '', stripped)
+            symbols = re.findall(r"['‘`]([A-Za-z_][A-Za-z0-9_]*)", summary)
+            return summary[:240], list(dict.fromkeys(symbols))[:6]
+        return str(output_text or "").strip()[:240], []
+
+    def _collect_fix_references(self,
+                                phase: str,
+                                root_cause: str,
+                                error_type: str,
+                                key_symbols: List[str],
+                                web_research_enabled: bool,
+                                web_research_max_results: int,
+                                experience_learning_enabled: bool,
+                                experience_top_k: int) -> Dict[str, Any]:
+        """
+        检索修复参考资料（根因检索 + 历史经验），分步修复与融合修复共用
 
-        log_dir = os.path.join(self.project_dir, "log")
-        os.makedirs(log_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        test_files = self._resolve_target_test_files(test_dir, target_functions)
-        
-        if not test_files:
-            print("✗ No test files found to run!")
-            self._current_target_functions_for_cmake_sync = None
-            return False
+        Returns:
+            可并入triage结果的字典（web_research/experience_hints，未取到的键不出现）
+        """
+        references: Dict[str, Any] = {}
+        if web_research_enabled:
+            try:
+                web_research = self.test_generator.research_root_cause_online(
+                    root_cause=root_cause,
+                    error_type=error_type,
+                    key_symbols=key_symbols,
+                    max_results=web_research_max_results
+                )
+                references["web_research"] = web_research
+                print(
+                    f"  [{'Research' if phase == 'compile' else 'Run-Research'}] "
+                    f"query='{web_research.get('query', '')}', refs={web_research.get('count', 0)}"
+                )
+            except Exception as research_error:
+                print(f"  ⚠ Web research failed ({phase} triage): {research_error}")
 
-        if target_functions:
-            print(f"Scoped run for selected functions: {', '.join(target_functions)}")
-        self._current_target_functions_for_cmake_sync = list(target_functions or [])
-        
-        print(f"Found {len(test_files)} test file(s) to run")
+        if experience_learning_enabled and self.experience_store:
+            try:
+                memory_refs = self.experience_store.query_experiences(
+                    root_cause=root_cause,
+                    error_type=error_type,
+                    phase=phase,
+                    key_symbols=key_symbols,
+                    top_k=experience_top_k
+                )
+                if memory_refs:
+                    references["experience_hints"] = memory_refs
+                    print(f"  [Memory] Retrieved {len(memory_refs)} {phase} experience(s)")
+            except Exception as memory_error:
+                print(f"  ⚠ Experience query failed ({phase}): {memory_error}")
+        return references
 
-        effective_compile_template = self._normalize_command_template(
-            compile_command_template if compile_command_template is not None else (self.compile_command_template or "")
-        )
-        effective_compile_cwd = self._resolve_custom_cwd(
-            compile_command_cwd if compile_command_cwd is not None else self.compile_command_cwd,
-            fallback=self.project_dir
+    @staticmethod
+    def _speculative_fix_variants(count: int, aggressive: bool) -> List[Tuple[float, bool]]:
+        """为K个候选分配差异化的(温度, aggressive)组合；首个候选保持常规设置。"""
+        variants: List[Tuple[float, bool]] = []
+        for index in range(max(1, count)):
+            temperature = min(1.0, 0.2 + 0.3 * index)
+            variants.append((temperature, bool(aggressive or index % 2 == 1)))
+        return variants
+
+    def _generate_fix_candidates(self,
+                                 phase: str,
+                                 current_test_code: str,
+                                 failure_output: str,
+                                 function_name: str,
+                                 analysis: Optional[Dict[str, Any]],
+                                 aggressive: bool,
+                                 count: int) -> List[str]:
+        """并发请求K个修复候选，去除与当前代码相同或彼此重复的候选（保持原顺序）。"""
+        variants = self._speculative_fix_variants(count, aggressive)
+
+        def _request(variant: Tuple[float, bool]) -> str:
+            temperature, variant_aggressive = variant
+            if phase == "runtime":
+                return self.test_generator.fix_test_from_test_failure(
+                    current_test_code=current_test_code,
+                    test_output=failure_output,
+                    function_name=function_name,
+                    failure_analysis=analysis,
+                    aggressive=variant_aggressive,
+                    temperature=temperature
+                )
+            return self.test_generator.fix_test_from_compile_error(
+                current_test_code=current_test_code,
+                compile_error=failure_output,
+                function_name=function_name,
+                compile_analysis=analysis,
+                aggressive=variant_aggressive,
+                temperature=temperature
+            )
+
+        with ThreadPoolExecutor(max_workers=len(variants)) as pool:
+            responses = list(pool.map(_request, variants))
+
+        candidates: List[str] = []
+        for code in responses:
+            if code and code != current_test_code and code not in candidates:
+                candidates.append(code)
+        return candidates
+
+    def _evaluate_fix_candidates(self,
+                                 candidates: List[str],
+                                 test_name: str,
+                                 test_path: str,
+                                 build_path: str,
+                                 compiler_path: str,
+                                 include_dirs: List[str],
+                                 source_files: List[str],
+                                 gtest_link_inputs: List[str],
+                                 exe_path: Optional[str] = None,
+                                 split_build: bool = False
+                                 ) -> Tuple[Optional[int], Dict[int, str], Optional[subprocess.CompletedProcess]]:
+        """
+        在独立的临时目录中并行编译并运行各候选
+
+        Args:
+            exe_path: 非空时把通过候选的可执行文件（分步构建时连同测试目标文件）移到主循环的产物位置
+            split_build: 与主循环分步构建一致：测试TU先编译为目标文件再单独链接
+
+        Returns:
+            (首个编译且运行通过的候选下标或None, {候选下标: passed/compile_failed/run_failed/error},
+             已移到产物位置的通过候选的构建结果或None)
+        """
+        scratch_root = os.path.join(build_path, "speculative", test_name)
+        shutil.rmtree(scratch_root, ignore_errors=True)
+        test_file_name = os.path.basename(test_path)
+        # 候选不在原测试目录中，补充原目录以保持相对引号include可用
+        candidate_include_dirs = list(include_dirs) + [f"-I{os.path.dirname(os.path.abspath(test_path))}"]
+        # 已有候选通过后终止其余候选的编译/运行进程，释放编译槽位
+        cancelled = threading.Event()
+        live_procs: Dict[int, subprocess.Popen] = {}
+        procs_lock = threading.Lock()
+
+        def _kill(proc: subprocess.Popen) -> None:
+            try:
+                if os.name != 'nt':
+                    os.killpg(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+            except OSError:
+                pass
+
+        def _run(index: int, cmd: List[str]) -> Optional[int]:
+            """执行候选的一个步骤，返回退出码；已取消返回None"""
+            with procs_lock:
+                if cancelled.is_set():
+                    return None
+                # 独立进程组：终止时连同编译器子进程（cc1plus/ld）一起结束
+                proc = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    cwd=self.project_dir,
+                    start_new_session=(os.name != 'nt')
+                )
+                live_procs[index] = proc
+            try:
+                return proc.wait(timeout=120)
+            except subprocess.TimeoutExpired:
+                _kill(proc)
+                proc.wait()
+                raise
+            finally:
+                with procs_lock:
+                    live_procs.pop(index, None)
+
+        def _candidate_exe(index: int) -> str:
+            candidate_exe = os.path.join(scratch_root, f"candidate{index}", test_name)
+            if self._is_msvc_compiler(compiler_path):
+                candidate_exe += '.exe'
+            return candidate_exe
+
+        build_steps: Dict[int, List[List[str]]] = {}
+
+        def _evaluate(index: int) -> str:
+            scratch_dir = os.path.join(scratch_root, f"candidate{index}")
+            os.makedirs(scratch_dir, exist_ok=True)
+            candidate_path = os.path.join(scratch_dir, test_file_name)
+            with open(candidate_path, 'w', encoding='utf-8') as f:
+                # __FILE__与诊断指向原测试文件，通过的候选产物可直接交给主循环复用
+                f.write(f'#line 1 "{os.path.abspath(test_path).replace(os.sep, "/")}"\n')
+                f.write(candidates[index])
+            candidate_exe = _candidate_exe(index)
+            if split_build:
+                candidate_object = self._test_object_path(candidate_exe)
+                steps = [
+                    self._build_test_object_command(
+                        compiler_path, candidate_include_dirs, candidate_path, candidate_object
+                    ),
+                    self._build_link_command(
+                        compiler_path=compiler_path,
+                        include_dirs=include_dirs,
+                        source_files=source_files,
+                        object_files=[candidate_object],
+                        exe_path=candidate_exe,
+                        gtest_link_inputs=gtest_link_inputs
+                    ),
+                ]
+            else:
+                steps = [self._build_compile_command(
+                    compiler_path=compiler_path,
+                    include_dirs=candidate_include_dirs,
+                    source_files=source_files,
+                    test_path=candidate_path,
+                    exe_path=candidate_exe,
+                    gtest_link_inputs=gtest_link_inputs
+                )]
+            build_steps[index] = steps
+            try:
+                for cmd in steps:
+                    with self._compile_slot():
+                        compile_code = _run(index, cmd)
+                    if compile_code is None or cancelled.is_set():
+                        return "cancelled"
+                    if compile_code != 0:
+                        return "compile_failed"
+                run_code = _run(index, [candidate_exe])
+                if run_code is None or cancelled.is_set():
+                    return "cancelled"
+                return "passed" if run_code == 0 else "run_failed"
+            except Exception:
+                return "error"
+
+        outcomes: Dict[int, str] = {}
+        winner: Optional[int] = None
+        winner_build: Optional[subprocess.CompletedProcess] = None
+        pool = ThreadPoolExecutor(max_workers=len(candidates))
+        try:
+            futures = {pool.submit(_evaluate, index): index for index in range(len(candidates))}
+            for future in as_completed(futures):
+                index = futures[future]
+                outcomes[index] = future.result()
+                if outcomes[index] == "passed":
+                    winner = index
+                    break
+        finally:
+            # 已有候选通过时终止其余候选并等待其退出，之后才能安全清理临时目录
+            with procs_lock:
+                cancelled.set()
+                for proc in live_procs.values():
+                    _kill(proc)
+            pool.shutdown(wait=True, cancel_futures=True)
+            if winner is not None and exe_path:
+                winner_build = self._adopt_candidate_build(
+                    _candidate_exe(winner), exe_path, build_steps[winner], split_build
+                )
+            shutil.rmtree(scratch_root, ignore_errors=True)
+        return winner, outcomes, winner_build
+
+    def _adopt_candidate_build(self,
+                               candidate_exe: str,
+                               exe_path: str,
+                               steps: List[List[str]],
+                               split_build: bool) -> Optional[subprocess.CompletedProcess]:
+        """把通过候选的产物移到主循环的位置，返回可代替下一轮编译的结果；移动失败返回None（主循环照常编译）"""
+        try:
+            if split_build:
+                os.replace(self._test_object_path(candidate_exe), self._test_object_path(exe_path))
+            os.replace(candidate_exe, exe_path)
+        except OSError as adopt_error:
+            print(f"  [Speculative] Cannot reuse candidate build: {adopt_error}")
+            return None
+        return subprocess.CompletedProcess(
+            args="\n".join(' '.join(cmd) for cmd in steps),
+            returncode=0,
+            stdout="",
+            stderr=""
         )
-        effective_run_template = self._normalize_command_template(
-            run_command_template if run_command_template is not None else (self.run_command_template or "")
+
+    def _speculative_fix(self,
+                         phase: str,
+                         current_test_code: str,
+                         failure_output: str,
+                         function_name: str,
+                         analysis: Optional[Dict[str, Any]],
+                         aggressive: bool,
+                         test_name: str,
+                         test_path: str,
+                         build_path: str,
+                         compiler_path: str,
+                         include_dirs: List[str],
+                         source_files: List[str],
+                         gtest_link_inputs: List[str],
+                         blocked_symbols: Optional[List[str]] = None,
+                         protected_symbols: Optional[List[str]] = None,
+                         exe_path: Optional[str] = None,
+                         split_build: bool = False) -> Tuple[str, Optional[subprocess.CompletedProcess]]:
+        """
+        推测式修复：并发生成K个候选并并行编译运行，选取第一个通过的候选
+
+        没有候选通过时，优先返回能编译的候选，否则返回首个候选（与常规单次修复一致）。
+
+        Returns:
+            (选中的测试代码, 通过候选已就位的构建结果或None)；构建结果非空时主循环下一轮直接复用，不再重新编译
+        """
+        count = max(2, int(self.speculative_candidates or 2))
+        candidates = self._generate_fix_candidates(
+            phase=phase,
+            current_test_code=current_test_code,
+            failure_output=failure_output,
+            function_name=function_name,
+            analysis=analysis,
+            aggressive=aggressive,
+            count=count
         )
-        effective_run_cwd = self._resolve_custom_cwd(
-            run_command_cwd if run_command_cwd is not None else self.run_command_cwd,
-            fallback=self.project_dir
+        if blocked_symbols:
+            sanitized_candidates: List[str] = []
+            for code in candidates:
+                sanitized_code, _ = self._remove_symbol_definitions_from_code(
+                    code, blocked_symbols, protected_symbols=protected_symbols or []
+                )
+                if sanitized_code not in sanitized_candidates:
+                    sanitized_candidates.append(sanitized_code)
+            candidates = sanitized_candidates
+
+        if not candidates:
+            self._print_key_event("[Speculative] No distinct fix candidate produced", bg_code="43")
+            return current_test_code, None
+        if len(candidates) == 1:
+            return candidates[0], None
+
+        print(f"  [Speculative] Evaluating {len(candidates)} {phase} fix candidate(s) in parallel...")
+        winner, outcomes, winner_build = self._evaluate_fix_candidates(
+            candidates=candidates,
+            test_name=test_name,
+            test_path=test_path,
+            build_path=build_path,
+            compiler_path=compiler_path,
+            include_dirs=include_dirs,
+            source_files=source_files,
+            gtest_link_inputs=gtest_link_inputs,
+            exe_path=exe_path,
+            split_build=split_build
         )
+        summary = ", ".join(f"#{index}={outcomes[index]}" for index in sorted(outcomes))
+        if winner is not None:
+            self._print_key_event(f"[Speculative] Candidate #{winner} passed ({summary})", bg_code="42")
+            return candidates[winner], winner_build
 
-        if effective_compile_template:
-            print(f"[Build] Using custom compile command template (cwd={effective_compile_cwd})")
-        if effective_run_template:
-            print(f"[Run] Using custom run command template (cwd={effective_run_cwd})")
-
-        if self.cmakelists_autogen_enabled:
-            try:
-                self.ensure_cmakelists_for_tests(
-                    test_dir=test_dir,
-                    compile_cwd=effective_compile_cwd,
-                    target_functions=target_functions
+        for index in sorted(outcomes):
+            if outcomes[index] == "run_failed":
+                self._print_key_event(
+                    f"[Speculative] No candidate passed; keep compiling candidate #{index} ({summary})",
+                    bg_code="43"
                 )
-            except Exception as cmake_sync_error:
-                print(f"⚠ CMake sync skipped due to error: {cmake_sync_error}")
-        else:
-            print("[CMakeSync] Auto-generation disabled by config")
-        
-        # 创建编译目录
-        build_path = os.path.join(self.project_dir, build_dir)
-        os.makedirs(build_path, exist_ok=True)
-        
-        # 使用CMake配置建立测试编译环境
-        print(f"\nSetting up CMake for tests in {build_path}...")
-        
+                return candidates[index], None
+        self._print_key_event(f"[Speculative] No candidate compiled; keep candidate #0 ({summary})", bg_code="43")
+        return candidates[0], None
+
+    def _compile_slot(self):
+        """并发流水线中占用一个编译槽位（串行执行时不限制）"""
+        semaphore = self._compile_semaphore
+        return semaphore if semaphore is not None else contextlib.nullcontext()
+
+    def _apply_llm_inflight_limit(self) -> None:
+        set_limit = getattr(self.llm_client, 'set_max_inflight', None)
+        if set_limit is not None:
+            set_limit(self.llm_inflight)
+
+    @contextlib.contextmanager
+    def _tagged_output(self):
+        """并发期间将stdout替换为按测试名加前缀的整行输出"""
+        original = sys.stdout
+        tagged = _ThreadTaggedStream(original)
+        sys.stdout = tagged
         try:
-            # 运行CMake配置
-            cmake_result = subprocess.run(
-                ["cmake", "-DCMAKE_EXPORT_COMPILE_COMMANDS=ON", "-S", self.project_dir, "-B", build_path],
-                capture_output=True,
-                timeout=60,
-                text=True
-            )
-            
-            if cmake_result.returncode != 0:
-                print("⚠ CMake configuration had issues, but continuing...")
-                if cmake_result.stderr:
-                    print(f"  Error: {cmake_result.stderr[:500]}")
-            else:
-                print("✓ CMake configured successfully")
-        except Exception as e:
-            print(f"⚠ CMake configuration failed: {e}")
-            print("  Attempting to run tests anyway...")
-        
-        # 收集源文件进行编译
-        source_files = []
-        for root, dirs, files in os.walk(self.src_dir):
-            for file in files:
-                if file.endswith('.c'):
-                    source_files.append(os.path.join(root, file))
-        
-        print(f"Found {len(source_files)} source file(s)")
+            yield tagged
+        finally:
+            sys.stdout = original
 
-        preclean_cc_dir = ""
-        if preclean_compile_commands:
-            cc_candidate = str(preclean_compile_commands).strip()
-            if cc_candidate and not os.path.isabs(cc_candidate):
-                cc_candidate = os.path.abspath(os.path.join(self.project_dir, cc_candidate))
-            if cc_candidate:
-                if os.path.isfile(cc_candidate):
-                    preclean_cc_dir = os.path.dirname(cc_candidate)
-                elif os.path.isdir(cc_candidate):
-                    preclean_cc_dir = cc_candidate
+    def _run_single_test_pipeline(self, test_file: str, run_ctx: Dict[str, Any]) -> str:
+        """
+        单个测试文件的完整流水线：编译 -> 预修复 -> 确定性修复 -> LLM诊断/修复 -> 运行 -> 运行期修复 -> 稳定性重跑
 
-        generated_cc_path = os.path.join(build_path, "compile_commands.json")
-        if not preclean_cc_dir and os.path.exists(generated_cc_path):
-            preclean_cc_dir = build_path
+        Args:
+            test_file: 测试文件名（位于run_ctx["test_dir"]）
+            run_ctx: run_tests解析出的本轮共享参数（只读）
 
-        if preclean_cc_dir:
-            print(f"[PreCompileCheck] Using clangd compile_commands dir: {preclean_cc_dir}")
-        else:
-            print("[PreCompileCheck] No compile_commands dir for clangd preclean, fallback to temp DB")
+        Returns:
+            最终状态 PASSED / FAILED / COMPILE_FAILED / TIMEOUT / ERROR
+        """
+        test_dir = run_ctx["test_dir"]
+        log_dir = run_ctx["log_dir"]
+        timestamp = run_ctx["timestamp"]
+        build_path = run_ctx["build_path"]
+        source_files = run_ctx["source_files"]
+        compiler_path = run_ctx["compiler_path"]
+        preclean_cc_dir = run_ctx["preclean_cc_dir"]
+        target_functions = run_ctx["target_functions"]
+        effective_compile_template = run_ctx["compile_template"]
+        effective_compile_cwd = run_ctx["compile_cwd"]
+        effective_run_template = run_ctx["run_template"]
+        effective_run_cwd = run_ctx["run_cwd"]
+        auto_fix_compile_errors = run_ctx["auto_fix_compile_errors"]
+        max_fix_attempts = run_ctx["max_fix_attempts"]
+        auto_fix_test_failures = run_ctx["auto_fix_test_failures"]
+        max_test_fix_attempts = run_ctx["max_test_fix_attempts"]
+        llm_triage_enabled = run_ctx["llm_triage_enabled"]
+        triage_min_confidence = run_ctx["triage_min_confidence"]
+        web_research_enabled = run_ctx["web_research_enabled"]
+        web_research_max_results = run_ctx["web_research_max_results"]
+        experience_learning_enabled = run_ctx["experience_learning_enabled"]
+        experience_top_k = run_ctx["experience_top_k"]
+        final_status = "ERROR"
+
+        test_path = os.path.join(test_dir, test_file)
+        test_name = os.path.splitext(test_file)[0]
+        target_symbol = test_name.replace("_llm_test", "")
+        exe_path = os.path.join(build_path, test_name)
+        if self._is_msvc_compiler(compiler_path) and not exe_path.lower().endswith('.exe'):
+            exe_path += '.exe'
+
+        self._print_key_node(f"[Test] {test_file}", bg_code="100")
+        print("-" * 40)
+
+        # 预编译参数收集（预修复改为首次编译失败后执行）
+        include_dirs, define_flags, inferred_cxx_standard = self._collect_compile_flags_from_scope(
+            target_symbol=target_symbol,
+            test_path=test_path
+        )
+        gtest_link_inputs = self._resolve_gtest_link_inputs(
+            include_dirs,
+            build_path,
+            prefer_sources=(os.name == 'nt' and not self._is_msvc_compiler(compiler_path)),
+            compiler_path=compiler_path
+        )
+        # 内置GCC/Clang编译分步执行（测试TU/桩TU -> 目标文件 -> 链接），链接期修复只重编变化的TU并重新链接
+        split_link = not effective_compile_template and not self._is_msvc_compiler(compiler_path)
+        weak_mocking = split_link and self._weak_mocking_active(effective_compile_template)
+        stub_unit = _LinkStubUnit(
+            os.path.join(build_path, f"{test_name}_link_stubs.cpp"),
+            os.path.join(build_path, f"{test_name}_link_stubs.o")
+        )
+        object_digests: Dict[str, str] = {}
+        # 推测式修复中通过的候选: (测试代码, 已就位的构建结果)，下一轮编译直接复用
+        speculative_build: Optional[Tuple[str, subprocess.CompletedProcess]] = None
 
-        compiler_path = self._detect_cpp_compiler()
-        if not compiler_path:
-            print("✗ No C++ compiler found (expected one of: g++, clang++, cl)")
-            print("  Please install a compiler or run from a Developer Command Prompt.")
-            self._current_target_functions_for_cmake_sync = None
-            return False
-        print(f"[Build] Using compiler: {compiler_path}")
-        
-        # 尝试编译并运行每个测试文件
-        all_passed = True
-        results = []
-        
-        for test_file in test_files:
-            test_path = os.path.join(test_dir, test_file)
-            test_name = os.path.splitext(test_file)[0]
-            target_symbol = test_name.replace("_llm_test", "")
-            exe_path = os.path.join(build_path, test_name)
-            if self._is_msvc_compiler(compiler_path) and not exe_path.lower().endswith('.exe'):
-                exe_path += '.exe'
-            
-            self._print_key_node(f"[Test] {test_file}", bg_code="100")
-            print("-" * 40)
-            
-            # 预编译参数收集（预修复改为首次编译失败后执行）
-            include_dirs, define_flags, inferred_cxx_standard = self._collect_compile_flags_from_scope(
-                target_symbol=target_symbol,
-                test_path=test_path
-            )
-            gtest_link_inputs = self._resolve_gtest_link_inputs(
-                include_dirs,
-                build_path,
-                prefer_sources=(os.name == 'nt' and not self._is_msvc_compiler(compiler_path))
+        try:
+            compile_result = None
+            llm_fix_count = 0
+            runtime_fix_count = 0
+            compile_round = 0
+            max_compile_rounds = max_fix_attempts + 2
+            compile_seen_issue_fingerprints = set()
+            runtime_seen_issue_fingerprints = set()
+            compile_issue_counts = defaultdict(int)
+            runtime_issue_counts = defaultdict(int)
+            compile_consumed_attempts = 0
+            runtime_consumed_attempts = 0
+            runtime_prev_failed_tests = None
+            test_finished = False
+            # weak模式下测试中的定义覆盖弱化的生产实现，同TU被调函数也可mock
+            same_tu_unmockable_symbols = (
+                [] if weak_mocking else self._get_same_tu_unmockable_symbols(target_symbol)
             )
-            
-            try:
-                compile_result = None
-                llm_fix_count = 0
-                runtime_fix_count = 0
-                compile_round = 0
-                max_compile_rounds = max_fix_attempts + 2
-                compile_seen_issue_fingerprints = set()
-                runtime_seen_issue_fingerprints = set()
-                compile_issue_counts = defaultdict(int)
-                runtime_issue_counts = defaultdict(int)
-                compile_consumed_attempts = 0
-                runtime_consumed_attempts = 0
-                runtime_prev_failed_tests = None
-                test_finished = False
-                same_tu_unmockable_symbols = self._get_same_tu_unmockable_symbols(target_symbol)
-                blocked_redefinition_symbols = set(same_tu_unmockable_symbols)
-
-                if same_tu_unmockable_symbols:
-                    with open(test_path, 'r', encoding='utf-8') as f:
-                        precheck_before_code = f.read()
-                    pre_removed = self._remove_symbol_definitions_from_test_file(
-                        test_path=test_path,
-                        symbols=same_tu_unmockable_symbols,
-                        protected_symbols=[target_symbol]
-                    )
-                    if pre_removed:
-                        with open(test_path, 'r', encoding='utf-8') as f:
-                            precheck_after_code = f.read()
-                        self._emit_fix_diff(
-                            before_code=precheck_before_code,
-                            after_code=precheck_after_code,
-                            log_dir=log_dir,
-                            test_name=test_name,
-                            phase="precheck",
-                            attempt=1,
-                            timestamp=timestamp
-                        )
-                        self._print_key_event(
-                            "[PreCheck] Removed same-TU symbol definitions before compile: "
-                            + ", ".join(pre_removed[:6])
-                            + (" ..." if len(pre_removed) > 6 else ""),
-                            bg_code="45"
-                        )
+            blocked_redefinition_symbols = set(same_tu_unmockable_symbols)
 
-                # 构建编译命令
-                source_files_for_test = self._resolve_source_files_for_test(test_name, source_files)
-                source_files_active = list(source_files_for_test)
-                full_source_link_mode = False
-                preclean_attempted = False
-                compile_cmd = self._build_compile_command(
-                    compiler_path=compiler_path,
-                    include_dirs=include_dirs,
-                    source_files=source_files_active,
+            if same_tu_unmockable_symbols:
+                with open(test_path, 'r', encoding='utf-8') as f:
+                    precheck_before_code = f.read()
+                pre_removed = self._remove_symbol_definitions_from_test_file(
                     test_path=test_path,
-                    exe_path=exe_path,
-                    gtest_link_inputs=gtest_link_inputs
+                    symbols=same_tu_unmockable_symbols,
+                    protected_symbols=[target_symbol]
                 )
+                if pre_removed:
+                    with open(test_path, 'r', encoding='utf-8') as f:
+                        precheck_after_code = f.read()
+                    self._emit_fix_diff(
+                        before_code=precheck_before_code,
+                        after_code=precheck_after_code,
+                        log_dir=log_dir,
+                        test_name=test_name,
+                        phase="precheck",
+                        attempt=1,
+                        timestamp=timestamp
+                    )
+                    self._print_key_event(
+                        "[PreCheck] Removed same-TU symbol definitions before compile: "
+                        + ", ".join(pre_removed[:6])
+                        + (" ..." if len(pre_removed) > 6 else ""),
+                        bg_code="45"
+                    )
 
-                while not test_finished:
-                    compile_success = False
+            # 链接的生产源文件（编译命令在实际执行的分支中按需构建）
+            source_files_for_test = self._resolve_source_files_for_test(test_name, source_files)
+            source_files_active = list(source_files_for_test)
+            full_source_link_mode = False
+            preclean_attempted = False
 
-                    while compile_round < max_compile_rounds:
-                        if compile_round == 0:
-                            print(f"Compiling: {test_name}...")
-                        else:
-                            print(
-                                f"Compiling after retry {compile_round}/{max_compile_rounds - 1}: {test_name}..."
-                            )
+            while not test_finished:
+                compile_success = False
 
-                        if effective_compile_template:
-                            compile_context = self._build_command_context(
-                                test_name=test_name,
-                                test_path=test_path,
-                                exe_path=exe_path,
-                                build_path=build_path,
-                                include_dirs=include_dirs,
-                                source_files_active=source_files_active,
-                            )
-                            compile_cmd_display = self._render_command_template(
-                                effective_compile_template,
-                                compile_context
-                            )
-                            print(f"  [CompileCmd] {compile_cmd_display}")
+                while compile_round < max_compile_rounds:
+                    if compile_round == 0:
+                        print(f"Compiling: {test_name}...")
+                    else:
+                        print(
+                            f"Compiling after retry {compile_round}/{max_compile_rounds - 1}: {test_name}..."
+                        )
+
+                    reused_build = None
+                    if speculative_build is not None:
+                        with open(test_path, 'rb') as f:
+                            written_code = f.read()
+                        if written_code.decode('utf-8', errors='replace') == speculative_build[0]:
+                            reused_build = speculative_build[1]
+                            if split_link:
+                                test_object = self._test_object_path(exe_path)
+                                object_digests[test_object] = self._object_digest(
+                                    self._build_test_object_command(compiler_path, include_dirs, test_path, test_object),
+                                    written_code
+                                )
+                        speculative_build = None
+
+                    syntax_result = None
+                    if reused_build is None and self.syntax_preflight_enabled and not effective_compile_template:
+                        syntax_result, syntax_cmd_display = self._syntax_preflight_for_test(
+                            test_file=test_file,
+                            test_path=test_path,
+                            compiler_path=compiler_path,
+                            include_dirs=include_dirs,
+                            run_ctx=run_ctx
+                        )
+
+                    if reused_build is not None:
+                        # 通过的推测候选已按相同参数编译链接并运行过，产物已就位
+                        compile_result = reused_build
+                        compile_cmd_display = str(reused_build.args)
+                        print("  [Speculative] Reusing the passing candidate's build (no recompile)")
+                    elif syntax_result is not None and syntax_result.returncode != 0:
+                        # 前端错误：跳过完整编译链接，直接把语法检查输出交给修复循环
+                        compile_result = syntax_result
+                        compile_cmd_display = syntax_cmd_display
+                        print(f"  [SyntaxPreflight] {syntax_cmd_display}")
+                        print("  [SyntaxPreflight] front-end errors -> skip full compile/link")
+                    elif effective_compile_template:
+                        compile_context = self._build_command_context(
+                            test_name=test_name,
+                            test_path=test_path,
+                            exe_path=exe_path,
+                            build_path=build_path,
+                            include_dirs=include_dirs,
+                            source_files_active=source_files_active,
+                        )
+                        compile_cmd_display = self._render_command_template(
+                            effective_compile_template,
+                            compile_context
+                        )
+                        print(f"  [CompileCmd] {compile_cmd_display}")
+                        with self._compile_slot():
                             compile_result = self._run_custom_shell_command(
                                 compile_cmd_display,
                                 cwd=effective_compile_cwd,
                                 timeout=120
                             )
-                        else:
-                            compile_cmd_display = ' '.join(compile_cmd)
-                            print(f"  [CompileCmd] {compile_cmd_display}")
+                    elif split_link:
+                        compile_result, compile_cmd_display = self._compile_and_link_test(
+                            compiler_path=compiler_path,
+                            include_dirs=include_dirs,
+                            source_files=source_files_active,
+                            test_path=test_path,
+                            exe_path=exe_path,
+                            gtest_link_inputs=gtest_link_inputs,
+                            stub_unit=stub_unit,
+                            object_digests=object_digests
+                        )
+                    else:
+                        compile_cmd = self._build_compile_command(
+                            compiler_path=compiler_path,
+                            include_dirs=include_dirs,
+                            source_files=source_files_active,
+                            test_path=test_path,
+                            exe_path=exe_path,
+                            gtest_link_inputs=gtest_link_inputs
+                        )
+                        compile_cmd_display = ' '.join(compile_cmd)
+                        print(f"  [CompileCmd] {compile_cmd_display}")
+                        with self._compile_slot():
                             compile_result = subprocess.run(
                                 compile_cmd,
                                 capture_output=True,
@@ -3121,73 +4450,74 @@ clangd raw output:
                                 cwd=self.project_dir
                             )
 
-                        if compile_result.returncode == 0:
-                            compile_success = True
-                            break
+                    if compile_result.returncode == 0:
+                        compile_success = True
+                        break
 
-                        print(f"  ✗ Compilation failed")
-                        if compile_result.stderr:
-                            error_lines = compile_result.stderr.split('\n')[:5]
-                            for line in error_lines:
-                                if line.strip():
-                                    print(f"    {line}")
-                            if len(compile_result.stderr.split('\n')) > 5:
-                                print(f"    ... (more errors)")
-
-                        compile_log_path = os.path.join(log_dir, f"{test_name}_compile_attempt{compile_round}_{timestamp}.log")
-                        with open(compile_log_path, 'w', encoding='utf-8') as log_file:
-                            log_file.write("Compile command:\n")
-                            log_file.write(compile_cmd_display + "\n\n")
-                            log_file.write("STDOUT:\n")
-                            log_file.write(compile_result.stdout or "")
-                            log_file.write("\nSTDERR:\n")
-                            log_file.write(compile_result.stderr or "")
-                        print(f"  ↳ Compile log saved: {compile_log_path}")
-
-                        compile_output_full = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
-
-                        if not preclean_attempted:
-                            preclean_attempted = True
-                            self._print_key_event(
-                                "[PreCompileCheck] Trigger preclean after first compile failure",
-                                bg_code="45"
-                            )
-                            preclean_ok = self._preclean_test_file_with_clang(
-                                test_path=test_path,
-                                test_name=test_name,
-                                target_symbol=target_symbol,
-                                include_dirs=include_dirs,
-                                define_flags=define_flags,
-                                cxx_standard=inferred_cxx_standard,
-                                log_dir=log_dir,
-                                timestamp=timestamp,
-                                blocked_redefinition_symbols=blocked_redefinition_symbols,
-                                clangd_compile_commands_dir=preclean_cc_dir or None,
-                                auto_fix_enabled=auto_fix_compile_errors,
-                                max_attempts=min(2, max_fix_attempts + 1)
-                            )
-                            if preclean_ok:
-                                compile_round += 1
-                                continue
-                            self._print_key_event(
-                                "[PreCompileCheck] preclean had no effective fix -> enter main fix loop",
-                                bg_code="43"
-                            )
+                    print(f"  ✗ Compilation failed")
+                    if compile_result.stderr:
+                        error_lines = compile_result.stderr.split('\n')[:5]
+                        for line in error_lines:
+                            if line.strip():
+                                print(f"    {line}")
+                        if len(compile_result.stderr.split('\n')) > 5:
+                            print(f"    ... (more errors)")
+
+                    compile_log_path = os.path.join(log_dir, f"{test_name}_compile_attempt{compile_round}_{timestamp}.log")
+                    with open(compile_log_path, 'w', encoding='utf-8') as log_file:
+                        log_file.write("Compile command:\n")
+                        log_file.write(compile_cmd_display + "\n\n")
+                        log_file.write("STDOUT:\n")
+                        log_file.write(compile_result.stdout or "")
+                        log_file.write("\nSTDERR:\n")
+                        log_file.write(compile_result.stderr or "")
+                    print(f"  ↳ Compile log saved: {compile_log_path}")
 
-                        issue_domain = self._classify_issue_domain(compile_output_full, phase_hint="compile")
-                        if issue_domain == "cmakelists":
-                            if not self.cmakelists_autogen_enabled:
-                                self._print_key_event(
-                                    "[CompileRoute] CMake auto-generation disabled by config -> stop compile auto-fix",
-                                    bg_code="43"
-                                )
-                                break
+                    compile_output_full = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
+
+                    if not preclean_attempted:
+                        preclean_attempted = True
+                        self._print_key_event(
+                            "[PreCompileCheck] Trigger preclean after first compile failure",
+                            bg_code="45"
+                        )
+                        preclean_ok = self._preclean_test_file_with_clang(
+                            test_path=test_path,
+                            test_name=test_name,
+                            target_symbol=target_symbol,
+                            include_dirs=include_dirs,
+                            define_flags=define_flags,
+                            cxx_standard=inferred_cxx_standard,
+                            log_dir=log_dir,
+                            timestamp=timestamp,
+                            blocked_redefinition_symbols=blocked_redefinition_symbols,
+                            clangd_compile_commands_dir=preclean_cc_dir or None,
+                            auto_fix_enabled=auto_fix_compile_errors,
+                            max_attempts=min(2, max_fix_attempts + 1)
+                        )
+                        if preclean_ok:
+                            compile_round += 1
+                            continue
+                        self._print_key_event(
+                            "[PreCompileCheck] preclean had no effective fix -> enter main fix loop",
+                            bg_code="43"
+                        )
 
+                    issue_domain = self._classify_issue_domain(compile_output_full, phase_hint="compile")
+                    if issue_domain == "cmakelists":
+                        if not self.cmakelists_autogen_enabled:
                             self._print_key_event(
-                                "[CompileRoute] CMakeLists issue detected -> sync CMake and retry compile",
-                                bg_code="45"
+                                "[CompileRoute] CMake auto-generation disabled by config -> stop compile auto-fix",
+                                bg_code="43"
                             )
-                            try:
+                            break
+
+                        self._print_key_event(
+                            "[CompileRoute] CMakeLists issue detected -> sync CMake and retry compile",
+                            bg_code="45"
+                        )
+                        try:
+                            with self._cmake_lock:
                                 self.ensure_cmakelists_for_tests(
                                     test_dir=test_dir,
                                     compile_cwd=effective_compile_cwd,
@@ -3198,877 +4528,1742 @@ clangd raw output:
                                     compile_cwd=effective_compile_cwd,
                                     test_dir=test_dir
                                 )
-                            except Exception as cmake_sync_error:
-                                print(f"  ⚠ CMake sync failed: {cmake_sync_error}")
-                                print("    Skip test-code auto-fix because issue belongs to CMake/project setup")
-                                break
+                        except Exception as cmake_sync_error:
+                            print(f"  ⚠ CMake sync failed: {cmake_sync_error}")
+                            print("    Skip test-code auto-fix because issue belongs to CMake/project setup")
+                            break
 
-                            compile_round += 1
-                            continue
+                        compile_round += 1
+                        continue
 
-                        duplicate_symbols = self._extract_duplicate_symbols(compile_output_full)
-                        if duplicate_symbols:
-                            with open(test_path, 'r', encoding='utf-8') as f:
-                                detfix_before_code = f.read()
-                            removed_symbols = self._remove_symbol_definitions_from_test_file(
-                                test_path=test_path,
-                                symbols=duplicate_symbols,
-                                protected_symbols=[test_name.replace("_llm_test", "")]
+                    duplicate_symbols = self._extract_duplicate_symbols(compile_output_full)
+                    if duplicate_symbols and split_link:
+                        # 测试代码已自行定义的符号优先从桩TU中移除：测试TU不变，只重编桩TU并重新链接
+                        removed_stubs = stub_unit.remove(duplicate_symbols)
+                        if removed_stubs:
+                            stub_unit.write()
+                            print(
+                                f"  [Fix] Removed {len(removed_stubs)} duplicate linker stub(s): "
+                                + ", ".join(removed_stubs[:6])
+                                + (" ..." if len(removed_stubs) > 6 else "")
                             )
-                            if removed_symbols:
-                                blocked_redefinition_symbols.update(removed_symbols)
-                                with open(test_path, 'r', encoding='utf-8') as f:
-                                    detfix_after_code = f.read()
-                                self._emit_fix_diff(
-                                    before_code=detfix_before_code,
-                                    after_code=detfix_after_code,
-                                    log_dir=log_dir,
-                                    test_name=test_name,
-                                    phase="compile_detfix",
-                                    attempt=compile_round + 1,
-                                    timestamp=timestamp
-                                )
-                                self._print_key_event(
-                                    "[DeterministicFix] Removed duplicate symbol definitions: "
-                                    + ", ".join(removed_symbols[:6])
-                                    + (" ..." if len(removed_symbols) > 6 else ""),
-                                    bg_code="45"
-                                )
-                                compile_round += 1
-                                continue
-
-                        unresolved_symbols = self._extract_unresolved_symbols(
-                            compile_output_full
+                            if compile_round >= max_compile_rounds - 1:
+                                max_compile_rounds += 1
+                            compile_round += 1
+                            continue
+                    if duplicate_symbols:
+                        with open(test_path, 'r', encoding='utf-8') as f:
+                            detfix_before_code = f.read()
+                        removed_symbols = self._remove_symbol_definitions_from_test_file(
+                            test_path=test_path,
+                            symbols=duplicate_symbols,
+                            protected_symbols=[test_name.replace("_llm_test", "")]
                         )
-
-                        if (
-                            unresolved_symbols
-                            and (not full_source_link_mode)
-                            and target_symbol in unresolved_symbols
-                            and len(source_files_active) < len(source_files)
-                        ):
-                            full_source_link_mode = True
-                            source_files_active = list(source_files)
-                            compile_cmd = self._build_compile_command(
-                                compiler_path=compiler_path,
-                                include_dirs=include_dirs,
-                                source_files=source_files_active,
-                                test_path=test_path,
-                                exe_path=exe_path,
-                                gtest_link_inputs=gtest_link_inputs
+                        if removed_symbols:
+                            blocked_redefinition_symbols.update(removed_symbols)
+                            with open(test_path, 'r', encoding='utf-8') as f:
+                                detfix_after_code = f.read()
+                            self._emit_fix_diff(
+                                before_code=detfix_before_code,
+                                after_code=detfix_after_code,
+                                log_dir=log_dir,
+                                test_name=test_name,
+                                phase="compile_detfix",
+                                attempt=compile_round + 1,
+                                timestamp=timestamp
                             )
                             self._print_key_event(
-                                "[Escalation] Target symbol unresolved -> switch to full-source linking",
+                                "[DeterministicFix] Removed duplicate symbol definitions: "
+                                + ", ".join(removed_symbols[:6])
+                                + (" ..." if len(removed_symbols) > 6 else ""),
                                 bg_code="45"
                             )
                             compile_round += 1
                             continue
 
-                        if unresolved_symbols:
-                            injected_symbols = self._inject_linker_stubs(test_path, unresolved_symbols)
-                            if injected_symbols:
-                                print(
-                                    f"  [Fix] Injected {len(injected_symbols)} linker stub(s): "
-                                    + ", ".join(injected_symbols[:6])
-                                    + (" ..." if len(injected_symbols) > 6 else "")
-                                )
-                                if compile_round >= max_compile_rounds - 1:
-                                    max_compile_rounds += 1
-                                compile_round += 1
-                                continue
-
-                        if self._is_toolchain_link_error(compile_result.stderr or ""):
-                            self._print_key_event("⚠ Linker/toolchain issue detected", bg_code="43")
-                            print("  ⚠ Linker/toolchain error detected (e.g. missing gtest library).")
-                            print("    Skipping LLM code-fix because this is not a test code issue.")
-                            break
-
-                        if not auto_fix_compile_errors:
-                            break
-
-                        triage_result = {
-                            "error_type": "unknown",
-                            "root_cause": "triage_skipped",
-                            "should_fix": True,
-                            "confidence": 1.0,
-                            "fix_strategy": ["direct_fix"],
-                            "key_symbols": [],
-                            "minimal_change": "apply minimal compile fix",
-                            "code_locations": [],
-                            "change_direction": ["apply minimal compile fix around first diagnostic location"]
-                        }
-
-                        if llm_triage_enabled:
-                            try:
-                                with open(test_path, 'r', encoding='utf-8') as f:
-                                    current_test_code = f.read()
-
-                                compile_output = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
-                                navigation_context = self.compile_analyzer.build_ordered_navigation_context(
-                                    compiler_output=compile_output,
-                                    key_symbols=[],
-                                    max_locations=8
-                                )
-
-                                triage_result = self.test_generator.analyze_compile_error(
-                                    current_test_code=current_test_code,
-                                    compile_error=compile_output,
-                                    function_name=test_name.replace("_llm_test", ""),
-                                    navigation_context=navigation_context
-                                )
-
-                                enriched_navigation = self.compile_analyzer.build_ordered_navigation_context(
-                                    compiler_output=compile_output,
-                                    key_symbols=triage_result.get("key_symbols", []),
-                                    max_locations=8
-                                )
-                                triage_result["code_locations"] = enriched_navigation.get("code_locations", [])
-                                triage_result["ordered_navigation"] = enriched_navigation.get("ordered_navigation", [])
-                                triage_result["scope"] = enriched_navigation.get("scope", {})
-
-                                if web_research_enabled:
-                                    try:
-                                        web_research = self.test_generator.research_root_cause_online(
-                                            root_cause=str(triage_result.get("root_cause", "")),
-                                            error_type=str(triage_result.get("error_type", "unknown")),
-                                            key_symbols=triage_result.get("key_symbols", []),
-                                            max_results=web_research_max_results
-                                        )
-                                        triage_result["web_research"] = web_research
-                                        print(
-                                            f"  [Research] query='{web_research.get('query', '')}', "
-                                            f"refs={web_research.get('count', 0)}"
-                                        )
-                                    except Exception as research_error:
-                                        print(f"  ⚠ Web research failed (compile triage): {research_error}")
-
-                                if experience_learning_enabled and self.experience_store:
-                                    try:
-                                        memory_refs = self.experience_store.query_experiences(
-                                            root_cause=str(triage_result.get("root_cause", "")),
-                                            error_type=str(triage_result.get("error_type", "unknown")),
-                                            phase="compile",
-                                            key_symbols=triage_result.get("key_symbols", []),
-                                            top_k=experience_top_k
-                                        )
-                                        if memory_refs:
-                                            triage_result["experience_hints"] = memory_refs
-                                            print(f"  [Memory] Retrieved {len(memory_refs)} compile experience(s)")
-                                    except Exception as memory_error:
-                                        print(f"  ⚠ Experience query failed (compile): {memory_error}")
-
-                                triage_conf = float(triage_result.get("confidence", 0.0) or 0.0)
-                                triage_type = str(triage_result.get("error_type", "unknown"))
-                                triage_cause = str(triage_result.get("root_cause", ""))
-                                print(
-                                    f"  [Triage] type={triage_type}, confidence={triage_conf:.2f}, cause={triage_cause}"
-                                )
-                                if triage_result.get("code_locations"):
-                                    first_loc = triage_result["code_locations"][0]
-                                    print(
-                                        f"  [Locate] {first_loc.get('file', '')}:{first_loc.get('line', 1)} "
-                                        f"({first_loc.get('kind', 'location')})"
-                                    )
-                                if triage_result.get("change_direction"):
-                                    print(f"  [Direction] {triage_result['change_direction'][0]}")
-                                if triage_result.get("actionable_edits"):
-                                    first_edit = triage_result["actionable_edits"][0]
-                                    print(
-                                        "  [Actionable] "
-                                        f"{first_edit.get('file', '')}:{first_edit.get('line', 1)} -> "
-                                        f"{first_edit.get('instruction', '')}"
-                                    )
-
-                                triage_log_path = os.path.join(
-                                    log_dir,
-                                    f"{test_name}_triage_attempt{llm_fix_count + 1}_{timestamp}.log"
-                                )
-                                with open(triage_log_path, 'w', encoding='utf-8') as triage_log:
-                                    triage_log.write("LLM triage result:\n")
-                                    triage_log.write(json.dumps(triage_result, ensure_ascii=False, indent=2))
-                                print(f"  ↳ Triage log saved: {triage_log_path}")
-
-                                triage_unavailable = str(triage_result.get("root_cause", "")) == "triage_unavailable"
-                                if triage_unavailable:
-                                    self._print_key_event(
-                                        "[Triage] unavailable -> fallback to direct fix (ignore confidence gate)",
-                                        bg_code="45"
-                                    )
-                                elif (not bool(triage_result.get("should_fix", True))) or triage_conf < triage_min_confidence:
-                                    print(
-                                        f"  ⚠ Triage decided to skip fix "
-                                        f"(should_fix={bool(triage_result.get('should_fix', True))}, "
-                                        f"confidence={triage_conf:.2f} < {triage_min_confidence:.2f})"
-                                    )
-                                    break
-                            except Exception as triage_error:
-                                print(f"  ⚠ Triage failed, fallback to direct fix: {triage_error}")
-
-                        compile_output = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
-                        issue_fingerprint = self._build_issue_fingerprint(
-                            error_type=str(triage_result.get("error_type", "unknown")),
-                            root_cause=str(triage_result.get("root_cause", "")),
-                            key_symbols=triage_result.get("key_symbols", []),
-                            raw_output=compile_output
-                        )
-                        is_new_issue = issue_fingerprint not in compile_seen_issue_fingerprints
-                        compile_issue_counts[issue_fingerprint] += 1
-                        compile_repeat_count = compile_issue_counts[issue_fingerprint]
-                        triage_result["issue_fingerprint"] = issue_fingerprint
-                        triage_result["is_new_issue"] = bool(is_new_issue)
-                        triage_result["repeat_count"] = int(compile_repeat_count)
-
-                        if is_new_issue:
-                            self._print_key_event(
-                                "[RetryPolicy] New compile issue detected -> does not consume attempt budget",
-                                bg_code="42"
-                            )
-                        else:
-                            compile_consumed_attempts += 1
-                            self._print_key_event(
-                                f"[RetryPolicy] Repeated compile issue -> consume budget ({compile_consumed_attempts}/{max_fix_attempts})",
-                                bg_code="43"
-                            )
+                    unresolved_symbols = self._extract_unresolved_symbols(
+                        compile_output_full
+                    )
 
-                        if compile_consumed_attempts > max_fix_attempts:
-                            self._print_key_event(
-                                "[RetryPolicy] Repeated compile issue budget exceeded -> stop",
-                                bg_code="41"
+                    if (
+                        unresolved_symbols
+                        and (not full_source_link_mode)
+                        and target_symbol in unresolved_symbols
+                        and len(source_files_active) < len(source_files)
+                    ):
+                        full_source_link_mode = True
+                        closure_sources = None
+                        if split_link:
+                            closure_sources = self._minimal_link_sources(
+                                compiler_path=compiler_path,
+                                include_dirs=include_dirs,
+                                source_files=source_files,
+                                test_objects=[self._test_object_path(exe_path)] + stub_unit.link_inputs(),
+                                seed_sources=source_files_active,
+                                allow_test_overrides=weak_mocking
                             )
-                            break
-
-                        compile_seen_issue_fingerprints.add(issue_fingerprint)
-
+                        source_files_active = closure_sources if closure_sources else list(source_files)
                         self._print_key_event(
-                            f"[Fix] Compile auto-fix phase (repeat-budget {compile_consumed_attempts}/{max_fix_attempts}, total-fix {llm_fix_count + 1})",
-                            bg_code="46"
+                            "[Escalation] Target symbol unresolved -> switch to "
+                            + ("symbol-index link closure" if closure_sources else "full-source linking"),
+                            bg_code="45"
                         )
-                        try:
-                            with open(test_path, 'r', encoding='utf-8') as f:
-                                current_test_code = f.read()
-                            before_fix_code = current_test_code
-
-                            aggressive_compile_fix = compile_repeat_count >= 2
-                            if aggressive_compile_fix:
-                                self._print_key_event(
-                                    "[Escalation] Compile issue repeated -> aggressive rewrite mode",
-                                    bg_code="45"
-                                )
+                        compile_round += 1
+                        continue
 
-                            fixed_test_code = self.test_generator.fix_test_from_compile_error(
-                                current_test_code=current_test_code,
-                                compile_error=compile_output,
-                                function_name=test_name.replace("_llm_test", ""),
-                                compile_analysis=triage_result if llm_triage_enabled else None,
-                                aggressive=aggressive_compile_fix
+                    if unresolved_symbols:
+                        if split_link:
+                            injected_symbols = self._add_linker_stubs_to_unit(
+                                stub_unit, test_path, unresolved_symbols, weak=weak_mocking
                             )
-
-                            first_change_preview = self._summarize_code_change(current_test_code, fixed_test_code)
-                            if first_change_preview == "no_text_change" and not aggressive_compile_fix:
-                                self._print_key_event(
-                                    "[Escalation] No code change detected -> retry once with aggressive rewrite",
-                                    bg_code="45"
-                                )
-                                fixed_test_code = self.test_generator.fix_test_from_compile_error(
-                                    current_test_code=current_test_code,
-                                    compile_error=compile_output,
-                                    function_name=test_name.replace("_llm_test", ""),
-                                    compile_analysis=triage_result if llm_triage_enabled else None,
-                                    aggressive=True
-                                )
-
-                            if blocked_redefinition_symbols:
-                                sanitized_code, stripped_symbols = self._remove_symbol_definitions_from_code(
-                                    fixed_test_code,
-                                    sorted(list(blocked_redefinition_symbols)),
-                                    protected_symbols=[target_symbol]
-                                )
-                                if stripped_symbols:
-                                    self._print_key_event(
-                                        "[AntiOscillation] Stripped forbidden redefinitions from compile fix: "
-                                        + ", ".join(stripped_symbols[:6])
-                                        + (" ..." if len(stripped_symbols) > 6 else ""),
-                                        bg_code="45"
-                                    )
-                                    fixed_test_code = sanitized_code
-
-                            with open(test_path, 'w', encoding='utf-8') as f:
-                                f.write(fixed_test_code)
-
-                            diff_log_path = self._emit_fix_diff(
-                                before_code=before_fix_code,
-                                after_code=fixed_test_code,
-                                log_dir=log_dir,
-                                test_name=test_name,
-                                phase="compile",
-                                attempt=llm_fix_count + 1,
-                                timestamp=timestamp
+                        else:
+                            injected_symbols = self._inject_linker_stubs(test_path, unresolved_symbols)
+                        if injected_symbols:
+                            print(
+                                f"  [Fix] Injected {len(injected_symbols)} linker stub(s): "
+                                + ", ".join(injected_symbols[:6])
+                                + (" ..." if len(injected_symbols) > 6 else "")
                             )
-
-                            fix_log_path = os.path.join(log_dir, f"{test_name}_autofix_attempt{llm_fix_count + 1}_{timestamp}.log")
-                            with open(fix_log_path, 'w', encoding='utf-8') as log_file:
-                                log_file.write("Auto-fix triggered by compile error.\n\n")
-                                log_file.write("Original compile stderr (truncated to 8000 chars):\n")
-                                log_file.write((compile_result.stderr or "")[:8000])
-                                if diff_log_path:
-                                    log_file.write("\n\nUnified diff patch log:\n")
-                                    log_file.write(diff_log_path)
-                                    log_file.write("\n")
-                                log_file.write("\n\nUpdated test file:\n")
-                                log_file.write(fixed_test_code)
-
-                            print(f"  ↳ Auto-fix applied and saved: {test_path}")
-                            print(f"  ↳ Auto-fix log saved: {fix_log_path}")
-
-                            if experience_learning_enabled and self.experience_store:
-                                try:
-                                    self.experience_store.add_experience({
-                                        "phase": "compile",
-                                        "function_name": test_name.replace("_llm_test", ""),
-                                        "test_file": test_file,
-                                        "error_type": str(triage_result.get("error_type", "unknown")),
-                                        "root_cause": str(triage_result.get("root_cause", "")),
-                                        "key_symbols": triage_result.get("key_symbols", []),
-                                        "fix_strategy": triage_result.get("fix_strategy", []),
-                                        "summary": str(triage_result.get("minimal_change", "compile fix applied")),
-                                        "code_locations": triage_result.get("code_locations", []),
-                                        "change_direction": triage_result.get("change_direction", []),
-                                        "analysis_layers": triage_result.get("analysis_layers", []),
-                                        "actionable_edits": triage_result.get("actionable_edits", []),
-                                        "verification_plan": triage_result.get("verification_plan", []),
-                                        "change_preview": self._summarize_code_change(before_fix_code, fixed_test_code),
-                                        "outcome": "fix_applied_pending_recompile",
-                                        "attempt": llm_fix_count + 1
-                                    })
-                                except Exception as memory_write_error:
-                                    print(f"  ⚠ Experience write failed (compile): {memory_write_error}")
-
-                            llm_fix_count += 1
+                            if compile_round >= max_compile_rounds - 1:
+                                max_compile_rounds += 1
                             compile_round += 1
-                        except Exception as fix_error:
-                            print(f"  ✗ Auto-fix failed: {fix_error}")
-                            break
-
-                    if not compile_success:
-                        all_passed = False
-                        results.append((test_name, "COMPILE_FAILED"))
-                        test_finished = True
-                        continue
-
-                    print(f"  ✓ Compiled successfully")
-                    self._print_key_event("Compile succeeded, entering test run", bg_code="42")
-                    print(f"Running: {test_name}...")
-                    runtime_xml_path = os.path.join(
-                        log_dir,
-                        f"{test_name}_run_attempt{runtime_fix_count}_{timestamp}.xml"
-                    )
-                    if effective_run_template:
-                        run_context = self._build_command_context(
-                            test_name=test_name,
-                            test_path=test_path,
-                            exe_path=exe_path,
-                            build_path=build_path,
-                            runtime_xml_path=runtime_xml_path
-                        )
-                        run_cmd_display = self._render_command_template(
-                            effective_run_template,
-                            run_context
-                        )
-                        print(f"  [RunCmd] {run_cmd_display}")
-                        run_result = self._run_custom_shell_command(
-                            run_cmd_display,
-                            cwd=effective_run_cwd,
-                            timeout=120
-                        )
-                    else:
-                        run_cmd = [exe_path, f"--gtest_output=xml:{runtime_xml_path}"]
-                        run_cmd_display = ' '.join(run_cmd)
-                        print(f"  [RunCmd] {run_cmd_display}")
-                        run_result = subprocess.run(
-                            run_cmd,
-                            capture_output=True,
-                            timeout=120,
-                            text=True,
-                            cwd=self.project_dir
-                        )
-
-                    if run_result.returncode == 0:
-                        print(f"  ✓ All tests passed")
-                        results.append((test_name, "PASSED"))
-
-                        output_lines = run_result.stderr.split('\n')
-                        for line in output_lines:
-                            if 'passed' in line.lower() or 'ok' in line.lower():
-                                print(f"    {line.strip()}")
-                        test_finished = True
-                        continue
-
-                    print(f"  ✗ Some tests failed")
-                    self._print_key_event("Runtime tests failed, preparing triage", bg_code="43")
-                    if run_result.stderr:
-                        error_lines = run_result.stderr.split('\n')
-                        for line in error_lines:
-                            if 'FAILED' in line or 'ERROR' in line or 'failed' in line:
-                                print(f"    {line.strip()}")
+                            continue
 
-                    run_log_path = os.path.join(
-                        log_dir,
-                        f"{test_name}_run_attempt{runtime_fix_count}_{timestamp}.log"
-                    )
-                    with open(run_log_path, 'w', encoding='utf-8') as log_file:
-                        log_file.write("Command:\n")
-                        log_file.write(exe_path + "\n\n")
-                        log_file.write("STDOUT:\n")
-                        log_file.write(run_result.stdout or "")
-                        log_file.write("\nSTDERR:\n")
-                        log_file.write(run_result.stderr or "")
-                    print(f"  ↳ Run log saved: {run_log_path}")
+                    if self._is_toolchain_link_error(compile_result.stderr or ""):
+                        self._print_key_event("⚠ Linker/toolchain issue detected", bg_code="43")
+                        print("  ⚠ Linker/toolchain error detected (e.g. missing gtest library).")
+                        print("    Skipping LLM code-fix because this is not a test code issue.")
+                        break
 
-                    if not auto_fix_test_failures:
-                        results.append((test_name, "FAILED"))
-                        all_passed = False
-                        test_finished = True
-                        continue
+                    if not auto_fix_compile_errors:
+                        break
 
-                    runtime_triage_result = {
+                    triage_result = {
                         "error_type": "unknown",
                         "root_cause": "triage_skipped",
                         "should_fix": True,
                         "confidence": 1.0,
                         "fix_strategy": ["direct_fix"],
                         "key_symbols": [],
-                        "minimal_change": "apply minimal runtime fix",
+                        "minimal_change": "apply minimal compile fix",
                         "code_locations": [],
-                        "change_direction": ["apply minimal runtime test fix near first failing assertion"]
-                    }
-
-                    run_output = (run_result.stdout or "") + "\n" + (run_result.stderr or "")
-                    runtime_xml_summary = self._parse_gtest_xml_result(runtime_xml_path)
-                    failed_tests = runtime_xml_summary.get("failed_tests", [])
-                    if not failed_tests:
-                        failed_tests = self._extract_failed_tests_from_output(run_output)
-
-                    current_failed_set = {str(name).strip() for name in failed_tests if str(name).strip()}
-                    if runtime_prev_failed_tests is not None:
-                        resolved = runtime_prev_failed_tests - current_failed_set
-                        if resolved:
-                            runtime_consumed_attempts = 0
-                            runtime_seen_issue_fingerprints.clear()
-                            resolved_preview = ", ".join(sorted(list(resolved))[:4])
-                            if len(resolved) > 4:
-                                resolved_preview += " ..."
-                            self._print_key_event(
-                                f"[RuntimeProgress] {len(resolved)} previously failed case(s) now pass -> reset runtime budget ({resolved_preview})",
-                                bg_code="42"
-                            )
-                    runtime_prev_failed_tests = current_failed_set
-
-                    focus_case = failed_tests[0] if failed_tests else ""
-                    focused_output = ""
-                    focus_xml_summary = {}
-                    if focus_case:
-                        focus_xml_path = os.path.join(
-                            log_dir,
-                            f"{test_name}_focus_attempt{runtime_fix_count}_{timestamp}.xml"
-                        )
-                        try:
-                            if effective_run_template:
-                                focus_context = self._build_command_context(
-                                    test_name=test_name,
-                                    test_path=test_path,
-                                    exe_path=exe_path,
-                                    build_path=build_path,
-                                    runtime_xml_path=focus_xml_path,
-                                    gtest_filter=focus_case
-                                )
-                                focus_cmd_text = self._render_command_template(
-                                    effective_run_template,
-                                    focus_context
-                                )
-                                print(f"  [RunCmd:Focus] {focus_cmd_text}")
-                                focus_result = self._run_custom_shell_command(
-                                    focus_cmd_text,
-                                    cwd=effective_run_cwd,
-                                    timeout=60
-                                )
-                            else:
-                                focus_cmd = [exe_path, f"--gtest_filter={focus_case}", f"--gtest_output=xml:{focus_xml_path}"]
-                                print(f"  [RunCmd:Focus] {' '.join(focus_cmd)}")
-                                focus_result = subprocess.run(
-                                    focus_cmd,
-                                    capture_output=True,
-                                    timeout=60,
-                                    text=True,
-                                    cwd=self.project_dir
-                                )
-                            focused_output = (focus_result.stdout or "") + "\n" + (focus_result.stderr or "")
-                            focus_xml_summary = self._parse_gtest_xml_result(focus_xml_path)
-                            self._print_key_event(
-                                f"[RuntimeFocus] solving case: {focus_case}",
-                                bg_code="45"
-                            )
-                        except Exception as focus_error:
-                            print(f"  ⚠ Focused rerun failed: {focus_error}")
-
-                    rerun_summary = self._rerun_failed_tests_for_stability(
-                        exe_path=exe_path,
-                        failed_tests=failed_tests,
-                        log_dir=log_dir,
-                        test_name=test_name,
-                        timestamp=timestamp,
-                        reruns=2,
-                        run_command_template=effective_run_template or None,
-                        run_command_cwd=effective_run_cwd,
-                        test_path=test_path,
-                        build_path=build_path
-                    )
-                    evidence_output = focused_output or run_output
-                    mock_violations = self._extract_mock_violations(evidence_output)
-                    runtime_evidence = {
-                        "xml_summary": runtime_xml_summary,
-                        "focus_case": focus_case,
-                        "focus_xml_summary": focus_xml_summary,
-                        "failed_tests": failed_tests,
-                        "stability": rerun_summary,
-                        "mock_violations": mock_violations,
-                        "first_violation": (mock_violations[0] if mock_violations else None)
+                        "change_direction": ["apply minimal compile fix around first diagnostic location"]
                     }
-
-                    if failed_tests:
-                        self._print_key_event(
-                            f"[RuntimeEvidence] failed_cases={len(failed_tests)}",
-                            bg_code="45"
-                        )
-                    if rerun_summary.get("enabled"):
-                        self._print_key_event(
-                            f"[RuntimeEvidence] stability={rerun_summary.get('status', 'unknown')}",
-                            bg_code="45"
-                        )
-                    if mock_violations:
-                        self._print_key_event(
-                            f"[RuntimeEvidence] mock_violations={len(mock_violations)}",
-                            bg_code="45"
-                        )
-
-                    never_called_methods = self._extract_never_called_mock_methods(evidence_output)
-                    if same_tu_unmockable_symbols and never_called_methods:
-                        blocked_methods = sorted([
-                            self._c_symbol_to_mock_method_name(sym)
-                            for sym in same_tu_unmockable_symbols
-                            if self._c_symbol_to_mock_method_name(sym) in never_called_methods
-                        ])
-                        if blocked_methods:
-                            with open(test_path, 'r', encoding='utf-8') as f:
-                                runtime_detfix_before_code = f.read()
-                            removed_expect_calls = self._remove_expect_call_blocks_for_methods(
-                                test_path=test_path,
-                                method_names=blocked_methods
-                            )
-                            if removed_expect_calls:
-                                with open(test_path, 'r', encoding='utf-8') as f:
-                                    runtime_detfix_after_code = f.read()
-                                self._emit_fix_diff(
-                                    before_code=runtime_detfix_before_code,
-                                    after_code=runtime_detfix_after_code,
-                                    log_dir=log_dir,
-                                    test_name=test_name,
-                                    phase="runtime_detfix",
-                                    attempt=runtime_fix_count + 1,
-                                    timestamp=timestamp
-                                )
-                                self._print_key_event(
-                                    "[DeterministicFix] Removed unreachable EXPECT_CALL blocks: "
-                                    + ", ".join(removed_expect_calls),
-                                    bg_code="45"
-                                )
-                                runtime_fix_count += 1
-                                compile_round = 0
-                                continue
+                    fused_fix_code = None
 
                     if llm_triage_enabled:
                         try:
                             with open(test_path, 'r', encoding='utf-8') as f:
                                 current_test_code = f.read()
 
+                            compile_output = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
                             navigation_context = self.compile_analyzer.build_ordered_navigation_context(
-                                compiler_output=evidence_output,
+                                compiler_output=compile_output,
                                 key_symbols=[],
                                 max_locations=8
                             )
 
-                            runtime_triage_result = self.test_generator.analyze_test_failure(
-                                current_test_code=current_test_code,
-                                test_output=evidence_output,
-                                function_name=test_name.replace("_llm_test", ""),
-                                navigation_context=navigation_context,
-                                runtime_evidence=runtime_evidence
-                            )
+                            fix_references = None
+                            if self.fused_triage_fix:
+                                # 融合模式：诊断与修复一次往返，修复在通过置信度门控后才使用；
+                                # 尚无triage根因，参考资料按编译输出预先检索，与分步修复提供同样的上下文
+                                preliminary_cause, preliminary_symbols = self._preliminary_fix_query(compile_output)
+                                fix_references = self._collect_fix_references(
+                                    phase="compile",
+                                    root_cause=preliminary_cause,
+                                    error_type="unknown",
+                                    key_symbols=preliminary_symbols,
+                                    web_research_enabled=web_research_enabled,
+                                    web_research_max_results=web_research_max_results,
+                                    experience_learning_enabled=experience_learning_enabled,
+                                    experience_top_k=experience_top_k
+                                )
+                                triage_result, fused_fix_code = self.test_generator.triage_and_fix_compile_error(
+                                    current_test_code=current_test_code,
+                                    compile_error=compile_output,
+                                    function_name=test_name.replace("_llm_test", ""),
+                                    navigation_context=navigation_context,
+                                    fix_references=fix_references
+                                )
+                            else:
+                                triage_result = self.test_generator.analyze_compile_error(
+                                    current_test_code=current_test_code,
+                                    compile_error=compile_output,
+                                    function_name=test_name.replace("_llm_test", ""),
+                                    navigation_context=navigation_context
+                                )
 
                             enriched_navigation = self.compile_analyzer.build_ordered_navigation_context(
-                                compiler_output=evidence_output,
-                                key_symbols=runtime_triage_result.get("key_symbols", []),
+                                compiler_output=compile_output,
+                                key_symbols=triage_result.get("key_symbols", []),
                                 max_locations=8
                             )
-                            runtime_triage_result["code_locations"] = enriched_navigation.get("code_locations", [])
-                            runtime_triage_result["ordered_navigation"] = enriched_navigation.get("ordered_navigation", [])
-                            runtime_triage_result["scope"] = enriched_navigation.get("scope", {})
-                            runtime_triage_result["runtime_evidence"] = runtime_evidence
-
-                            if web_research_enabled:
-                                try:
-                                    web_research = self.test_generator.research_root_cause_online(
-                                        root_cause=str(runtime_triage_result.get("root_cause", "")),
-                                        error_type=str(runtime_triage_result.get("error_type", "unknown")),
-                                        key_symbols=runtime_triage_result.get("key_symbols", []),
-                                        max_results=web_research_max_results
-                                    )
-                                    runtime_triage_result["web_research"] = web_research
-                                    print(
-                                        f"  [Run-Research] query='{web_research.get('query', '')}', "
-                                        f"refs={web_research.get('count', 0)}"
-                                    )
-                                except Exception as research_error:
-                                    print(f"  ⚠ Web research failed (runtime triage): {research_error}")
-
-                            if experience_learning_enabled and self.experience_store:
-                                try:
-                                    memory_refs = self.experience_store.query_experiences(
-                                        root_cause=str(runtime_triage_result.get("root_cause", "")),
-                                        error_type=str(runtime_triage_result.get("error_type", "unknown")),
-                                        phase="runtime",
-                                        key_symbols=runtime_triage_result.get("key_symbols", []),
-                                        top_k=experience_top_k
-                                    )
-                                    if memory_refs:
-                                        runtime_triage_result["experience_hints"] = memory_refs
-                                        print(f"  [Memory] Retrieved {len(memory_refs)} runtime experience(s)")
-                                except Exception as memory_error:
-                                    print(f"  ⚠ Experience query failed (runtime): {memory_error}")
-
-                            triage_conf = float(runtime_triage_result.get("confidence", 0.0) or 0.0)
-                            triage_type = str(runtime_triage_result.get("error_type", "unknown"))
-                            triage_cause = str(runtime_triage_result.get("root_cause", ""))
+                            triage_result["code_locations"] = enriched_navigation.get("code_locations", [])
+                            triage_result["ordered_navigation"] = enriched_navigation.get("ordered_navigation", [])
+                            triage_result["scope"] = enriched_navigation.get("scope", {})
+
+                            if fix_references is None:
+                                fix_references = self._collect_fix_references(
+                                    phase="compile",
+                                    root_cause=str(triage_result.get("root_cause", "")),
+                                    error_type=str(triage_result.get("error_type", "unknown")),
+                                    key_symbols=triage_result.get("key_symbols", []),
+                                    web_research_enabled=web_research_enabled,
+                                    web_research_max_results=web_research_max_results,
+                                    experience_learning_enabled=experience_learning_enabled,
+                                    experience_top_k=experience_top_k
+                                )
+                            triage_result.update(fix_references)
+
+                            triage_conf = float(triage_result.get("confidence", 0.0) or 0.0)
+                            triage_type = str(triage_result.get("error_type", "unknown"))
+                            triage_cause = str(triage_result.get("root_cause", ""))
                             print(
-                                f"  [Run-Triage] type={triage_type}, confidence={triage_conf:.2f}, cause={triage_cause}"
+                                f"  [Triage] type={triage_type}, confidence={triage_conf:.2f}, cause={triage_cause}"
                             )
-                            if runtime_triage_result.get("code_locations"):
-                                first_loc = runtime_triage_result["code_locations"][0]
+                            if triage_result.get("code_locations"):
+                                first_loc = triage_result["code_locations"][0]
                                 print(
-                                    f"  [Run-Locate] {first_loc.get('file', '')}:{first_loc.get('line', 1)} "
+                                    f"  [Locate] {first_loc.get('file', '')}:{first_loc.get('line', 1)} "
                                     f"({first_loc.get('kind', 'location')})"
                                 )
-                            if runtime_triage_result.get("change_direction"):
-                                print(f"  [Run-Direction] {runtime_triage_result['change_direction'][0]}")
-                            if runtime_triage_result.get("actionable_edits"):
-                                first_edit = runtime_triage_result["actionable_edits"][0]
+                            if triage_result.get("change_direction"):
+                                print(f"  [Direction] {triage_result['change_direction'][0]}")
+                            if triage_result.get("actionable_edits"):
+                                first_edit = triage_result["actionable_edits"][0]
                                 print(
-                                    "  [Run-Actionable] "
+                                    "  [Actionable] "
                                     f"{first_edit.get('file', '')}:{first_edit.get('line', 1)} -> "
                                     f"{first_edit.get('instruction', '')}"
                                 )
 
                             triage_log_path = os.path.join(
                                 log_dir,
-                                f"{test_name}_run_triage_attempt{runtime_fix_count + 1}_{timestamp}.log"
+                                f"{test_name}_triage_attempt{llm_fix_count + 1}_{timestamp}.log"
                             )
                             with open(triage_log_path, 'w', encoding='utf-8') as triage_log:
-                                triage_log.write("LLM runtime triage result:\n")
-                                triage_log.write(json.dumps(runtime_triage_result, ensure_ascii=False, indent=2))
-                            print(f"  ↳ Run triage log saved: {triage_log_path}")
+                                triage_log.write("LLM triage result:\n")
+                                triage_log.write(json.dumps(triage_result, ensure_ascii=False, indent=2))
+                            print(f"  ↳ Triage log saved: {triage_log_path}")
 
-                            triage_unavailable = str(runtime_triage_result.get("root_cause", "")) == "triage_unavailable"
+                            triage_unavailable = str(triage_result.get("root_cause", "")) == "triage_unavailable"
                             if triage_unavailable:
                                 self._print_key_event(
-                                    "[Run-Triage] unavailable -> fallback to direct fix (ignore confidence gate)",
+                                    "[Triage] unavailable -> fallback to direct fix (ignore confidence gate)",
                                     bg_code="45"
                                 )
-                            elif (not bool(runtime_triage_result.get("should_fix", True))) or triage_conf < triage_min_confidence:
+                            elif (not bool(triage_result.get("should_fix", True))) or triage_conf < triage_min_confidence:
                                 print(
-                                    f"  ⚠ Runtime triage decided to skip fix "
-                                    f"(should_fix={bool(runtime_triage_result.get('should_fix', True))}, "
+                                    f"  ⚠ Triage decided to skip fix "
+                                    f"(should_fix={bool(triage_result.get('should_fix', True))}, "
                                     f"confidence={triage_conf:.2f} < {triage_min_confidence:.2f})"
                                 )
-                                results.append((test_name, "FAILED"))
-                                all_passed = False
-                                test_finished = True
-                                continue
+                                break
                         except Exception as triage_error:
-                            print(f"  ⚠ Runtime triage failed, fallback to direct fix: {triage_error}")
-
-                    runtime_issue_fingerprint = self._build_issue_fingerprint(
-                        error_type=str(runtime_triage_result.get("error_type", "unknown")),
-                        root_cause=str(runtime_triage_result.get("root_cause", "")),
-                        key_symbols=runtime_triage_result.get("key_symbols", []),
-                        raw_output=evidence_output
+                            print(f"  ⚠ Triage failed, fallback to direct fix: {triage_error}")
+
+                    compile_output = (compile_result.stdout or "") + "\n" + (compile_result.stderr or "")
+                    issue_fingerprint = self._build_issue_fingerprint(
+                        error_type=str(triage_result.get("error_type", "unknown")),
+                        root_cause=str(triage_result.get("root_cause", "")),
+                        key_symbols=triage_result.get("key_symbols", []),
+                        raw_output=compile_output
                     )
-                    runtime_is_new_issue = runtime_issue_fingerprint not in runtime_seen_issue_fingerprints
-                    runtime_issue_counts[runtime_issue_fingerprint] += 1
-                    runtime_repeat_count = runtime_issue_counts[runtime_issue_fingerprint]
-                    runtime_triage_result["issue_fingerprint"] = runtime_issue_fingerprint
-                    runtime_triage_result["is_new_issue"] = bool(runtime_is_new_issue)
-                    runtime_triage_result["repeat_count"] = int(runtime_repeat_count)
-
-                    if runtime_is_new_issue:
+                    is_new_issue = issue_fingerprint not in compile_seen_issue_fingerprints
+                    compile_issue_counts[issue_fingerprint] += 1
+                    compile_repeat_count = compile_issue_counts[issue_fingerprint]
+                    triage_result["issue_fingerprint"] = issue_fingerprint
+                    triage_result["is_new_issue"] = bool(is_new_issue)
+                    triage_result["repeat_count"] = int(compile_repeat_count)
+
+                    if is_new_issue:
                         self._print_key_event(
-                            "[RetryPolicy] New runtime issue detected -> does not consume attempt budget",
+                            "[RetryPolicy] New compile issue detected -> does not consume attempt budget",
                             bg_code="42"
                         )
                     else:
-                        runtime_consumed_attempts += 1
+                        compile_consumed_attempts += 1
                         self._print_key_event(
-                            f"[RetryPolicy] Repeated runtime issue -> consume budget ({runtime_consumed_attempts}/{max_test_fix_attempts})",
+                            f"[RetryPolicy] Repeated compile issue -> consume budget ({compile_consumed_attempts}/{max_fix_attempts})",
                             bg_code="43"
                         )
 
-                    if runtime_consumed_attempts > max_test_fix_attempts:
-                        self._print_key_event(
-                            "[RetryPolicy] Repeated runtime issue budget exceeded -> stop",
-                            bg_code="41"
-                        )
-                        results.append((test_name, "FAILED"))
-                        all_passed = False
-                        test_finished = True
-                        continue
+                    if compile_consumed_attempts > max_fix_attempts:
+                        self._print_key_event(
+                            "[RetryPolicy] Repeated compile issue budget exceeded -> stop",
+                            bg_code="41"
+                        )
+                        break
+
+                    compile_seen_issue_fingerprints.add(issue_fingerprint)
+
+                    self._print_key_event(
+                        f"[Fix] Compile auto-fix phase (repeat-budget {compile_consumed_attempts}/{max_fix_attempts}, total-fix {llm_fix_count + 1})",
+                        bg_code="46"
+                    )
+                    try:
+                        with open(test_path, 'r', encoding='utf-8') as f:
+                            current_test_code = f.read()
+                        before_fix_code = current_test_code
+
+                        aggressive_compile_fix = compile_repeat_count >= 2
+                        if aggressive_compile_fix:
+                            self._print_key_event(
+                                "[Escalation] Compile issue repeated -> aggressive rewrite mode",
+                                bg_code="45"
+                            )
+
+                        speculative_build = None
+                        if self.speculative_candidates > 1 and not effective_compile_template:
+                            fixed_test_code, winner_build = self._speculative_fix(
+                                phase="compile",
+                                current_test_code=current_test_code,
+                                failure_output=compile_output,
+                                function_name=test_name.replace("_llm_test", ""),
+                                analysis=triage_result if llm_triage_enabled else None,
+                                aggressive=aggressive_compile_fix,
+                                test_name=test_name,
+                                test_path=test_path,
+                                build_path=build_path,
+                                compiler_path=compiler_path,
+                                include_dirs=include_dirs,
+                                source_files=source_files_active,
+                                gtest_link_inputs=stub_unit.link_inputs() + gtest_link_inputs,
+                                blocked_symbols=sorted(list(blocked_redefinition_symbols)),
+                                protected_symbols=[target_symbol],
+                                exe_path=exe_path,
+                                split_build=split_link
+                            )
+                            if winner_build is not None:
+                                speculative_build = (fixed_test_code, winner_build)
+                        elif fused_fix_code not in (None, current_test_code) and not aggressive_compile_fix:
+                            print("  [Fused] Using fix returned by fused triage response")
+                            fixed_test_code = fused_fix_code
+                        else:
+                            fixed_test_code = self.test_generator.fix_test_from_compile_error(
+                                current_test_code=current_test_code,
+                                compile_error=compile_output,
+                                function_name=test_name.replace("_llm_test", ""),
+                                compile_analysis=triage_result if llm_triage_enabled else None,
+                                aggressive=aggressive_compile_fix
+                            )
+
+                            first_change_preview = self._summarize_code_change(current_test_code, fixed_test_code)
+                            if first_change_preview == "no_text_change" and not aggressive_compile_fix:
+                                self._print_key_event(
+                                    "[Escalation] No code change detected -> retry once with aggressive rewrite",
+                                    bg_code="45"
+                                )
+                                fixed_test_code = self.test_generator.fix_test_from_compile_error(
+                                    current_test_code=current_test_code,
+                                    compile_error=compile_output,
+                                    function_name=test_name.replace("_llm_test", ""),
+                                    compile_analysis=triage_result if llm_triage_enabled else None,
+                                    aggressive=True
+                                )
+
+                        if blocked_redefinition_symbols:
+                            sanitized_code, stripped_symbols = self._remove_symbol_definitions_from_code(
+                                fixed_test_code,
+                                sorted(list(blocked_redefinition_symbols)),
+                                protected_symbols=[target_symbol]
+                            )
+                            if stripped_symbols:
+                                self._print_key_event(
+                                    "[AntiOscillation] Stripped forbidden redefinitions from compile fix: "
+                                    + ", ".join(stripped_symbols[:6])
+                                    + (" ..." if len(stripped_symbols) > 6 else ""),
+                                    bg_code="45"
+                                )
+                                fixed_test_code = sanitized_code
+
+                        with open(test_path, 'w', encoding='utf-8') as f:
+                            f.write(fixed_test_code)
+
+                        diff_log_path = self._emit_fix_diff(
+                            before_code=before_fix_code,
+                            after_code=fixed_test_code,
+                            log_dir=log_dir,
+                            test_name=test_name,
+                            phase="compile",
+                            attempt=llm_fix_count + 1,
+                            timestamp=timestamp
+                        )
+
+                        fix_log_path = os.path.join(log_dir, f"{test_name}_autofix_attempt{llm_fix_count + 1}_{timestamp}.log")
+                        with open(fix_log_path, 'w', encoding='utf-8') as log_file:
+                            log_file.write("Auto-fix triggered by compile error.\n\n")
+                            log_file.write("Original compile stderr (truncated to 8000 chars):\n")
+                            log_file.write((compile_result.stderr or "")[:8000])
+                            if diff_log_path:
+                                log_file.write("\n\nUnified diff patch log:\n")
+                                log_file.write(diff_log_path)
+                                log_file.write("\n")
+                            log_file.write("\n\nUpdated test file:\n")
+                            log_file.write(fixed_test_code)
+
+                        print(f"  ↳ Auto-fix applied and saved: {test_path}")
+                        print(f"  ↳ Auto-fix log saved: {fix_log_path}")
+
+                        if experience_learning_enabled and self.experience_store:
+                            try:
+                                self.experience_store.add_experience({
+                                    "phase": "compile",
+                                    "function_name": test_name.replace("_llm_test", ""),
+                                    "test_file": test_file,
+                                    "error_type": str(triage_result.get("error_type", "unknown")),
+                                    "root_cause": str(triage_result.get("root_cause", "")),
+                                    "key_symbols": triage_result.get("key_symbols", []),
+                                    "fix_strategy": triage_result.get("fix_strategy", []),
+                                    "summary": str(triage_result.get("minimal_change", "compile fix applied")),
+                                    "code_locations": triage_result.get("code_locations", []),
+                                    "change_direction": triage_result.get("change_direction", []),
+                                    "analysis_layers": triage_result.get("analysis_layers", []),
+                                    "actionable_edits": triage_result.get("actionable_edits", []),
+                                    "verification_plan": triage_result.get("verification_plan", []),
+                                    "change_preview": self._summarize_code_change(before_fix_code, fixed_test_code),
+                                    "outcome": "fix_applied_pending_recompile",
+                                    "attempt": llm_fix_count + 1
+                                })
+                            except Exception as memory_write_error:
+                                print(f"  ⚠ Experience write failed (compile): {memory_write_error}")
+
+                        llm_fix_count += 1
+                        compile_round += 1
+                    except Exception as fix_error:
+                        print(f"  ✗ Auto-fix failed: {fix_error}")
+                        break
+
+                if not compile_success:
+                    final_status = "COMPILE_FAILED"
+                    test_finished = True
+                    continue
+
+                print(f"  ✓ Compiled successfully")
+                self._print_key_event("Compile succeeded, entering test run", bg_code="42")
+                print(f"Running: {test_name}...")
+                runtime_xml_path = os.path.join(
+                    log_dir,
+                    f"{test_name}_run_attempt{runtime_fix_count}_{timestamp}.xml"
+                )
+                if effective_run_template:
+                    run_context = self._build_command_context(
+                        test_name=test_name,
+                        test_path=test_path,
+                        exe_path=exe_path,
+                        build_path=build_path,
+                        runtime_xml_path=runtime_xml_path
+                    )
+                    run_cmd_display = self._render_command_template(
+                        effective_run_template,
+                        run_context
+                    )
+                    print(f"  [RunCmd] {run_cmd_display}")
+                    run_result = self._run_custom_shell_command(
+                        run_cmd_display,
+                        cwd=effective_run_cwd,
+                        timeout=120
+                    )
+                else:
+                    run_cmd = [exe_path, f"--gtest_output=xml:{runtime_xml_path}"]
+                    run_cmd_display = ' '.join(run_cmd)
+                    print(f"  [RunCmd] {run_cmd_display}")
+                    run_result = subprocess.run(
+                        run_cmd,
+                        capture_output=True,
+                        timeout=120,
+                        text=True,
+                        cwd=self.project_dir
+                    )
+
+                if run_result.returncode == 0:
+                    print(f"  ✓ All tests passed")
+                    final_status = "PASSED"
+
+                    output_lines = run_result.stderr.split('\n')
+                    for line in output_lines:
+                        if 'passed' in line.lower() or 'ok' in line.lower():
+                            print(f"    {line.strip()}")
+                    test_finished = True
+                    continue
+
+                print(f"  ✗ Some tests failed")
+                self._print_key_event("Runtime tests failed, preparing triage", bg_code="43")
+                if run_result.stderr:
+                    error_lines = run_result.stderr.split('\n')
+                    for line in error_lines:
+                        if 'FAILED' in line or 'ERROR' in line or 'failed' in line:
+                            print(f"    {line.strip()}")
+
+                run_log_path = os.path.join(
+                    log_dir,
+                    f"{test_name}_run_attempt{runtime_fix_count}_{timestamp}.log"
+                )
+                with open(run_log_path, 'w', encoding='utf-8') as log_file:
+                    log_file.write("Command:\n")
+                    log_file.write(exe_path + "\n\n")
+                    log_file.write("STDOUT:\n")
+                    log_file.write(run_result.stdout or "")
+                    log_file.write("\nSTDERR:\n")
+                    log_file.write(run_result.stderr or "")
+                print(f"  ↳ Run log saved: {run_log_path}")
+
+                if not auto_fix_test_failures:
+                    final_status = "FAILED"
+                    test_finished = True
+                    continue
+
+                runtime_triage_result = {
+                    "error_type": "unknown",
+                    "root_cause": "triage_skipped",
+                    "should_fix": True,
+                    "confidence": 1.0,
+                    "fix_strategy": ["direct_fix"],
+                    "key_symbols": [],
+                    "minimal_change": "apply minimal runtime fix",
+                    "code_locations": [],
+                    "change_direction": ["apply minimal runtime test fix near first failing assertion"]
+                }
+                runtime_fused_fix_code = None
+
+                run_output = (run_result.stdout or "") + "\n" + (run_result.stderr or "")
+                runtime_xml_summary = self._parse_gtest_xml_result(runtime_xml_path)
+                failed_tests = runtime_xml_summary.get("failed_tests", [])
+                if not failed_tests:
+                    failed_tests = self._extract_failed_tests_from_output(run_output)
+
+                current_failed_set = {str(name).strip() for name in failed_tests if str(name).strip()}
+                if runtime_prev_failed_tests is not None:
+                    resolved = runtime_prev_failed_tests - current_failed_set
+                    if resolved:
+                        runtime_consumed_attempts = 0
+                        runtime_seen_issue_fingerprints.clear()
+                        resolved_preview = ", ".join(sorted(list(resolved))[:4])
+                        if len(resolved) > 4:
+                            resolved_preview += " ..."
+                        self._print_key_event(
+                            f"[RuntimeProgress] {len(resolved)} previously failed case(s) now pass -> reset runtime budget ({resolved_preview})",
+                            bg_code="42"
+                        )
+                runtime_prev_failed_tests = current_failed_set
+
+                focus_case = failed_tests[0] if failed_tests else ""
+                focused_output = ""
+                focus_xml_summary = {}
+                if focus_case:
+                    focus_xml_path = os.path.join(
+                        log_dir,
+                        f"{test_name}_focus_attempt{runtime_fix_count}_{timestamp}.xml"
+                    )
+                    try:
+                        if effective_run_template:
+                            focus_context = self._build_command_context(
+                                test_name=test_name,
+                                test_path=test_path,
+                                exe_path=exe_path,
+                                build_path=build_path,
+                                runtime_xml_path=focus_xml_path,
+                                gtest_filter=focus_case
+                            )
+                            focus_cmd_text = self._render_command_template(
+                                effective_run_template,
+                                focus_context
+                            )
+                            print(f"  [RunCmd:Focus] {focus_cmd_text}")
+                            focus_result = self._run_custom_shell_command(
+                                focus_cmd_text,
+                                cwd=effective_run_cwd,
+                                timeout=60
+                            )
+                        else:
+                            focus_cmd = [exe_path, f"--gtest_filter={focus_case}", f"--gtest_output=xml:{focus_xml_path}"]
+                            print(f"  [RunCmd:Focus] {' '.join(focus_cmd)}")
+                            focus_result = subprocess.run(
+                                focus_cmd,
+                                capture_output=True,
+                                timeout=60,
+                                text=True,
+                                cwd=self.project_dir
+                            )
+                        focused_output = (focus_result.stdout or "") + "\n" + (focus_result.stderr or "")
+                        focus_xml_summary = self._parse_gtest_xml_result(focus_xml_path)
+                        self._print_key_event(
+                            f"[RuntimeFocus] solving case: {focus_case}",
+                            bg_code="45"
+                        )
+                    except Exception as focus_error:
+                        print(f"  ⚠ Focused rerun failed: {focus_error}")
+
+                rerun_summary = self._rerun_failed_tests_for_stability(
+                    exe_path=exe_path,
+                    failed_tests=failed_tests,
+                    log_dir=log_dir,
+                    test_name=test_name,
+                    timestamp=timestamp,
+                    reruns=2,
+                    run_command_template=effective_run_template or None,
+                    run_command_cwd=effective_run_cwd,
+                    test_path=test_path,
+                    build_path=build_path
+                )
+                evidence_output = focused_output or run_output
+                mock_violations = self._extract_mock_violations(evidence_output)
+                runtime_evidence = {
+                    "xml_summary": runtime_xml_summary,
+                    "focus_case": focus_case,
+                    "focus_xml_summary": focus_xml_summary,
+                    "failed_tests": failed_tests,
+                    "stability": rerun_summary,
+                    "mock_violations": mock_violations,
+                    "first_violation": (mock_violations[0] if mock_violations else None)
+                }
+
+                if failed_tests:
+                    self._print_key_event(
+                        f"[RuntimeEvidence] failed_cases={len(failed_tests)}",
+                        bg_code="45"
+                    )
+                if rerun_summary.get("enabled"):
+                    self._print_key_event(
+                        f"[RuntimeEvidence] stability={rerun_summary.get('status', 'unknown')}",
+                        bg_code="45"
+                    )
+                if mock_violations:
+                    self._print_key_event(
+                        f"[RuntimeEvidence] mock_violations={len(mock_violations)}",
+                        bg_code="45"
+                    )
+
+                never_called_methods = self._extract_never_called_mock_methods(evidence_output)
+                if same_tu_unmockable_symbols and never_called_methods:
+                    blocked_methods = sorted([
+                        self._c_symbol_to_mock_method_name(sym)
+                        for sym in same_tu_unmockable_symbols
+                        if self._c_symbol_to_mock_method_name(sym) in never_called_methods
+                    ])
+                    if blocked_methods:
+                        with open(test_path, 'r', encoding='utf-8') as f:
+                            runtime_detfix_before_code = f.read()
+                        removed_expect_calls = self._remove_expect_call_blocks_for_methods(
+                            test_path=test_path,
+                            method_names=blocked_methods
+                        )
+                        if removed_expect_calls:
+                            with open(test_path, 'r', encoding='utf-8') as f:
+                                runtime_detfix_after_code = f.read()
+                            self._emit_fix_diff(
+                                before_code=runtime_detfix_before_code,
+                                after_code=runtime_detfix_after_code,
+                                log_dir=log_dir,
+                                test_name=test_name,
+                                phase="runtime_detfix",
+                                attempt=runtime_fix_count + 1,
+                                timestamp=timestamp
+                            )
+                            self._print_key_event(
+                                "[DeterministicFix] Removed unreachable EXPECT_CALL blocks: "
+                                + ", ".join(removed_expect_calls),
+                                bg_code="45"
+                            )
+                            runtime_fix_count += 1
+                            compile_round = 0
+                            continue
+
+                if llm_triage_enabled:
+                    try:
+                        with open(test_path, 'r', encoding='utf-8') as f:
+                            current_test_code = f.read()
+
+                        navigation_context = self.compile_analyzer.build_ordered_navigation_context(
+                            compiler_output=evidence_output,
+                            key_symbols=[],
+                            max_locations=8
+                        )
+
+                        runtime_fix_references = None
+                        if self.fused_triage_fix:
+                            preliminary_cause, preliminary_symbols = self._preliminary_fix_query(evidence_output)
+                            runtime_fix_references = self._collect_fix_references(
+                                phase="runtime",
+                                root_cause=preliminary_cause,
+                                error_type="unknown",
+                                key_symbols=preliminary_symbols,
+                                web_research_enabled=web_research_enabled,
+                                web_research_max_results=web_research_max_results,
+                                experience_learning_enabled=experience_learning_enabled,
+                                experience_top_k=experience_top_k
+                            )
+                            runtime_triage_result, runtime_fused_fix_code = self.test_generator.triage_and_fix_test_failure(
+                                current_test_code=current_test_code,
+                                test_output=evidence_output,
+                                function_name=test_name.replace("_llm_test", ""),
+                                navigation_context=navigation_context,
+                                runtime_evidence=runtime_evidence,
+                                fix_references=runtime_fix_references
+                            )
+                        else:
+                            runtime_triage_result = self.test_generator.analyze_test_failure(
+                                current_test_code=current_test_code,
+                                test_output=evidence_output,
+                                function_name=test_name.replace("_llm_test", ""),
+                                navigation_context=navigation_context,
+                                runtime_evidence=runtime_evidence
+                            )
+
+                        enriched_navigation = self.compile_analyzer.build_ordered_navigation_context(
+                            compiler_output=evidence_output,
+                            key_symbols=runtime_triage_result.get("key_symbols", []),
+                            max_locations=8
+                        )
+                        runtime_triage_result["code_locations"] = enriched_navigation.get("code_locations", [])
+                        runtime_triage_result["ordered_navigation"] = enriched_navigation.get("ordered_navigation", [])
+                        runtime_triage_result["scope"] = enriched_navigation.get("scope", {})
+                        runtime_triage_result["runtime_evidence"] = runtime_evidence
+
+                        if runtime_fix_references is None:
+                            runtime_fix_references = self._collect_fix_references(
+                                phase="runtime",
+                                root_cause=str(runtime_triage_result.get("root_cause", "")),
+                                error_type=str(runtime_triage_result.get("error_type", "unknown")),
+                                key_symbols=runtime_triage_result.get("key_symbols", []),
+                                web_research_enabled=web_research_enabled,
+                                web_research_max_results=web_research_max_results,
+                                experience_learning_enabled=experience_learning_enabled,
+                                experience_top_k=experience_top_k
+                            )
+                        runtime_triage_result.update(runtime_fix_references)
+
+                        triage_conf = float(runtime_triage_result.get("confidence", 0.0) or 0.0)
+                        triage_type = str(runtime_triage_result.get("error_type", "unknown"))
+                        triage_cause = str(runtime_triage_result.get("root_cause", ""))
+                        print(
+                            f"  [Run-Triage] type={triage_type}, confidence={triage_conf:.2f}, cause={triage_cause}"
+                        )
+                        if runtime_triage_result.get("code_locations"):
+                            first_loc = runtime_triage_result["code_locations"][0]
+                            print(
+                                f"  [Run-Locate] {first_loc.get('file', '')}:{first_loc.get('line', 1)} "
+                                f"({first_loc.get('kind', 'location')})"
+                            )
+                        if runtime_triage_result.get("change_direction"):
+                            print(f"  [Run-Direction] {runtime_triage_result['change_direction'][0]}")
+                        if runtime_triage_result.get("actionable_edits"):
+                            first_edit = runtime_triage_result["actionable_edits"][0]
+                            print(
+                                "  [Run-Actionable] "
+                                f"{first_edit.get('file', '')}:{first_edit.get('line', 1)} -> "
+                                f"{first_edit.get('instruction', '')}"
+                            )
+
+                        triage_log_path = os.path.join(
+                            log_dir,
+                            f"{test_name}_run_triage_attempt{runtime_fix_count + 1}_{timestamp}.log"
+                        )
+                        with open(triage_log_path, 'w', encoding='utf-8') as triage_log:
+                            triage_log.write("LLM runtime triage result:\n")
+                            triage_log.write(json.dumps(runtime_triage_result, ensure_ascii=False, indent=2))
+                        print(f"  ↳ Run triage log saved: {triage_log_path}")
+
+                        triage_unavailable = str(runtime_triage_result.get("root_cause", "")) == "triage_unavailable"
+                        if triage_unavailable:
+                            self._print_key_event(
+                                "[Run-Triage] unavailable -> fallback to direct fix (ignore confidence gate)",
+                                bg_code="45"
+                            )
+                        elif (not bool(runtime_triage_result.get("should_fix", True))) or triage_conf < triage_min_confidence:
+                            print(
+                                f"  ⚠ Runtime triage decided to skip fix "
+                                f"(should_fix={bool(runtime_triage_result.get('should_fix', True))}, "
+                                f"confidence={triage_conf:.2f} < {triage_min_confidence:.2f})"
+                            )
+                            final_status = "FAILED"
+                            test_finished = True
+                            continue
+                    except Exception as triage_error:
+                        print(f"  ⚠ Runtime triage failed, fallback to direct fix: {triage_error}")
+
+                runtime_issue_fingerprint = self._build_issue_fingerprint(
+                    error_type=str(runtime_triage_result.get("error_type", "unknown")),
+                    root_cause=str(runtime_triage_result.get("root_cause", "")),
+                    key_symbols=runtime_triage_result.get("key_symbols", []),
+                    raw_output=evidence_output
+                )
+                runtime_is_new_issue = runtime_issue_fingerprint not in runtime_seen_issue_fingerprints
+                runtime_issue_counts[runtime_issue_fingerprint] += 1
+                runtime_repeat_count = runtime_issue_counts[runtime_issue_fingerprint]
+                runtime_triage_result["issue_fingerprint"] = runtime_issue_fingerprint
+                runtime_triage_result["is_new_issue"] = bool(runtime_is_new_issue)
+                runtime_triage_result["repeat_count"] = int(runtime_repeat_count)
+
+                if runtime_is_new_issue:
+                    self._print_key_event(
+                        "[RetryPolicy] New runtime issue detected -> does not consume attempt budget",
+                        bg_code="42"
+                    )
+                else:
+                    runtime_consumed_attempts += 1
+                    self._print_key_event(
+                        f"[RetryPolicy] Repeated runtime issue -> consume budget ({runtime_consumed_attempts}/{max_test_fix_attempts})",
+                        bg_code="43"
+                    )
+
+                if runtime_consumed_attempts > max_test_fix_attempts:
+                    self._print_key_event(
+                        "[RetryPolicy] Repeated runtime issue budget exceeded -> stop",
+                        bg_code="41"
+                    )
+                    final_status = "FAILED"
+                    test_finished = True
+                    continue
+
+                runtime_seen_issue_fingerprints.add(runtime_issue_fingerprint)
+
+                self._print_key_event(
+                    f"[Fix] Runtime auto-fix phase (repeat-budget {runtime_consumed_attempts}/{max_test_fix_attempts}, total-fix {runtime_fix_count + 1})",
+                    bg_code="46"
+                )
+                try:
+                    with open(test_path, 'r', encoding='utf-8') as f:
+                        current_test_code = f.read()
+                    before_fix_code = current_test_code
+
+                    aggressive_runtime_fix = runtime_repeat_count >= 2
+                    if aggressive_runtime_fix:
+                        self._print_key_event(
+                            "[Escalation] Runtime issue repeated -> aggressive rewrite mode",
+                            bg_code="45"
+                        )
+
+                    speculative_build = None
+                    if self.speculative_candidates > 1 and not effective_compile_template:
+                        fixed_test_code, winner_build = self._speculative_fix(
+                            phase="runtime",
+                            current_test_code=current_test_code,
+                            failure_output=run_output,
+                            function_name=test_name.replace("_llm_test", ""),
+                            analysis=runtime_triage_result if llm_triage_enabled else None,
+                            aggressive=aggressive_runtime_fix,
+                            test_name=test_name,
+                            test_path=test_path,
+                            build_path=build_path,
+                            compiler_path=compiler_path,
+                            include_dirs=include_dirs,
+                            source_files=source_files_active,
+                            gtest_link_inputs=stub_unit.link_inputs() + gtest_link_inputs,
+                            blocked_symbols=sorted(list(blocked_redefinition_symbols)),
+                            protected_symbols=[target_symbol],
+                            exe_path=exe_path,
+                            split_build=split_link
+                        )
+                        if winner_build is not None:
+                            speculative_build = (fixed_test_code, winner_build)
+                    elif runtime_fused_fix_code not in (None, current_test_code) and not aggressive_runtime_fix:
+                        print("  [Fused] Using fix returned by fused triage response")
+                        fixed_test_code = runtime_fused_fix_code
+                    else:
+                        fixed_test_code = self.test_generator.fix_test_from_test_failure(
+                            current_test_code=current_test_code,
+                            test_output=run_output,
+                            function_name=test_name.replace("_llm_test", ""),
+                            failure_analysis=runtime_triage_result if llm_triage_enabled else None,
+                            aggressive=aggressive_runtime_fix
+                        )
+
+                        first_change_preview = self._summarize_code_change(current_test_code, fixed_test_code)
+                        if first_change_preview == "no_text_change" and not aggressive_runtime_fix:
+                            self._print_key_event(
+                                "[Escalation] No code change detected -> retry once with aggressive rewrite",
+                                bg_code="45"
+                            )
+                            fixed_test_code = self.test_generator.fix_test_from_test_failure(
+                                current_test_code=current_test_code,
+                                test_output=run_output,
+                                function_name=test_name.replace("_llm_test", ""),
+                                failure_analysis=runtime_triage_result if llm_triage_enabled else None,
+                                aggressive=True
+                            )
+
+                    if blocked_redefinition_symbols:
+                        sanitized_code, stripped_symbols = self._remove_symbol_definitions_from_code(
+                            fixed_test_code,
+                            sorted(list(blocked_redefinition_symbols)),
+                            protected_symbols=[target_symbol]
+                        )
+                        if stripped_symbols:
+                            self._print_key_event(
+                                "[AntiOscillation] Stripped forbidden redefinitions from runtime fix: "
+                                + ", ".join(stripped_symbols[:6])
+                                + (" ..." if len(stripped_symbols) > 6 else ""),
+                                bg_code="45"
+                            )
+                            fixed_test_code = sanitized_code
+
+                    with open(test_path, 'w', encoding='utf-8') as f:
+                        f.write(fixed_test_code)
+
+                    diff_log_path = self._emit_fix_diff(
+                        before_code=before_fix_code,
+                        after_code=fixed_test_code,
+                        log_dir=log_dir,
+                        test_name=test_name,
+                        phase="runtime",
+                        attempt=runtime_fix_count + 1,
+                        timestamp=timestamp
+                    )
+
+                    fix_log_path = os.path.join(
+                        log_dir,
+                        f"{test_name}_run_autofix_attempt{runtime_fix_count + 1}_{timestamp}.log"
+                    )
+                    with open(fix_log_path, 'w', encoding='utf-8') as log_file:
+                        log_file.write("Auto-fix triggered by test runtime failure.\n\n")
+                        log_file.write("Original run output (truncated to 8000 chars):\n")
+                        log_file.write(run_output[:8000])
+                        if diff_log_path:
+                            log_file.write("\n\nUnified diff patch log:\n")
+                            log_file.write(diff_log_path)
+                            log_file.write("\n")
+                        log_file.write("\n\nUpdated test file:\n")
+                        log_file.write(fixed_test_code)
+
+                    print(f"  ↳ Runtime auto-fix applied and saved: {test_path}")
+                    print(f"  ↳ Runtime auto-fix log saved: {fix_log_path}")
+
+                    if experience_learning_enabled and self.experience_store:
+                        try:
+                            self.experience_store.add_experience({
+                                "phase": "runtime",
+                                "function_name": test_name.replace("_llm_test", ""),
+                                "test_file": test_file,
+                                "error_type": str(runtime_triage_result.get("error_type", "unknown")),
+                                "root_cause": str(runtime_triage_result.get("root_cause", "")),
+                                "key_symbols": runtime_triage_result.get("key_symbols", []),
+                                "fix_strategy": runtime_triage_result.get("fix_strategy", []),
+                                "summary": str(runtime_triage_result.get("minimal_change", "runtime fix applied")),
+                                "code_locations": runtime_triage_result.get("code_locations", []),
+                                "change_direction": runtime_triage_result.get("change_direction", []),
+                                "analysis_layers": runtime_triage_result.get("analysis_layers", []),
+                                "actionable_edits": runtime_triage_result.get("actionable_edits", []),
+                                "verification_plan": runtime_triage_result.get("verification_plan", []),
+                                "runtime_evidence": runtime_triage_result.get("runtime_evidence", runtime_evidence),
+                                "change_preview": self._summarize_code_change(before_fix_code, fixed_test_code),
+                                "outcome": "fix_applied_pending_rerun",
+                                "attempt": runtime_fix_count + 1
+                            })
+                        except Exception as memory_write_error:
+                            print(f"  ⚠ Experience write failed (runtime): {memory_write_error}")
+
+                    runtime_fix_count += 1
+                    if compile_round >= max_compile_rounds - 1:
+                        max_compile_rounds += 1
+                    continue
+                except Exception as run_fix_error:
+                    print(f"  ✗ Runtime auto-fix failed: {run_fix_error}")
+                    final_status = "FAILED"
+                    test_finished = True
+                    continue
+
+        except subprocess.TimeoutExpired:
+            print(f"  ✗ Test execution timeout")
+            final_status = "TIMEOUT"
+            log_path = os.path.join(log_dir, f"{test_name}_timeout_{timestamp}.log")
+            with open(log_path, 'w', encoding='utf-8') as log_file:
+                log_file.write("Test execution timed out.\n")
+                log_file.write(f"Executable: {exe_path}\n")
+            print(f"  ↳ Timeout log saved: {log_path}")
+        except Exception as e:
+            print(f"  ✗ Error: {e}")
+            final_status = "ERROR"
+            log_path = os.path.join(log_dir, f"{test_name}_error_{timestamp}.log")
+            with open(log_path, 'w', encoding='utf-8') as log_file:
+                log_file.write("Unexpected error during test execution.\n")
+                log_file.write(str(e) + "\n")
+            print(f"  ↳ Error log saved: {log_path}")
+
+        if split_link and stub_unit.symbols:
+            if final_status == "PASSED":
+                # 单独编译链接折叠后的测试文件（不带桩TU），验证其与外部构建一致
+                self._fold_link_stubs_into_test(
+                    test_path,
+                    stub_unit,
+                    verify=lambda: self._compile_and_link_test(
+                        compiler_path=compiler_path,
+                        include_dirs=include_dirs,
+                        source_files=source_files_active,
+                        test_path=test_path,
+                        exe_path=exe_path,
+                        gtest_link_inputs=gtest_link_inputs,
+                        stub_unit=_LinkStubUnit(stub_unit.source_path, stub_unit.object_path),
+                        object_digests={}
+                    )[0]
+                )
+            else:
+                print(f"  [LinkStub] {final_status}: test file left unchanged, stubs kept in {stub_unit.source_path}")
+        # 流水线结束后释放clangd中该文档的AST，避免长驻会话内存随测试数增长
+        self._release_clangd_document(test_path)
+        return final_status
+
+    def run_tests(self, test_dir: Optional[str] = None,
+                  build_dir: str = "build-test",
+                  target_functions: Optional[List[str]] = None,
+                  auto_fix_compile_errors: bool = True,
+                  max_fix_attempts: int = 2,
+                  auto_fix_test_failures: bool = True,
+                  max_test_fix_attempts: int = 2,
+                  llm_triage_enabled: bool = True,
+                  triage_min_confidence: float = 0.55,
+                  web_research_enabled: bool = True,
+                  web_research_max_results: int = 4,
+                  experience_learning_enabled: bool = True,
+                  experience_top_k: int = 3,
+                  preclean_compile_commands: Optional[str] = None,
+                  compile_command_template: Optional[str] = None,
+                  compile_command_cwd: Optional[str] = None,
+                  run_command_template: Optional[str] = None,
+                  run_command_cwd: Optional[str] = None) -> bool:
+        """
+        编译并执行生成的测试用例
+        
+        Args:
+            test_dir: 测试文件所在目录
+            build_dir: 测试编译目录
+            target_functions: 本轮限定处理的函数列表（仅处理对应测试文件）
+            auto_fix_compile_errors: 编译失败后是否自动进入LLM修复阶段
+            max_fix_attempts: 最大自动修复重试次数
+            auto_fix_test_failures: 测试运行失败后是否自动进入LLM修复阶段
+            max_test_fix_attempts: 测试运行失败最大自动修复重试次数
+            llm_triage_enabled: 是否启用“先分析再修复”诊断阶段
+            triage_min_confidence: 触发修复的最低诊断置信度
+            web_research_enabled: triage后是否进行在线检索增强
+            web_research_max_results: 在线检索最多返回条数
+            experience_learning_enabled: 是否启用经验积累与检索
+            experience_top_k: 经验检索返回条数
+            preclean_compile_commands: clangd预修复阶段使用的compile_commands.json路径（可为文件或目录）
+            
+        Returns:
+            是否执行成功
+        """
+        self._print_key_node("[Step 5/5] Compiling and running tests", bg_code="45")
+        print("=" * 60)
+        
+        if test_dir is None:
+            test_dir = self.test_dir
+
+        test_files = self._resolve_target_test_files(test_dir, target_functions)
+        
+        if not test_files:
+            print("✗ No test files found to run!")
+            return False
+
+        if target_functions:
+            print(f"Scoped run for selected functions: {', '.join(target_functions)}")
+        
+        print(f"Found {len(test_files)} test file(s) to run")
+
+        run_ctx = self._prepare_test_run(
+            test_dir=test_dir,
+            build_dir=build_dir,
+            target_functions=target_functions,
+            auto_fix_compile_errors=auto_fix_compile_errors,
+            max_fix_attempts=max_fix_attempts,
+            auto_fix_test_failures=auto_fix_test_failures,
+            max_test_fix_attempts=max_test_fix_attempts,
+            llm_triage_enabled=llm_triage_enabled,
+            triage_min_confidence=triage_min_confidence,
+            web_research_enabled=web_research_enabled,
+            web_research_max_results=web_research_max_results,
+            experience_learning_enabled=experience_learning_enabled,
+            experience_top_k=experience_top_k,
+            preclean_compile_commands=preclean_compile_commands,
+            compile_command_template=compile_command_template,
+            compile_command_cwd=compile_command_cwd,
+            run_command_template=run_command_template,
+            run_command_cwd=run_command_cwd
+        )
+        if run_ctx is None:
+            return False
+
+        # 合并测试二进制：上次已通过的测试按分片一次链接运行，其余（含合并失败）走逐测试流水线
+        aggregate_statuses = self._run_aggregate_shards(test_files, run_ctx) if self.aggregate_shards > 0 else {}
+        pipeline_files = [test_file for test_file in test_files if test_file not in aggregate_statuses]
+        pipeline_statuses = dict(self._execute_test_pipelines(pipeline_files, run_ctx)) if pipeline_files else {}
+        results = [
+            (os.path.splitext(test_file)[0],
+             aggregate_statuses.get(test_file) or pipeline_statuses[os.path.splitext(test_file)[0]])
+            for test_file in test_files
+        ]
+        return self._report_test_results(results, run_ctx)
+
+    def _prepare_test_run(self, test_dir: str,
+                          build_dir: str = "build-test",
+                          target_functions: Optional[List[str]] = None,
+                          auto_fix_compile_errors: bool = True,
+                          max_fix_attempts: int = 2,
+                          auto_fix_test_failures: bool = True,
+                          max_test_fix_attempts: int = 2,
+                          llm_triage_enabled: bool = True,
+                          triage_min_confidence: float = 0.55,
+                          web_research_enabled: bool = True,
+                          web_research_max_results: int = 4,
+                          experience_learning_enabled: bool = True,
+                          experience_top_k: int = 3,
+                          preclean_compile_commands: Optional[str] = None,
+                          compile_command_template: Optional[str] = None,
+                          compile_command_cwd: Optional[str] = None,
+                          run_command_template: Optional[str] = None,
+                          run_command_cwd: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        准备测试编译/运行环境：解析自定义命令、同步CMakeLists、CMake配置、收集源文件、探测编译器
+
+        Returns:
+            各测试流水线共享的run_ctx；找不到编译器时返回None
+        """
+        log_dir = os.path.join(self.project_dir, "log")
+        os.makedirs(log_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        self._current_target_functions_for_cmake_sync = list(target_functions or [])
+
+        effective_compile_template = self._normalize_command_template(
+            compile_command_template if compile_command_template is not None else (self.compile_command_template or "")
+        )
+        effective_compile_cwd = self._resolve_custom_cwd(
+            compile_command_cwd if compile_command_cwd is not None else self.compile_command_cwd,
+            fallback=self.project_dir
+        )
+        effective_run_template = self._normalize_command_template(
+            run_command_template if run_command_template is not None else (self.run_command_template or "")
+        )
+        effective_run_cwd = self._resolve_custom_cwd(
+            run_command_cwd if run_command_cwd is not None else self.run_command_cwd,
+            fallback=self.project_dir
+        )
+
+        if effective_compile_template:
+            print(f"[Build] Using custom compile command template (cwd={effective_compile_cwd})")
+        if effective_run_template:
+            print(f"[Run] Using custom run command template (cwd={effective_run_cwd})")
+
+        if self.cmakelists_autogen_enabled:
+            try:
+                self.ensure_cmakelists_for_tests(
+                    test_dir=test_dir,
+                    compile_cwd=effective_compile_cwd,
+                    target_functions=target_functions
+                )
+            except Exception as cmake_sync_error:
+                print(f"⚠ CMake sync skipped due to error: {cmake_sync_error}")
+        else:
+            print("[CMakeSync] Auto-generation disabled by config")
+        
+        # 创建编译目录
+        build_path = os.path.join(self.project_dir, build_dir)
+        os.makedirs(build_path, exist_ok=True)
+        
+        # 使用CMake配置建立测试编译环境
+        print(f"\nSetting up CMake for tests in {build_path}...")
+        self._configure_test_build_dir(build_path)
+        
+        # 收集源文件进行编译
+        source_files = []
+        for root, dirs, files in os.walk(self.src_dir):
+            for file in files:
+                if file.endswith('.c'):
+                    source_files.append(os.path.join(root, file))
+        
+        print(f"Found {len(source_files)} source file(s)")
+
+        preclean_cc_dir = ""
+        if preclean_compile_commands:
+            cc_candidate = str(preclean_compile_commands).strip()
+            if cc_candidate and not os.path.isabs(cc_candidate):
+                cc_candidate = os.path.abspath(os.path.join(self.project_dir, cc_candidate))
+            if cc_candidate:
+                if os.path.isfile(cc_candidate):
+                    preclean_cc_dir = os.path.dirname(cc_candidate)
+                elif os.path.isdir(cc_candidate):
+                    preclean_cc_dir = cc_candidate
+
+        generated_cc_path = os.path.join(build_path, "compile_commands.json")
+        if not preclean_cc_dir and os.path.exists(generated_cc_path):
+            preclean_cc_dir = build_path
+
+        if preclean_cc_dir:
+            print(f"[PreCompileCheck] Using clangd compile_commands dir: {preclean_cc_dir}")
+        else:
+            print("[PreCompileCheck] No compile_commands dir for clangd preclean, fallback to temp DB")
+
+        compiler_path = self._detect_cpp_compiler()
+        if not compiler_path:
+            print("✗ No C++ compiler found (expected one of: g++, clang++, cl)")
+            print("  Please install a compiler or run from a Developer Command Prompt.")
+            self._current_target_functions_for_cmake_sync = None
+            return None
+        print(f"[Build] Using compiler: {compiler_path}")
+        
+        run_ctx: Dict[str, Any] = {
+            "test_dir": test_dir,
+            "log_dir": log_dir,
+            "timestamp": timestamp,
+            "build_path": build_path,
+            "source_files": source_files,
+            "compiler_path": compiler_path,
+            "preclean_cc_dir": preclean_cc_dir,
+            "target_functions": target_functions,
+            "compile_template": effective_compile_template,
+            "compile_cwd": effective_compile_cwd,
+            "run_template": effective_run_template,
+            "run_cwd": effective_run_cwd,
+            "auto_fix_compile_errors": auto_fix_compile_errors,
+            "max_fix_attempts": max_fix_attempts,
+            "auto_fix_test_failures": auto_fix_test_failures,
+            "max_test_fix_attempts": max_test_fix_attempts,
+            "llm_triage_enabled": llm_triage_enabled,
+            "triage_min_confidence": triage_min_confidence,
+            "web_research_enabled": web_research_enabled,
+            "web_research_max_results": web_research_max_results,
+            "experience_learning_enabled": experience_learning_enabled,
+            "experience_top_k": experience_top_k,
+        }
+        return run_ctx
+
+    CMAKE_CONFIGURE_STAMP = ".ut_configure_stamp"
+
+    @staticmethod
+    def _read_cmake_cache_generator(build_path: str) -> str:
+        """读取已有构建目录的生成器（CMake不允许在同一构建目录切换生成器）"""
+        cache_path = os.path.join(build_path, "CMakeCache.txt")
+        try:
+            with open(cache_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if line.startswith("CMAKE_GENERATOR:"):
+                        return line.split("=", 1)[1].strip()
+        except OSError:
+            pass
+        return ""
+
+    def _select_cmake_generator(self, build_path: str) -> str:
+        """
+        选择CMake生成器：已有构建目录沿用原生成器；auto时优先Ninja（可用时），
+        设置了CMAKE_GENERATOR环境变量则交给CMake自行处理
+
+        Returns:
+            需要通过-G传入的生成器名（空串表示不传）
+        """
+        existing = self._read_cmake_cache_generator(build_path)
+        if existing:
+            return ""
+        configured = str(self.cmake_generator or "").strip()
+        if configured.lower() == "auto":
+            if os.getenv("CMAKE_GENERATOR"):
+                return ""
+            return "Ninja" if shutil.which("ninja") or shutil.which("ninja-build") else ""
+        return configured
+
+    _CMAKE_GLOB_RE = re.compile(rb'\bfile\s*\(\s*GLOB(?:_RECURSE)?\b', re.IGNORECASE)
+    _CMAKE_GLOB_SOURCE_SUFFIXES = ('.c', '.cc', '.cpp', '.cxx')
+
+    def _cmake_configure_inputs_digest(self, cmake_args: List[str]) -> str:
+        """
+        CMake配置输入摘要：参数 + cmake可执行文件 + 工程内所有CMakeLists.txt/*.cmake/CMakePresets.json内容；
+        CMake脚本使用file(GLOB)时再加上工程内源文件路径列表（增删源文件需要重新配置才会被GLOB收集）
+        """
+        digest = hashlib.sha256()
+        digest.update("\0".join(cmake_args).encode("utf-8"))
+        cmake_path = shutil.which("cmake") or "cmake"
+        try:
+            st = os.stat(os.path.realpath(cmake_path))
+            digest.update(f"\0{os.path.realpath(cmake_path)}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8"))
+        except OSError:
+            digest.update(f"\0{cmake_path}".encode("utf-8"))
+        for env_name in ("CC", "CXX", "CMAKE_GENERATOR", "CMAKE_PREFIX_PATH"):
+            digest.update(f"\0{env_name}={os.getenv(env_name, '')}".encode("utf-8"))
+
+        uses_glob = False
+        source_paths: List[str] = []
+        for root, dirs, files in os.walk(self.project_dir):
+            # 跳过隐藏目录与已有的CMake构建目录（其中的_deps等不属于配置输入）
+            dirs[:] = sorted(
+                d for d in dirs
+                if not d.startswith('.') and not os.path.exists(os.path.join(root, d, "CMakeCache.txt"))
+            )
+            for name in sorted(files):
+                rel_path = os.path.relpath(os.path.join(root, name), self.project_dir).replace(os.sep, "/")
+                if name.endswith(self._CMAKE_GLOB_SOURCE_SUFFIXES):
+                    source_paths.append(rel_path)
+                if name in ("CMakeLists.txt", "CMakePresets.json", "CMakeUserPresets.json") or name.endswith(".cmake"):
+                    path = os.path.join(root, name)
+                    try:
+                        with open(path, 'rb') as f:
+                            content = f.read()
+                    except OSError:
+                        continue
+                    uses_glob = uses_glob or bool(self._CMAKE_GLOB_RE.search(content))
+                    digest.update(b"\0" + rel_path.encode("utf-8"))
+                    digest.update(b"\0" + hashlib.sha256(content).hexdigest().encode("ascii"))
+        if uses_glob:
+            digest.update(b"\0glob-sources\0" + "\n".join(sorted(source_paths)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _configure_test_build_dir(self, build_path: str) -> bool:
+        """
+        运行CMake配置（导出compile_commands.json）；配置输入摘要与上次成功配置一致时跳过
+
+        Returns:
+            配置是否可用（跳过也视为可用）
+        """
+        cmake_args = ["cmake", "-DCMAKE_EXPORT_COMPILE_COMMANDS=ON", "-S", self.project_dir, "-B", build_path]
+        stamp_path = os.path.join(build_path, self.CMAKE_CONFIGURE_STAMP)
+        with self._cmake_lock:
+            # 生成器只在首次配置时传入，不计入摘要（之后沿用CMakeCache中的生成器）
+            try:
+                inputs_digest = self._cmake_configure_inputs_digest(cmake_args)
+            except Exception as digest_error:
+                print(f"  [CMake] configure input digest unavailable: {digest_error}")
+                inputs_digest = ""
+            configured = (
+                os.path.isfile(os.path.join(build_path, "CMakeCache.txt"))
+                and os.path.isfile(os.path.join(build_path, "compile_commands.json"))
+            )
+            if inputs_digest and configured and os.path.isfile(stamp_path):
+                try:
+                    if self._read_text_file(stamp_path).strip() == inputs_digest:
+                        print("✓ CMake configuration up to date (inputs unchanged, configure skipped)")
+                        return True
+                except OSError:
+                    pass
+
+            generator = self._select_cmake_generator(build_path)
+            if generator:
+                cmake_args[1:1] = ["-G", generator]
+                print(f"  [CMake] Using generator: {generator}")
+            try:
+                # 运行CMake配置
+                cmake_result = subprocess.run(
+                    cmake_args,
+                    capture_output=True,
+                    timeout=60,
+                    text=True
+                )
+            except Exception as e:
+                print(f"⚠ CMake configuration failed: {e}")
+                print("  Attempting to run tests anyway...")
+                return False
+
+            if cmake_result.returncode != 0:
+                if os.path.exists(stamp_path):
+                    os.remove(stamp_path)
+                print("⚠ CMake configuration had issues, but continuing...")
+                if cmake_result.stderr:
+                    print(f"  Error: {cmake_result.stderr[:500]}")
+                return False
+
+            if inputs_digest:
+                self._write_text_file_atomic(stamp_path, inputs_digest + "\n")
+            print("✓ CMake configured successfully")
+            return True
+
+    def _begin_concurrent_builds(self, workers: int, run_ctx: Dict[str, Any]) -> int:
+        """按并发流水线数设置编译槽位与LLM在途上限，返回实际编译并发数"""
+        compile_jobs = int(self.compile_jobs or 0) or workers
+        if run_ctx["compile_template"] and compile_jobs > 1:
+            # 自定义编译命令通常共用同一个构建树（如cmake --build），并发构建会互相干扰
+            print("[Parallel] Custom compile command shares one build tree -> compile jobs limited to 1")
+            compile_jobs = 1
+        self._compile_semaphore = threading.BoundedSemaphore(compile_jobs) if workers > 1 else None
+        self._apply_llm_inflight_limit()
+        return compile_jobs
+
+    def _run_syntax_preflight(self, test_files: List[str], run_ctx: Dict[str, Any]) -> None:
+        """
+        对全部测试文件并行执行 -fsyntax-only，结果按(检查命令+文件内容)摘要存入run_ctx["syntax_preflight"]，
+        各测试流水线每轮编译前复用（摘要未变时不再检查）
+        """
+        if not self.syntax_preflight_enabled or run_ctx["compile_template"] or not test_files:
+            return
+        compiler_path = run_ctx["compiler_path"]
+        test_dir = run_ctx["test_dir"]
+        preflight = run_ctx.setdefault("syntax_preflight", {})
+
+        def _check(test_file: str) -> None:
+            test_path = os.path.join(test_dir, test_file)
+            target_symbol = os.path.splitext(test_file)[0].replace("_llm_test", "")
+            include_dirs, _, _ = self._collect_compile_flags_from_scope(
+                target_symbol=target_symbol,
+                test_path=test_path
+            )
+            cmd, digest = self._syntax_check_digest(compiler_path, include_dirs, test_path)
+            result, cmd_display = self._run_syntax_check(cmd)
+            if result is not None:
+                preflight[test_file] = (digest, result, cmd_display)
+
+        workers = max(1, min(len(test_files), int(self.compile_jobs or 0) or (os.cpu_count() or 4)))
+        started = datetime.now()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_check, test_file): test_file for test_file in test_files}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as preflight_error:
+                    print(f"  [SyntaxPreflight] {futures[future]}: {preflight_error}")
+        failed = sorted(name for name, (_, result, _) in preflight.items() if result.returncode != 0)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(
+            f"[SyntaxPreflight] {len(preflight)}/{len(test_files)} file(s) checked in {elapsed:.2f}s "
+            f"with {workers} worker(s), front-end errors: {len(failed)}"
+        )
+        for name in failed:
+            print(f"  ✗ {name}")
+
+    def _syntax_check_digest(self,
+                             compiler_path: str,
+                             include_dirs: List[str],
+                             test_path: str) -> Tuple[List[str], str]:
+        """语法检查命令及其复用键（检查命令 + 测试文件内容，与object_digests相同规则）"""
+        cmd = self._build_syntax_check_command(compiler_path, include_dirs, test_path)
+        with open(test_path, 'rb') as f:
+            return cmd, self._object_digest(cmd, f.read())
+
+    def _syntax_preflight_for_test(self,
+                                   test_file: str,
+                                   test_path: str,
+                                   compiler_path: str,
+                                   include_dirs: List[str],
+                                   run_ctx: Dict[str, Any]) -> Tuple[Optional[subprocess.CompletedProcess], str]:
+        """流水线内的语法预检：测试文件与检查命令均未变时直接复用上次结果（含并行预检），否则现场执行"""
+        preflight = run_ctx.setdefault("syntax_preflight", {})
+        cmd, digest = self._syntax_check_digest(compiler_path, include_dirs, test_path)
+        cached = preflight.get(test_file)
+        if cached is not None and cached[0] == digest:
+            print("  [SyntaxPreflight] unchanged since last check -> reuse result")
+            return cached[1], cached[2]
+        with self._compile_slot():
+            result, cmd_display = self._run_syntax_check(cmd)
+        if result is not None:
+            preflight[test_file] = (digest, result, cmd_display)
+        return result, cmd_display
+
+    def _execute_test_pipelines(self, test_files: List[str], run_ctx: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """执行各测试文件的流水线，按test_files顺序返回 [(测试名, 状态)]"""
+        # 先并行做语法预检，前端错误无需付出完整编译链接的代价
+        self._run_syntax_preflight(test_files, run_ctx)
+
+        # 尝试编译并运行每个测试文件（test_workers>1时各测试流水线并发执行）
+        workers = min(max(1, int(self.test_workers or 1)), len(test_files))
+        compile_jobs = self._begin_concurrent_builds(workers, run_ctx)
+
+        statuses: Dict[str, str] = {}
+        if workers <= 1:
+            for test_file in test_files:
+                statuses[test_file] = self._run_single_test_pipeline(test_file, run_ctx)
+        else:
+            print(
+                f"[Parallel] Running {len(test_files)} test pipeline(s) with {workers} worker(s) "
+                f"(compile_jobs={compile_jobs}, llm_inflight={self.llm_inflight or 'unlimited'})"
+            )
+            with self._tagged_output() as tagged_stdout:
+                def _pipeline(test_file: str) -> str:
+                    tagged_stdout.set_tag(os.path.splitext(test_file)[0].replace("_llm_test", ""))
+                    try:
+                        return self._run_single_test_pipeline(test_file, run_ctx)
+                    finally:
+                        tagged_stdout.set_tag(None)
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(_pipeline, test_file): test_file for test_file in test_files}
+                    for future in as_completed(futures):
+                        test_file = futures[future]
+                        try:
+                            statuses[test_file] = future.result()
+                        except Exception as pipeline_error:
+                            print(f"  ✗ Pipeline error ({test_file}): {pipeline_error}")
+                            statuses[test_file] = "ERROR"
+        self._compile_semaphore = None
+        self._close_clangd_sessions()
+
+        # 按原始顺序汇总，保证并发与串行的输出一致
+        return [(os.path.splitext(test_file)[0], statuses[test_file]) for test_file in test_files]
+
+    def _aggregate_candidates(self, test_files: List[str], test_dir: str) -> List[str]:
+        """函数状态索引中为PASSED、且测试文件在该状态记录之后未修改的测试"""
+        index = self._load_function_status_index()
+        candidates: List[str] = []
+        for test_file in test_files:
+            entry = index.get(os.path.splitext(test_file)[0].replace("_llm_test", "")) or {}
+            if entry.get("status") != "PASSED":
+                continue
+            try:
+                recorded_at = datetime.fromisoformat(str(entry.get("updated_at", ""))).timestamp()
+                modified_at = os.path.getmtime(os.path.join(test_dir, test_file))
+            except (TypeError, ValueError, OSError):
+                continue
+            if modified_at <= recorded_at:
+                candidates.append(test_file)
+        return candidates
+
+    def _prepare_aggregate_unit(self,
+                                test_file: str,
+                                run_ctx: Dict[str, Any],
+                                aggregate_dir: str,
+                                production_objects: Callable[[List[str]], Optional[List[str]]]) -> Optional[AggregateUnit]:
+        """
+        重写并编译单个测试的合并TU，读取其强定义符号并求所需生产TU
+
+        Returns:
+            AggregateUnit；不可合并（自带main、编译失败、符号不可读）时返回None
+        """
+        compiler_path = run_ctx["compiler_path"]
+        source_files = run_ctx["source_files"]
+        test_path = os.path.join(run_ctx["test_dir"], test_file)
+        test_name = os.path.splitext(test_file)[0]
+        function_name = test_name.replace("_llm_test", "")
+
+        rewritten = rewrite_for_aggregate(self._read_text_file(test_path), function_name)
+        if rewritten is None:
+            print(f"  [Aggregate] {test_file}: custom main or no TEST macros -> per-test pipeline")
+            return None
+        aggregate_code, suites = rewritten
+        include_dirs, _, _ = self._collect_compile_flags_from_scope(target_symbol=function_name, test_path=test_path)
+
+        source_path = os.path.join(aggregate_dir, f"{test_name}.agg.cpp")
+        object_path = os.path.join(aggregate_dir, f"{test_name}.agg.o")
+        stamp_path = object_path + ".sha256"
+        self._write_text_file_atomic(source_path, aggregate_code)
+        cmd = self._build_test_object_command(compiler_path, include_dirs, source_path, object_path)
+        digest = hashlib.sha256(" ".join(cmd).encode("utf-8") + b"\0" + aggregate_code.encode("utf-8")).hexdigest()
+        try:
+            up_to_date = os.path.isfile(object_path) and self._read_text_file(stamp_path).strip() == digest
+        except OSError:
+            up_to_date = False
+        if not up_to_date:
+            with self._compile_slot():
+                result = subprocess.run(cmd, capture_output=True, timeout=120, text=True, cwd=self.project_dir)
+            if result.returncode != 0:
+                first_error = next((line for line in (result.stderr or "").splitlines() if "error" in line), "")
+                print(f"  [Aggregate] {test_file}: rewritten TU failed to compile -> per-test pipeline")
+                if first_error:
+                    print(f"    {first_error.strip()[:200]}")
+                return None
+            self._write_text_file_atomic(stamp_path, digest + "\n")
 
-                    runtime_seen_issue_fingerprints.add(runtime_issue_fingerprint)
+        objects = production_objects(include_dirs)
+        symbol_index = get_default_symbol_index()
+        test_symbols = symbol_index.read_symbols(object_path, strong_only=True) if symbol_index else None
+        if not objects or test_symbols is None:
+            return None
+        candidates = dict(zip(source_files, objects))
+        closure = symbol_index.link_closure(
+            [object_path],
+            candidates,
+            seed_sources=self._resolve_source_files_for_test(test_name, source_files),
+            allow_test_overrides=self._weak_mocking_active(run_ctx["compile_template"])
+        )
+        if closure is None:
+            return None
+        selected, _ = closure
+        entries = symbol_index.update([candidates[source] for source in selected])
+        provided: Set[str] = set()
+        for source in selected:
+            provided.update((entries.get(os.path.abspath(candidates[source])) or {}).get("defined", []))
+        defined = test_symbols[0]
+        return AggregateUnit(
+            name=test_name,
+            object_path=object_path,
+            include_dirs=include_dirs,
+            suites=suites,
+            sources=selected,
+            defined=defined,
+            required=provided - defined,
+            definition_texts={
+                symbol: c_definition_text(aggregate_code, symbol)
+                for symbol in defined if not symbol.startswith("_Z")
+            }
+        )
 
-                    self._print_key_event(
-                        f"[Fix] Runtime auto-fix phase (repeat-budget {runtime_consumed_attempts}/{max_test_fix_attempts}, total-fix {runtime_fix_count + 1})",
-                        bg_code="46"
-                    )
-                    try:
-                        with open(test_path, 'r', encoding='utf-8') as f:
-                            current_test_code = f.read()
-                        before_fix_code = current_test_code
+    def _run_aggregate_shard(self,
+                             index: int,
+                             shard: AggregateShard,
+                             run_ctx: Dict[str, Any],
+                             aggregate_dir: str) -> Dict[str, str]:
+        """链接一个分片并逐个测试运行，返回 {测试名: PASSED}（只包含全部用例通过的测试）"""
+        compiler_path = run_ctx["compiler_path"]
+        include_dirs = shard.units[0].include_dirs
+        label = f"shard{index}"
+        duplicates = [(unit.object_path, shard.duplicate_symbols(unit)) for unit in shard.units]
+        object_files = [unit.object_path for unit in shard.units]
+        if any(symbols for _, symbols in duplicates):
+            weak_cache = get_default_weak_object_cache()
+            weakened = weak_cache.get_objects(duplicates) if weak_cache is not None else None
+            if weakened is None:
+                print(f"  [Aggregate] {label}: cannot deduplicate shared stubs (objcopy) -> per-test pipelines")
+                return {}
+            object_files = weakened
+
+        exe_path = os.path.join(aggregate_dir, f"ut_aggregate_{label}")
+        gtest_link_inputs = self._resolve_gtest_link_inputs(
+            include_dirs,
+            run_ctx["build_path"],
+            prefer_sources=(os.name == 'nt'),
+            compiler_path=compiler_path
+        )
+        link_cmd = self._build_link_command(
+            compiler_path=compiler_path,
+            include_dirs=include_dirs,
+            source_files=shard.sources(),
+            object_files=object_files,
+            exe_path=exe_path,
+            gtest_link_inputs=gtest_link_inputs
+        )
 
-                        aggressive_runtime_fix = runtime_repeat_count >= 2
-                        if aggressive_runtime_fix:
-                            self._print_key_event(
-                                "[Escalation] Runtime issue repeated -> aggressive rewrite mode",
-                                bg_code="45"
-                            )
+        def _save_log(log_name: str, cmd: List[str], result: subprocess.CompletedProcess) -> str:
+            log_path = os.path.join(run_ctx["log_dir"], f"ut_aggregate_{log_name}_{run_ctx['timestamp']}.log")
+            with open(log_path, 'w', encoding='utf-8') as log_file:
+                log_file.write("Command:\n")
+                log_file.write(' '.join(cmd) + "\n\n")
+                log_file.write("STDOUT:\n")
+                log_file.write(result.stdout or "")
+                log_file.write("\nSTDERR:\n")
+                log_file.write(result.stderr or "")
+            return log_path
+
+        print(f"  [LinkCmd] {' '.join(link_cmd)}")
+        try:
+            with self._compile_slot():
+                result = subprocess.run(link_cmd, capture_output=True, timeout=300, text=True, cwd=self.project_dir)
+        except subprocess.TimeoutExpired:
+            print(f"  [Aggregate] {label}: link timed out -> {len(shard.units)} test(s) fall back to per-test pipelines")
+            return {}
+        if result.returncode != 0:
+            log_path = _save_log(label, link_cmd, result)
+            print(f"  [Aggregate] {label}: link exited with {result.returncode} (log: {log_path})")
+            return {}
 
-                        fixed_test_code = self.test_generator.fix_test_from_test_failure(
-                            current_test_code=current_test_code,
-                            test_output=run_output,
-                            function_name=test_name.replace("_llm_test", ""),
-                            failure_analysis=runtime_triage_result if llm_triage_enabled else None,
-                            aggressive=aggressive_runtime_fix
-                        )
+        # 分片只链接一次，但每个测试用--gtest_filter单独启动进程：
+        # 生产代码的全局/静态状态（计数器、缓存、单例等）不会被同分片其他测试改动
+        passed: Dict[str, str] = {}
+        for unit in shard.units:
+            xml_path = os.path.join(aggregate_dir, f"{unit.name}.agg.xml")
+            run_cmd = [exe_path, f"--gtest_filter={self._aggregate_gtest_filter(unit.suites)}",
+                       f"--gtest_output=xml:{xml_path}"]
+            if os.path.exists(xml_path):
+                os.remove(xml_path)
+            print(f"  [RunCmd] {' '.join(run_cmd)}")
+            try:
+                result = subprocess.run(run_cmd, capture_output=True, timeout=120, text=True, cwd=self.project_dir)
+            except subprocess.TimeoutExpired:
+                print(f"  [Aggregate] {unit.name}: timed out -> per-test pipeline")
+                continue
+            if result.returncode != 0:
+                log_path = _save_log(f"{label}_{unit.name}", run_cmd, result)
+                print(f"  [Aggregate] {unit.name}: run exited with {result.returncode} (log: {log_path})")
+                continue
+            suite_counts = self._parse_gtest_xml_result(xml_path).get("suites") or {}
+            # TEST_P/TYPED_TEST的套件名带实例化前缀或类型序号（Inst/Suite、Suite/0）
+            counts = [
+                suite_counts[name] for name in suite_counts
+                if any(part in unit.suites for part in name.split('/'))
+            ]
+            if counts and all(failed == 0 for _, failed in counts):
+                passed[unit.name] = "PASSED"
+        return passed
 
-                        first_change_preview = self._summarize_code_change(current_test_code, fixed_test_code)
-                        if first_change_preview == "no_text_change" and not aggressive_runtime_fix:
-                            self._print_key_event(
-                                "[Escalation] No code change detected -> retry once with aggressive rewrite",
-                                bg_code="45"
-                            )
-                            fixed_test_code = self.test_generator.fix_test_from_test_failure(
-                                current_test_code=current_test_code,
-                                test_output=run_output,
-                                function_name=test_name.replace("_llm_test", ""),
-                                failure_analysis=runtime_triage_result if llm_triage_enabled else None,
-                                aggressive=True
-                            )
+    @staticmethod
+    def _aggregate_gtest_filter(suites: List[str]) -> str:
+        """只运行给定套件的--gtest_filter（含TEST_P实例化 Inst/Suite 与TYPED_TEST的 Suite/0）"""
+        patterns: List[str] = []
+        for suite in suites:
+            patterns.extend([f"{suite}.*", f"*/{suite}.*", f"{suite}/*"])
+        return ":".join(patterns)
+
+    def _run_aggregate_shards(self, test_files: List[str], run_ctx: Dict[str, Any]) -> Dict[str, str]:
+        """
+        合并测试二进制模式（回归运行）：上次已通过且之后未修改的测试改写套件名/类名后按分片合并链接，
+        每个分片只链接一次gtest；各测试以--gtest_filter单独启动进程，XML结果按套件映射回各测试
 
-                        if blocked_redefinition_symbols:
-                            sanitized_code, stripped_symbols = self._remove_symbol_definitions_from_code(
-                                fixed_test_code,
-                                sorted(list(blocked_redefinition_symbols)),
-                                protected_symbols=[target_symbol]
-                            )
-                            if stripped_symbols:
-                                self._print_key_event(
-                                    "[AntiOscillation] Stripped forbidden redefinitions from runtime fix: "
-                                    + ", ".join(stripped_symbols[:6])
-                                    + (" ..." if len(stripped_symbols) > 6 else ""),
-                                    bg_code="45"
-                                )
-                                fixed_test_code = sanitized_code
+        Returns:
+            {测试文件名: "PASSED"}，只包含在分片中确认通过的测试；其余测试由调用方交给逐测试流水线
+        """
+        compiler_path = run_ctx["compiler_path"]
+        if run_ctx["compile_template"] or run_ctx["run_template"] or self._is_msvc_compiler(compiler_path):
+            print("[Aggregate] Custom compile/run command or MSVC -> per-test pipelines")
+            return {}
+        if get_default_symbol_index() is None or get_default_object_cache() is None:
+            print("[Aggregate] Build cache or nm unavailable -> per-test pipelines")
+            return {}
+        candidates = self._aggregate_candidates(test_files, run_ctx["test_dir"])
+        if len(candidates) < 2:
+            print(f"[Aggregate] {len(candidates)} previously passing test(s) -> per-test pipelines")
+            return {}
 
-                        with open(test_path, 'w', encoding='utf-8') as f:
-                            f.write(fixed_test_code)
+        self._print_key_node(
+            f"[Aggregate] {len(candidates)}/{len(test_files)} previously passing test(s) -> combined shard binaries",
+            bg_code="45"
+        )
+        started = datetime.now()
+        aggregate_dir = os.path.join(run_ctx["build_path"], "aggregate")
+        os.makedirs(aggregate_dir, exist_ok=True)
+
+        # 生产代码目标文件按include参数只解析一次（通常所有测试相同）
+        objects_by_includes: Dict[Tuple[str, ...], Optional[List[str]]] = {}
+        objects_lock = threading.Lock()
+
+        def _production_objects(include_dirs: List[str]) -> Optional[List[str]]:
+            key = tuple(include_dirs)
+            with objects_lock:
+                if key not in objects_by_includes:
+                    objects_by_includes[key] = self._cached_production_objects(
+                        compiler_path, include_dirs, run_ctx["source_files"]
+                    )
+                return objects_by_includes[key]
 
-                        diff_log_path = self._emit_fix_diff(
-                            before_code=before_fix_code,
-                            after_code=fixed_test_code,
-                            log_dir=log_dir,
-                            test_name=test_name,
-                            phase="runtime",
-                            attempt=runtime_fix_count + 1,
-                            timestamp=timestamp
-                        )
+        def _prepare(test_file: str) -> Optional[AggregateUnit]:
+            try:
+                return self._prepare_aggregate_unit(test_file, run_ctx, aggregate_dir, _production_objects)
+            except Exception as prepare_error:
+                print(f"  [Aggregate] {test_file}: {prepare_error} -> per-test pipeline")
+                return None
 
-                        fix_log_path = os.path.join(
-                            log_dir,
-                            f"{test_name}_run_autofix_attempt{runtime_fix_count + 1}_{timestamp}.log"
-                        )
-                        with open(fix_log_path, 'w', encoding='utf-8') as log_file:
-                            log_file.write("Auto-fix triggered by test runtime failure.\n\n")
-                            log_file.write("Original run output (truncated to 8000 chars):\n")
-                            log_file.write(run_output[:8000])
-                            if diff_log_path:
-                                log_file.write("\n\nUnified diff patch log:\n")
-                                log_file.write(diff_log_path)
-                                log_file.write("\n")
-                            log_file.write("\n\nUpdated test file:\n")
-                            log_file.write(fixed_test_code)
+        workers = max(1, min(len(candidates), int(self.compile_jobs or 0) or (os.cpu_count() or 4)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            units = [unit for unit in executor.map(_prepare, candidates) if unit is not None]
+        if not units:
+            return {}
 
-                        print(f"  ↳ Runtime auto-fix applied and saved: {test_path}")
-                        print(f"  ↳ Runtime auto-fix log saved: {fix_log_path}")
+        shards = plan_shards(units, self.aggregate_shards)
+        for index, shard in enumerate(shards):
+            shared = sum(len(shard.duplicate_symbols(unit)) for unit in shard.units)
+            print(
+                f"  [Aggregate] shard{index}: {len(shard.units)} test(s), {len(shard.sources())} production TU(s), "
+                f"{shared} shared stub definition(s) deduplicated"
+            )
 
-                        if experience_learning_enabled and self.experience_store:
-                            try:
-                                self.experience_store.add_experience({
-                                    "phase": "runtime",
-                                    "function_name": test_name.replace("_llm_test", ""),
-                                    "test_file": test_file,
-                                    "error_type": str(runtime_triage_result.get("error_type", "unknown")),
-                                    "root_cause": str(runtime_triage_result.get("root_cause", "")),
-                                    "key_symbols": runtime_triage_result.get("key_symbols", []),
-                                    "fix_strategy": runtime_triage_result.get("fix_strategy", []),
-                                    "summary": str(runtime_triage_result.get("minimal_change", "runtime fix applied")),
-                                    "code_locations": runtime_triage_result.get("code_locations", []),
-                                    "change_direction": runtime_triage_result.get("change_direction", []),
-                                    "analysis_layers": runtime_triage_result.get("analysis_layers", []),
-                                    "actionable_edits": runtime_triage_result.get("actionable_edits", []),
-                                    "verification_plan": runtime_triage_result.get("verification_plan", []),
-                                    "runtime_evidence": runtime_triage_result.get("runtime_evidence", runtime_evidence),
-                                    "change_preview": self._summarize_code_change(before_fix_code, fixed_test_code),
-                                    "outcome": "fix_applied_pending_rerun",
-                                    "attempt": runtime_fix_count + 1
-                                })
-                            except Exception as memory_write_error:
-                                print(f"  ⚠ Experience write failed (runtime): {memory_write_error}")
+        passed: Dict[str, str] = {}
+        shard_workers = max(1, min(len(shards), int(self.test_workers or 1)))
+        with ThreadPoolExecutor(max_workers=shard_workers) as executor:
+            futures = {
+                executor.submit(self._run_aggregate_shard, index, shard, run_ctx, aggregate_dir): index
+                for index, shard in enumerate(shards)
+            }
+            for future in as_completed(futures):
+                try:
+                    passed.update(future.result())
+                except Exception as shard_error:
+                    print(f"  [Aggregate] shard{futures[future]}: {shard_error} -> per-test pipelines")
 
-                        runtime_fix_count += 1
-                        if compile_round >= max_compile_rounds - 1:
-                            max_compile_rounds += 1
-                        continue
-                    except Exception as run_fix_error:
-                        print(f"  ✗ Runtime auto-fix failed: {run_fix_error}")
-                        results.append((test_name, "FAILED"))
-                        all_passed = False
-                        test_finished = True
-                        continue
-            
-            except subprocess.TimeoutExpired:
-                print(f"  ✗ Test execution timeout")
-                results.append((test_name, "TIMEOUT"))
-                all_passed = False
-                log_path = os.path.join(log_dir, f"{test_name}_timeout_{timestamp}.log")
-                with open(log_path, 'w', encoding='utf-8') as log_file:
-                    log_file.write("Test execution timed out.\n")
-                    log_file.write(f"Executable: {exe_path}\n")
-                print(f"  ↳ Timeout log saved: {log_path}")
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
-                results.append((test_name, "ERROR"))
-                all_passed = False
-                log_path = os.path.join(log_dir, f"{test_name}_error_{timestamp}.log")
-                with open(log_path, 'w', encoding='utf-8') as log_file:
-                    log_file.write("Unexpected error during test execution.\n")
-                    log_file.write(str(e) + "\n")
-                print(f"  ↳ Error log saved: {log_path}")
+        statuses = {test_file: "PASSED" for test_file in candidates if os.path.splitext(test_file)[0] in passed}
+        fallback = [test_file for test_file in candidates if test_file not in statuses]
+        elapsed = (datetime.now() - started).total_seconds()
+        print(
+            f"[Aggregate] {len(statuses)}/{len(candidates)} test(s) passed in {len(shards)} shard binar"
+            f"{'y' if len(shards) == 1 else 'ies'} ({elapsed:.2f}s); {len(fallback)} fall back to per-test pipelines"
+        )
+        for test_file in fallback:
+            print(f"  ✗ {test_file}")
+        return statuses
+
+    def _report_test_results(self, results: List[Tuple[str, str]], run_ctx: Dict[str, Any]) -> bool:
+        """打印测试执行总结并更新函数状态索引，返回是否全部通过"""
+        all_passed = all(status == "PASSED" for _, status in results)
         
         # 显示总结
         print("\n" + "=" * 60)
@@ -4088,7 +6283,11 @@ clangd raw output:
         for test_name, status in results:
             function_name = test_name.replace("_llm_test", "")
             status_updates[function_name] = status
-        self._update_function_status_index(status_updates, log_dir=log_dir, timestamp=timestamp)
+        self._update_function_status_index(
+            status_updates,
+            log_dir=run_ctx["log_dir"],
+            timestamp=run_ctx["timestamp"]
+        )
         self._current_target_functions_for_cmake_sync = None
         
         return all_passed
@@ -4160,6 +6359,32 @@ Usage:
         self.show_workflow_info()
         self.analyze_codebase()
         self.print_compile_info()
+        if self.pipeline_mode == "streaming" and not reuse_existing_tests:
+            self._run_streaming_pipeline(
+                target_functions=target_functions,
+                skip_run=skip_run,
+                skip_quality_gates=skip_quality_gates,
+                quality_strict=quality_strict,
+                run_options={
+                    "auto_fix_compile_errors": auto_fix_compile_errors,
+                    "max_fix_attempts": max_fix_attempts,
+                    "auto_fix_test_failures": auto_fix_test_failures,
+                    "max_test_fix_attempts": max_test_fix_attempts,
+                    "llm_triage_enabled": llm_triage_enabled,
+                    "triage_min_confidence": triage_min_confidence,
+                    "web_research_enabled": web_research_enabled,
+                    "web_research_max_results": web_research_max_results,
+                    "experience_learning_enabled": experience_learning_enabled,
+                    "experience_top_k": experience_top_k,
+                    "preclean_compile_commands": preclean_compile_commands,
+                    "compile_command_template": compile_command_template,
+                    "compile_command_cwd": compile_command_cwd,
+                    "run_command_template": run_command_template,
+                    "run_command_cwd": run_command_cwd,
+                }
+            )
+            self._print_workflow_completed()
+            return
         if reuse_existing_tests:
             self._print_key_event(
                 "[Step 3/4] Reuse existing tests (skip generation)",
@@ -4229,9 +6454,188 @@ Usage:
                 run_command_cwd=run_command_cwd
             )
         
+        self._print_workflow_completed()
+
+    def _print_workflow_completed(self) -> None:
+        self._print_llm_endpoint_stats()
+        self._print_llm_metrics_summary()
+        self._print_domain_classify_stats()
         print("\n" + "=" * 60)
         self._print_key_node("✓ Workflow completed", bg_code="42")
 
+    def _run_streaming_pipeline(self,
+                                target_functions: Optional[List[str]],
+                                skip_run: bool,
+                                skip_quality_gates: bool,
+                                quality_strict: bool,
+                                run_options: Dict[str, Any]) -> None:
+        """
+        流式流水线：生成 -> 校验 -> 质量闸门 -> 编译/修复/运行，各阶段通过有界队列衔接
+
+        每个测试文件保存后立即进入后续阶段，LLM生成与编译运行重叠执行；队列满时上游阻塞（背压）。
+        与分阶段模式不同，校验/质量闸门未通过只淘汰该文件，不会终止整个工作流。
+        """
+        queue_size = max(1, int(self.pipeline_queue_size or 1))
+        test_dir = self.test_dir
+        os.makedirs(test_dir, exist_ok=True)
+
+        run_ctx: Optional[Dict[str, Any]] = None
+        if not skip_run:
+            self._print_key_node("[Pipeline] Preparing build environment for streaming mode", bg_code="45")
+            run_ctx = self._prepare_test_run(test_dir=test_dir, target_functions=target_functions, **run_options)
+            if run_ctx is None:
+                print("⚠ Build environment unavailable, streaming pipeline continues with generation/verification only")
+
+        workers = max(1, int(self.test_workers or 1)) if run_ctx is not None else 0
+        compile_jobs = self._begin_concurrent_builds(workers, run_ctx) if run_ctx is not None else 0
+        print(
+            f"[Pipeline] Streaming mode: queue_size={queue_size}, build_workers={workers}, "
+            f"compile_jobs={compile_jobs}, quality_gates={'off' if skip_quality_gates else 'on'}"
+        )
+
+        check_queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        build_queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        statuses: Dict[str, str] = {}
+        statuses_lock = threading.Lock()
+        accepted_functions: List[str] = []
+
+        def _set_status(test_file: str, status: str) -> None:
+            with statuses_lock:
+                statuses[test_file] = status
+
+        with self._tagged_output() as tagged_stdout:
+            def _generate_stage() -> None:
+                tagged_stdout.set_tag("generate")
+                try:
+                    self.generate_tests(
+                        target_functions,
+                        on_test_saved=lambda fname, path: check_queue.put(os.path.basename(path))
+                    )
+                except Exception as gen_error:
+                    print(f"✗ Generation stage failed: {gen_error}")
+                finally:
+                    check_queue.put(None)
+                    tagged_stdout.set_tag(None)
+
+            def _check_stage() -> None:
+                tagged_stdout.set_tag("check")
+                try:
+                    while True:
+                        test_file = check_queue.get()
+                        if test_file is None:
+                            break
+                        function_name = test_file[:-len("_llm_test.cpp")]
+                        try:
+                            if not self._verify_test_file(test_dir, test_file):
+                                _set_status(test_file, "INVALID")
+                                continue
+                            if not skip_quality_gates and not self.run_quality_gates(
+                                    test_dir=test_dir, strict=quality_strict, target_functions=[function_name]):
+                                _set_status(test_file, "QUALITY_FAILED")
+                                continue
+                        except Exception as check_error:
+                            print(f"  ✗ Check stage error ({test_file}): {check_error}")
+                            _set_status(test_file, "ERROR")
+                            continue
+
+                        if run_ctx is None:
+                            _set_status(test_file, "VERIFIED")
+                            continue
+                        accepted_functions.append(function_name)
+                        if self.cmakelists_autogen_enabled:
+                            try:
+                                with self._cmake_lock:
+                                    self.ensure_cmakelists_for_tests(
+                                        test_dir=test_dir,
+                                        compile_cwd=run_ctx["compile_cwd"],
+                                        target_functions=list(accepted_functions)
+                                    )
+                            except Exception as cmake_sync_error:
+                                print(f"⚠ CMake sync skipped due to error: {cmake_sync_error}")
+                        build_queue.put(test_file)
+                finally:
+                    for _ in range(workers):
+                        build_queue.put(None)
+                    tagged_stdout.set_tag(None)
+
+            def _build_stage() -> None:
+                while True:
+                    test_file = build_queue.get()
+                    if test_file is None:
+                        break
+                    tagged_stdout.set_tag(os.path.splitext(test_file)[0].replace("_llm_test", ""))
+                    try:
+                        _set_status(test_file, self._run_single_test_pipeline(test_file, run_ctx))
+                    except Exception as pipeline_error:
+                        print(f"  ✗ Pipeline error ({test_file}): {pipeline_error}")
+                        _set_status(test_file, "ERROR")
+                    finally:
+                        tagged_stdout.set_tag(None)
+
+            stages = [threading.Thread(target=_generate_stage, name="ut-generate"),
+                      threading.Thread(target=_check_stage, name="ut-check")]
+            stages.extend(
+                threading.Thread(target=_build_stage, name=f"ut-build-{i}") for i in range(workers)
+            )
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+        self._compile_semaphore = None
+        self._close_clangd_sessions()
+
+        ordered = sorted(statuses)
+        if run_ctx is not None:
+            results = [(os.path.splitext(test_file)[0], statuses[test_file]) for test_file in ordered]
+            if results:
+                self._report_test_results(results, run_ctx)
+            else:
+                print("✗ No test files reached the build stage!")
+                self._current_target_functions_for_cmake_sync = None
+            return
+
+        print("\n" + "=" * 60)
+        self._print_key_node("Streaming Pipeline Summary", bg_code="44")
+        for test_file in ordered:
+            status = statuses[test_file]
+            print(f"{'✓' if status == 'VERIFIED' else '✗'} {os.path.splitext(test_file)[0]:<40} {status}")
+
+    def _print_llm_metrics_summary(self) -> None:
+        """打印本次运行各阶段的LLM token/耗时分布"""
+        metrics = getattr(self.llm_client, 'metrics', None)
+        if metrics is None:
+            return
+        summary = metrics.summary()
+        if not summary.get("calls"):
+            return
+        print("\n[LLM Metrics] token/time budget by phase (run_id=" + metrics.run_id + "):")
+        print(format_llm_metrics_summary(summary))
+        if metrics.metrics_path:
+            print(f"  ↳ metrics saved: {metrics.metrics_path}")
+
+    def _print_domain_classify_stats(self) -> None:
+        """打印失败分流的来源分布（仅在发生过分流时）"""
+        stats = dict(self._domain_classify_stats)
+        if not any(stats.values()):
+            return
+        print(
+            f"\n[Domain Classify] rule={stats['rule']}, memo={stats['memo']}, "
+            f"llm={stats['llm']}, fallback={stats['fallback']}, fingerprints={len(self._issue_domain_cache)}"
+        )
+
+    def _print_llm_endpoint_stats(self) -> None:
+        """打印vLLM端点池统计（仅在实际发生过vLLM请求时）"""
+        get_stats = getattr(self.llm_client, 'get_endpoint_stats', None)
+        if not callable(get_stats):
+            return
+        try:
+            rows = get_stats()
+        except Exception:
+            return
+        if not any(int(row.get('requests', 0) or 0) > 0 for row in rows):
+            return
+        print("\n" + self.llm_client.format_endpoint_stats())
+
 
 class CCodeAnalyzer:
     """扩展的代码分析器，添加文件查找功能"""
@@ -4462,6 +6866,135 @@ def main():
         help="Working directory for custom run command (absolute or relative to project_dir)"
     )
 
+    parser.add_argument(
+        "--gen-workers",
+        type=int,
+        default=None,
+        help="Number of concurrent test generation workers (default: config test_generation.generation.workers or 1)"
+    )
+
+    parser.add_argument(
+        "--gen-mode",
+        choices=["function", "tu_batch"],
+        default=None,
+        help="Generation mode: one prompt per function, or one prompt per source file (default: config or function)"
+    )
+
+    parser.add_argument(
+        "--gen-batch-size",
+        type=int,
+        default=None,
+        help="Maximum functions per prompt in tu_batch mode (default: config or 6)"
+    )
+
+    parser.add_argument(
+        "--mocking-mode",
+        choices=["off", "weak"],
+        default=None,
+        help="weak: link production objects with weakened symbols so tests may override any callee, including same-TU ones (default: config or off)"
+    )
+
+    parser.add_argument(
+        "--header-slicing",
+        choices=["full", "tu", "function"],
+        default=None,
+        help="Header context in prompts: whole headers, declarations referenced by the source file, or by the target function (default: config or tu)"
+    )
+
+    parser.add_argument(
+        "--repair-output",
+        choices=["full", "patch"],
+        default=None,
+        help="Fix-loop output: complete rewritten file, or SEARCH/REPLACE edit blocks with full-rewrite fallback (default: config or full)"
+    )
+
+    parser.add_argument(
+        "--patch-max-tokens",
+        type=int,
+        default=None,
+        help="max_tokens for patch-mode repair requests (default: config or 8192)"
+    )
+
+    parser.add_argument(
+        "--speculative-candidates",
+        type=int,
+        default=None,
+        help="Fix candidates requested concurrently and verified in parallel scratch builds per fix round; 1 disables (default: config or 1)"
+    )
+
+    parser.add_argument(
+        "--domain-classify",
+        choices=["rules_first", "llm"],
+        default=None,
+        help="Failure domain classification: rules_first skips the LLM when high-confidence rules match, llm always asks the LLM first (default: config or rules_first); results are memoized by failure fingerprint"
+    )
+
+    parser.add_argument(
+        "--test-workers",
+        type=int,
+        default=None,
+        help="Per-test compile/fix/run pipelines executed concurrently; 1 runs serially (default: config or 1)"
+    )
+
+    parser.add_argument(
+        "--compile-jobs",
+        type=int,
+        default=None,
+        help="Max concurrent compiler processes across test pipelines; 0 means same as --test-workers (default: config or 0)"
+    )
+
+    parser.add_argument(
+        "--llm-inflight",
+        type=int,
+        default=None,
+        help="Max in-flight LLM requests shared by all pipelines; 0 means unlimited (default: config or 0)"
+    )
+
+    parser.add_argument(
+        "--pipeline-mode",
+        choices=["phased", "streaming"],
+        default=None,
+        help="phased runs generate/verify/quality/build as separate steps; streaming feeds each generated test into verify -> quality -> build/run while later tests are still generating (default: config or phased)"
+    )
+
+    parser.add_argument(
+        "--pipeline-queue-size",
+        type=int,
+        default=None,
+        help="Bounded queue capacity between streaming pipeline stages (default: config or 2)"
+    )
+
+    parser.add_argument(
+        "--aggregate-shards",
+        type=int,
+        default=None,
+        help="Regression mode: link tests that passed last run into about N combined gtest binaries (renamed suites, deduplicated stubs) and run each once; failures fall back to per-test pipelines. 0 disables (default: config or 0)"
+    )
+
+    parser.add_argument(
+        "--cmake-generator",
+        default=None,
+        help="CMake generator for the first configure of the test build dir: auto picks Ninja when available, empty string uses the CMake default (default: config or auto)"
+    )
+
+    parser.add_argument(
+        "--disable-clangd-session",
+        action="store_true",
+        help="Run a fresh clangd --check per pre-compile diagnosis instead of reusing a persistent clangd LSP session"
+    )
+
+    parser.add_argument(
+        "--disable-syntax-preflight",
+        action="store_true",
+        help="Skip the -fsyntax-only preflight and always run the full compile+link to get the first compiler feedback"
+    )
+
+    parser.add_argument(
+        "--fused-triage-fix",
+        action="store_true",
+        help="Return triage JSON and the fix in one LLM response (requires triage enabled)"
+    )
+
     parser.add_argument(
         "--preclean-compile-commands",
         default=None,
@@ -4622,6 +7155,44 @@ def main():
         workflow.analyze_codebase()
         workflow.print_compile_info()
     else:
+        if args.gen_workers is not None:
+            workflow.generation_workers = max(1, args.gen_workers)
+        if args.gen_mode is not None:
+            workflow.generation_mode = args.gen_mode
+        if args.gen_batch_size is not None:
+            workflow.generation_batch_size = max(1, args.gen_batch_size)
+        if args.header_slicing is not None:
+            workflow.test_generator.header_slicing = args.header_slicing
+        if args.mocking_mode is not None:
+            workflow.mocking_mode = args.mocking_mode
+        if args.repair_output is not None:
+            workflow.test_generator.repair_output = args.repair_output
+        if args.patch_max_tokens is not None:
+            workflow.test_generator.patch_max_tokens = max(256, args.patch_max_tokens)
+        if args.speculative_candidates is not None:
+            workflow.speculative_candidates = max(1, args.speculative_candidates)
+        if args.fused_triage_fix:
+            workflow.fused_triage_fix = True
+        if args.domain_classify:
+            workflow.domain_classify = args.domain_classify
+        if args.test_workers is not None:
+            workflow.test_workers = max(1, args.test_workers)
+        if args.compile_jobs is not None:
+            workflow.compile_jobs = max(0, args.compile_jobs)
+        if args.llm_inflight is not None:
+            workflow.llm_inflight = max(0, args.llm_inflight)
+        if args.pipeline_mode:
+            workflow.pipeline_mode = args.pipeline_mode
+        if args.pipeline_queue_size is not None:
+            workflow.pipeline_queue_size = max(1, args.pipeline_queue_size)
+        if args.aggregate_shards is not None:
+            workflow.aggregate_shards = max(0, args.aggregate_shards)
+        if args.cmake_generator is not None:
+            workflow.cmake_generator = args.cmake_generator.strip()
+        if args.disable_clangd_session:
+            workflow.clangd_session_enabled = False
+        if args.disable_syntax_preflight:
+            workflow.syntax_preflight_enabled = False
         workflow.experience_learning_enabled = bool(effective_experience_learning_enabled)
         workflow.experience_top_k = max(1, effective_experience_top_k)
         if effective_experience_store_path and effective_experience_learning_enabled: